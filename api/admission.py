@@ -0,0 +1,267 @@
+"""
+Admission control for LLM-backed endpoints.
+
+A chat request holds a worker thread for as long as the OpenAI call takes,
+so a single busy client could otherwise occupy every thread and starve
+/health and the upload endpoints. Each controlled endpoint gets:
+
+- a per-client token bucket (CHAT_RATE_PER_MINUTE, burst CHAT_RATE_BURST);
+  clients over their rate get 429 with Retry-After set to when the next
+  token is available
+- a concurrency limit (CHAT_MAX_CONCURRENT) with a bounded wait queue
+  (CHAT_MAX_QUEUE); when the queue is full the request is rejected at once
+  with 503, and queued requests that are not admitted within
+  CHAT_QUEUE_TIMEOUT seconds get 503 as well. Retry-After on 503 is an
+  estimate from the recent service time.
+
+The graph change feed (GRAPH_CHANGES_MAX_STREAMS) only has a concurrency
+limit: each open stream holds a thread until it ends, and further streams
+get 503 without queueing.
+
+Waiting requests still hold a worker thread, so CHAT_MAX_CONCURRENT plus
+CHAT_MAX_QUEUE plus GRAPH_CHANGES_MAX_STREAMS should stay below the threads
+per worker (GUNICORN_THREADS).
+Limits are per process. Clients are identified by request.remote_addr; run
+behind werkzeug's ProxyFix when a proxy sets X-Forwarded-For.
+"""
+
+import math
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from functools import wraps
+from typing import Dict, Iterator, Optional, Tuple
+import logging
+
+from flask import Flask, current_app, jsonify, request
+
+from metrics import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+ADMISSION_IN_FLIGHT = Gauge(
+    'admission_in_flight',
+    'Requests currently admitted, by endpoint',
+    ('endpoint',)
+)
+ADMISSION_QUEUE_DEPTH = Gauge(
+    'admission_queue_depth',
+    'Requests waiting for admission, by endpoint',
+    ('endpoint',)
+)
+ADMISSION_REJECTIONS = Counter(
+    'admission_rejections_total',
+    'Requests rejected by admission control, by endpoint and reason',
+    ('endpoint', 'reason')
+)
+ADMISSION_WAIT = Histogram(
+    'admission_wait_seconds',
+    'Time admitted requests spent in the wait queue',
+    ('endpoint',)
+)
+
+class Rejected(Exception):
+    """Raised when a request is not admitted."""
+
+    def __init__(self, status: int, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+        self.retry_after = retry_after
+
+class TokenBucketLimiter:
+    """
+    Per-key token buckets.
+
+    Args:
+        rate: Tokens added per second
+        burst: Bucket capacity
+        max_keys: Full buckets are pruned once more keys than this are tracked
+    """
+
+    def __init__(self, rate: float, burst: int, max_keys: int = 10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        # key -> (tokens, last update)
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str, now: Optional[float] = None) -> float:
+        """
+        Take a token for key.
+
+        Returns:
+            0 if a token was taken, otherwise seconds until one is available
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                if len(self._buckets) > self.max_keys:
+                    self._prune(now)
+                return 0.0
+            self._buckets[key] = (tokens, now)
+            return (1 - tokens) / self.rate
+
+    def _prune(self, now: float) -> None:
+        """Forget buckets that have refilled completely (lock held)."""
+        full_after = self.burst / self.rate
+        self._buckets = {key: state for key, state in self._buckets.items() if now - state[1] < full_after}
+
+class ConcurrencyLimiter:
+    """
+    Concurrency limit with a bounded FIFO-ish wait queue and a deadline.
+
+    Args:
+        name: Endpoint name used as the metric label
+        max_concurrent: Requests allowed to run at once
+        max_queue: Requests allowed to wait for a slot
+        timeout: Seconds a request may wait before it is rejected
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, timeout: float):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.active = 0
+        self.waiting = 0
+        # Exponentially weighted mean service time, for Retry-After estimates
+        self.service_time = 1.0
+        self._condition = threading.Condition()
+
+    def retry_after(self) -> int:
+        """Estimated seconds until a newly queued request would be admitted."""
+        backlog = (self.waiting + 1) / self.max_concurrent
+        return max(1, math.ceil(backlog * self.service_time))
+
+    def _update_gauges(self) -> None:
+        ADMISSION_IN_FLIGHT.set(self.active, endpoint=self.name)
+        ADMISSION_QUEUE_DEPTH.set(self.waiting, endpoint=self.name)
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """Hold a concurrency slot for the duration of the block; raises Rejected."""
+        with self._condition:
+            if self.active >= self.max_concurrent:
+                if self.waiting >= self.max_queue:
+                    raise Rejected(503, 'queue_full', self.retry_after())
+                self.waiting += 1
+                self._update_gauges()
+                start = time.monotonic()
+                deadline = start + self.timeout
+                try:
+                    while self.active >= self.max_concurrent:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise Rejected(503, 'queue_timeout', self.retry_after())
+                        self._condition.wait(remaining)
+                finally:
+                    self.waiting -= 1
+                    self._update_gauges()
+                ADMISSION_WAIT.observe(time.monotonic() - start, endpoint=self.name)
+            self.active += 1
+            self._update_gauges()
+
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - start
+            with self._condition:
+                self.active -= 1
+                self.service_time = 0.8 * self.service_time + 0.2 * elapsed
+                self._update_gauges()
+                self._condition.notify()
+
+class AdmissionController:
+    """Token bucket plus concurrency limiter for one endpoint."""
+
+    def __init__(self, name: str, rate_per_minute: float, burst: int,
+                 max_concurrent: int, max_queue: int, timeout: float):
+        self.name = name
+        self.buckets = TokenBucketLimiter(rate_per_minute / 60.0, burst) if rate_per_minute > 0 else None
+        self.limiter = ConcurrencyLimiter(name, max_concurrent, max_queue, timeout)
+
+    @contextmanager
+    def admit(self, client: str) -> Iterator[None]:
+        """Admit one request from client; raises Rejected."""
+        if self.buckets is not None:
+            wait = self.buckets.acquire(client)
+            if wait > 0:
+                raise Rejected(429, 'rate_limited', max(1, math.ceil(wait)))
+        with self.limiter.slot():
+            yield
+
+def admission_controlled(name: str, streaming: bool = False):
+    """
+    Decorate a view so it runs under the named AdmissionController.
+
+    Rejected requests get a JSON error with Retry-After; OPTIONS preflight
+    requests are not counted.
+
+    Args:
+        name: Controller name
+        streaming: Hold the slot until the response is closed, i.e. for
+            the whole streamed body rather than until the view returns
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            controller = current_app.extensions['admission'].get(name)
+            if controller is None or request.method == 'OPTIONS':
+                return view(*args, **kwargs)
+            try:
+                if not streaming:
+                    with controller.admit(request.remote_addr or 'unknown'):
+                        return view(*args, **kwargs)
+                with ExitStack() as stack:
+                    stack.enter_context(controller.admit(request.remote_addr or 'unknown'))
+                    response = current_app.make_response(view(*args, **kwargs))
+                    response.call_on_close(stack.pop_all().close)
+                    return response
+            except Rejected as e:
+                ADMISSION_REJECTIONS.inc(endpoint=name, reason=e.reason)
+                logger.warning("Rejected %s request from %s: %s", name, request.remote_addr, e.reason)
+                message = 'Too many requests' if e.status == 429 else 'Server busy, try again later'
+                response = jsonify({'error': message, 'reason': e.reason})
+                response.status_code = e.status
+                response.headers['Retry-After'] = str(e.retry_after)
+                return response
+        return wrapper
+    return decorator
+
+def init_admission(app: Flask) -> None:
+    """
+    Create the admission controllers from the CHAT_* and
+    GRAPH_CHANGES_MAX_STREAMS settings.
+
+    Setting CHAT_MAX_CONCURRENT (GRAPH_CHANGES_MAX_STREAMS) to 0 disables
+    admission control for chat (the change feed).
+
+    Args:
+        app: Flask application
+    """
+    controllers = {}
+    if app.config.get('CHAT_MAX_CONCURRENT', 0) > 0:
+        controllers['chat'] = AdmissionController(
+            'chat',
+            rate_per_minute=app.config['CHAT_RATE_PER_MINUTE'],
+            burst=app.config['CHAT_RATE_BURST'],
+            max_concurrent=app.config['CHAT_MAX_CONCURRENT'],
+            max_queue=app.config['CHAT_MAX_QUEUE'],
+            timeout=app.config['CHAT_QUEUE_TIMEOUT'],
+        )
+    if app.config.get('GRAPH_CHANGES_MAX_STREAMS', 0) > 0:
+        controllers['graph_changes'] = AdmissionController(
+            'graph_changes',
+            rate_per_minute=0,
+            burst=0,
+            max_concurrent=app.config['GRAPH_CHANGES_MAX_STREAMS'],
+            max_queue=0,
+            timeout=0,
+        )
+    app.extensions['admission'] = controllers
@@ -1,129 +1,259 @@
 """
 Main Flask application entry point for the AI-Powered Industrial Data Management Platform.
 
-This module initializes and configures the Flask application, including:
+This module provides the create_app() factory, which initializes and configures
+the Flask application, including:
 - Database connection and configuration
 - CORS settings for API access
-- Static file serving for the frontend
+- Static file serving for the frontend (precompressed, cached, see static_files.py)
+- Fast JSON encoding and response compression (json_provider.py, compression.py)
 - Health check endpoint
 - Route registration
+- The init-db, precompress-static, graph export and chat maintenance CLI commands
+
+Importing this module has no side effects: no app is built, no database
+connection is opened and heavy libraries (pandas, networkx, NumPy/SciPy,
+openai) are only imported by the endpoints that use them. Tables are created
+explicitly with `flask --app app init-db` (or `flask --app app db upgrade`
+for migrations). Production serving goes through wsgi.py and gunicorn.conf.py.
 
 The application uses Flask-SQLAlchemy for ORM and Flask-Migrate for database migrations.
 """
 
 import os
-from flask import Flask, request, jsonify, send_from_directory
+from typing import Any, Mapping, Optional
+from flask import Flask, request, jsonify
 from flask_cors import CORS
+from sqlalchemy import text
+import click
 import logging
-from database import db
+from database import db, configure_engines, init_read_routing
 from flask_migrate import Migrate
+from metrics import init_metrics
+from logging_setup import configure_logging, parse_sampling, truncated
+from static_files import init_static, precompress_directory
+from json_provider import init_json
+from compression import init_compression
+from upload_cache import init_upload_cache
+from admission import init_admission
 
-# Configure logging with debug level for development
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-# Initialize Flask application
-app = Flask(__name__)
-
-# Configure static folder path for serving the frontend build
-static_folder = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'frontend', 'dist')
-app.static_folder = static_folder
-logger.info(f"Static folder path: {static_folder}")
-logger.info(f"Static folder exists: {os.path.exists(static_folder)}")
-
-# Database Configuration
-# Uses environment variables for secure credential management
-app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL')
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
-    'pool_pre_ping': True,  # Verify connection before usage
-    'pool_recycle': 300,    # Recycle connections every 5 minutes
-}
-
-# Initialize database instance
-db.init_app(app)
-
-# Configure CORS for cross-origin requests
-# In production, replace "*" with specific origins
-CORS(app, resources={
-    r"/*": {
-        "origins": "*",
-        "methods": ["GET", "POST", "OPTIONS"],
-        "allow_headers": ["Content-Type"]
-    }
-})
-
-# Initialize database migration support
-migrate = Migrate(app, db)
-
-# Create database tables
-with app.app_context():
-    try:
-        from models import Node, Edge, User
-        db.create_all()
-        logger.info("Database tables created successfully")
-    except Exception as e:
-        logger.error(f"Error creating database tables: {str(e)}", exc_info=True)
-
-@app.before_request
-def log_request_info():
-    """Log details about incoming requests for debugging and monitoring."""
-    logger.info(f"Request: {request.method} {request.url}")
-    logger.debug(f"Request headers: {request.headers}")
-    logger.debug(f"Request data: {request.get_data()}")
-
-@app.route('/health')
-def health_check():
-    """Health check endpoint for monitoring application status.
+def create_app(config: Optional[Mapping[str, Any]] = None) -> Flask:
+    """Create and configure the Flask application.
 
-    Returns:
-        JSON response with application health status
-        200: If the application and database are healthy
-        500: If there are any issues
-    """
-    try:
-        # Verify database connection
-        with db.engine.connect() as connection:
-            connection.execute("SELECT 1")
-        return jsonify({'status': 'healthy'}), 200
-    except Exception as e:
-        logger.error(f"Health check failed: {str(e)}")
-        return jsonify({'status': 'unhealthy', 'error': str(e)}), 500
-
-# Register API routes
-from routes import register_routes
-register_routes(app)
-
-# Frontend route handler
-@app.route('/', defaults={'path': ''})
-@app.route('/<path:path>')
-def serve_frontend(path):
-    """Serve the frontend application and handle client-side routing.
+    Defaults come from config.py (which reads the environment); entries in
+    `config` override them.
 
     Args:
-        path: The requested path from the client
+        config: Optional Flask config overrides, e.g. for tests
 
     Returns:
-        The appropriate static file or index.html for client-side routing
+        The configured Flask application
     """
-    try:
-        if not os.path.exists(app.static_folder):
-            logger.error(f"Static folder not found at {app.static_folder}")
-            return jsonify({'error': 'Frontend build not found'}), 404
-
-        # Try to serve the exact file first
-        file_path = os.path.join(app.static_folder, path)
-        if os.path.exists(file_path) and os.path.isfile(file_path):
-            return send_from_directory(app.static_folder, path)
-
-        # Otherwise, serve index.html for client-side routing
-        logger.info(f"Serving index.html for path: {path}")
-        return send_from_directory(app.static_folder, 'index.html')
-    except Exception as e:
-        logger.error(f"Error serving frontend: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+    # The frontend build is served by static_files, not Flask's static route
+    app = Flask(__name__, static_folder=None)
+    app.config.from_object('config')
+    if config:
+        app.config.update(config)
+
+    # Queue-based logging; the profile decides level, sampling and truncation
+    configure_logging(
+        app.config['LOG_PROFILE'],
+        level=app.config['LOG_LEVEL'],
+        max_message_length=app.config['LOG_MAX_MESSAGE_LENGTH'],
+        sampling=parse_sampling(app.config['LOG_SAMPLING']) if app.config['LOG_SAMPLING'] else None
+    )
+
+    # orjson-backed jsonify when available (see json_provider.py)
+    init_json(app)
+
+    # Uploads are hashed as they arrive; identical files reuse the cached ontology
+    init_upload_cache(app)
+
+    # Initialize database instance; pool, timeout and replica settings come
+    # from the DB_* config values
+    configure_engines(app.config)
+    db.init_app(app)
+    init_read_routing(app)
+
+    # Configure CORS for cross-origin requests
+    # In production, replace "*" with specific origins
+    CORS(app, resources={
+        r"/*": {
+            "origins": "*",
+            "methods": ["GET", "POST", "PATCH", "DELETE", "OPTIONS"],
+            "allow_headers": ["Content-Type"]
+        }
+    })
+
+    # Initialize database migration support
+    Migrate(app, db)
+
+    # Request latency, pipeline stage and SQL instrumentation exposed at /metrics
+    init_metrics(app, db)
+
+    register_core_routes(app)
+
+    # Per-client rate limits and a bounded queue for the LLM-backed chat endpoint
+    init_admission(app)
+
+    # Register API routes
+    from routes import register_routes
+    register_routes(app)
+
+    # gzip/zstd for large API responses; registered last so it runs first
+    # among the after_request hooks and request timing includes it
+    init_compression(app)
+
+    # Frontend build, indexed once and served from memory
+    init_static(app, app.config['FRONTEND_DIST_DIR'])
+    register_commands(app)
+    return app
+
+def register_core_routes(app: Flask) -> None:
+    """Register request logging and the health check."""
+
+    @app.before_request
+    def log_request_info():
+        """Log details about incoming requests for debugging and monitoring."""
+        logger.info("Request: %s %s (%s bytes)", request.method, request.path, request.content_length or 0)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Request headers: %s", truncated(dict(request.headers)))
+
+    @app.route('/health')
+    def health_check():
+        """Health check endpoint for monitoring application status.
+
+        Returns:
+            JSON response with application health status
+            200: If the application and database are healthy
+            500: If there are any issues
+        """
+        try:
+            # Verify database connection
+            with db.engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
+            return jsonify({'status': 'healthy'}), 200
+        except Exception as e:
+            logger.error(f"Health check failed: {str(e)}")
+            return jsonify({'status': 'unhealthy', 'error': str(e)}), 500
+
+def create_schema() -> None:
+    """Create all tables that do not exist yet. Requires an app context."""
+    import models  # noqa: F401 - registers the tables on db.metadata
+    db.create_all()
+    logger.info("Database tables created successfully")
+
+def register_commands(app: Flask) -> None:
+    """Register CLI commands (run with `flask --app app <command>`)."""
+
+    @app.cli.command('init-db')
+    @click.option('--drop', is_flag=True, help='Drop all tables first.')
+    def init_db_command(drop):
+        """Create the database schema."""
+        if drop:
+            import models  # noqa: F401
+            db.drop_all()
+            click.echo('Dropped all tables.')
+        create_schema()
+        click.echo('Database tables created.')
+
+    @app.cli.command('precompress-static')
+    def precompress_static_command():
+        """Write .gz/.br variants of the frontend build (run after npm run build)."""
+        written = precompress_directory(app.config['FRONTEND_DIST_DIR'], app.config['STATIC_COMPRESS_MIN_SIZE'])
+        click.echo(f'Wrote {written} compressed files.')
+
+    @app.cli.command('export-neo4j')
+    @click.argument('directory', type=click.Path(file_okay=False))
+    @click.option('--format', 'export_format', type=click.Choice(['csv', 'cypher']), default='csv',
+                  help='neo4j-admin import CSV files or a batched UNWIND Cypher script.')
+    @click.option('--batch-size', type=int, default=None,
+                  help='Rows per UNWIND statement (default NEO4J_EXPORT_BATCH_SIZE).')
+    def export_neo4j_command(directory, export_format, batch_size):
+        """Export the stored graph for Neo4j into DIRECTORY (see neo4j_export.py)."""
+        from neo4j_export import export_admin_csv, export_cypher
+        read_batch_size = app.config['GRAPH_EXPORT_BATCH_SIZE']
+        if export_format == 'csv':
+            manifest = export_admin_csv(directory, batch_size=read_batch_size)
+        else:
+            manifest = export_cypher(directory, batch_size=batch_size or app.config['NEO4J_EXPORT_BATCH_SIZE'],
+                                     read_batch_size=read_batch_size)
+        click.echo(f"Wrote {len(manifest['files'])} files for graph version {manifest['graph_version']} to {directory}.")
+
+    @app.cli.command('export-snapshot')
+    @click.argument('directory', type=click.Path(file_okay=False))
+    @click.option('--format', 'export_format', type=click.Choice(['parquet', 'arrow']), default='parquet',
+                  help='Parquet files or memory-mappable Arrow IPC files.')
+    def export_snapshot_command(directory, export_format):
+        """Write nodes and edges tables into DIRECTORY (see arrow_export.py)."""
+        from arrow_export import arrow_available, export_snapshot
+        if not arrow_available():
+            raise click.ClickException('Snapshot export requires pyarrow (pip install pyarrow).')
+        manifest = export_snapshot(
+            directory, export_format,
+            batch_size=app.config['ARROW_EXPORT_BATCH_SIZE'],
+            row_group_size=app.config['PARQUET_ROW_GROUP_SIZE'],
+            compression=app.config['PARQUET_COMPRESSION']
+        )
+        for name, rows in manifest['files'].items():
+            click.echo(f'{name}: {rows} rows')
+        click.echo(f"Wrote graph version {manifest['graph_version']} to {directory}.")
+
+    @app.cli.command('verify-neo4j-export')
+    @click.argument('directory', type=click.Path(exists=True, file_okay=False))
+    def verify_neo4j_export_command(directory):
+        """Check a Neo4j export against its manifest."""
+        from neo4j_export import verify_export
+        problems = verify_export(directory)
+        for problem in problems:
+            click.echo(problem, err=True)
+        if problems:
+            raise click.ClickException(f'{len(problems)} problems found.')
+        click.echo('Export is intact.')
+
+    @app.cli.command('prune-chat-sessions')
+    @click.option('--days', type=int, default=30, show_default=True,
+                  help='Delete sessions without a turn for this many days.')
+    def prune_chat_sessions_command(days):
+        """Delete idle chat sessions and their conversations."""
+        from datetime import timedelta
+        from chat_sessions import prune_sessions
+        deleted = prune_sessions(timedelta(days=days))
+        db.session.commit()
+        click.echo(f'Deleted {deleted} chat sessions.')
+
+    @app.cli.command('query-templates')
+    @click.option('--clear', is_flag=True, help='Delete all templates, e.g. after the ontology changed.')
+    def query_templates_command(clear):
+        """List the cached chat query templates (see query_planner.py)."""
+        from models import QueryTemplate
+        if clear:
+            deleted = QueryTemplate.query.delete()
+            db.session.commit()
+            click.echo(f'Deleted {deleted} query templates.')
+            return
+        for template in QueryTemplate.query.order_by(QueryTemplate.hits.desc()):
+            state = 'planned' if template.plan.get('answerable') else 'declined'
+            site = f'  [{template.site}]' if template.site else ''
+            click.echo(f'{template.hits:>8}  {state:<8}  {template.signature}{site}')
+
+_default_app = None
+
+def __getattr__(name):
+    """Build the default app on first access of `app.app` (kept for existing imports)."""
+    global _default_app
+    if name == 'app':
+        if _default_app is None:
+            _default_app = create_app()
+        return _default_app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 if __name__ == '__main__':
-    # Start the development server
+    # Development server; production uses gunicorn with wsgi.py
+    dev_app = create_app()
+    with dev_app.app_context():
+        create_schema()
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port, debug=True)
\ No newline at end of file
+    dev_app.run(host='0.0.0.0', port=port, debug=os.environ.get('FLASK_DEBUG') == '1')
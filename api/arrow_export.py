@@ -0,0 +1,240 @@
+"""
+Columnar snapshots of the node and edge tables as Parquet or Arrow IPC.
+
+Rows are read through a server-side cursor (``yield_per``; a named cursor on
+PostgreSQL) in ARROW_EXPORT_BATCH_SIZE batches, converted column-wise into
+Arrow record batches and written out as they arrive:
+
+- Parquet files get a row group every PARQUET_ROW_GROUP_SIZE rows, so at most
+  one row group is buffered
+- Arrow IPC output is written batch by batch; the file format (``.arrow``)
+  can be memory-mapped with ``pyarrow.memory_map`` + ``pyarrow.ipc.open_file``,
+  the stream format is used for HTTP responses
+
+Schemas::
+
+    nodes: id int64, label string, type string, properties string (JSON)
+    edges: id int64, source_id int64, target_id int64, type string
+
+The graph version is stored in the schema metadata under ``graph_version``.
+export_snapshot() reads the version and both tables in one snapshot session
+(REPEATABLE READ on PostgreSQL). It reads the version again after writing,
+and exports again if a write was committed in between, so the node and edge
+files always describe the same version.
+pyarrow is an optional dependency (the ``arrow`` extra); without it
+arrow_available() is False and the exports raise RuntimeError.
+"""
+
+import json
+import os
+from typing import Dict, Iterator, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from database import get_graph_version, read_session, snapshot_session
+from graph_export import StreamBuffer
+from models import Node, Edge
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # optional dependency
+    pa = pq = None
+
+TABLES = ('nodes', 'edges')
+FORMATS = ('parquet', 'arrow')
+MIMETYPES = {'parquet': 'application/vnd.apache.parquet', 'arrow': 'application/vnd.apache.arrow.stream'}
+
+def arrow_available() -> bool:
+    """Whether pyarrow is installed."""
+    return pa is not None
+
+def _require_arrow() -> None:
+    if pa is None:
+        raise RuntimeError('Columnar export requires pyarrow (pip install pyarrow)')
+
+def table_schema(table: str, version: int) -> 'pa.Schema':
+    """Arrow schema of an exported table, tagged with the graph version."""
+    _require_arrow()
+    if table == 'nodes':
+        fields = [('id', pa.int64()), ('label', pa.string()), ('type', pa.string()), ('properties', pa.string())]
+    elif table == 'edges':
+        fields = [('id', pa.int64()), ('source_id', pa.int64()), ('target_id', pa.int64()), ('type', pa.string())]
+    else:
+        raise ValueError(f"table must be one of {list(TABLES)}")
+    return pa.schema(fields, metadata={'graph_version': str(version), 'table': table})
+
+def iter_record_batches(table: str, version: int, batch_size: int = 65536,
+                        session: Optional[Session] = None) -> Iterator['pa.RecordBatch']:
+    """
+    Read a table through a server-side cursor as Arrow record batches.
+
+    Args:
+        table: 'nodes' or 'edges'
+        version: Graph version stored in the schema metadata
+        batch_size: Rows per database fetch and per record batch
+        session: Session to read from (default read_session())
+
+    Yields:
+        Record batches in id order
+    """
+    schema = table_schema(table, version)
+    if table == 'nodes':
+        query = select(Node.id, Node.label, Node.type, Node.properties).order_by(Node.id)
+    else:
+        query = select(Edge.id, Edge.source_id, Edge.target_id, Edge.type).order_by(Edge.id)
+
+    # Core execution on the session's connection skips ORM row processing (about 2x faster)
+    result = (session or read_session()).connection().execute(query.execution_options(yield_per=batch_size))
+    try:
+        for rows in result.partitions():
+            columns = list(zip(*rows))
+            if table == 'nodes':
+                columns[3] = [json.dumps(properties or {}, sort_keys=True) for properties in columns[3]]
+            yield pa.RecordBatch.from_arrays(
+                [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+                schema=schema
+            )
+    finally:
+        result.close()
+
+def _write_parquet_groups(sink, table: str, version: int, batch_size: int, row_group_size: int,
+                          compression: str, session: Optional[Session] = None) -> Iterator[int]:
+    """Write a table as Parquet, yielding the running row count after each row group."""
+    schema = table_schema(table, version)
+    rows = 0
+    with pq.ParquetWriter(sink, schema, compression=compression) as writer:
+        pending, pending_rows = [], 0
+        for batch in iter_record_batches(table, version, batch_size, session):
+            pending.append(batch)
+            pending_rows += batch.num_rows
+            if pending_rows >= row_group_size:
+                writer.write_table(pa.Table.from_batches(pending, schema), row_group_size=row_group_size)
+                rows += pending_rows
+                pending, pending_rows = [], 0
+                yield rows
+        if pending:
+            writer.write_table(pa.Table.from_batches(pending, schema), row_group_size=row_group_size)
+            rows += pending_rows
+    yield rows
+
+def _write_ipc_batches(sink, table: str, version: int, batch_size: int, file_format: bool,
+                       session: Optional[Session] = None) -> Iterator[int]:
+    """Write a table as Arrow IPC, yielding the running row count after each batch."""
+    schema = table_schema(table, version)
+    rows = 0
+    open_writer = pa.ipc.new_file if file_format else pa.ipc.new_stream
+    with open_writer(sink, schema) as writer:
+        for batch in iter_record_batches(table, version, batch_size, session):
+            writer.write_batch(batch)
+            rows += batch.num_rows
+            yield rows
+    yield rows
+
+def write_parquet(sink, table: str, version: int, batch_size: int = 65536, row_group_size: int = 131072,
+                  compression: str = 'zstd', session: Optional[Session] = None) -> int:
+    """
+    Write a table as Parquet, one row group per row_group_size rows.
+
+    Args:
+        sink: Path or writable file object
+        table: 'nodes' or 'edges'
+        version: Graph version stored in the schema metadata
+        batch_size: Rows per database fetch
+        row_group_size: Rows per Parquet row group
+        compression: Parquet codec ('zstd', 'snappy', 'none', ...)
+        session: Session to read from (default read_session())
+
+    Returns:
+        Number of rows written
+    """
+    rows = 0
+    for rows in _write_parquet_groups(sink, table, version, batch_size, row_group_size, compression,
+                                      session):
+        pass
+    return rows
+
+def write_ipc(sink, table: str, version: int, batch_size: int = 65536, file_format: bool = True,
+              session: Optional[Session] = None) -> int:
+    """
+    Write a table as Arrow IPC.
+
+    Args:
+        sink: Path or writable file object
+        table: 'nodes' or 'edges'
+        version: Graph version stored in the schema metadata
+        batch_size: Rows per database fetch and record batch
+        file_format: IPC file format (random access, memory-mappable) if True,
+            otherwise the stream format
+        session: Session to read from (default read_session())
+
+    Returns:
+        Number of rows written
+    """
+    rows = 0
+    for rows in _write_ipc_batches(sink, table, version, batch_size, file_format, session):
+        pass
+    return rows
+
+def export_snapshot(directory: str, export_format: str = 'parquet', batch_size: int = 65536,
+                    row_group_size: int = 131072, compression: str = 'zstd', attempts: int = 3) -> Dict:
+    """
+    Write nodes and edges files for the current graph into a directory.
+
+    The version and both tables are read in one snapshot session. If the
+    graph version changed by the time both files are written (possible
+    where the database gives no snapshot, i.e. SQLite), the files are
+    written again.
+
+    Args:
+        directory: Output directory, created if missing
+        export_format: 'parquet' or 'arrow'
+        batch_size, row_group_size, compression: See write_parquet()
+        attempts: Exports to try before giving up on a graph being written
+
+    Returns:
+        {'graph_version': version, 'files': {file name: rows written}}
+
+    Raises:
+        RuntimeError: If the graph changed during every attempt
+    """
+    if export_format not in FORMATS:
+        raise ValueError(f"format must be one of {list(FORMATS)}")
+    os.makedirs(directory, exist_ok=True)
+    for _ in range(attempts):
+        with snapshot_session() as session:
+            version = get_graph_version(session)
+            written = {}
+            for table in TABLES:
+                name = f'{table}.{export_format}'
+                path = os.path.join(directory, name)
+                if export_format == 'parquet':
+                    written[name] = write_parquet(path, table, version, batch_size, row_group_size, compression,
+                                                  session)
+                else:
+                    written[name] = write_ipc(path, table, version, batch_size, file_format=True,
+                                              session=session)
+            # get() would answer from the identity map
+            session.expire_all()
+            if get_graph_version(session) == version:
+                return {'graph_version': version, 'files': written}
+    raise RuntimeError(f'The graph changed during each of {attempts} export attempts')
+
+def iter_export(table: str, version: int, export_format: str, batch_size: int = 65536,
+                row_group_size: int = 131072, compression: str = 'zstd') -> Iterator[bytes]:
+    """
+    Stream one table as Parquet or as an Arrow IPC stream.
+
+    Output is yielded as the writer produces it: per row group for Parquet,
+    per record batch for Arrow.
+    """
+    buffer = StreamBuffer()
+    if export_format == 'parquet':
+        progress = _write_parquet_groups(buffer, table, version, batch_size, row_group_size, compression)
+    else:
+        progress = _write_ipc_batches(buffer, table, version, batch_size, file_format=False)
+    for _ in progress:
+        data = buffer.drain()
+        if data:
+            yield data
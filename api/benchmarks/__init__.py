@@ -0,0 +1,10 @@
+"""
+Micro-benchmark suite for the ingestion and query paths.
+
+Run from the api directory:
+
+    python -m benchmarks.run --rows 1000 10000
+    python -m benchmarks.run --database-url postgresql://localhost/bench --rows 1000 10000 100000
+
+See benchmarks/run.py for the options and the baseline format.
+"""
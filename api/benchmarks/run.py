@@ -0,0 +1,334 @@
+"""
+Benchmark runner with JSON baselines and regression thresholds.
+
+Benchmarks (each run on synthetic_data datasets of the requested sizes):
+
+- extract_ontology: CSV DataFrame -> ontology
+- generate_knowledge_graph: ontology -> graph data
+- validate_ontology: the full POST /api/validate-ontology path on an empty
+  database, with the graph_build, persistence and layout stages reported
+  separately from the metrics spans
+- chat_asset_context: ChatHandler._get_asset_context on the stored graph
+  (PostgreSQL only; the query uses DISTINCT ON)
+- graph_response: encoding a validate-ontology style response with N nodes
+  through the stdlib and orjson JSON providers, and compressing it with gzip
+  and zstd at the configured levels (keyed "<N>-nodes"; sizes are recorded
+  next to the timings)
+
+Results are keyed by database backend and row count. A baseline file holds
+the same structure plus regression thresholds:
+
+    {
+      "backend": "sqlite",
+      "thresholds": {"default": 0.25, "validate_ontology.layout": 0.5},
+      "min_delta_s": 0.005,
+      "results": {"1000": {"extract_ontology": {"median_s": 0.05, ...}, ...}}
+    }
+
+A benchmark regresses when its median exceeds the baseline median by more
+than its threshold (a fraction) and by more than min_delta_s. The exit
+status is 1 if anything regressed.
+
+Usage (from the api directory):
+    python -m benchmarks.run --rows 1000 10000
+    python -m benchmarks.run --rows 1000 10000 --update-baseline
+    python -m benchmarks.run --database-url postgresql://localhost/bench --rows 100000
+    python -m benchmarks.run --rows --response-nodes 100000
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), 'baselines')
+DEFAULT_THRESHOLD = 0.25
+DEFAULT_MIN_DELTA = 0.005
+VALIDATE_STAGES = ('graph_build', 'persistence', 'layout')
+
+def measure(run: Callable[[], None], repeat: int, setup: Optional[Callable[[], None]] = None) -> Dict:
+    """
+    Time a callable several times.
+
+    Args:
+        run: Code under test
+        repeat: Number of timed runs
+        setup: Untimed preparation before every run
+
+    Returns:
+        Dict with median_s, min_s and repeat
+    """
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+    return {'median_s': round(statistics.median(timings), 6), 'min_s': round(min(timings), 6), 'repeat': repeat}
+
+def run_suite(app, db, sizes: List[int], repeat: int = 3, seed: int = 42) -> Dict:
+    """
+    Run every benchmark for every dataset size.
+
+    Args:
+        app: Flask application (its database is dropped and recreated)
+        db: Flask-SQLAlchemy extension bound to the app
+        sizes: Dataset row counts
+        repeat: Timed runs per benchmark
+        seed: Synthetic data seed
+
+    Returns:
+        Results keyed by row count (as a string) and benchmark name
+    """
+    from chat_handler import ChatHandler
+    from graph_cache import clear_all_caches
+    from graph_generator import generate_knowledge_graph
+    from metrics import STAGE_LATENCY
+    from ontology_processor import extract_ontology
+    from synthetic_data import generate_work_orders
+
+    client = app.test_client()
+    with app.app_context():
+        backend = db.engine.dialect.name
+
+    def reset_database():
+        with app.app_context():
+            db.session.remove()
+            db.drop_all()
+            db.create_all()
+        clear_all_caches()
+
+    results = {}
+    for rows in sizes:
+        logger.info(f"Benchmarking {rows} rows on {backend}")
+        df = generate_work_orders(rows, seed=seed)
+        size_results = {}
+
+        ontology = {}
+
+        def extract():
+            ontology.update(extract_ontology(df))
+        size_results['extract_ontology'] = measure(extract, repeat)
+        size_results['generate_knowledge_graph'] = measure(lambda: generate_knowledge_graph(ontology), repeat)
+
+        # Serialize once so the timing covers the request path, not the test client's encoder
+        body = json.dumps({'ontology': ontology})
+        stage_totals = {stage: 0.0 for stage in VALIDATE_STAGES}
+
+        def validate():
+            before = {stage: STAGE_LATENCY.sum(stage=stage) for stage in VALIDATE_STAGES}
+            response = client.post('/api/validate-ontology', data=body, content_type='application/json')
+            if response.status_code != 200:
+                raise RuntimeError(f"validate-ontology failed: {response.get_data(as_text=True)[:500]}")
+            for stage in VALIDATE_STAGES:
+                stage_totals[stage] += STAGE_LATENCY.sum(stage=stage) - before[stage]
+        size_results['validate_ontology'] = measure(validate, repeat, setup=reset_database)
+        for stage in VALIDATE_STAGES:
+            size_results[f'validate_ontology.{stage}'] = {
+                'median_s': round(stage_totals[stage] / repeat, 6), 'repeat': repeat, 'aggregate': 'mean'
+            }
+
+        if backend == 'postgresql':
+            os.environ.setdefault('OPENAI_API_KEY', 'benchmark-unused')
+            handler = ChatHandler(db)
+
+            def asset_context():
+                with app.app_context():
+                    handler._get_asset_context()
+            size_results['chat_asset_context'] = measure(asset_context, repeat)
+        else:
+            logger.info("Skipping chat_asset_context: its query uses PostgreSQL DISTINCT ON")
+
+        results[str(rows)] = size_results
+        reset_database()
+    return results
+
+def graph_response_payload(nodes: int, edges_per_node: int = 2, seed: int = 42) -> Dict:
+    """
+    Build a validate-ontology response body with the given number of nodes.
+
+    Nodes carry layout coordinates and edges point at random nodes, like the
+    graph returned after validation.
+    """
+    import random
+
+    rng = random.Random(seed)
+    types = ('Asset', 'WorkOrder', 'Facility', 'Person', 'Status')
+    return {
+        'message': 'Ontology validated and stored successfully',
+        'graph': {
+            'nodes': [
+                {'id': f'entity_{i}', 'label': f'{types[i % len(types)]} {i}', 'type': types[i % len(types)],
+                 'x': rng.uniform(-1000, 1000), 'y': rng.uniform(-1000, 1000)}
+                for i in range(nodes)
+            ],
+            'edges': [
+                {'source': f'entity_{i}', 'target': f'entity_{rng.randrange(nodes)}', 'type': 'RELATED_TO'}
+                for i in range(nodes) for _ in range(edges_per_node)
+            ]
+        }
+    }
+
+def run_response_suite(app, nodes: int, repeat: int = 3, seed: int = 42) -> Dict:
+    """
+    Time JSON encoding and compression of a large graph response.
+
+    Args:
+        app: Flask application (its COMPRESS_*_LEVEL settings are used)
+        nodes: Number of nodes in the payload
+        repeat: Timed runs per benchmark
+        seed: Payload seed
+
+    Returns:
+        Benchmark results for this payload size
+    """
+    from flask.json.provider import DefaultJSONProvider
+    from compression import available_encodings, compress
+    from json_provider import OrjsonProvider, orjson
+
+    payload = graph_response_payload(nodes, seed=seed)
+    providers = {'stdlib': DefaultJSONProvider(app)}
+    if orjson is not None:
+        providers['orjson'] = OrjsonProvider(app)
+
+    results = {}
+    body = b''
+    with app.app_context():
+        for name, provider in providers.items():
+            holder = {}
+
+            def encode():
+                holder['body'] = provider.response(payload).get_data()
+            results[f'graph_response.encode.{name}'] = {**measure(encode, repeat), 'bytes': len(holder['body'])}
+            body = holder['body']
+
+    levels = {'gzip': app.config['COMPRESS_GZIP_LEVEL'], 'zstd': app.config['COMPRESS_ZSTD_LEVEL']}
+    for encoding in available_encodings():
+        holder = {}
+
+        def run():
+            holder['body'] = compress(body, encoding, levels[encoding])
+        results[f'graph_response.{encoding}'] = {**measure(run, repeat), 'bytes': len(holder['body'])}
+    return results
+
+def compare(results: Dict, baseline: Dict) -> List[Dict]:
+    """
+    Compare results against a baseline.
+
+    Args:
+        results: Output of run_suite
+        baseline: Baseline document with results, thresholds and min_delta_s
+
+    Returns:
+        One entry per benchmark present in both, with ratio and regressed flag
+    """
+    thresholds = baseline.get('thresholds', {})
+    default_threshold = thresholds.get('default', DEFAULT_THRESHOLD)
+    min_delta = baseline.get('min_delta_s', DEFAULT_MIN_DELTA)
+
+    comparisons = []
+    for rows, benchmarks in results.items():
+        baseline_benchmarks = baseline.get('results', {}).get(rows, {})
+        for name, current in benchmarks.items():
+            reference = baseline_benchmarks.get(name)
+            if not reference or not reference.get('median_s'):
+                continue
+            threshold = thresholds.get(name, default_threshold)
+            ratio = current['median_s'] / reference['median_s']
+            comparisons.append({
+                'rows': rows,
+                'benchmark': name,
+                'baseline_s': reference['median_s'],
+                'current_s': current['median_s'],
+                'ratio': round(ratio, 3),
+                'threshold': threshold,
+                'regressed': ratio > 1 + threshold and current['median_s'] - reference['median_s'] > min_delta
+            })
+    return comparisons
+
+def load_baseline(path: str) -> Optional[Dict]:
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def write_baseline(path: str, backend: str, results: Dict, previous: Optional[Dict] = None) -> None:
+    """Write results as the new baseline, keeping thresholds and sizes not re-run."""
+    previous = previous or {}
+    document = {
+        'backend': backend,
+        'machine': f"{platform.system()} {platform.machine()} / Python {platform.python_version()}",
+        'thresholds': previous.get('thresholds', {'default': DEFAULT_THRESHOLD}),
+        'min_delta_s': previous.get('min_delta_s', DEFAULT_MIN_DELTA),
+        'results': {**previous.get('results', {}), **results}
+    }
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(document, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Run the benchmark suite')
+    parser.add_argument('--rows', type=int, nargs='*', default=[1000, 10000])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--response-nodes', type=int, nargs='*', default=[100000],
+                        help='Node counts for the graph_response benchmarks')
+    parser.add_argument('--database-url', default=os.environ.get('BENCHMARK_DATABASE_URL', 'sqlite:///:memory:'),
+                        help='Database to benchmark against; its tables are dropped and recreated')
+    parser.add_argument('--baseline', help='Baseline file (defaults to benchmarks/baselines/<backend>.json)')
+    parser.add_argument('--update-baseline', action='store_true', help='Store these results as the baseline')
+    parser.add_argument('--output', help='Also write the raw results to this file')
+    args = parser.parse_args(argv)
+
+    # Benchmarks measure the production logging profile, not per-entity DEBUG output
+    from app import create_app
+    from database import db
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': args.database_url,
+        'LOG_PROFILE': os.environ.get('LOG_PROFILE', 'production')
+    })
+
+    with app.app_context():
+        backend = db.engine.dialect.name
+    results = run_suite(app, db, args.rows, args.repeat, args.seed)
+    for nodes in args.response_nodes:
+        results[f'{nodes}-nodes'] = run_response_suite(app, nodes, args.repeat, args.seed)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'backend': backend, 'results': results}, f, indent=2, sort_keys=True)
+
+    baseline_path = args.baseline or os.path.join(BASELINE_DIR, f'{backend}.json')
+    baseline = load_baseline(baseline_path)
+
+    regressed = []
+    if baseline is not None:
+        for entry in compare(results, baseline):
+            flag = 'REGRESSED' if entry['regressed'] else 'ok'
+            print(f"{entry['rows']:>9} {entry['benchmark']:<32} {entry['baseline_s']:>10.4f}s "
+                  f"-> {entry['current_s']:>10.4f}s  x{entry['ratio']:<6} {flag}")
+            if entry['regressed']:
+                regressed.append(entry)
+    else:
+        print(json.dumps(results, indent=2, sort_keys=True))
+
+    if args.update_baseline:
+        write_baseline(baseline_path, backend, results, baseline)
+        print(f"Baseline written to {baseline_path}")
+        return 0
+    if regressed:
+        print(f"{len(regressed)} benchmark(s) regressed beyond their threshold")
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,13 +1,18 @@
 import os
 import logging
+from contextlib import nullcontext
 from typing import Dict, List, Optional, TypedDict
 from openai import OpenAI, APIError
 import json
 from sqlalchemy import text
-from models import Node, Edge, db
+from flask import current_app
+from models import Node, Edge, WorkOrderAttribute, ChatSession, db
+from database import get_graph_version, in_transaction, read_session
+from chat_sessions import cached_context, has_history, history_messages, record_exchange, select_context
+from metrics import span
+from logging_setup import truncated
 
 logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.DEBUG)
 
 class WorkOrder(TypedDict):
     id: str
@@ -26,7 +31,7 @@ class AssetContext(TypedDict):
     system_note: Optional[str]
 
 class ChatHandler:
-    def __init__(self, db):
+    def __init__(self, db, site: Optional[str] = None):
         api_key = os.environ.get('OPENAI_API_KEY')
         if not api_key:
             logger.error("OpenAI API key not found in environment variables")
@@ -34,6 +39,8 @@ class ChatHandler:
 
         self.openai = OpenAI(api_key=api_key)
         self.db = db
+        # Restricts every context query to one site's graph (one partition on PostgreSQL)
+        self.site = site
 
     def _analyze_query_intent(self, query: str) -> Dict[str, float]:
         """Analyze query to determine the intent and confidence scores."""
@@ -57,47 +64,55 @@ class ChatHandler:
         logger.debug(f"Query intent analysis: {intents}")
         return intents
 
-    def _get_asset_context(self) -> AssetContext:
+    def _get_asset_context(self, raise_errors: bool = False) -> AssetContext:
         """Get asset-specific context using optimized queries."""
         try:
-            with db.session.begin():
+            # Read-only context queries go to the replica when one is configured
+            session = read_session()
+            params = {'site': self.site} if self.site else {}
+            # Chat sessions have loaded their history in an open transaction already
+            with nullcontext() if in_transaction(session) else session.begin():
                 # First get a count of work orders for debugging
                 count_query = text("""
                     SELECT COUNT(DISTINCT wo.id) 
                     FROM node wo 
                     WHERE wo.type = 'WorkOrder'
-                """)
-                result = db.session.execute(count_query)
+                """ + (" AND wo.site = :site" if self.site else ""))
+                result = session.execute(count_query, params)
                 total_wo_count = result.scalar()
                 logger.info(f"Total work orders in database: {total_wo_count}")
 
-                # Get assets with their work orders using a simpler query
+                # Get assets with their work orders using a simpler query; joins
+                # stay within a site, as labels are only unique per site
                 query = text("""
                     WITH base_assets AS (
                         -- Get unique assets with their facilities
                         SELECT DISTINCT ON (a.id)
                             a.id as asset_id,
+                            a.site as asset_site,
                             a.label as asset_label,
                             a.properties as asset_properties,
                             f.label as facility_label
                         FROM node a
-                        LEFT JOIN edge e_f ON a.id = e_f.target_id AND e_f.type = 'LOCATED_IN'
-                        LEFT JOIN node f ON e_f.source_id = f.id AND f.type = 'Facility'
-                        WHERE a.type = 'Asset'
+                        LEFT JOIN edge e_f ON a.id = e_f.target_id AND e_f.site = a.site AND e_f.type = 'LOCATED_IN'
+                        LEFT JOIN node f ON e_f.source_id = f.id AND f.site = a.site AND f.type = 'Facility'
+                        WHERE a.type = 'Asset'{site_filter}
                         ORDER BY a.id, f.label
                     )
                     SELECT 
                         ba.*,
                         wo.id as wo_id,
                         wo.label as wo_label,
-                        e_wo.type as wo_type
+                        e_wo.type as wo_type,
+                        woa.status as wo_status
                     FROM base_assets ba
-                    LEFT JOIN edge e_wo ON ba.asset_id = e_wo.target_id AND e_wo.type = 'MAINTAINS'
-                    LEFT JOIN node wo ON e_wo.source_id = wo.id AND wo.type = 'WorkOrder'
+                    LEFT JOIN edge e_wo ON ba.asset_id = e_wo.target_id AND e_wo.site = ba.asset_site AND e_wo.type = 'MAINTAINS'
+                    LEFT JOIN node wo ON e_wo.source_id = wo.id AND wo.site = ba.asset_site AND wo.type = 'WorkOrder'
+                    LEFT JOIN work_order_attribute woa ON woa.site = wo.site AND woa.work_order = wo.label
                     ORDER BY ba.asset_label, wo.label;
-                """)
+                """.format(site_filter=" AND a.site = :site" if self.site else ""))
 
-                result = db.session.execute(query)
+                result = session.execute(query, params)
 
                 # Process results into the required format
                 assets_dict: Dict[int, Asset] = {}
@@ -114,7 +129,7 @@ class ChatHandler:
                     if row.wo_id:  # Only add work orders if they exist
                         work_order: WorkOrder = {
                             'id': row.wo_label,
-                            'status': None,
+                            'status': row.wo_status,
                             'type': row.wo_type
                         }
                         # Avoid duplicates
@@ -136,15 +151,81 @@ class ChatHandler:
                 }
 
         except Exception as e:
+            if raise_errors:
+                raise
             logger.error(f"Error in _get_asset_context: {str(e)}", exc_info=True)
             return {"type": "asset_context", "data": [], "system_note": None}
 
-    def get_response(self, user_query: str) -> Dict:
-        """Generate response using context."""
+    def _get_session_context(self, session: ChatSession, user_query: str):
+        """
+        Select the asset context for a turn of a chat session.
+
+        The full context is cached per graph version and site. A question
+        naming no entity keeps the session's previous focus (and so its
+        context); named assets, facilities or work orders become the focus.
+
+        Returns:
+            Tuple of (context, focus labels, whether the previous focus was reused)
+        """
+        try:
+            version = get_graph_version(read_session(), self.site)
+            indexed = cached_context(version, self.site, lambda: self._get_asset_context(raise_errors=True))
+        except Exception as e:
+            logger.error(f"Error in _get_session_context: {str(e)}", exc_info=True)
+            return {"type": "asset_context", "data": [], "system_note": None}, [], False
+
+        mentioned = indexed.mentioned(user_query)
+        reused = not mentioned and bool(session.focus)
+        focus = mentioned or list(session.focus or [])
+        context = select_context(indexed.context, focus, current_app.config['CHAT_CONTEXT_MAX_TOKENS'])
+        return context, focus, reused
+
+    def _plan_query(self, messages: List[Dict]) -> str:
+        """Ask the LLM for the query plan of a question shape (see query_planner.py)."""
+        with span('llm_call'):
+            response = self.openai.chat.completions.create(
+                model="gpt-4-turbo-preview",
+                messages=messages,
+                temperature=0,
+                max_tokens=400,
+                response_format={"type": "json_object"}
+            )
+        return response.choices[0].message.content if response.choices else ''
+
+    def _answer_from_template(self, user_query: str) -> Optional[Dict]:
+        """Answer from the cached query template of the question's shape, if it has one that applies."""
+        from query_planner import answer_question
+        try:
+            return answer_question(user_query, self.site, self._plan_query,
+                                   max_steps=current_app.config['QUERY_TEMPLATE_MAX_STEPS'],
+                                   max_results=current_app.config['QUERY_TEMPLATE_MAX_RESULTS'])
+        except Exception as e:
+            logger.error(f"Error in _answer_from_template: {str(e)}", exc_info=True)
+            return None
+
+    def get_response(self, user_query: str, session: Optional[ChatSession] = None) -> Dict:
+        """Generate response using context, continuing the chat session if one is given."""
         try:
             logger.info(f"Processing chat query: {user_query}")
-            context = self._get_asset_context()  # Always use asset context for work order queries
-            logger.debug(f"Generated context: {json.dumps(context, indent=2)}")
+            # Template answers see only the question, not a session's summary
+            # and focus, so follow-ups go to the regular chat
+            if current_app.config['CHAT_QUERY_TEMPLATES'] and (session is None or not has_history(session)):
+                with span('query_template'):
+                    result = self._answer_from_template(user_query)
+                if result is not None:
+                    if session is not None:
+                        record_exchange(session, user_query, result["response"],
+                                        current_app.config['CHAT_HISTORY_MESSAGES'],
+                                        current_app.config['CHAT_SUMMARY_MAX_TOKENS'])
+                        result.update(session_id=session.id, focus=list(session.focus or []), context_reused=False)
+                    return result
+
+            with span('context_build'):
+                if session is None:
+                    context = self._get_asset_context()  # Always use asset context for work order queries
+                else:
+                    context, focus, reused = self._get_session_context(session, user_query)
+            logger.debug("Generated context: %s", truncated(context))
 
             system_message = """You are an expert in enterprise asset management and maintenance operations.
             When analyzing and responding to queries:
@@ -154,27 +235,40 @@ class ChatHandler:
             4. Keep responses clear and focused on the user's needs
             5. When counting work orders, include the total number and break it down by facility if applicable"""
 
+            messages = [{"role": "system", "content": system_message}]
+            if session is not None:
+                # Older turns as a bounded summary, recent ones verbatim
+                if session.summary:
+                    messages[0]["content"] += f"\n\nSummary of the earlier conversation:\n{session.summary}"
+                messages.extend(history_messages(session))
+            messages.append({
+                "role": "user", 
+                "content": f"Based on this context:\n{json.dumps(context, indent=2)}\n\nQuestion: {user_query}"
+            })
+
             try:
-                response = self.openai.chat.completions.create(
-                    model="gpt-4-turbo-preview",
-                    messages=[
-                        {"role": "system", "content": system_message},
-                        {
-                            "role": "user", 
-                            "content": f"Based on this context:\n{json.dumps(context, indent=2)}\n\nQuestion: {user_query}"
-                        }
-                    ],
-                    temperature=0.7,
-                    max_tokens=1000
-                )
+                with span('llm_call'):
+                    response = self.openai.chat.completions.create(
+                        model="gpt-4-turbo-preview",
+                        messages=messages,
+                        temperature=0.7,
+                        max_tokens=1000
+                    )
 
                 if not response.choices or not response.choices[0].message:
                     raise ValueError("Empty response received from OpenAI")
 
-                return {
+                result = {
                     "response": response.choices[0].message.content,
                     "context": context
                 }
+                if session is not None:
+                    session.focus = focus
+                    record_exchange(session, user_query, result["response"],
+                                    current_app.config['CHAT_HISTORY_MESSAGES'],
+                                    current_app.config['CHAT_SUMMARY_MAX_TOKENS'])
+                    result.update(session_id=session.id, focus=focus, context_reused=reused)
+                return result
 
             except APIError as e:
                 logger.error(f"OpenAI API error: {str(e)}", exc_info=True)
@@ -192,11 +286,15 @@ class ChatHandler:
     def _get_general_context(self) -> Dict:
         """Get general context about the knowledge graph."""
         try:
+            session = read_session()
+            nodes, edges = session.query(Node), session.query(Edge)
+            if self.site:
+                nodes, edges = nodes.filter(Node.site == self.site), edges.filter(Edge.site == self.site)
             context = {
-                'nodes': Node.query.count(),
-                'edges': Edge.query.count(),
-                'asset_count': Node.query.filter_by(type='Asset').count(),
-                'facility_count': Node.query.filter_by(type='Facility').count()
+                'nodes': nodes.count(),
+                'edges': edges.count(),
+                'asset_count': nodes.filter_by(type='Asset').count(),
+                'facility_count': nodes.filter_by(type='Facility').count()
             }
             return {
                 'type': 'general_context',
@@ -210,12 +308,16 @@ class ChatHandler:
         """Get facility-specific context."""
         facilities = []
         try:
-            facility_nodes = Node.query.filter_by(type='Facility').all()
+            session = read_session()
+            facility_query = session.query(Node).filter_by(type='Facility')
+            if self.site:
+                facility_query = facility_query.filter(Node.site == self.site)
+            facility_nodes = facility_query.all()
             logger.debug(f"Found {len(facility_nodes)} facility nodes")
 
             for facility in facility_nodes:
                 # Get work order count for this facility
-                work_order_count = Edge.query.join(
+                work_order_count = session.query(Edge).join(
                     Node, Edge.source_id == Node.id
                 ).filter(
                     Node.type == 'WorkOrder'
@@ -227,12 +329,13 @@ class ChatHandler:
 
                 facility_data = {
                     'facility': facility.label,
+                    'site': facility.site,
                     'assets': [],
                     'workOrderCount': work_order_count
                 }
 
                 # Get assets in this facility
-                asset_edges = Edge.query.join(
+                asset_edges = session.query(Edge).join(
                     Node, Edge.source_id == Node.id
                 ).filter(
                     Node.type == 'Asset',
@@ -244,7 +347,7 @@ class ChatHandler:
                 for edge in asset_edges:
                     asset = edge.source
                     # Get work orders for this asset
-                    asset_work_orders = Edge.query.join(
+                    asset_work_orders = session.query(Edge).join(
                         Node, Edge.source_id == Node.id
                     ).filter(
                         Node.type == 'WorkOrder',
@@ -257,7 +360,7 @@ class ChatHandler:
                         'workOrders': [
                             {
                                 'id': wo.source.label,
-                                'status': wo.source.properties.get('status') if wo.source.properties else None,
+                                'status': None,
                                 'type': wo.type
                             }
                             for wo in asset_work_orders
@@ -266,6 +369,20 @@ class ChatHandler:
 
                 facilities.append(facility_data)
 
+            # Work order status lives in the typed attribute table; one lookup for all
+            labels = {wo['id'] for facility in facilities for asset in facility['assets'] for wo in asset['workOrders']}
+            if labels:
+                status_query = session.query(
+                    WorkOrderAttribute.site, WorkOrderAttribute.work_order, WorkOrderAttribute.status
+                ).filter(WorkOrderAttribute.work_order.in_(labels))
+                if self.site:
+                    status_query = status_query.filter(WorkOrderAttribute.site == self.site)
+                statuses = {(site, work_order): status for site, work_order, status in status_query.all()}
+                for facility in facilities:
+                    for asset in facility['assets']:
+                        for wo in asset['workOrders']:
+                            wo['status'] = statuses.get((facility['site'], wo['id']))
+
             logger.info(f"Returning context for {len(facilities)} facilities")
             return {
                 "type": "facility_context",
@@ -283,9 +400,11 @@ class ChatHandler:
             logger.info(f"Primary intent detected: {primary_intent}")
 
             # Debug database state
-            logger.debug(f"Total nodes in database: {Node.query.count()}")
-            logger.debug(f"Total edges in database: {Edge.query.count()}")
-            logger.debug(f"Asset nodes: {Node.query.filter_by(type='Asset').count()}")
+            if logger.isEnabledFor(logging.DEBUG):
+                session = read_session()
+                logger.debug("Total nodes in database: %d", session.query(Node).count())
+                logger.debug("Total edges in database: %d", session.query(Edge).count())
+                logger.debug("Asset nodes: %d", session.query(Node).filter_by(type='Asset').count())
 
             if primary_intent == 'asset':
                 return self._get_asset_context()
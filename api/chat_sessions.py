@@ -0,0 +1,213 @@
+"""
+Server-side multi-turn chat sessions with a bounded prompt.
+
+A session stores its conversation as ChatTurn rows. Each prompt is built from:
+
+- the running summary of older turns, folded in extractively (question and
+  first sentence of the answer) so no extra LLM call is needed, and trimmed
+  to CHAT_SUMMARY_MAX_TOKENS
+- the last CHAT_HISTORY_MESSAGES messages verbatim
+- the graph context of the entities in focus, within CHAT_CONTEXT_MAX_TOKENS
+
+The asset context is built once per graph version and site and shared by
+all sessions. A follow-up that names no entity keeps the previous turn's
+focus, so it is answered from the same context without querying the graph
+again; naming assets, facilities or work orders moves the focus to them.
+Prompt size therefore stays bounded however long the conversation gets.
+Token counts are estimated at four characters per token.
+"""
+
+import json
+import re
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, select
+
+from database import db
+from graph_cache import VersionedCache
+from models import ChatSession, ChatTurn
+
+CHARS_PER_TOKEN = 4
+# Longest label, in words, matched against a question
+MAX_LABEL_WORDS = 6
+# Clip for each history message; completions are capped at the same size
+MAX_MESSAGE_TOKENS = 1000
+SUMMARY_QUESTION_CHARS = 160
+SUMMARY_ANSWER_CHARS = 240
+
+_context_cache = VersionedCache('chat_context', max_entries=16)
+_WORD = re.compile(r'[a-z0-9_]+')
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s')
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count of a text."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def _clip(text: str, max_chars: int) -> str:
+    text = ' '.join(text.split())
+    return text if len(text) <= max_chars else text[:max_chars - 3].rstrip() + '...'
+
+def _normalize(text: str) -> Tuple[str, ...]:
+    return tuple(_WORD.findall(text.lower()))
+
+class IndexedContext:
+    """An asset context with its entity labels indexed by normalized words."""
+
+    def __init__(self, context: Dict):
+        self.context = context
+        self.labels: Dict[Tuple[str, ...], str] = {}
+        for asset in context.get('data', []):
+            labels = [asset.get('asset'), asset.get('facility')]
+            labels.extend(work_order['id'] for work_order in asset.get('workOrders', []))
+            for label in labels:
+                if label:
+                    words = _normalize(label)
+                    if 0 < len(words) <= MAX_LABEL_WORDS:
+                        self.labels.setdefault(words, label)
+
+    def mentioned(self, query: str) -> List[str]:
+        """Labels of the entities named in a question, in order of appearance."""
+        words = _normalize(query)
+        found = []
+        for start in range(len(words)):
+            # Prefer the longest label starting at each word ('Plant A' over 'Plant')
+            for size in range(min(MAX_LABEL_WORDS, len(words) - start), 0, -1):
+                label = self.labels.get(words[start:start + size])
+                if label is not None:
+                    if label not in found:
+                        found.append(label)
+                    break
+        return found
+
+def cached_context(version: int, site: Optional[str], build: Callable[[], Dict]) -> IndexedContext:
+    """The asset context for a site's graph version, built once and shared by all sessions."""
+    return _context_cache.get_or_compute(version, 'asset', lambda: IndexedContext(build()), site=site)
+
+def select_context(context: Dict, focus: List[str], max_tokens: int) -> Dict:
+    """
+    Restrict an asset context to the entities in focus and to a token budget.
+
+    Args:
+        context: Asset context as built by ChatHandler
+        focus: Asset, facility or work order labels; empty keeps all assets
+        max_tokens: Budget for the serialized assets
+
+    Returns:
+        A context dict of the same shape, noting how many assets were left out
+    """
+    assets = context.get('data', [])
+    if focus:
+        wanted = set(focus)
+        assets = [asset for asset in assets if asset.get('asset') in wanted or asset.get('facility') in wanted
+                  or any(work_order['id'] in wanted for work_order in asset.get('workOrders', []))]
+
+    selected, used = [], 0
+    for asset in assets:
+        cost = estimate_tokens(json.dumps(asset, indent=2))
+        if used + cost > max_tokens:
+            break
+        selected.append(asset)
+        used += cost
+
+    notes = [context['system_note'].strip()] if context.get('system_note') else []
+    if focus:
+        notes.append(f"The context is limited to the assets related to: {', '.join(focus)}.")
+    if len(selected) < len(assets):
+        notes.append(f"{len(assets) - len(selected)} further matching assets were left out for length.")
+    return {'type': context.get('type', 'asset_context'), 'data': selected,
+            'system_note': '\n'.join(notes) or None}
+
+def create_session(site: Optional[str] = None) -> ChatSession:
+    """Start a chat session; the caller commits."""
+    session = ChatSession(id=uuid.uuid4().hex, site=site, summary='', focus=[])
+    db.session.add(session)
+    return session
+
+def get_session(session_id: str) -> Optional[ChatSession]:
+    """Look up a chat session by id."""
+    return db.session.get(ChatSession, session_id)
+
+def has_history(session: ChatSession) -> bool:
+    """Whether a session has earlier turns a question may refer back to."""
+    return bool(session.summary) or session.turns.first() is not None
+
+def history_messages(session: ChatSession) -> List[Dict]:
+    """The session's unsummarized turns as chat messages, each clipped to MAX_MESSAGE_TOKENS."""
+    turns = session.turns.filter(ChatTurn.summarized.is_(False)).all()
+    return [{'role': turn.role, 'content': _clip(turn.content, MAX_MESSAGE_TOKENS * CHARS_PER_TOKEN)}
+            for turn in turns]
+
+def _summary_line(question: str, answer: str) -> str:
+    first_sentence = _SENTENCE_END.split(' '.join(answer.split()), maxsplit=1)[0]
+    return (f"- Asked: {_clip(question, SUMMARY_QUESTION_CHARS)} "
+            f"Answered: {_clip(first_sentence, SUMMARY_ANSWER_CHARS)}")
+
+def trim_summary(summary: str, max_tokens: int) -> str:
+    """Drop the oldest summary lines until the summary fits the budget."""
+    lines = summary.splitlines()
+    while len(lines) > 1 and estimate_tokens('\n'.join(lines)) > max_tokens:
+        lines.pop(0)
+    if lines and estimate_tokens(lines[0]) > max_tokens:
+        lines[0] = _clip(lines[0], max_tokens * CHARS_PER_TOKEN)
+    return '\n'.join(lines)
+
+def record_exchange(session: ChatSession, question: str, answer: str, history_limit: int,
+                    summary_max_tokens: int) -> None:
+    """
+    Append a question and its answer, folding turns beyond the history window into the summary.
+
+    Runs in the current transaction; the caller commits.
+
+    Args:
+        session: Chat session
+        question: User message
+        answer: Assistant message
+        history_limit: Messages kept verbatim for the next prompt
+        summary_max_tokens: Budget of the running summary
+    """
+    session.turns.append(ChatTurn(role='user', content=question))
+    session.turns.append(ChatTurn(role='assistant', content=answer))
+    session.updated_at = datetime.utcnow()
+    db.session.flush()
+
+    pending = session.turns.filter(ChatTurn.summarized.is_(False)).all()
+    # Fold whole question/answer pairs
+    excess = len(pending) - max(history_limit, 0)
+    excess += excess % 2
+    if excess <= 0:
+        return
+    folded = pending[:excess]
+    lines = [session.summary] if session.summary else []
+    for index in range(0, len(folded) - 1, 2):
+        lines.append(_summary_line(folded[index].content, folded[index + 1].content))
+    for turn in folded:
+        turn.summarized = True
+    session.summary = trim_summary('\n'.join(lines), summary_max_tokens)
+
+def session_to_dict(session: ChatSession) -> Dict:
+    """Serialize a session with its full conversation."""
+    return {
+        'session_id': session.id,
+        'site': session.site,
+        'summary': session.summary,
+        'focus': session.focus or [],
+        'turns': [{'role': turn.role, 'content': turn.content, 'summarized': turn.summarized,
+                   'created_at': turn.created_at.isoformat() if turn.created_at else None}
+                  for turn in session.turns],
+        'created_at': session.created_at.isoformat() if session.created_at else None,
+        'updated_at': session.updated_at.isoformat() if session.updated_at else None
+    }
+
+def prune_sessions(max_age: timedelta) -> int:
+    """
+    Delete sessions without a turn for longer than max_age; the caller commits.
+
+    Returns:
+        Number of sessions deleted
+    """
+    cutoff = datetime.utcnow() - max_age
+    stale = select(ChatSession.id).where(ChatSession.updated_at < cutoff)
+    db.session.execute(delete(ChatTurn).where(ChatTurn.session_id.in_(stale)))
+    return db.session.execute(delete(ChatSession).where(ChatSession.updated_at < cutoff)).rowcount
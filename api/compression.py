@@ -0,0 +1,144 @@
+"""
+Response compression negotiated via Accept-Encoding.
+
+An after_request hook compresses JSON, NDJSON and other text responses:
+
+- zstd (with the optional zstandard package) is preferred over gzip when the
+  client accepts both
+- buffered responses smaller than COMPRESS_MIN_SIZE are left alone, as are
+  responses that do not shrink
+- streamed responses (the NDJSON graph export) are compressed chunk by chunk,
+  flushing after every chunk so clients can decode records as they arrive
+- responses that already carry a Content-Encoding (precompressed static
+  files), event streams, partial content and Cache-Control: no-transform
+  responses are passed through
+
+Strong ETags on compressed responses are turned into weak ones, since the
+bytes differ from the identity representation; If-None-Match checks use weak
+comparison, so revalidation keeps working.
+"""
+
+import gzip
+import zlib
+from typing import Iterable, Iterator, Optional
+import logging
+
+from flask import Flask, Response, request
+
+from static_files import is_compressible
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+def available_encodings():
+    """Supported encodings, preferred first."""
+    return ('zstd', 'gzip') if zstandard is not None else ('gzip',)
+
+def choose_encoding(accept_encodings, encodings=None) -> Optional[str]:
+    """Pick the first supported encoding the client accepts; None means identity."""
+    for encoding in encodings or available_encodings():
+        if accept_encodings[encoding] > 0:
+            return encoding
+    return None
+
+def compress(data: bytes, encoding: str, level: int) -> bytes:
+    """Compress a complete body."""
+    if encoding == 'zstd':
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+def compress_stream(chunks: Iterable, encoding: str, level: int) -> Iterator[bytes]:
+    """
+    Compress an iterable of chunks, flushing after each one.
+
+    The iterable is closed afterwards, so stream_with_context generators
+    still release their context.
+
+    Args:
+        chunks: Body chunks (str is encoded as UTF-8)
+        encoding: 'zstd' or 'gzip'
+        level: Compression level
+
+    Yields:
+        Compressed chunks
+    """
+    if encoding == 'zstd':
+        compressor = zstandard.ZstdCompressor(level=level).compressobj()
+        flush_args = (zstandard.COMPRESSOBJ_FLUSH_BLOCK,)
+    else:
+        # wbits 31 = zlib stream in a gzip container
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+        flush_args = (zlib.Z_SYNC_FLUSH,)
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            if chunk:
+                yield compressor.compress(chunk) + compressor.flush(*flush_args)
+        yield compressor.flush()
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+
+def _skip(response: Response) -> bool:
+    return (
+        request.method == 'HEAD'
+        or not 200 <= response.status_code < 300
+        or response.status_code in (204, 206)
+        or 'Content-Encoding' in response.headers
+        or 'no-transform' in response.headers.get('Cache-Control', '')
+        or response.mimetype == 'text/event-stream'
+        or not is_compressible(response.mimetype or '')
+    )
+
+def init_compression(app: Flask) -> None:
+    """
+    Register the response compression hook.
+
+    Register it after the other after_request hooks (Flask runs them in
+    reverse order) so request timing includes compression.
+
+    Args:
+        app: Flask application
+    """
+    min_size = app.config.get('COMPRESS_MIN_SIZE', 1024)
+    levels = {
+        'gzip': app.config.get('COMPRESS_GZIP_LEVEL', 5),
+        'zstd': app.config.get('COMPRESS_ZSTD_LEVEL', 3),
+    }
+    logger.info(f"Response compression: {', '.join(available_encodings())}, min size {min_size} bytes")
+
+    @app.after_request
+    def compress_response(response):
+        if _skip(response):
+            return response
+        streamed = response.is_streamed
+        if not streamed and (response.content_length or 0) < min_size:
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = choose_encoding(request.accept_encodings)
+        if encoding is None:
+            return response
+
+        if streamed:
+            response.response = compress_stream(response.response, encoding, levels[encoding])
+            response.direct_passthrough = False
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            compressed = compress(data, encoding, levels[encoding])
+            if len(compressed) >= len(data):
+                return response
+            response.set_data(compressed)
+
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
@@ -1,25 +1,120 @@
 import logging
 import os
+import tempfile
 
-# Configure logging
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
+# Logging pipeline (see logging_setup.py); LOG_PROFILE is 'development' or 'production'
+LOG_PROFILE = os.environ.get('LOG_PROFILE', 'development')
+LOG_LEVEL = os.environ.get('LOG_LEVEL')
+LOG_MAX_MESSAGE_LENGTH = int(os.environ['LOG_MAX_MESSAGE_LENGTH']) if os.environ.get('LOG_MAX_MESSAGE_LENGTH') else None
+# Per-logger sampling of DEBUG/INFO records, e.g. "graph_generator=100,routes=10"
+LOG_SAMPLING = os.environ.get('LOG_SAMPLING')
+
 # Database configuration
-DATABASE_URL = os.environ.get('DATABASE_URL')
-if DATABASE_URL and DATABASE_URL.startswith('postgres://'):
-    DATABASE_URL = DATABASE_URL.replace('postgres://', 'postgresql://', 1)
+def _normalize_url(url):
+    if url and url.startswith('postgres://'):
+        return url.replace('postgres://', 'postgresql://', 1)
+    return url
+
+DATABASE_URL = _normalize_url(os.environ.get('DATABASE_URL'))
+# Optional read-only replica for read-heavy paths (chat context, traversal,
+# export, graph views); reads go to the primary when unset
+DATABASE_REPLICA_URL = _normalize_url(os.environ.get('DATABASE_REPLICA_URL'))
 
-# SQLAlchemy configuration
+# SQLAlchemy configuration; engine options are built from the DB_* settings
+# below by database.configure_engines()
 SQLALCHEMY_DATABASE_URI = DATABASE_URL
 SQLALCHEMY_TRACK_MODIFICATIONS = False
-SQLALCHEMY_ENGINE_OPTIONS = {
-    "pool_pre_ping": True,
-    "pool_recycle": 300,
-}
+
+# Connection pool per engine and process (ignored for SQLite)
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 300))
+# Server-side statement timeout in milliseconds (PostgreSQL); 0 disables it
+DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 30000))
+
+# Site (plant/tenant) key used when a request does not name one (see sites.py)
+DEFAULT_SITE = os.environ.get('DEFAULT_SITE', 'default')
 
 # Configure maximum query depth for recursive CTEs
-MAX_GRAPH_DEPTH = 10
\ No newline at end of file
+MAX_GRAPH_DEPTH = int(os.environ.get('MAX_GRAPH_DEPTH', 10))
+
+# Graph export settings
+GRAPH_EXPORT_BATCH_SIZE = int(os.environ.get('GRAPH_EXPORT_BATCH_SIZE', 1000))
+GRAPH_EXPORT_MAX_LIMIT = int(os.environ.get('GRAPH_EXPORT_MAX_LIMIT', 100000))
+
+# Maximum operations in one ontology patch (see ontology_patch.py)
+ONTOLOGY_PATCH_MAX_OPERATIONS = int(os.environ.get('ONTOLOGY_PATCH_MAX_OPERATIONS', 1000))
+
+# Rows per UNWIND statement in Neo4j Cypher exports (see neo4j_export.py)
+NEO4J_EXPORT_BATCH_SIZE = int(os.environ.get('NEO4J_EXPORT_BATCH_SIZE', 1000))
+
+# Parquet/Arrow snapshot exports (see arrow_export.py): rows per server-side
+# cursor fetch and per Parquet row group
+ARROW_EXPORT_BATCH_SIZE = int(os.environ.get('ARROW_EXPORT_BATCH_SIZE', 65536))
+PARQUET_ROW_GROUP_SIZE = int(os.environ.get('PARQUET_ROW_GROUP_SIZE', 131072))
+PARQUET_COMPRESSION = os.environ.get('PARQUET_COMPRESSION', 'zstd')
+
+# Precomputed layouts are skipped for graphs larger than this
+GRAPH_LAYOUT_MAX_NODES = int(os.environ.get('GRAPH_LAYOUT_MAX_NODES', 100000))
+
+# JSON encoder for API responses: 'auto' (orjson when installed), 'orjson' or 'stdlib'
+JSON_PROVIDER = os.environ.get('JSON_PROVIDER', 'auto')
+# API responses smaller than this are sent uncompressed
+COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+COMPRESS_GZIP_LEVEL = int(os.environ.get('COMPRESS_GZIP_LEVEL', 5))
+# zstd is used when the zstandard package is installed and the client accepts it
+COMPRESS_ZSTD_LEVEL = int(os.environ.get('COMPRESS_ZSTD_LEVEL', 3))
+
+# On-disk cache of extracted ontologies keyed by upload content hash (see
+# upload_cache.py); least recently used entries are evicted beyond the size
+# limit, 0 disables the cache
+UPLOAD_CACHE_DIR = os.environ.get('UPLOAD_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'ontology-upload-cache'))
+UPLOAD_CACHE_MAX_BYTES = int(os.environ.get('UPLOAD_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+
+# Graph change feed (see graph_changes.py): versions per site kept for resuming,
+# largest delta listed id by id (in id ranges), poll and keepalive intervals,
+# stream lifetime before the client reconnects, and open streams per process
+# (each holds a worker thread, see the admission settings below)
+GRAPH_CHANGES_RETENTION = int(os.environ.get('GRAPH_CHANGES_RETENTION', 1000))
+GRAPH_CHANGES_MAX_RANGES = int(os.environ.get('GRAPH_CHANGES_MAX_RANGES', 10000))
+GRAPH_CHANGES_POLL_INTERVAL = float(os.environ.get('GRAPH_CHANGES_POLL_INTERVAL', 1.0))
+GRAPH_CHANGES_KEEPALIVE = float(os.environ.get('GRAPH_CHANGES_KEEPALIVE', 15))
+GRAPH_CHANGES_MAX_SECONDS = float(os.environ.get('GRAPH_CHANGES_MAX_SECONDS', 300))
+GRAPH_CHANGES_MAX_STREAMS = int(os.environ.get('GRAPH_CHANGES_MAX_STREAMS', 3))
+
+# Chat sessions (see chat_sessions.py): messages kept verbatim in the prompt,
+# and token budgets for the running summary and the graph context
+CHAT_HISTORY_MESSAGES = int(os.environ.get('CHAT_HISTORY_MESSAGES', 6))
+CHAT_SUMMARY_MAX_TOKENS = int(os.environ.get('CHAT_SUMMARY_MAX_TOKENS', 400))
+CHAT_CONTEXT_MAX_TOKENS = int(os.environ.get('CHAT_CONTEXT_MAX_TOKENS', 6000))
+
+# CHAT_QUERY_TEMPLATES=1 answers chat questions naming graph entities from
+# cached query templates (query_planner.py). Off by default: the first
+# question of each new shape costs one extra planning call to the LLM
+CHAT_QUERY_TEMPLATES = os.environ.get('CHAT_QUERY_TEMPLATES', '0') == '1'
+QUERY_TEMPLATE_MAX_STEPS = int(os.environ.get('QUERY_TEMPLATE_MAX_STEPS', 3))
+QUERY_TEMPLATE_MAX_RESULTS = int(os.environ.get('QUERY_TEMPLATE_MAX_RESULTS', 50))
+
+# Admission control for /api/chat (see admission.py); limits are per worker
+# process. Keep CHAT_MAX_CONCURRENT + CHAT_MAX_QUEUE + GRAPH_CHANGES_MAX_STREAMS
+# below GUNICORN_THREADS so other endpoints always have a thread;
+# CHAT_MAX_CONCURRENT=0 disables it.
+CHAT_MAX_CONCURRENT = int(os.environ.get('CHAT_MAX_CONCURRENT', 2))
+CHAT_MAX_QUEUE = int(os.environ.get('CHAT_MAX_QUEUE', 1))
+CHAT_QUEUE_TIMEOUT = float(os.environ.get('CHAT_QUEUE_TIMEOUT', 5))
+# Per-client token bucket; CHAT_RATE_PER_MINUTE=0 disables it
+CHAT_RATE_PER_MINUTE = float(os.environ.get('CHAT_RATE_PER_MINUTE', 30))
+CHAT_RATE_BURST = int(os.environ.get('CHAT_RATE_BURST', 5))
+
+# Frontend build served by static_files.py, indexed once at startup
+FRONTEND_DIST_DIR = os.environ.get(
+    'FRONTEND_DIST_DIR',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'frontend', 'dist')
+)
+# Larger static files are streamed from disk instead of held in memory
+STATIC_MEMORY_MAX_FILE_SIZE = int(os.environ.get('STATIC_MEMORY_MAX_FILE_SIZE', 5 * 1024 * 1024))
+# Smaller static files are not compressed
+STATIC_COMPRESS_MIN_SIZE = int(os.environ.get('STATIC_COMPRESS_MIN_SIZE', 1024))
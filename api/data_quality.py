@@ -0,0 +1,148 @@
+"""
+Data-quality profile of an uploaded work order export.
+
+Bad exports (duplicate work order IDs, assets listed under two facilities,
+blank Asset IDs) otherwise only show up as odd graphs after validation and
+persistence. profile_frame() reports, next to the extracted ontology:
+
+- per column: null rate (blank cells count as null in rule columns) and
+  number of distinct values
+- duplicate_ids: work order IDs that occur on more than one row
+- blank_values: rows with a blank cell in a column the extraction rules use
+- conflicts: source values of a single-valued relationship rule
+  ("cardinality": "one") with more than one target, e.g. an Asset ID
+  LOCATED_IN two facilities; one-to-many rules (a work order ASSIGNED_TO
+  several people) are not checked
+- orphans: entity values that take part in no relationship, i.e. nodes that
+  will have no edges
+- missing_columns: columns the rules use that the export lacks
+
+Each rule column is factorized once into integer codes of its cleaned text
+(ontology_rules.factorize_column); conflicts and orphans are then found with
+array indexing on the codes, so no string group-by or Python row loop is
+needed. The upload passes the same codes to the extraction, which then skips
+cleaning those columns, so profiling adds little to the upload.
+Row filters of the rules are not applied: the profile describes the export
+itself.
+"""
+
+from typing import Dict, List, Optional
+import logging
+
+import numpy as np
+import pandas as pd
+
+from ontology_rules import ColumnCodes, compile_rules, factorize_column
+from work_orders import WORK_ORDER_COLUMN
+
+logger = logging.getLogger(__name__)
+
+# Examples listed per issue
+MAX_EXAMPLES = 5
+
+def _examples(labels: np.ndarray, codes: np.ndarray) -> List[str]:
+    return [str(label) for label in labels[codes[:MAX_EXAMPLES]]]
+
+def _rule_columns(df: pd.DataFrame, rules: Optional[Dict]) -> List[str]:
+    plan = compile_rules(rules)
+    columns = list(dict.fromkeys(
+        [step.column for step in plan.entities]
+        + [column for step in plan.relationships for column in (step.source, step.target)]
+    ))
+    if WORK_ORDER_COLUMN in df.columns and WORK_ORDER_COLUMN not in columns:
+        columns.append(WORK_ORDER_COLUMN)
+    return columns
+
+def factorize_rule_columns(df: pd.DataFrame, rules: Optional[Dict] = None) -> Dict[str, ColumnCodes]:
+    """Factorize the columns the rules (and the work order ID check) use."""
+    return {column: factorize_column(df[column]) for column in _rule_columns(df, rules) if column in df.columns}
+
+def profile_frame(df: pd.DataFrame, rules: Optional[Dict] = None,
+                  codes: Optional[Dict[str, ColumnCodes]] = None) -> Dict:
+    """
+    Profile an uploaded DataFrame against the extraction rules.
+
+    Args:
+        df: Uploaded work orders
+        rules: Optional rule set (see ontology_rules.py); defaults to the
+            built-in work order mapping
+        codes: Result of factorize_rule_columns(), computed if not given
+
+    Returns:
+        Dict with 'rows', per-column stats, 'issues' (each with a 'check',
+        a 'count' and up to MAX_EXAMPLES examples) and 'missing_columns'
+    """
+    plan = compile_rules(rules)
+    rule_columns = _rule_columns(df, rules)
+    factorized = codes if codes is not None else factorize_rule_columns(df, rules)
+
+    rows = len(df)
+    columns = {}
+    for column in df.columns:
+        if column in factorized:
+            column_codes, labels, _ = factorized[column]
+            nulls = int(np.count_nonzero(column_codes < 0))
+            distinct = len(labels) - int(np.any(labels == ''))
+        else:
+            series = df[column]
+            nulls = int(series.isna().sum())
+            distinct = int(series.nunique())
+        columns[str(column)] = {'null_rate': round(nulls / rows, 4) if rows else 0.0, 'distinct': distinct}
+
+    issues = []
+    if WORK_ORDER_COLUMN in factorized:
+        column_codes, labels, _ = factorized[WORK_ORDER_COLUMN]
+        counts = np.bincount(column_codes[column_codes >= 0], minlength=len(labels))
+        duplicated = np.flatnonzero(counts > 1)
+        if len(duplicated):
+            issues.append({'check': 'duplicate_ids', 'column': WORK_ORDER_COLUMN, 'count': len(duplicated),
+                           'rows': int(counts[duplicated].sum()), 'examples': _examples(labels, duplicated)})
+
+    for column, (column_codes, _, _) in factorized.items():
+        blank_rows = np.flatnonzero(column_codes < 0)
+        if len(blank_rows):
+            issues.append({'check': 'blank_values', 'column': column, 'count': len(blank_rows),
+                           'rows': blank_rows[:MAX_EXAMPLES].tolist()})
+
+    linked = {column: np.zeros(rows, dtype=bool) for column in factorized}
+    for step in plan.relationships:
+        if step.source not in factorized or step.target not in factorized:
+            continue
+        source, source_labels, _ = factorized[step.source]
+        target, target_labels, _ = factorized[step.target]
+        both = (source >= 0) & (target >= 0)
+        linked[step.source] |= both
+        linked[step.target] |= both
+        if not step.single:
+            continue
+        source, target = source[both], target[both]
+
+        # First target of each source (reversed assignment keeps the first
+        # occurrence); a row with any other target is a conflict
+        first = np.full(len(source_labels), -1)
+        first[source[::-1]] = target[::-1]
+        conflicting = pd.unique(source[target != first[source]])
+        if len(conflicting):
+            examples = []
+            for code in conflicting[:MAX_EXAMPLES]:
+                targets = pd.unique(target[source == code])
+                examples.append({'value': str(source_labels[code]),
+                                 'targets': _examples(target_labels, targets)})
+            issues.append({'check': 'conflicts', 'relationship': step.type, 'source': step.source,
+                           'target': step.target, 'count': len(conflicting), 'examples': examples})
+
+    for column in dict.fromkeys(step.column for step in plan.entities):
+        if column not in factorized:
+            continue
+        column_codes, labels, _ = factorized[column]
+        present = np.zeros(len(labels), dtype=bool)
+        present[column_codes[column_codes >= 0]] = True
+        present[column_codes[linked[column]]] = False
+        orphans = np.flatnonzero(present)
+        if len(orphans):
+            issues.append({'check': 'orphans', 'column': column, 'count': len(orphans),
+                           'examples': _examples(labels, orphans)})
+
+    missing = [column for column in rule_columns if column not in df.columns]
+    logger.info(f"Profiled {rows} rows: {len(issues)} data quality issues, {len(missing)} missing columns")
+    return {'rows': rows, 'columns': columns, 'issues': issues, 'missing_columns': missing}
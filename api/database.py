@@ -1,13 +1,140 @@
+from contextlib import contextmanager
+from flask import current_app, g
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.dialects.postgresql import JSONB
-from sqlalchemy import text
-from typing import Any, Dict, List, Optional
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import Session, scoped_session
+from typing import Any, Dict, Iterator, List, Optional
 import logging
 
 logger = logging.getLogger(__name__)
 
 db = SQLAlchemy()
 
+# GraphVersion key of the whole graph; SITE_PATTERN keeps it apart from site keys
+ALL_SITES = '*'
+
+def engine_options(url: Optional[str], config, read_only: bool = False) -> Dict[str, Any]:
+    """
+    Build SQLAlchemy engine options from the DB_* settings.
+
+    Args:
+        url: Database URL the options are for
+        config: Mapping with the DB_* settings (config.py or app.config)
+        read_only: Open connections in read-only mode
+
+    Returns:
+        Keyword arguments for create_engine
+    """
+    options = {
+        'pool_pre_ping': True,  # Verify connection before usage
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+    }
+    if url and not url.startswith('sqlite'):
+        options.update(
+            pool_size=config['DB_POOL_SIZE'],
+            max_overflow=config['DB_MAX_OVERFLOW'],
+            pool_timeout=config['DB_POOL_TIMEOUT'],
+        )
+    if url and url.startswith('postgresql'):
+        settings = []
+        if config['DB_STATEMENT_TIMEOUT_MS']:
+            settings.append(f"-c statement_timeout={config['DB_STATEMENT_TIMEOUT_MS']}")
+        if read_only:
+            settings.append('-c default_transaction_read_only=on')
+        if settings:
+            options['connect_args'] = {'options': ' '.join(settings)}
+    return options
+
+def configure_engines(config) -> None:
+    """
+    Derive the primary engine options from the DB_* settings.
+
+    Explicit SQLALCHEMY_ENGINE_OPTIONS are kept.
+
+    Args:
+        config: The Flask app config, before db.init_app
+    """
+    if not config.get('SQLALCHEMY_ENGINE_OPTIONS'):
+        config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(config.get('SQLALCHEMY_DATABASE_URI'), config)
+
+def init_read_routing(app) -> None:
+    """
+    Create the replica engine (if DATABASE_REPLICA_URL is set) and register
+    cleanup of the per-context read session.
+
+    SQLite replicas are opened with PRAGMA query_only, PostgreSQL replicas with
+    default_transaction_read_only, so accidental writes fail loudly. The
+    engine is not a Flask-SQLAlchemy bind: create_all/drop_all never touch it.
+    """
+    replica_url = app.config.get('DATABASE_REPLICA_URL')
+    if replica_url:
+        replica = create_engine(replica_url, **engine_options(replica_url, app.config, read_only=True))
+        if replica.dialect.name == 'sqlite':
+            @event.listens_for(replica, 'connect')
+            def set_query_only(dbapi_connection, connection_record):
+                cursor = dbapi_connection.cursor()
+                cursor.execute('PRAGMA query_only = ON')
+                cursor.close()
+        app.extensions['replica_engine'] = replica
+        logger.info(f"Routing reads to replica {replica.url.render_as_string(hide_password=True)}")
+
+    @app.teardown_appcontext
+    def close_read_session(exception=None):
+        session = g.pop('_read_session', None)
+        if session is not None:
+            session.close()
+
+def read_session() -> Session:
+    """
+    Return the session for read-only queries in the current app context.
+
+    This is a session on the replica engine when one is configured, and
+    db.session otherwise (or inside primary_reads()).
+    """
+    replica = current_app.extensions.get('replica_engine')
+    if replica is None or g.get('_primary_reads'):
+        return db.session
+    session = g.get('_read_session')
+    if session is None:
+        session = g._read_session = Session(bind=replica, autoflush=False)
+    return session
+
+@contextmanager
+def primary_reads() -> Iterator[None]:
+    """Route read_session() to the primary, e.g. to read data just written."""
+    previous = g.get('_primary_reads', False)
+    g._primary_reads = True
+    try:
+        yield
+    finally:
+        g._primary_reads = previous
+
+@contextmanager
+def snapshot_session() -> Iterator[Session]:
+    """
+    Open a session whose reads share one snapshot, for multi-table exports.
+
+    Uses the same engine as read_session(). On PostgreSQL the session runs
+    in a REPEATABLE READ, READ ONLY transaction, so every statement sees the
+    same committed state. SQLite (pysqlite) does not open a transaction for
+    SELECTs; callers compare the graph version before and after reading.
+    """
+    replica = current_app.extensions.get('replica_engine')
+    engine = db.engine if replica is None or g.get('_primary_reads') else replica
+    with engine.connect() as connection:
+        if engine.dialect.name == 'postgresql':
+            connection = connection.execution_options(isolation_level='REPEATABLE READ',
+                                                      postgresql_readonly=True)
+        with Session(bind=connection, autoflush=False) as session:
+            yield session
+
+def in_transaction(session) -> bool:
+    """Whether a session (or db.session's current session) has a transaction open."""
+    if isinstance(session, scoped_session):
+        session = session()
+    return session.in_transaction()
+
 def init_db(app):
     """Initialize the database with the Flask app"""
     try:
@@ -27,20 +154,73 @@ def init_db(app):
         logger.error(f"Error initializing database: {str(e)}", exc_info=True)
         raise
 
-def recursive_graph_query(start_node_id: int, relationship_type: Optional[str] = None, max_depth: int = 5) -> List[Dict[str, Any]]:
+def get_graph_version(session: Optional[Session] = None, site: Optional[str] = None) -> int:
+    """
+    Return the current version of the stored graph or of one site's graph.
+
+    Args:
+        session: Session to read from; pass read_session() when the data
+            served under this version is read from the replica
+        site: Site whose version to return; None for the whole graph,
+            which changes with every write to any site
+
+    Returns:
+        The version counter, or 0 if the graph has never been written
+    """
+    from models import GraphVersion
+
+    row = (session or db.session).get(GraphVersion, ALL_SITES if site is None else site)
+    return row.version if row else 0
+
+def bump_graph_version(site: str) -> int:
+    """
+    Increment a site's graph version and the whole-graph version within the
+    current transaction.
+
+    Callers are expected to commit (or roll back) together with the node/edge
+    changes the new version describes. The whole-graph row is locked first,
+    so concurrent writers always lock the two rows in the same order.
+
+    Args:
+        site: Site whose nodes and edges were written
+
+    Returns:
+        The site's new version number
+    """
+    from models import GraphVersion
+
+    for key in (ALL_SITES, site):
+        row = db.session.get(GraphVersion, key, with_for_update=True)
+        if row is None:
+            row = GraphVersion(site=key, version=0)
+            db.session.add(row)
+        row.version += 1
+    db.session.flush()
+    return row.version
+
+def recursive_graph_query(start_node_id: int, relationship_type: Optional[str] = None, max_depth: int = 5,
+                          site: Optional[str] = None) -> List[Dict[str, Any]]:
     """
     Execute a recursive CTE query to traverse the graph
     Args:
         start_node_id: The ID of the starting node
         relationship_type: Optional filter for relationship type
-        max_depth: Maximum depth of traversal (default: 5)
+        max_depth: Maximum depth of traversal (default: 5), capped at MAX_GRAPH_DEPTH
+        site: Optional site key; the traversal then only reads that site's partition
     Returns:
         List of dictionaries containing node information and path
     """
     try:
+        max_depth = min(max_depth, current_app.config['MAX_GRAPH_DEPTH'])
+        params = {"start_node_id": start_node_id, "max_depth": max_depth}
         relationship_filter = ""
         if relationship_type:
-            relationship_filter = f"AND e.type = '{relationship_type}'"
+            relationship_filter = "AND e.type = :relationship_type"
+            params["relationship_type"] = relationship_type
+        site_filter = ""
+        if site:
+            site_filter = "AND n.site = :site"
+            params["site"] = site
 
         query = text(f"""
         WITH RECURSIVE graph_traversal AS (
@@ -50,10 +230,12 @@ def recursive_graph_query(start_node_id: int, relationship_type: Optional[str] =
                 n.label,
                 n.type,
                 n.properties,
+                n.site,
                 ARRAY[n.id] as path,
                 0 as depth
             FROM node n
             WHERE n.id = :start_node_id
+            {site_filter}
 
             UNION ALL
 
@@ -63,11 +245,12 @@ def recursive_graph_query(start_node_id: int, relationship_type: Optional[str] =
                 next_node.label,
                 next_node.type,
                 next_node.properties,
+                next_node.site,
                 gt.path || next_node.id,
                 gt.depth + 1
             FROM graph_traversal gt
-            JOIN edge e ON gt.id = e.source_id
-            JOIN node next_node ON e.target_id = next_node.id
+            JOIN edge e ON gt.id = e.source_id AND e.site = gt.site
+            JOIN node next_node ON e.target_id = next_node.id AND next_node.site = e.site
             WHERE gt.depth < :max_depth
             {relationship_filter}
             AND NOT next_node.id = ANY(gt.path)  -- Prevent cycles
@@ -83,12 +266,9 @@ def recursive_graph_query(start_node_id: int, relationship_type: Optional[str] =
         ORDER BY depth, id;
         """)
 
-        result = db.session.execute(
-            query,
-            {"start_node_id": start_node_id, "max_depth": max_depth}
-        )
+        result = read_session().execute(query, params)
 
-        return [dict(row) for row in result]
+        return [dict(row._mapping) for row in result]
 
     except Exception as e:
         logger.error(f"Error in recursive graph query: {str(e)}", exc_info=True)
@@ -0,0 +1,214 @@
+"""
+Entity resolution for extracted ontologies.
+
+Runs between extract_ontology and graph generation and merges entities that
+refer to the same thing under slightly different labels ("Pump 1", "PUMP-1",
+"pump 1 "). Entities are only ever merged within their own type namespace, so
+an Asset and a Department sharing a label stay separate nodes.
+
+Candidate pairs come from a blocking index instead of O(n^2) comparison:
+
+1. Exact blocks: entities with the same type and normalized label are merged.
+2. Trigram blocks: remaining keys are indexed by (type, signature, trigram),
+   where the signature is the set of "distinguishing" tokens (numbers, short
+   codes) that must match exactly. Only the rarest trigrams of each key are
+   indexed (prefix filtering: two sets with Jaccard >= t must share one of
+   their first len - ceil(t * len) + 1 trigrams under a global rarest-first
+   order), so blocks stay small. Pairs sharing a block are merged when their
+   trigram Jaccard similarity reaches the threshold.
+
+Because identifiers such as "A001" and "A002" have different signatures they
+never share a block, so near-duplicate matching only affects the free-text
+part of labels.
+"""
+
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Dict, FrozenSet, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Minimum trigram Jaccard similarity for a near-duplicate merge
+SIMILARITY_THRESHOLD = 0.7
+# Trigram blocks larger than this are too common to be informative
+MAX_BLOCK_SIZE = 50
+
+_SEPARATORS = re.compile(r'[\s\-_./\\,;:]+')
+_PUNCTUATION = re.compile(r'[^\w ]+')
+_DIGIT = re.compile(r'\d')
+
+def normalize_label(label: str) -> str:
+    """
+    Normalize a label for comparison.
+
+    Case-folds, unifies separators to single spaces, drops punctuation and
+    splits letter/digit boundaries, so "PUMP-1", "Pump 1" and "pump1 " all
+    normalize to "pump 1".
+    """
+    text = _SEPARATORS.sub(' ', str(label).casefold())
+    text = _PUNCTUATION.sub('', text)
+    text = re.sub(r'(?<=[a-z])(?=\d)|(?<=\d)(?=[a-z])', ' ', text)
+    return ' '.join(text.split())
+
+def _signature(key: str) -> FrozenSet[str]:
+    """Tokens that must match exactly: anything with digits or up to two characters."""
+    return frozenset(token for token in key.split() if len(token) <= 2 or _DIGIT.search(token))
+
+def _trigrams(key: str) -> FrozenSet[str]:
+    """Character trigrams of a normalized key, padded at the ends."""
+    padded = f"  {key} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+def _unique_type(types_by_label: Dict[str, set], label: str) -> Optional[str]:
+    """Return the entity type of a label if it is unambiguous."""
+    types = types_by_label.get(label)
+    if types and len(types) == 1:
+        return next(iter(types))
+    return None
+
+def _trigram_blocks(group: List[int], grams: Dict[int, FrozenSet[str]], threshold: float,
+                    max_block_size: int) -> List[List[int]]:
+    """
+    Split a (type, signature) group into candidate blocks.
+
+    Small groups are a single block. Larger ones are indexed by the rarest
+    trigrams of each key (prefix filtering), and oversized blocks are dropped.
+    """
+    if len(group) <= max_block_size:
+        return [group]
+
+    frequency = Counter(gram for i in group for gram in grams[i])
+    index = defaultdict(list)
+    for i in group:
+        ordered = sorted(grams[i], key=lambda gram: (frequency[gram], gram))
+        prefix = len(ordered) - math.ceil(threshold * len(ordered)) + 1
+        for gram in ordered[:prefix]:
+            index[gram].append(i)
+    return [block for block in index.values() if 1 < len(block) <= max_block_size]
+
+class _UnionFind:
+    """Disjoint sets over integer ids with path halving."""
+
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+
+    def find(self, item: int) -> int:
+        while self.parent[item] != item:
+            self.parent[item] = self.parent[self.parent[item]]
+            item = self.parent[item]
+        return item
+
+    def union(self, a: int, b: int) -> None:
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            self.parent[max(root_a, root_b)] = min(root_a, root_b)
+
+def resolve_entities(ontology: Dict, threshold: float = SIMILARITY_THRESHOLD,
+                     max_block_size: int = MAX_BLOCK_SIZE) -> Dict:
+    """
+    Merge near-duplicate entities and rewrite relationships to canonical labels.
+
+    Args:
+        ontology: Ontology as returned by extract_ontology
+        threshold: Minimum trigram Jaccard similarity for near-duplicate merges
+        max_block_size: Skip trigram blocks with more keys than this
+
+    Returns:
+        A new ontology with resolved entities, relationships carrying
+        source_type/target_type, and a 'resolution' summary
+    """
+    entities = [(str(label), entity_type) for label, entity_type in ontology.get('entities', [])]
+    relationships = ontology.get('relationships', [])
+
+    # Mention counts pick the canonical spelling of a merged group
+    mentions = Counter()
+    types_by_label = defaultdict(set)
+    for label, entity_type in entities:
+        types_by_label[label].add(entity_type)
+    for rel in relationships:
+        for end in ('source', 'target'):
+            label = rel.get(end)
+            entity_type = rel.get(f'{end}_type') or _unique_type(types_by_label, label)
+            mentions[(label, entity_type)] += 1
+
+    # Block 1: exact (type, normalized label) keys
+    keys: List[Tuple[str, str]] = []
+    key_index: Dict[Tuple[str, str], int] = {}
+    members: Dict[int, List[Tuple[str, str]]] = defaultdict(list)
+    for label, entity_type in entities:
+        key = (entity_type, normalize_label(label))
+        if key not in key_index:
+            key_index[key] = len(keys)
+            keys.append(key)
+        members[key_index[key]].append((label, entity_type))
+
+    # Block 2: keys can only match within the same (type, signature) group
+    sets = _UnionFind(len(keys))
+    groups_by_signature = defaultdict(list)
+    for i, (entity_type, key) in enumerate(keys):
+        groups_by_signature[(entity_type, _signature(key))].append(i)
+
+    grams: Dict[int, FrozenSet[str]] = {}
+    compared = set()
+    for group in groups_by_signature.values():
+        if len(group) < 2:
+            continue
+        for i in group:
+            grams[i] = _trigrams(keys[i][1])
+        for block in _trigram_blocks(group, grams, threshold, max_block_size):
+            for a_pos, a in enumerate(block):
+                for b in block[a_pos + 1:]:
+                    size_a, size_b = len(grams[a]), len(grams[b])
+                    if min(size_a, size_b) < threshold * max(size_a, size_b) or (a, b) in compared:
+                        continue
+                    compared.add((a, b))
+                    if len(grams[a] & grams[b]) / len(grams[a] | grams[b]) >= threshold:
+                        sets.union(a, b)
+
+    # Pick a canonical label for every merged group
+    groups = defaultdict(list)
+    for i in range(len(keys)):
+        groups[sets.find(i)].extend(members[i])
+
+    canonical: Dict[Tuple[str, str], str] = {}
+    resolved_entities = []
+    merged = 0
+    for group in groups.values():
+        best = min(group, key=lambda e: (-mentions[e], e[0] != e[0].strip(), e[0]))
+        best_label = best[0].strip()
+        for entity in group:
+            canonical[entity] = best_label
+        resolved_entities.append((best_label, best[1]))
+        merged += len(set(group)) - 1
+
+    resolved_relationships = []
+    seen = set()
+    for rel in relationships:
+        source_type = rel.get('source_type') or _unique_type(types_by_label, rel.get('source'))
+        target_type = rel.get('target_type') or _unique_type(types_by_label, rel.get('target'))
+        source = canonical.get((rel.get('source'), source_type), rel.get('source'))
+        target = canonical.get((rel.get('target'), target_type), rel.get('target'))
+        identity = (source, source_type, target, target_type, rel.get('type'))
+        if identity in seen:
+            continue
+        seen.add(identity)
+        resolved_relationships.append({
+            **rel,
+            'source': source,
+            'target': target,
+            'source_type': source_type,
+            'target_type': target_type
+        })
+
+    logger.info(
+        f"Entity resolution: {len(entities)} entities -> {len(resolved_entities)} "
+        f"({merged} merged, {len(compared)} trigram comparisons)"
+    )
+    return {
+        **ontology,
+        'entities': sorted(resolved_entities),
+        'relationships': resolved_relationships,
+        'resolution': {'input_entities': len(entities), 'merged': merged}
+    }
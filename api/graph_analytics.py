@@ -0,0 +1,172 @@
+"""
+Vectorized graph analytics over the stored knowledge graph.
+
+Builds SciPy sparse adjacency matrices from the edge table and computes:
+
+- in/out degree statistics per relationship type
+- weakly connected components, including the "islands" outside the largest one
+- top-k hotspot rankings (most maintained assets, most loaded personnel,
+  highest overall degree)
+
+Everything operates on index arrays from graph_arrays, so the cost is a few
+passes over the edge list, and results are cached per graph version.
+"""
+
+from typing import Dict, List, Optional
+import logging
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+from sqlalchemy import select
+
+from database import read_session
+from graph_arrays import TypedGraph, load_typed_graph
+from graph_cache import VersionedCache
+from models import Node
+
+logger = logging.getLogger(__name__)
+
+# name -> (node type, relationship type, direction counted)
+HOTSPOT_RANKINGS = {
+    'most_maintained_assets': ('Asset', 'MAINTAINS', 'in'),
+    'most_loaded_personnel': ('Personnel', 'ASSIGNED_TO', 'in'),
+}
+
+_analytics_cache = VersionedCache('analytics', max_entries=32)
+
+def adjacency(graph: TypedGraph, edge_type: int = None) -> sparse.csr_matrix:
+    """
+    Build the sparse adjacency matrix of the graph.
+
+    Args:
+        graph: Graph arrays
+        edge_type: Optional edge type code to restrict the matrix to
+
+    Returns:
+        n x n CSR matrix with edge multiplicities as values
+    """
+    n = len(graph.node_ids)
+    sources, targets = graph.sources, graph.targets
+    if edge_type is not None:
+        mask = graph.edge_types == edge_type
+        sources, targets = sources[mask], targets[mask]
+    data = np.ones(len(sources), dtype=np.int32)
+    return sparse.csr_matrix((data, (sources, targets)), shape=(n, n))
+
+def _degree_stats(degrees: np.ndarray) -> Dict:
+    """Summarize a degree vector over the nodes that have any such edge."""
+    active = degrees[degrees > 0]
+    return {
+        'nodes': int(len(active)),
+        'max': int(active.max()) if len(active) else 0,
+        'mean': round(float(active.mean()), 3) if len(active) else 0.0
+    }
+
+def top_k(graph: TypedGraph, scores: np.ndarray, k: int, node_type: str = None) -> List[Dict]:
+    """
+    Return the k highest scoring nodes, optionally restricted to one node type.
+
+    Args:
+        graph: Graph arrays
+        scores: Score per node position
+        k: Number of nodes to return
+        node_type: Optional node type name
+
+    Returns:
+        List of dicts with node position and score, highest first
+    """
+    candidates = np.arange(len(scores))
+    if node_type is not None:
+        if node_type not in graph.node_type_names:
+            return []
+        candidates = candidates[graph.node_types == graph.node_type_names.index(node_type)]
+    candidates = candidates[scores[candidates] > 0]
+    if len(candidates) > k:
+        candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+    # Highest score first, ties broken by node id
+    order = np.lexsort((graph.node_ids[candidates], -scores[candidates]))
+    return [{'position': int(i), 'score': int(scores[i])} for i in candidates[order]]
+
+def _attach_labels(graph: TypedGraph, entries: List[Dict]) -> None:
+    """Replace node positions with ids, labels and types in place."""
+    ids = sorted({int(graph.node_ids[entry['position']]) for entry in entries})
+    labels = {}
+    for start in range(0, len(ids), 1000):
+        rows = read_session().execute(
+            select(Node.id, Node.label).where(Node.id.in_(ids[start:start + 1000]))
+        ).all()
+        labels.update({row.id: row.label for row in rows})
+
+    for entry in entries:
+        position = entry.pop('position')
+        entry['id'] = int(graph.node_ids[position])
+        entry['label'] = labels.get(entry['id'])
+        entry['type'] = graph.node_type_names[graph.node_types[position]]
+
+def compute_analytics(k: int = 10, site: Optional[str] = None) -> Dict:
+    """
+    Compute degree, component and hotspot analytics for the stored graph.
+
+    Args:
+        k: Number of entries in each ranking and island listing
+        site: Only analyze this site's graph; None analyzes all sites
+
+    Returns:
+        JSON-serializable analytics dictionary
+    """
+    graph = load_typed_graph(site)
+    n = len(graph.node_ids)
+
+    degree = {}
+    for code, edge_type in enumerate(graph.edge_type_names):
+        matrix = adjacency(graph, code)
+        degree[edge_type] = {
+            'edges': int(matrix.sum()),
+            'out': _degree_stats(np.asarray(matrix.sum(axis=1)).ravel()),
+            'in': _degree_stats(np.asarray(matrix.sum(axis=0)).ravel())
+        }
+
+    full = adjacency(graph)
+    total_degree = np.asarray(full.sum(axis=1)).ravel() + np.asarray(full.sum(axis=0)).ravel()
+
+    if n:
+        component_count, membership = connected_components(full, directed=True, connection='weak')
+    else:
+        component_count, membership = 0, np.empty(0, dtype=np.int32)
+    sizes = np.bincount(membership, minlength=component_count)
+    _, first_member = np.unique(membership, return_index=True)
+    largest = int(sizes.argmax()) if component_count else -1
+    island_ids = [c for c in np.argsort(-sizes, kind='stable') if c != largest][:k]
+    islands = [{'size': int(sizes[c]), 'position': int(first_member[c])} for c in island_ids]
+
+    rankings = {}
+    for name, (node_type, edge_type, direction) in HOTSPOT_RANKINGS.items():
+        if edge_type not in graph.edge_type_names:
+            rankings[name] = []
+            continue
+        matrix = adjacency(graph, graph.edge_type_names.index(edge_type))
+        scores = np.asarray(matrix.sum(axis=0 if direction == 'in' else 1)).ravel()
+        rankings[name] = top_k(graph, scores, k, node_type)
+    rankings['highest_degree'] = top_k(graph, total_degree, k)
+
+    _attach_labels(graph, islands + [entry for ranking in rankings.values() for entry in ranking])
+    for island in islands:
+        island['sample'] = {'id': island.pop('id'), 'label': island.pop('label'), 'type': island.pop('type')}
+
+    return {
+        'node_count': int(n),
+        'edge_count': int(len(graph.sources)),
+        'degree': degree,
+        'components': {
+            'count': int(component_count),
+            'largest': int(sizes[largest]) if component_count else 0,
+            'isolated_nodes': int((sizes == 1).sum()),
+            'islands': islands
+        },
+        'rankings': rankings
+    }
+
+def get_analytics(version: int, k: int = 10, site: Optional[str] = None) -> Dict:
+    """Return cached analytics for a graph version (of the site, if given), computing them on first use."""
+    return _analytics_cache.get_or_compute(version, k, lambda: compute_analytics(k, site), site=site)
@@ -0,0 +1,123 @@
+"""
+Bulk loading of the node/edge tables into NumPy arrays.
+
+Vectorized graph computations (layout, analytics) need the graph as dense
+integer arrays rather than ORM objects. Rows are streamed from the database
+with server-side batching and only integer columns are fetched; string columns
+such as node and edge types are handled by issuing one query per distinct
+value, so no per-row Python objects are built for them.
+"""
+
+from typing import List, NamedTuple, Optional, Tuple
+import logging
+
+import numpy as np
+from sqlalchemy import select
+
+from database import read_session
+from models import Node, Edge
+
+logger = logging.getLogger(__name__)
+
+class TypedGraph(NamedTuple):
+    """
+    The stored graph as index arrays.
+
+    Node positions index into node_ids (sorted ascending); edge endpoints are
+    given as node positions. Type columns are codes into the matching names.
+    """
+    node_ids: np.ndarray
+    node_types: np.ndarray
+    node_type_names: List[str]
+    sources: np.ndarray
+    targets: np.ndarray
+    edge_types: np.ndarray
+    edge_type_names: List[str]
+
+def read_int_columns(query, batch_size: int = 50000) -> Tuple[np.ndarray, ...]:
+    """
+    Stream an integer-column query into one NumPy array per column.
+
+    Args:
+        query: Select statement returning only integer columns
+        batch_size: Number of rows fetched per round trip
+
+    Returns:
+        Tuple with one int64 array per selected column
+    """
+    width = len(query.selected_columns)
+    chunks = []
+    result = read_session().execute(query.execution_options(yield_per=batch_size))
+    for partition in result.partitions():
+        chunks.append(np.array(partition, dtype=np.int64).reshape(-1, width))
+    if not chunks:
+        return tuple(np.empty(0, dtype=np.int64) for _ in range(width))
+    columns = np.concatenate(chunks)
+    return tuple(columns[:, i] for i in range(width))
+
+def load_edge_index(site: Optional[str] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Load the stored graph as untyped index arrays.
+
+    Args:
+        site: Only load this site's graph; None loads all sites
+
+    Returns:
+        Tuple of (sorted node ids, edge source positions, edge target positions)
+    """
+    nodes = select(Node.id).order_by(Node.id)
+    edges = select(Edge.source_id, Edge.target_id)
+    if site is not None:
+        nodes, edges = nodes.where(Node.site == site), edges.where(Edge.site == site)
+    node_ids, = read_int_columns(nodes)
+    sources, targets = read_int_columns(edges)
+    return node_ids, np.searchsorted(node_ids, sources), np.searchsorted(node_ids, targets)
+
+def load_typed_graph(site: Optional[str] = None) -> TypedGraph:
+    """
+    Load the stored graph with node and edge type codes.
+
+    Args:
+        site: Only load this site's graph; None loads all sites
+
+    Returns:
+        The graph as a TypedGraph
+    """
+    node_filter = [] if site is None else [Node.site == site]
+    edge_filter = [] if site is None else [Edge.site == site]
+    node_type_names = sorted(read_session().execute(select(Node.type).where(*node_filter).distinct()).scalars())
+    id_chunks, node_type_chunks = [], []
+    for code, node_type in enumerate(node_type_names):
+        ids, = read_int_columns(select(Node.id).where(Node.type == node_type, *node_filter))
+        id_chunks.append(ids)
+        node_type_chunks.append(np.full(len(ids), code, dtype=np.int32))
+
+    node_ids = np.concatenate(id_chunks) if id_chunks else np.empty(0, dtype=np.int64)
+    node_types = np.concatenate(node_type_chunks) if node_type_chunks else np.empty(0, dtype=np.int32)
+    order = np.argsort(node_ids, kind='stable')
+    node_ids, node_types = node_ids[order], node_types[order]
+
+    edge_type_names = sorted(read_session().execute(select(Edge.type).where(*edge_filter).distinct()).scalars())
+    source_chunks, target_chunks, edge_type_chunks = [], [], []
+    for code, edge_type in enumerate(edge_type_names):
+        sources, targets = read_int_columns(
+            select(Edge.source_id, Edge.target_id).where(Edge.type == edge_type, *edge_filter)
+        )
+        source_chunks.append(np.searchsorted(node_ids, sources))
+        target_chunks.append(np.searchsorted(node_ids, targets))
+        edge_type_chunks.append(np.full(len(sources), code, dtype=np.int32))
+
+    def join(chunks, dtype):
+        return np.concatenate(chunks) if chunks else np.empty(0, dtype=dtype)
+
+    graph = TypedGraph(
+        node_ids=node_ids,
+        node_types=node_types,
+        node_type_names=node_type_names,
+        sources=join(source_chunks, np.int64),
+        targets=join(target_chunks, np.int64),
+        edge_types=join(edge_type_chunks, np.int32),
+        edge_type_names=edge_type_names
+    )
+    logger.info(f"Loaded graph arrays: {len(graph.node_ids)} nodes, {len(graph.sources)} edges")
+    return graph
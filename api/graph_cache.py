@@ -0,0 +1,105 @@
+"""
+Per-graph-version caching for derived graph data.
+
+Derived views of the graph (layouts, summaries, analytics) are expensive to
+compute but only change when the graph itself does. VersionedCache keeps
+results keyed by the graph version from database.get_graph_version() and
+drops everything computed for older versions as soon as a newer one is seen.
+
+Values computed from one site's graph are cached under that site and its own
+version, values of the whole graph under site None and the whole-graph
+version; a write to one site leaves the entries of other sites in place.
+"""
+
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+_registry = []
+
+class VersionedCache:
+    """
+    Thread-safe in-process cache whose entries are valid for one graph version.
+
+    Concurrent requests for the same missing key compute the value once; the
+    others wait for the result instead of repeating the work.
+    """
+
+    def __init__(self, name: str, max_entries: int = 64):
+        self.name = name
+        self.max_entries = max_entries
+        # Latest version seen per site (None: the whole graph)
+        self._versions: Dict[Optional[str], int] = {}
+        self._entries: Dict[Tuple[Optional[str], Hashable], Any] = {}
+        self._key_locks: Dict[Tuple[Optional[str], Hashable], threading.Lock] = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _reset_if_stale(self, site: Optional[str], version: int) -> None:
+        """Drop a site's entries if its graph moved to a newer version (lock held)."""
+        current = self._versions.get(site)
+        if current is None or version > current:
+            stale = [entry for entry in self._entries if entry[0] == site]
+            if stale:
+                logger.debug(f"Invalidating {self.name} cache of site {site} for graph version {version}")
+            for entry in stale:
+                del self._entries[entry]
+            for entry in [entry for entry in self._key_locks if entry[0] == site]:
+                del self._key_locks[entry]
+            self._versions[site] = version
+
+    def get_or_compute(self, version: int, key: Hashable, compute: Callable[[], Any],
+                       site: Optional[str] = None,
+                       version_of: Optional[Callable[[Any], int]] = None) -> Any:
+        """
+        Return the cached value for key at version, computing it if missing.
+
+        Args:
+            version: Graph version the value belongs to; the site's version
+                when site is given
+            key: Cache key within the version
+            compute: Zero-argument callable producing the value
+            site: Site the value was computed from, or None for the whole graph
+            version_of: Returns the graph version a computed value describes,
+                for computations that read the graph in a snapshot of their
+                own; values of another version are returned but not cached
+
+        Returns:
+            The cached or freshly computed value
+        """
+        entry = (site, key)
+        with self._lock:
+            self._reset_if_stale(site, version)
+            if version == self._versions[site] and entry in self._entries:
+                return self._entries[entry]
+            key_lock = self._key_locks.setdefault(entry, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                if version == self._versions.get(site) and entry in self._entries:
+                    return self._entries[entry]
+
+            value = compute()
+
+            with self._lock:
+                # Only store results for the current version; a request that
+                # read an older version still gets its (consistent) result.
+                if version == self._versions.get(site) and (version_of is None or version_of(value) == version):
+                    if len(self._entries) >= self.max_entries:
+                        self._entries.pop(next(iter(self._entries)))
+                    self._entries[entry] = value
+            return value
+
+    def clear(self) -> None:
+        """Remove all cached entries."""
+        with self._lock:
+            self._versions = {}
+            self._entries = {}
+            self._key_locks = {}
+
+def clear_all_caches() -> None:
+    """Clear every VersionedCache, e.g. after the database was recreated."""
+    for cache in _registry:
+        cache.clear()
@@ -0,0 +1,218 @@
+"""
+Live feed of graph changes as server-sent events.
+
+Every write that bumps a site's graph version (clearing a site on upload,
+validate-ontology, ontology patches) records a GraphChange row in the same
+transaction, describing what the new version changed::
+
+    {"version": 12, "site": "main", "kind": "patch",
+     "nodes": {"added": [[41, 43]], "removed": [[7, 7]],
+               "updated": [{"id": 9, "label": "A009", "type": "Asset"}]},
+     "edges": {"added": [[88, 89]], "removed": [], "updated": [{"id": 3, "type": "FEEDS"}]}}
+
+Added and removed ids are inclusive [first, last] ranges: the ids of one
+write are mostly consecutive, so even clearing a site of a million nodes is
+a handful of ranges. New ids are always greater than existing ones, so a
+client fetches the added nodes and their edges with
+``/api/graph?site=<site>&after=<first added id - 1>``, drops removed ids and
+applies updated records in place. A change that would list more than
+GRAPH_CHANGES_MAX_RANGES ranges is stored as ``{"reset": true}`` instead.
+
+GET /api/graph/changes streams the stored changes::
+
+    id: 12
+    event: change
+    data: {...}
+
+Versions and event ids are whole-graph versions, or with ``?site=`` the
+site's own versions (the X-Graph-Version of ``/api/graph?site=``), so other
+sites' writes neither show up in nor push history out of a site's feed.
+Each stream polls the graph version every GRAPH_CHANGES_POLL_INTERVAL
+seconds, so writes made by any worker process are picked up, and ends after
+GRAPH_CHANGES_MAX_SECONDS. Clients resume from the last version they applied
+with Last-Event-ID (sent by EventSource on reconnect) or ``?since=``. When
+the changes after that version are not all available (older than the last
+GRAPH_CHANGES_RETENTION versions of a site, or a reset change), an
+``event: reset`` carrying the current version tells the client to reload the
+graph.
+"""
+
+import json
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import logging
+
+from flask import current_app
+from sqlalchemy import func, select
+
+from database import db, get_graph_version
+from models import GraphChange
+
+logger = logging.getLogger(__name__)
+
+# Reconnect delay suggested to EventSource clients, in milliseconds
+RETRY_MS = 2000
+
+def id_ranges(ids: Iterable[int]) -> List[List[int]]:
+    """Encode ids as sorted, inclusive [first, last] runs of consecutive ids."""
+    ranges = []
+    for id_ in sorted(set(ids)):
+        if ranges and ranges[-1][1] == id_ - 1:
+            ranges[-1][1] = id_
+        else:
+            ranges.append([id_, id_])
+    return ranges
+
+def stored_id_ranges(model, site: str, limit: int) -> Optional[List[List[int]]]:
+    """
+    Id ranges of a site's stored nodes or edges, computed in the database.
+
+    Consecutive ids share the same id - row_number(), so each run is one
+    group; no id is loaded into Python.
+
+    Args:
+        model: Node or Edge
+        site: Site key
+        limit: Maximum number of ranges
+
+    Returns:
+        The ranges, or None if there are more than limit
+    """
+    runs = select(
+        model.id.label('id'),
+        (model.id - func.row_number().over(order_by=model.id)).label('run')
+    ).where(model.site == site).subquery()
+    rows = db.session.execute(
+        select(func.min(runs.c.id), func.max(runs.c.id))
+        .group_by(runs.c.run)
+        .order_by(func.min(runs.c.id))
+        .limit(limit + 1)
+    ).all()
+    if len(rows) > limit:
+        return None
+    return [[first, last] for first, last in rows]
+
+def record_change(version: int, site: str, kind: str,
+                  nodes_added: Optional[List[List[int]]] = (), nodes_removed: Optional[List[List[int]]] = (),
+                  edges_added: Optional[List[List[int]]] = (), edges_removed: Optional[List[List[int]]] = (),
+                  nodes_updated: List[Dict] = (), edges_updated: List[Dict] = ()) -> GraphChange:
+    """
+    Record the delta of a graph version and prune changes past the retention.
+
+    Runs in the current transaction; the caller commits together with the
+    writes and the version bump.
+
+    Args:
+        version: Site version returned by bump_graph_version(site)
+        site: Site whose graph changed
+        kind: Write that caused the change ('upload', 'validate', 'patch')
+        nodes_added, nodes_removed, edges_added, edges_removed: Id ranges
+            (see id_ranges()); None when there were too many to list
+        nodes_updated: {'id', 'label', 'type'} of nodes changed in place
+        edges_updated: {'id', 'type'} of edges changed in place
+
+    Returns:
+        The new GraphChange
+    """
+    max_ranges = current_app.config['GRAPH_CHANGES_MAX_RANGES']
+    listed = (nodes_added, nodes_removed, edges_added, edges_removed)
+    if any(ranges is None for ranges in listed) or \
+            sum(map(len, listed)) + len(nodes_updated) + len(edges_updated) > max_ranges:
+        delta = {'reset': True}
+    else:
+        delta = {
+            'nodes': {'added': list(nodes_added), 'removed': list(nodes_removed), 'updated': list(nodes_updated)},
+            'edges': {'added': list(edges_added), 'removed': list(edges_removed), 'updated': list(edges_updated)},
+        }
+    # The whole-graph version bumped with the site's (still in the session)
+    change = GraphChange(version=get_graph_version(), site=site, site_version=version, kind=kind, delta=delta)
+    db.session.add(change)
+    GraphChange.query.filter(
+        GraphChange.site == site,
+        GraphChange.site_version <= version - current_app.config['GRAPH_CHANGES_RETENTION']
+    ).delete(synchronize_session=False)
+    return change
+
+def _event(event: str, version: int, data: Dict) -> str:
+    return f"id: {version}\nevent: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+def _reset(version: int) -> str:
+    return _event('reset', version, {'version': version})
+
+def changes_after(since: int, version: int, site: Optional[str] = None) -> Tuple[List[str], int]:
+    """
+    Events taking a client from since to version.
+
+    Args:
+        since: Last version the client applied
+        version: Current graph version (of the site, if given)
+        site: Only send changes of this site, numbered by its versions;
+            None sends all, numbered by whole-graph versions
+
+    Returns:
+        The events and the version they lead to
+    """
+    if since == version:
+        return [], version
+    if since > version:
+        # The client is ahead of this database (e.g. it was recreated)
+        return [_reset(version)], version
+
+    column = GraphChange.version if site is None else GraphChange.site_version
+    query = GraphChange.query.filter(column > since, column <= version)
+    if site is not None:
+        query = query.filter(GraphChange.site == site)
+    changes = query.order_by(column).all()
+    numbers = [change.version if site is None else change.site_version for change in changes]
+    if numbers != list(range(since + 1, version + 1)):
+        # Pruned, or written without a delta
+        return [_reset(version)], version
+
+    events = []
+    for number, change in zip(numbers, changes):
+        if change.delta.get('reset'):
+            # Everything up to here is covered by reloading the graph
+            events = [_reset(number)]
+            continue
+        events.append(_event('change', number, {
+            'version': number, 'site': change.site, 'kind': change.kind, **change.delta
+        }))
+    return events, version
+
+def iter_change_events(since: int, site: Optional[str] = None, poll_interval: float = 1.0,
+                       keepalive: float = 15.0, max_seconds: float = 300.0) -> Iterator[str]:
+    """
+    Stream graph changes after a version as server-sent events.
+
+    Args:
+        since: Last version the client applied
+        site: Only send changes of this site; None sends all
+        poll_interval: Seconds between graph version checks
+        keepalive: Seconds of silence after which a comment line is sent,
+            so proxies keep the connection open
+        max_seconds: Seconds after which the stream ends and the client
+            reconnects with Last-Event-ID
+
+    Yields:
+        SSE-formatted strings
+    """
+    yield f'retry: {RETRY_MS}\n\n'
+    start = time.monotonic()
+    last_sent = start
+    while True:
+        try:
+            events, since = changes_after(since, get_graph_version(site=site), site)
+        finally:
+            # End the read transaction so the next poll sees new commits,
+            # and return the connection to the pool between polls
+            db.session.rollback()
+        now = time.monotonic()
+        if events:
+            yield ''.join(events)
+            last_sent = now
+        elif now - last_sent >= keepalive:
+            yield ': keepalive\n\n'
+            last_sent = now
+        if now - start >= max_seconds:
+            return
+        time.sleep(min(poll_interval, start + max_seconds - now))
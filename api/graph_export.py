@@ -0,0 +1,220 @@
+"""
+Streaming export of the stored knowledge graph.
+
+Nodes are read from the database in keyset-paginated batches (``id > cursor``)
+and written out as newline-delimited JSON, so neither the server nor the client
+has to materialize the whole graph. Each node batch is followed by the edges
+whose source is in that batch, which means every edge is emitted exactly once.
+
+Stream layout::
+
+    {"kind": "meta", "version": 7}
+    {"kind": "node", "id": 1, "label": "A001", "type": "Asset", "properties": {...}, "x": 12.5, "y": 80.1}
+    {"kind": "edge", "id": 1, "source": 1, "target": 2, "type": "LOCATED_IN"}
+    ...
+    {"kind": "end", "next_after": null}
+
+``next_after`` is the cursor for the next page when ``limit`` was reached.
+``x``/``y`` are only present when a precomputed layout is passed in.
+"""
+
+import io
+import json
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import select, union
+from sqlalchemy.orm import Session
+
+from database import read_session
+from graph_layout import Layout
+from models import Node, Edge
+
+def facility_scope(facility: str, site: Optional[str] = None):
+    """
+    Build a subquery of node ids belonging to a facility's subgraph.
+
+    The subgraph is the facility node itself, the assets located in it and
+    the work orders maintaining those assets.
+
+    Args:
+        facility: Facility label
+        site: Optional site key the facility belongs to
+
+    Returns:
+        A selectable yielding node ids
+    """
+    node_site = [Node.site == site] if site else []
+    edge_site = [Edge.site == site] if site else []
+    facility_ids = select(Node.id).where(Node.type == 'Facility', Node.label == facility, *node_site)
+    asset_ids = select(Edge.source_id).where(
+        Edge.type == 'LOCATED_IN',
+        Edge.target_id.in_(facility_ids),
+        *edge_site
+    )
+    work_order_ids = select(Edge.source_id).where(
+        Edge.type == 'MAINTAINS',
+        Edge.target_id.in_(asset_ids),
+        *edge_site
+    )
+    return union(facility_ids, asset_ids, work_order_ids)
+
+def node_filters(types: Optional[List[str]] = None, facility: Optional[str] = None,
+                 site: Optional[str] = None) -> List:
+    """
+    Build SQL filter clauses on the node table for the export filters.
+
+    Args:
+        types: Optional list of node types to keep
+        facility: Optional facility label restricting the export to its subgraph
+        site: Optional site key; prunes to the site's partition on PostgreSQL
+
+    Returns:
+        List of SQLAlchemy boolean clauses
+    """
+    clauses = []
+    if site:
+        clauses.append(Node.site == site)
+    if types:
+        clauses.append(Node.type.in_(types))
+    if facility:
+        clauses.append(Node.id.in_(facility_scope(facility, site)))
+    return clauses
+
+def iter_node_batches(filters: List, after: int = 0, limit: Optional[int] = None,
+                      batch_size: int = 1000, session: Optional[Session] = None) -> Iterator[List]:
+    """
+    Yield batches of node rows in id order using keyset pagination.
+
+    Args:
+        filters: Clauses returned by node_filters
+        after: Only return nodes with an id greater than this cursor
+        limit: Maximum number of nodes to return in total
+        batch_size: Number of rows fetched per query
+        session: Session to read from (default read_session())
+
+    Yields:
+        Lists of rows with id, label, type and properties columns
+    """
+    session = session or read_session()
+    remaining = limit
+    cursor = after
+    while remaining is None or remaining > 0:
+        size = batch_size if remaining is None else min(batch_size, remaining)
+        rows = session.execute(
+            select(Node.id, Node.label, Node.type, Node.properties)
+            .where(Node.id > cursor, *filters)
+            .order_by(Node.id)
+            .limit(size)
+        ).all()
+        if not rows:
+            return
+
+        yield rows
+
+        cursor = rows[-1].id
+        if remaining is not None:
+            remaining -= len(rows)
+        if len(rows) < size:
+            return
+
+def edges_for_sources(source_ids: List[int], filters: List) -> List:
+    """
+    Fetch the edges leaving the given nodes whose target passes the filters.
+
+    Args:
+        source_ids: Node ids of the current batch
+        filters: Clauses returned by node_filters, applied to the edge target
+
+    Returns:
+        List of rows with id, source_id, target_id and type columns
+    """
+    query = select(Edge.id, Edge.source_id, Edge.target_id, Edge.type).where(
+        Edge.source_id.in_(source_ids)
+    )
+    if filters:
+        query = query.where(Edge.target_id.in_(select(Node.id).where(*filters)))
+    return read_session().execute(query.order_by(Edge.id)).all()
+
+def node_payload(row, position: Optional[Tuple[float, float]] = None) -> Dict:
+    """Convert a node row into its export dictionary."""
+    payload = {
+        'kind': 'node',
+        'id': row.id,
+        'label': row.label,
+        'type': row.type,
+        'properties': row.properties or {}
+    }
+    if position is not None:
+        payload['x'], payload['y'] = position
+    return payload
+
+def edge_payload(row) -> Dict:
+    """Convert an edge row into its export dictionary."""
+    return {
+        'kind': 'edge',
+        'id': row.id,
+        'source': row.source_id,
+        'target': row.target_id,
+        'type': row.type
+    }
+
+def iter_graph_ndjson(version: int, types: Optional[List[str]] = None, facility: Optional[str] = None,
+                      site: Optional[str] = None, after: int = 0, limit: Optional[int] = None, batch_size: int = 1000,
+                      layout: Optional[Layout] = None) -> Iterator[str]:
+    """
+    Stream the stored graph as NDJSON lines.
+
+    Args:
+        version: Graph version reported in the leading meta line
+        types: Optional list of node types to keep
+        facility: Optional facility label restricting the export to its subgraph
+        site: Optional site key restricting the export to one site
+        after: Keyset cursor; only nodes with a greater id are exported
+        limit: Maximum number of nodes in this page
+        batch_size: Number of nodes fetched per database round trip
+        layout: Optional precomputed layout used to add x/y to node records
+
+    Yields:
+        JSON-encoded lines terminated by a newline
+    """
+    filters = node_filters(types, facility, site)
+    yield json.dumps({'kind': 'meta', 'version': version}) + '\n'
+
+    exported = 0
+    last_id = None
+    for rows in iter_node_batches(filters, after=after, limit=limit, batch_size=batch_size):
+        positions = layout.positions_for(row.id for row in rows) if layout is not None else {}
+        yield ''.join(json.dumps(node_payload(row, positions.get(row.id))) + '\n' for row in rows)
+
+        edges = edges_for_sources([row.id for row in rows], filters)
+        if edges:
+            yield ''.join(json.dumps(edge_payload(row)) + '\n' for row in edges)
+
+        exported += len(rows)
+        last_id = rows[-1].id
+
+    next_after = last_id if limit is not None and exported >= limit else None
+    yield json.dumps({'kind': 'end', 'next_after': next_after}) + '\n'
+
+class StreamBuffer(io.RawIOBase):
+    """
+    Write-only sink that collects what a writer (zipfile, pyarrow) produces,
+    so a generator can drain and yield it chunk by chunk.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        """Return and forget everything written since the last drain."""
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
@@ -15,33 +15,46 @@ def generate_knowledge_graph(ontology: Dict) -> Dict:
 
         logger.info(f"Processing {len(entities)} entities and {len(relationships)} relationships")
 
-        # Add nodes for entities, filtering out test data
-        node_mapping = {}  # Track entity label to node_id mapping
+        # Add nodes for entities, filtering out test data. Nodes are keyed by
+        # (label, type) so entities of different types sharing a label stay apart.
+        node_mapping = {}  # Track (label, type) to node_id mapping
+        label_index = {}  # Track label to node_ids for relationships without types
         for entity in entities:
             # Skip test data (Stamping Press assets)
             if entity[1] == 'Asset' and 'Stamping Press' in entity[0]:
-                logger.debug(f"Skipping test asset: {entity[0]}")
+                logger.debug("Skipping test asset: %s", entity[0])
                 continue
 
+            key = (entity[0], entity[1])
+            if key in node_mapping:
+                continue
             node_id = f"entity_{len(G.nodes)}"
             G.add_node(node_id, label=entity[0], type=entity[1])
-            node_mapping[entity[0]] = node_id
-            logger.debug(f"Added node {node_id}: {entity}")
+            node_mapping[key] = node_id
+            label_index.setdefault(entity[0], []).append(node_id)
+            logger.debug("Added node %s: %s", node_id, entity)
+
+        def resolve_node(label, entity_type):
+            """Find the node for a relationship end, preferring its declared type."""
+            if entity_type and (label, entity_type) in node_mapping:
+                return node_mapping[(label, entity_type)]
+            candidates = label_index.get(label, [])
+            if len(candidates) > 1:
+                logger.debug("Ambiguous label %r without type, using first of %d nodes", label, len(candidates))
+            return candidates[0] if candidates else None
 
         # Add edges for relationships
         edge_count = 0
         for rel in relationships:
-            source_label = rel['source']
-            target_label = rel['target']
+            source_id = resolve_node(rel['source'], rel.get('source_type'))
+            target_id = resolve_node(rel['target'], rel.get('target_type'))
 
-            if source_label in node_mapping and target_label in node_mapping:
-                source_id = node_mapping[source_label]
-                target_id = node_mapping[target_label]
+            if source_id is not None and target_id is not None:
                 G.add_edge(source_id, target_id, type=rel['type'])
                 edge_count += 1
-                logger.debug(f"Added edge: {source_label} -{rel['type']}-> {target_label}")
+                logger.debug("Added edge: %s -%s-> %s", rel['source'], rel['type'], rel['target'])
             else:
-                logger.warning(f"Skipped relationship due to missing nodes: {rel}")
+                logger.warning("Skipped relationship due to missing nodes: %s", rel)
 
         logger.info(f"Created graph with {len(G.nodes)} nodes and {edge_count} edges")
 
@@ -66,12 +79,8 @@ def generate_knowledge_graph(ontology: Dict) -> Dict:
         }
 
         logger.info(f"Generated graph data with {len(graph_data['nodes'])} nodes and {len(graph_data['edges'])} edges")
-        logger.debug("Sample nodes:")
-        for node in graph_data['nodes'][:5]:
-            logger.debug(f"Node: {node}")
-        logger.debug("Sample edges:")
-        for edge in graph_data['edges'][:5]:
-            logger.debug(f"Edge: {edge}")
+        logger.debug("Sample nodes: %s", graph_data['nodes'][:5])
+        logger.debug("Sample edges: %s", graph_data['edges'][:5])
 
         return graph_data
 
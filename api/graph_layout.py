@@ -0,0 +1,242 @@
+"""
+Server-side graph layout.
+
+Computes 2D node coordinates once per graph version with a vectorized
+Fruchterman-Reingold force layout in NumPy, so browsers can render the stored
+graph at its precomputed positions instead of running a force simulation.
+
+Attraction is evaluated per edge with np.bincount. Repulsion is exact for
+small graphs. Large graphs use a particle-particle/particle-mesh split on a
+grid of about GRID_NODES_PER_CELL nodes per cell: nodes in the same and the
+eight neighbouring cells repel each other exactly, and all other cells act
+through their node counts, convolved with the repulsion kernel by FFT. Each
+iteration is O(n + cells log cells) in time and memory, and nodes of a dense
+cluster still keep each other apart.
+"""
+
+from functools import lru_cache
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+import logging
+
+import numpy as np
+
+from database import read_session
+from graph_arrays import load_edge_index
+from graph_cache import VersionedCache
+from models import Node
+
+logger = logging.getLogger(__name__)
+
+# Graphs up to this many nodes use exact pairwise repulsion
+EXACT_REPULSION_MAX_NODES = 1000
+# Target occupancy of the repulsion grid for larger graphs
+GRID_NODES_PER_CELL = 2
+# Upper bound on grid cells per axis
+MAX_GRID_CELLS = 1024
+# The grid is refined while near pairs exceed this many per node
+MAX_NEAR_PAIRS_PER_NODE = 64
+# Coordinates are scaled into a [0, LAYOUT_SIZE] square
+LAYOUT_SIZE = 1000.0
+
+# The whole graph's layout and those of a few sites
+_layout_cache = VersionedCache('layout', max_entries=4)
+
+class Layout(NamedTuple):
+    """Node coordinates for one graph version, sorted by node id."""
+    node_ids: np.ndarray
+    positions: np.ndarray
+
+    def positions_for(self, ids: Iterable[int]) -> Dict[int, Tuple[float, float]]:
+        """
+        Look up coordinates for a batch of node ids.
+
+        Args:
+            ids: Node ids
+
+        Returns:
+            Mapping from node id to (x, y); ids missing from the layout are omitted
+        """
+        ids = np.asarray(list(ids), dtype=np.int64)
+        if not len(ids) or not len(self.node_ids):
+            return {}
+        idx = np.searchsorted(self.node_ids, ids)
+        idx = np.minimum(idx, len(self.node_ids) - 1)
+        found = self.node_ids[idx] == ids
+        return {
+            int(node_id): (round(float(x), 2), round(float(y), 2))
+            for node_id, (x, y) in zip(ids[found], self.positions[idx[found]])
+        }
+
+def _repel_from(pos: np.ndarray, points: np.ndarray, weights: np.ndarray,
+                min_dist2: float, k: float, exclude_self: bool = False) -> np.ndarray:
+    """
+    Repulsive displacement of every node from a set of weighted points.
+
+    Uses sum_j w_ij * (p_i - c_j) = p_i * sum_j w_ij - W @ c, so the work is a
+    few dense matrix products instead of an (n, m, 2) difference tensor.
+    """
+    dist2 = (pos ** 2).sum(axis=1)[:, None] + (points ** 2).sum(axis=1)[None, :] - 2.0 * pos @ points.T
+    w = weights[None, :] * (k * k) / np.maximum(dist2, min_dist2)
+    if exclude_self:
+        np.fill_diagonal(w, 0.0)
+    return pos * w.sum(axis=1)[:, None] - w @ points
+
+@lru_cache(maxsize=4)
+def _far_kernel_fft(cells: int) -> np.ndarray:
+    """
+    FFT of the repulsion kernel d / |d|^2 over cell offsets d (x + iy), for
+    a zero-padded (2 * cells)^2 grid, without the 3x3 near block.
+    """
+    size = 2 * cells
+    offsets = np.fft.fftfreq(size, 1.0 / size)
+    dx, dy = np.meshgrid(offsets, offsets, indexing='ij')
+    far = (np.maximum(np.abs(dx), np.abs(dy)) > 1) & (np.abs(dx) < cells) & (np.abs(dy) < cells)
+    scale = np.where(far, 1.0 / np.maximum(dx ** 2 + dy ** 2, 1.0), 0.0)
+    return np.fft.fft2((dx + 1j * dy) * scale)
+
+def _near_pair_count(counts: np.ndarray) -> int:
+    """Number of near pairs (i, j), i != j, for a (cells, cells) count grid."""
+    padded = np.pad(counts, 1)
+    block = sum(padded[1 + ox:1 + ox + len(counts), 1 + oy:1 + oy + len(counts)]
+                for ox in (-1, 0, 1) for oy in (-1, 0, 1))
+    return int((counts * block).sum() - counts.sum())
+
+def _near_pairs(cell_xy: np.ndarray, cells: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Each unordered pair of nodes in the same or adjacent grid cells, once."""
+    cell = cell_xy[:, 0] * cells + cell_xy[:, 1]
+    order = np.argsort(cell, kind='stable')
+    counts = np.bincount(cell, minlength=cells * cells)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+    firsts, seconds = [], []
+    # Half of the 3x3 neighbourhood; the other half is the same pairs reversed
+    for ox, oy in ((0, 0), (0, 1), (1, -1), (1, 0), (1, 1)):
+        nx, ny = cell_xy[:, 0] + ox, cell_xy[:, 1] + oy
+        valid = np.flatnonzero((nx >= 0) & (nx < cells) & (ny >= 0) & (ny < cells))
+        neighbour = nx[valid] * cells + ny[valid]
+        reps = counts[neighbour]
+        first = np.repeat(valid, reps)
+        # Position within the neighbour cell's run of the sorted order
+        within = np.arange(len(first)) - np.repeat(np.cumsum(reps) - reps, reps)
+        second = order[np.repeat(starts[neighbour], reps) + within]
+        keep = first < second if (ox, oy) == (0, 0) else slice(None)
+        firsts.append(first[keep])
+        seconds.append(second[keep])
+    return np.concatenate(firsts), np.concatenate(seconds)
+
+def _repulsion(pos: np.ndarray, k: float) -> np.ndarray:
+    """Compute repulsive displacement for every node."""
+    n = len(pos)
+    if n <= EXACT_REPULSION_MAX_NODES:
+        return _repel_from(pos, pos, np.ones(n), 1e-9, k, exclude_self=True)
+
+    lo = pos.min(axis=0)
+    span = float(max(np.max(pos.max(axis=0) - lo), 1e-9))
+    cells = int(min(MAX_GRID_CELLS, max(4, np.ceil(np.sqrt(n / GRID_NODES_PER_CELL)))))
+    while True:
+        width = span / cells
+        cell_xy = np.minimum(((pos - lo) / width).astype(np.int64), cells - 1)
+        counts = np.bincount(cell_xy[:, 0] * cells + cell_xy[:, 1],
+                             minlength=cells * cells).reshape(cells, cells)
+        # Refine the grid when a dense cluster would make the near pairs quadratic
+        if cells >= MAX_GRID_CELLS or _near_pair_count(counts) <= MAX_NEAR_PAIRS_PER_NODE * n:
+            break
+        cells = min(MAX_GRID_CELLS, cells * 2)
+
+    # Near field: exact pairwise repulsion, applied to both nodes of a pair
+    first, second = _near_pairs(cell_xy, cells)
+    dx = pos[first, 0] - pos[second, 0]
+    dy = pos[first, 1] - pos[second, 1]
+    weight = (k * k) / np.maximum(dx * dx + dy * dy, 1e-9)
+    disp = np.empty((n, 2))
+    for axis, delta in enumerate((dx * weight, dy * weight)):
+        disp[:, axis] = np.bincount(first, weights=delta, minlength=n) - np.bincount(second, weights=delta, minlength=n)
+
+    # Far field: node counts convolved with the kernel, read at each node's cell
+    padded = np.zeros((2 * cells, 2 * cells))
+    padded[:cells, :cells] = counts
+    field = np.fft.ifft2(np.fft.fft2(padded) * _far_kernel_fft(cells))[:cells, :cells]
+    far = field[cell_xy[:, 0], cell_xy[:, 1]] * ((k * k) / width)
+    disp[:, 0] += far.real
+    disp[:, 1] += far.imag
+    return disp
+
+def force_layout(n: int, src: np.ndarray, tgt: np.ndarray, iterations: int = 50,
+                 seed: int = 0) -> np.ndarray:
+    """
+    Compute a Fruchterman-Reingold layout for a graph given as index arrays.
+
+    Args:
+        n: Number of nodes
+        src: Edge source positions
+        tgt: Edge target positions
+        iterations: Number of simulation steps
+        seed: Seed for the initial positions, so every worker produces the
+            same layout for the same graph
+
+    Returns:
+        Array of shape (n, 2) with coordinates in [0, LAYOUT_SIZE]
+    """
+    if n == 0:
+        return np.empty((0, 2))
+    if n == 1:
+        return np.full((1, 2), LAYOUT_SIZE / 2)
+
+    pos = np.random.default_rng(seed).random((n, 2))
+
+    k = 1.0 / np.sqrt(n)
+    temperature = 0.1
+    cooling = temperature / (iterations + 1)
+    mask = src != tgt
+    src, tgt = src[mask], tgt[mask]
+
+    for _ in range(iterations):
+        disp = _repulsion(pos, k)
+
+        delta = pos[src] - pos[tgt]
+        dist = np.sqrt((delta ** 2).sum(axis=1))
+        force = delta * (dist / k)[:, None]
+        for axis in range(2):
+            pull = np.bincount(src, weights=force[:, axis], minlength=n)
+            push = np.bincount(tgt, weights=force[:, axis], minlength=n)
+            disp[:, axis] += push - pull
+
+        length = np.maximum(np.sqrt((disp ** 2).sum(axis=1)), 1e-9)
+        pos += disp * (np.minimum(length, temperature) / length)[:, None]
+        temperature -= cooling
+
+    lo = pos.min(axis=0)
+    span = np.maximum(pos.max(axis=0) - lo, 1e-9)
+    return (pos - lo) / span.max() * LAYOUT_SIZE
+
+def compute_layout(iterations: int = 50, site: Optional[str] = None) -> Layout:
+    """Load the stored graph (or one site's graph) and compute its layout."""
+    node_ids, src, tgt = load_edge_index(site)
+    logger.info(f"Computing layout for {len(node_ids)} nodes and {len(src)} edges")
+    positions = force_layout(len(node_ids), src, tgt, iterations=iterations)
+    return Layout(node_ids=node_ids, positions=positions)
+
+def get_layout(version: int, max_nodes: Optional[int] = None, site: Optional[str] = None) -> Optional[Layout]:
+    """
+    Return the cached layout for a graph version, computing it on first use.
+
+    Args:
+        version: Current graph version (of the site, if given)
+        max_nodes: Skip layout for graphs larger than this
+        site: Lay out only this site's graph; None lays out all sites
+
+    Returns:
+        The layout, or None if the graph exceeds max_nodes
+    """
+    def compute():
+        if max_nodes is not None:
+            query = read_session().query(Node.id)
+            if site is not None:
+                query = query.filter(Node.site == site)
+            node_count = query.count()
+            if node_count > max_nodes:
+                logger.warning(f"Skipping layout for {node_count} nodes (limit {max_nodes})")
+                return None
+        return compute_layout(site=site)
+
+    return _layout_cache.get_or_compute(version, 'layout', compute, site=site)
@@ -0,0 +1,263 @@
+"""
+Level-of-detail summaries of the stored knowledge graph.
+
+Instead of sending every node to the UI, nodes are collapsed into supernodes
+and the edges between them into counted superedges. The grouping level sets
+how many supernodes there are, independent of graph size:
+
+- ``type``: one supernode per node type
+- ``facility``: one supernode per (facility, node type)
+- ``department``: one supernode per (department, node type)
+
+Nodes are assigned to their nearest facility/department by propagating the
+anchor node id along edges (in either direction) for a bounded number of hops,
+with ties broken by the smallest anchor id. All steps are vectorized pandas
+operations over the node/edge tables. Summaries cover the whole graph or one
+site and are cached per graph version of what they cover. Both tables are
+read in one snapshot session together with that version, which is checked
+again after reading, so a summary never mixes nodes and edges of two versions.
+"""
+
+from typing import Dict, List, NamedTuple, Optional
+import logging
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+
+from database import get_graph_version, read_session, snapshot_session
+from graph_cache import VersionedCache
+from models import Node, Edge
+
+logger = logging.getLogger(__name__)
+
+GROUPINGS = {
+    'type': None,
+    'facility': 'Facility',
+    'department': 'Department',
+}
+
+# How far anchor assignments spread from a facility/department node
+ANCHOR_MAX_HOPS = 3
+UNASSIGNED = 'none'
+
+# Every grouping of the whole graph and of a few sites
+_summary_cache = VersionedCache('summary', max_entries=4 * len(GROUPINGS))
+
+# Reads of the node and edge tables before giving up on a graph being written
+LOAD_ATTEMPTS = 3
+
+class GraphSummary(NamedTuple):
+    """Supernodes, superedges and node membership for one grouping level."""
+    group_by: str
+    version: int  # Graph version (of the site) the summary describes
+    supernodes: List[Dict]
+    superedges: List[Dict]
+    node_ids: np.ndarray
+    codes: np.ndarray
+    index: Dict[str, int]
+
+    def members(self, supernode_id: str) -> Optional[np.ndarray]:
+        """
+        Return the sorted node ids collapsed into a supernode.
+
+        Args:
+            supernode_id: Id of the supernode
+
+        Returns:
+            Array of node ids, or None if the supernode does not exist
+        """
+        code = self.index.get(supernode_id)
+        if code is None:
+            return None
+        return self.node_ids[self.codes == code]
+
+def load_frames(site: Optional[str] = None, attempts: int = LOAD_ATTEMPTS):
+    """
+    Load the node and edge tables (or one site's rows) into DataFrames.
+
+    Both are read in one snapshot session. If the graph version changed
+    meanwhile (possible where the database gives no snapshot, i.e. SQLite),
+    they are read again.
+
+    Returns:
+        (nodes, edges, version) with the graph version (of the site) they show
+
+    Raises:
+        RuntimeError: If the graph changed during every attempt
+    """
+    node_query = select(Node.id, Node.type, Node.label).order_by(Node.id)
+    edge_query = select(Edge.source_id, Edge.target_id, Edge.type)
+    if site is not None:
+        node_query, edge_query = node_query.where(Node.site == site), edge_query.where(Edge.site == site)
+    for _ in range(attempts):
+        with snapshot_session() as session:
+            version = get_graph_version(session, site)
+            nodes = pd.DataFrame(session.execute(node_query).all(), columns=['id', 'type', 'label'])
+            edges = pd.DataFrame(session.execute(edge_query).all(), columns=['source', 'target', 'type'])
+            # get() would answer from the identity map
+            session.expire_all()
+            if get_graph_version(session, site) == version:
+                return nodes, edges, version
+    raise RuntimeError(f'The graph changed during each of {attempts} summary attempts')
+
+def assign_anchors(nodes: pd.DataFrame, edges: pd.DataFrame, anchor_type: str,
+                   max_hops: int = ANCHOR_MAX_HOPS) -> pd.Series:
+    """
+    Assign each node the id of its nearest anchor node.
+
+    Args:
+        nodes: Node frame with id and type columns
+        edges: Edge frame with source and target columns
+        anchor_type: Node type acting as anchor (e.g. 'Facility')
+        max_hops: Maximum propagation distance
+
+    Returns:
+        Series indexed by node id holding the anchor id (missing if unreached)
+    """
+    anchors = nodes.loc[nodes['type'] == anchor_type, 'id']
+    assigned = pd.Series(anchors.values, index=anchors.values)
+
+    # Treat edges as undirected for propagation
+    pairs = pd.concat([
+        edges[['source', 'target']].set_axis(['a', 'b'], axis=1),
+        edges[['target', 'source']].set_axis(['a', 'b'], axis=1),
+    ], ignore_index=True)
+
+    for _ in range(max_hops):
+        frontier = pairs[pairs['a'].isin(assigned.index) & ~pairs['b'].isin(assigned.index)]
+        if frontier.empty:
+            break
+        reached = frontier.assign(anchor=frontier['a'].map(assigned)).groupby('b')['anchor'].min()
+        assigned = pd.concat([assigned, reached])
+
+    return assigned
+
+def build_summary(group_by: str, site: Optional[str] = None) -> GraphSummary:
+    """
+    Compute the summary of the stored graph for a grouping level.
+
+    Args:
+        group_by: One of the keys of GROUPINGS
+        site: Only summarize this site's graph; None summarizes all sites
+
+    Returns:
+        The computed GraphSummary
+    """
+    nodes, edges, version = load_frames(site)
+    logger.info(f"Summarizing {len(nodes)} nodes and {len(edges)} edges by {group_by}")
+
+    anchor_type = GROUPINGS[group_by]
+    if anchor_type is None:
+        anchor_ids = pd.Series(pd.NA, index=nodes.index, dtype='Int64')
+    else:
+        anchors = assign_anchors(nodes, edges, anchor_type)
+        anchor_ids = nodes['id'].map(anchors).astype('Int64')
+
+    groups = pd.DataFrame({'anchor': anchor_ids, 'type': nodes['type']}).groupby(
+        ['anchor', 'type'], dropna=False, sort=True
+    )
+    codes = groups.ngroup().to_numpy(dtype=np.int64)
+    labels = nodes.set_index('id')['label']
+
+    supernodes = []
+    for (anchor, node_type), count in groups.size().items():
+        if anchor_type is None:
+            supernode_id = f"{group_by}:{node_type}"
+            group_label = None
+        else:
+            assigned = not pd.isna(anchor)
+            supernode_id = f"{group_by}:{int(anchor) if assigned else UNASSIGNED}:{node_type}"
+            group_label = labels.get(int(anchor)) if assigned else None
+        supernodes.append({
+            'id': supernode_id,
+            'type': node_type,
+            'group': group_label,
+            'label': f"{group_label} / {node_type}" if group_label else node_type,
+            'count': int(count)
+        })
+    uniques = [supernode['id'] for supernode in supernodes]
+
+    superedges = []
+    if len(edges):
+        code_by_node = pd.Series(codes, index=nodes['id'].values)
+        grouped = pd.DataFrame({
+            'source': edges['source'].map(code_by_node),
+            'target': edges['target'].map(code_by_node),
+            'type': edges['type']
+        }).dropna().astype({'source': np.int64, 'target': np.int64})
+        counts = grouped.groupby(['source', 'target', 'type'], sort=True).size()
+        superedges = [
+            {'source': uniques[s], 'target': uniques[t], 'type': edge_type, 'count': int(count)}
+            for (s, t, edge_type), count in counts.items()
+        ]
+
+    return GraphSummary(
+        group_by=group_by,
+        version=version,
+        supernodes=supernodes,
+        superedges=superedges,
+        node_ids=nodes['id'].to_numpy(dtype=np.int64),
+        codes=codes,
+        index={supernode_id: code for code, supernode_id in enumerate(uniques)}
+    )
+
+def get_summary(version: int, group_by: str, site: Optional[str] = None) -> GraphSummary:
+    """
+    Return the cached summary for a graph version (of the site, if given) and grouping level.
+
+    A summary computed after the graph moved past version describes the
+    newer graph; it is returned but not cached under version.
+    """
+    if group_by not in GROUPINGS:
+        raise ValueError(f"Unsupported grouping: {group_by}")
+    return _summary_cache.get_or_compute(version, group_by, lambda: build_summary(group_by, site), site=site,
+                                         version_of=lambda summary: summary.version)
+
+def expand_supernode(summary: GraphSummary, supernode_id: str, after: int = 0,
+                     limit: int = 1000) -> Optional[Dict]:
+    """
+    Return one page of the nodes collapsed into a supernode.
+
+    Args:
+        summary: Summary the supernode belongs to
+        supernode_id: Id of the supernode to expand
+        after: Keyset cursor; only members with a greater node id are returned
+        limit: Maximum number of members in this page
+
+    Returns:
+        Dict with the member nodes, the edges among them and the next cursor,
+        or None if the supernode does not exist
+    """
+    members = summary.members(supernode_id)
+    if members is None:
+        return None
+
+    page = members[members > after][:limit]
+    page_ids = [int(node_id) for node_id in page]
+    nodes = []
+    edges = []
+    if page_ids:
+        rows = read_session().execute(
+            select(Node.id, Node.label, Node.type).where(Node.id.in_(page_ids)).order_by(Node.id)
+        ).all()
+        nodes = [{'id': row.id, 'label': row.label, 'type': row.type} for row in rows]
+        edge_rows = read_session().execute(
+            select(Edge.id, Edge.source_id, Edge.target_id, Edge.type).where(
+                Edge.source_id.in_(page_ids),
+                Edge.target_id.in_(page_ids)
+            ).order_by(Edge.id)
+        ).all()
+        edges = [
+            {'id': row.id, 'source': row.source_id, 'target': row.target_id, 'type': row.type}
+            for row in edge_rows
+        ]
+
+    has_more = bool(page_ids) and page_ids[-1] < int(members[-1])
+    return {
+        'supernode': supernode_id,
+        'total': int(len(members)),
+        'nodes': nodes,
+        'edges': edges,
+        'next_after': page_ids[-1] if has_more else None
+    }
@@ -0,0 +1,52 @@
+"""
+gunicorn settings for the production server.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+The app is preloaded in the master process, so workers fork with the Flask
+app, routes and SQLAlchemy metadata already built instead of importing them
+one by one. Heavy libraries (pandas, networkx, SciPy, openai) stay lazy and
+are loaded by a worker on the first request that needs them; set
+PRELOAD_HEAVY_IMPORTS=1 to import them in the master instead, trading a
+slower boot for memory shared copy-on-write across workers. Each worker
+starts its own logging listener thread after the fork (see logging_setup.py).
+
+Environment:
+    PORT: Listen port (default 5000)
+    WEB_CONCURRENCY: Worker processes (default 2 x CPUs + 1, at most 8)
+    GUNICORN_THREADS: Threads per worker (default 8; chat requests and graph
+        change streams each hold one, see admission.py)
+    GUNICORN_TIMEOUT: Worker timeout in seconds (default 120)
+    GUNICORN_ACCESS_LOG: Access log path, '-' for stdout (default) or empty to disable
+"""
+
+import importlib
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', min(multiprocessing.cpu_count() * 2 + 1, 8)))
+threads = int(os.environ.get('GUNICORN_THREADS', 8))
+worker_class = 'gthread'
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+keepalive = 5
+preload_app = True
+# Recycle workers periodically to bound memory growth
+max_requests = 2000
+max_requests_jitter = 200
+# Access log destination; empty disables it (e.g. for load tests)
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-') or None
+
+HEAVY_MODULES = ('pandas', 'networkx', 'numpy', 'scipy.sparse', 'openai')
+
+def on_starting(server):
+    if os.environ.get('PRELOAD_HEAVY_IMPORTS') == '1':
+        for module in HEAVY_MODULES:
+            importlib.import_module(module)
+
+def post_fork(server, worker):
+    # Connections opened in the master must not be shared with workers
+    from wsgi import app
+    from database import db
+    with app.app_context():
+        db.engine.dispose(close=False)
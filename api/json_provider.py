@@ -0,0 +1,86 @@
+"""
+JSON provider backed by orjson, with the standard library as fallback.
+
+orjson encodes the large ontology and graph payloads several times faster
+than json.dumps and produces bytes, so responses skip the str -> bytes round
+trip. Behaviour follows Flask's DefaultJSONProvider: keys are sorted unless
+sort_keys is False, dates, decimals, UUIDs and dataclasses are handled by the
+same default hook, and responses are compact unless in debug mode.
+
+Differences from the standard library: output is UTF-8 rather than
+ASCII-escaped, NaN/Infinity are encoded as null, and integers beyond 64 bits
+or calls with json.dumps-only arguments (cls, custom separators) fall back
+to the stdlib encoder.
+
+JSON_PROVIDER selects the implementation: 'auto' (orjson when installed),
+'orjson' or 'stdlib'.
+"""
+
+from typing import Any
+import logging
+
+from flask import Flask, Response
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# json.dumps arguments orjson can honour; anything else uses the stdlib
+_ORJSON_ARGS = {'default', 'sort_keys', 'indent', 'separators', 'ensure_ascii'}
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Flask JSON provider encoding and decoding with orjson."""
+
+    def _options(self, sort_keys: bool, indent) -> int:
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return option
+
+    def dumps_bytes(self, obj: Any, **kwargs: Any) -> bytes:
+        """Serialize to UTF-8 bytes; see dumps() for the accepted arguments."""
+        if set(kwargs) - _ORJSON_ARGS or kwargs.get('separators') not in (None, (',', ':')):
+            return super().dumps(obj, **kwargs).encode()
+        option = self._options(kwargs.get('sort_keys', self.sort_keys), kwargs.get('indent'))
+        try:
+            return orjson.dumps(obj, default=kwargs.get('default', self.default), option=option)
+        except orjson.JSONEncodeError:
+            # e.g. integers beyond 64 bits, which json.dumps supports
+            return super().dumps(obj, **kwargs).encode()
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return self.dumps_bytes(obj, **kwargs).decode()
+
+    def loads(self, s, **kwargs: Any) -> Any:
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any) -> Response:
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        body = self.dumps_bytes(obj, indent=2 if indent else None)
+        return self._app.response_class(body + b'\n', mimetype=self.mimetype)
+
+def init_json(app: Flask) -> None:
+    """
+    Install the JSON provider chosen by JSON_PROVIDER.
+
+    Args:
+        app: Flask application
+    """
+    choice = app.config.get('JSON_PROVIDER', 'auto')
+    if choice not in ('auto', 'orjson', 'stdlib'):
+        raise ValueError(f"JSON_PROVIDER must be 'auto', 'orjson' or 'stdlib', not {choice!r}")
+    if choice == 'orjson' and orjson is None:
+        raise RuntimeError("JSON_PROVIDER is 'orjson' but the orjson package is not installed")
+
+    if choice != 'stdlib' and orjson is not None:
+        app.json = OrjsonProvider(app)
+    logger.info(f"JSON provider: {type(app.json).__name__}")
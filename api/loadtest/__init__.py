@@ -0,0 +1,13 @@
+"""
+End-to-end load testing without external services.
+
+- stub_llm: OpenAI-compatible chat completions server with configurable
+  latency and token rate
+- run: starts the stub and the app under gunicorn, drives concurrent clients
+  with a configurable request mix and reports throughput and latency
+  percentiles per endpoint
+
+Run from the api directory:
+
+    python -m loadtest.run --concurrency 16 --duration 30 --mix chat=8,upload=1,validate=1
+"""
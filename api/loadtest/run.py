@@ -0,0 +1,374 @@
+"""
+Load-test harness for /api/chat, /api/upload, /api/validate-ontology and
+/health (which admission control keeps responsive while chat is saturated).
+
+By default the harness is self-contained:
+
+1. starts the stub LLM server (loadtest.stub_llm) in-process,
+2. starts the app under gunicorn against a scratch SQLite file (or the
+   database given with --database-url), with OPENAI_BASE_URL pointing at
+   the stub,
+3. seeds it with a synthetic upload + validate,
+4. runs --concurrency client threads for --duration seconds (or until
+   --requests requests), each picking endpoints from the weighted --mix,
+5. prints throughput and p50/p95/p99 latency per endpoint, optionally
+   writing the report as JSON.
+
+Use --target to load an already running deployment instead; the stub and
+gunicorn are then not started.
+
+Usage (from the api directory):
+    python -m loadtest.run --concurrency 16 --duration 30
+    python -m loadtest.run --mix chat=1 --llm-latency 1.5 --tokens-per-second 30 --workers 4 --threads 8
+    python -m loadtest.run --target http://staging:5000 --mix upload=1,validate=1 --output report.json
+"""
+
+import argparse
+import http.client
+import json
+import math
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import urlsplit
+import logging
+
+from loadtest.stub_llm import StubLLMServer, StubSettings
+
+logger = logging.getLogger(__name__)
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHAT_QUERIES = [
+    'How many work orders are there per facility?',
+    'Which assets have the most maintenance work orders?',
+    'List open work orders for pumps',
+    'What equipment in Plant A needs repair?',
+    'Summarize maintenance issues across all assets',
+]
+
+class Sample(NamedTuple):
+    endpoint: str
+    status: int
+    latency: float
+    finished_at: float
+
+class Workload:
+    """Prebuilt request bodies for each endpoint."""
+
+    def __init__(self, upload_rows: int = 200, seed: int = 42):
+        from synthetic_data import generate_work_orders
+        from ontology_processor import extract_ontology
+
+        df = generate_work_orders(upload_rows, seed=seed)
+        self.csv = df.to_csv(index=False).encode('utf-8')
+        self.boundary = uuid.uuid4().hex
+        self.upload_body = (
+            f'--{self.boundary}\r\n'
+            f'Content-Disposition: form-data; name="file"; filename="work_orders.csv"\r\n'
+            f'Content-Type: text/csv\r\n\r\n'
+        ).encode('utf-8') + self.csv + f'\r\n--{self.boundary}--\r\n'.encode('utf-8')
+        self.validate_body = json.dumps({'ontology': extract_ontology(df)}).encode('utf-8')
+        self.chat_bodies = [json.dumps({'query': query}).encode('utf-8') for query in CHAT_QUERIES]
+
+    def request(self, endpoint: str, rng: random.Random) -> Tuple[str, str, bytes, Dict[str, str]]:
+        """Return (method, path, body, headers) for one request to an endpoint."""
+        if endpoint == 'upload':
+            return 'POST', '/api/upload', self.upload_body, {
+                'Content-Type': f'multipart/form-data; boundary={self.boundary}'
+            }
+        if endpoint == 'validate':
+            return 'POST', '/api/validate-ontology', self.validate_body, {'Content-Type': 'application/json'}
+        if endpoint == 'chat':
+            return 'POST', '/api/chat', rng.choice(self.chat_bodies), {'Content-Type': 'application/json'}
+        if endpoint == 'health':
+            return 'GET', '/health', b'', {}
+        raise ValueError(f"Unknown endpoint {endpoint!r}")
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """Parse 'chat=8,upload=1,validate=1' into endpoint weights."""
+    mix = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        name, _, weight = item.partition('=')
+        mix[name.strip()] = float(weight or 1)
+    unknown = set(mix) - {'chat', 'upload', 'validate', 'health'}
+    if unknown or not mix:
+        raise ValueError(f"Invalid request mix {spec!r}")
+    return mix
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+def summarize(samples: List[Sample], elapsed: float) -> Dict:
+    """
+    Build the latency/throughput report.
+
+    Args:
+        samples: Completed requests
+        elapsed: Wall-clock duration of the load phase in seconds
+
+    Returns:
+        Report with an entry per endpoint and an 'all' entry
+    """
+    groups: Dict[str, List[Sample]] = {}
+    for sample in samples:
+        groups.setdefault(sample.endpoint, []).append(sample)
+    groups['all'] = list(samples)
+
+    report = {'elapsed_s': round(elapsed, 3), 'endpoints': {}}
+    for name, group in sorted(groups.items()):
+        latencies = sorted(sample.latency for sample in group)
+        errors = sum(1 for sample in group if sample.status == 0 or sample.status >= 400)
+        # Rejected by admission control (see admission.py)
+        shed = sum(1 for sample in group if sample.status in (429, 503))
+        statuses: Dict[str, int] = {}
+        for sample in group:
+            statuses[str(sample.status)] = statuses.get(str(sample.status), 0) + 1
+        report['endpoints'][name] = {
+            'requests': len(group),
+            'errors': errors,
+            'shed': shed,
+            'statuses': statuses,
+            'throughput_rps': round(len(group) / elapsed, 2) if elapsed > 0 else 0.0,
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 1),
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 1),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 1),
+            'max_ms': round(latencies[-1] * 1000, 1) if latencies else 0.0,
+        }
+    return report
+
+def run_load(target: str, workload: Workload, mix: Dict[str, float], concurrency: int,
+             duration: Optional[float] = None, requests: Optional[int] = None,
+             timeout: float = 120.0, seed: int = 0) -> Tuple[List[Sample], float]:
+    """
+    Drive concurrent keep-alive clients against a running app.
+
+    Args:
+        target: Base URL of the app
+        workload: Request bodies
+        mix: Endpoint weights
+        concurrency: Number of client threads
+        duration: Stop after this many seconds
+        requests: Stop after this many requests in total
+        timeout: Per-request socket timeout in seconds
+        seed: Seed for the per-client endpoint choice
+
+    Returns:
+        Tuple of (samples, elapsed seconds)
+    """
+    if duration is None and requests is None:
+        raise ValueError("Either duration or requests is required")
+    url = urlsplit(target)
+    endpoints, weights = zip(*mix.items())
+    samples: List[Sample] = []
+    samples_lock = threading.Lock()
+    issued = [0]
+    start = time.perf_counter()
+    deadline = start + duration if duration is not None else math.inf
+
+    def take_ticket() -> bool:
+        with samples_lock:
+            if requests is not None and issued[0] >= requests:
+                return False
+            issued[0] += 1
+            return True
+
+    def client(index: int):
+        rng = random.Random(seed * 1000 + index)
+        connection = None
+        while time.perf_counter() < deadline and take_ticket():
+            endpoint = rng.choices(endpoints, weights)[0]
+            method, path, body, headers = workload.request(endpoint, rng)
+            began = time.perf_counter()
+            try:
+                if connection is None:
+                    connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=timeout)
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                status = response.status
+                if response.getheader('Connection', '').lower() == 'close':
+                    connection.close()
+                    connection = None
+            except (OSError, http.client.HTTPException) as e:
+                logger.debug("Request to %s failed: %s", path, e)
+                status = 0
+                if connection is not None:
+                    connection.close()
+                connection = None
+            finished = time.perf_counter()
+            with samples_lock:
+                samples.append(Sample(endpoint, status, finished - began, finished - start))
+        if connection is not None:
+            connection.close()
+
+    threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, time.perf_counter() - start
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def wait_until_ready(target: str, timeout: float = 60.0, process: Optional[subprocess.Popen] = None) -> None:
+    """Poll the app's /health endpoint until it reports healthy."""
+    url = urlsplit(target)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"App server exited with status {process.returncode}")
+        try:
+            connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=2)
+            connection.request('GET', '/health')
+            if connection.getresponse().status == 200:
+                connection.close()
+                return
+            connection.close()
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"App at {target} did not become ready within {timeout}s")
+
+def start_app_server(port: int, database_url: str, llm_base_url: str, workers: int, threads: int,
+                     log_path: str) -> subprocess.Popen:
+    """Start the app under gunicorn with the given database and LLM endpoint."""
+    if shutil.which('gunicorn') is None:
+        raise RuntimeError("gunicorn is not installed")
+    env = {
+        **os.environ,
+        'DATABASE_URL': database_url,
+        'OPENAI_BASE_URL': llm_base_url,
+        'OPENAI_API_KEY': 'loadtest-stub',
+        'LOG_PROFILE': os.environ.get('LOG_PROFILE', 'production'),
+        'GUNICORN_ACCESS_LOG': '',
+        # All harness clients share one address; measure the concurrency
+        # limit and queue, not the per-client rate limit
+        'CHAT_RATE_PER_MINUTE': os.environ.get('CHAT_RATE_PER_MINUTE', '0'),
+    }
+    log = open(log_path, 'ab')
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'init-db'], cwd=API_DIR, env=env,
+                   stdout=log, stderr=subprocess.STDOUT, check=True)
+    command = [
+        'gunicorn', '-c', 'gunicorn.conf.py', '--workers', str(workers), '--threads', str(threads),
+        '--bind', f'127.0.0.1:{port}', '--timeout', '300', '--log-level', 'warning',
+        'wsgi:app'
+    ]
+    logger.info(f"Starting app: {' '.join(command)}")
+    return subprocess.Popen(command, cwd=API_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+def seed_app(target: str, workload: Workload) -> None:
+    """Upload and validate the workload dataset once so chat has a graph to read."""
+    url = urlsplit(target)
+    rng = random.Random(0)
+    for endpoint in ('upload', 'validate'):
+        method, path, body, headers = workload.request(endpoint, rng)
+        connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=300)
+        connection.request(method, path, body=body, headers=headers)
+        response = connection.getresponse()
+        payload = response.read()
+        connection.close()
+        if response.status != 200:
+            raise RuntimeError(f"Seeding {path} failed with {response.status}: {payload[:500]!r}")
+
+def print_report(report: Dict) -> None:
+    print(f"\nLoad phase: {report['elapsed_s']}s")
+    print(f"{'endpoint':<10} {'requests':>9} {'errors':>7} {'shed':>6} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} "
+          f"{'p99 ms':>9} {'max ms':>9}")
+    for name, stats in report['endpoints'].items():
+        print(f"{name:<10} {stats['requests']:>9} {stats['errors']:>7} {stats['shed']:>6} {stats['throughput_rps']:>8} "
+              f"{stats['p50_ms']:>9} {stats['p95_ms']:>9} {stats['p99_ms']:>9} {stats['max_ms']:>9}")
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Load test the API with a stub LLM')
+    parser.add_argument('--target', help='Base URL of a running app; skips starting the stub and gunicorn')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=30.0, help='Seconds of load')
+    parser.add_argument('--requests', type=int, help='Stop after this many requests instead')
+    parser.add_argument('--mix', default='chat=8,upload=1,validate=1,health=1', help='Endpoint weights')
+    parser.add_argument('--upload-rows', type=int, default=200, help='Rows in the uploaded CSV')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn worker processes')
+    parser.add_argument('--threads', type=int, default=4, help='gunicorn threads per worker')
+    parser.add_argument('--database-url', help='Defaults to a scratch SQLite file')
+    parser.add_argument('--llm-latency', type=float, default=0.3, help='Stub time to first token (s)')
+    parser.add_argument('--tokens-per-second', type=float, default=50.0)
+    parser.add_argument('--completion-tokens', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write the JSON report to this file')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    mix = parse_mix(args.mix)
+    workload = Workload(args.upload_rows)
+
+    stub = None
+    server = None
+    scratch = None
+    try:
+        target = args.target
+        if target is None:
+            settings = StubSettings(args.llm_latency, args.tokens_per_second, args.completion_tokens)
+            stub = StubLLMServer(settings=settings, seed=args.seed).start()
+            scratch = tempfile.mkdtemp(prefix='loadtest-')
+            database_url = args.database_url or f"sqlite:///{os.path.join(scratch, 'loadtest.db')}"
+            port = _free_port()
+            target = f"http://127.0.0.1:{port}"
+            log_path = os.path.join(scratch, 'server.log')
+            server = start_app_server(port, database_url, stub.base_url, args.workers, args.threads, log_path)
+            wait_until_ready(target, process=server)
+            logger.info(f"App ready at {target}; server log at {log_path}")
+
+        seed_app(target, workload)
+        logger.info(f"Running {args.concurrency} clients with mix {mix}")
+        duration = None if args.requests else args.duration
+        samples, elapsed = run_load(target, workload, mix, args.concurrency, duration, args.requests,
+                                    seed=args.seed)
+        report = summarize(samples, elapsed)
+        report['config'] = {
+            'target': args.target or 'gunicorn',
+            'concurrency': args.concurrency,
+            'mix': mix,
+            'workers': args.workers,
+            'threads': args.threads,
+            'upload_rows': args.upload_rows,
+            'llm_latency_s': args.llm_latency,
+            'tokens_per_second': args.tokens_per_second,
+            'completion_tokens': args.completion_tokens,
+        }
+        if stub is not None:
+            report['stub_llm_requests'] = stub.requests
+
+        print_report(report)
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(report, f, indent=2)
+        return 0
+    finally:
+        if server is not None:
+            server.terminate()
+            try:
+                server.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                server.kill()
+        if stub is not None:
+            stub.stop()
+        if scratch is not None and not args.database_url:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+if __name__ == '__main__':
+    sys.exit(main())
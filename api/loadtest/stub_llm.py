@@ -0,0 +1,179 @@
+"""
+Stub OpenAI-compatible LLM server for load tests.
+
+Implements POST /v1/chat/completions (plain and stream=true) and GET
+/v1/models. Each completion waits for a time-to-first-token latency and then
+"generates" completion tokens at a fixed rate, so the app sees realistic LLM
+timing without any network access or API cost.
+
+Point the app at it with OPENAI_BASE_URL=http://127.0.0.1:<port>/v1.
+
+Usage:
+    python -m loadtest.stub_llm --port 8900 --latency 0.4 --tokens-per-second 60 --completion-tokens 120
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, NamedTuple, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+WORDS = ('asset', 'pump', 'work', 'order', 'facility', 'maintenance', 'schedule', 'inspection',
+         'technician', 'priority', 'overdue', 'completed', 'the', 'and', 'of', 'for')
+
+class StubSettings(NamedTuple):
+    """Timing model of the stub LLM."""
+    latency: float = 0.3
+    tokens_per_second: float = 50.0
+    completion_tokens: int = 100
+    jitter: float = 0.1
+
+    def sample_latency(self, rng: random.Random) -> float:
+        """Time to first token with +/- jitter (as a fraction)."""
+        return max(0.0, self.latency * (1 + rng.uniform(-self.jitter, self.jitter)))
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server: 'StubLLMServer'
+
+    def log_message(self, format, *args):
+        logger.debug("stub_llm: " + format, *args)
+
+    def _send_json(self, status: int, payload) -> None:
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/v1/models':
+            self._send_json(200, {'object': 'list', 'data': [{'id': 'stub-model', 'object': 'model'}]})
+        else:
+            self._send_json(404, {'error': {'message': 'not found'}})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            request = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            self._send_json(400, {'error': {'message': 'invalid JSON'}})
+            return
+        if self.path.rstrip('/') != '/v1/chat/completions':
+            self._send_json(404, {'error': {'message': 'not found'}})
+            return
+
+        settings = self.server.settings
+        tokens = min(settings.completion_tokens, int(request.get('max_tokens') or settings.completion_tokens))
+        prompt_tokens = sum(len(str(m.get('content', '')).split()) for m in request.get('messages', []))
+        with self.server.rng_lock:
+            latency = settings.sample_latency(self.server.rng)
+        self.server.record_request(request)
+
+        time.sleep(latency)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        model = request.get('model', 'stub-model')
+        words = [WORDS[i % len(WORDS)] for i in range(tokens)]
+        per_token = 1.0 / settings.tokens_per_second if settings.tokens_per_second > 0 else 0.0
+
+        if request.get('stream'):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Cache-Control', 'no-cache')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            self.close_connection = True
+            for index, word in enumerate(words):
+                chunk = {
+                    'id': completion_id, 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                    'model': model,
+                    'choices': [{'index': 0, 'delta': {'content': word + ' '} if index else
+                                 {'role': 'assistant', 'content': word + ' '}, 'finish_reason': None}]
+                }
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+                self.wfile.flush()
+                time.sleep(per_token)
+            final = {'id': completion_id, 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                     'model': model, 'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]}
+            self.wfile.write(f"data: {json.dumps(final)}\n\ndata: [DONE]\n\n".encode('utf-8'))
+            return
+
+        time.sleep(per_token * tokens)
+        content = self.server.responder(request) if self.server.responder else ' '.join(words)
+        self._send_json(200, {
+            'id': completion_id,
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': model,
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content},
+                'finish_reason': 'stop'
+            }],
+            'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': tokens,
+                      'total_tokens': prompt_tokens + tokens}
+        })
+
+class StubLLMServer(ThreadingHTTPServer):
+    """Threaded stub server; use start() to serve from a background thread."""
+    daemon_threads = True
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, settings: StubSettings = StubSettings(),
+                 seed: int = 0, responder: Optional[Callable[[dict], str]] = None):
+        super().__init__((host, port), _Handler)
+        self.settings = settings
+        # Optional reply content for a (non-streamed) request instead of filler words
+        self.responder = responder
+        self.rng = random.Random(seed)
+        self.rng_lock = threading.Lock()
+        self.requests = 0
+        self.last_request = None
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def record_request(self, request=None) -> None:
+        with self.rng_lock:
+            self.requests += 1
+            self.last_request = request
+
+    def start(self) -> 'StubLLMServer':
+        self._thread = threading.Thread(target=self.serve_forever, name='stub-llm', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description='Stub OpenAI-compatible LLM server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--latency', type=float, default=0.3, help='Seconds to first token')
+    parser.add_argument('--tokens-per-second', type=float, default=50.0)
+    parser.add_argument('--completion-tokens', type=int, default=100)
+    parser.add_argument('--jitter', type=float, default=0.1, help='Latency jitter as a fraction')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    settings = StubSettings(args.latency, args.tokens_per_second, args.completion_tokens, args.jitter)
+    server = StubLLMServer(args.host, args.port, settings)
+    logger.info(f"Stub LLM listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+if __name__ == '__main__':
+    main()
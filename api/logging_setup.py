@@ -0,0 +1,240 @@
+"""
+Central logging configuration.
+
+Request threads only enqueue log records: a QueueHandler on the root logger
+hands records to a QueueListener thread, which does the line formatting and
+I/O. The message itself is rendered in the logging thread, as by the stock
+QueueHandler, so the listener never touches arguments that may have been
+mutated since the call or that belong to another thread (e.g. ORM objects
+of a closed session). On top of that:
+
+- Messages use lazy %-style arguments, so disabled levels cost one check.
+- truncated() wraps large payloads so only a bounded repr is ever built,
+  and every rendered message is capped at LOG_MAX_MESSAGE_LENGTH before it
+  is queued.
+- SamplingFilter keeps only every Nth DEBUG/INFO record of selected loggers
+  (hot loops); warnings and errors always pass.
+
+Profiles (LOG_PROFILE):
+
+- development: DEBUG level, no sampling
+- production: INFO level, werkzeug access logs at WARNING, sampling of the
+  per-entity loggers, shorter messages
+
+A forked child (e.g. a gunicorn worker of the preloaded app) does not
+inherit the listener thread, so the pipeline is configured again in every
+child process, with the settings last passed to configure_logging().
+"""
+
+import atexit
+import copy
+import logging
+import logging.handlers
+import os
+import queue
+import reprlib
+import sys
+import threading
+from typing import Dict, Optional
+
+DEFAULT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+PROFILES = {
+    'development': {
+        'level': 'DEBUG',
+        'max_message_length': 10000,
+        'sampling': {},
+        'logger_levels': {},
+    },
+    'production': {
+        'level': 'INFO',
+        'max_message_length': 2000,
+        'sampling': {'graph_generator': 100, 'ontology_processor': 100, 'entity_resolution': 10},
+        'logger_levels': {'werkzeug': 'WARNING', 'sqlalchemy.engine': 'WARNING'},
+    },
+}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_settings: Optional[Dict] = None
+_lock = threading.Lock()
+
+class truncated:
+    """
+    Lazily rendered, size-bounded representation of a log payload.
+
+    The repr is only computed if the record is actually emitted, and reprlib
+    limits how much of a large container is walked.
+
+    Example:
+        logger.debug("Received data: %s", truncated(data))
+    """
+    _repr = reprlib.Repr()
+    _repr.maxstring = 200
+    _repr.maxother = 200
+    _repr.maxlist = _repr.maxdict = _repr.maxtuple = _repr.maxset = 10
+    _repr.maxlevel = 4
+
+    __slots__ = ('value', 'limit')
+
+    def __init__(self, value, limit: int = 500):
+        self.value = value
+        self.limit = limit
+
+    def __str__(self) -> str:
+        text = self.value if isinstance(self.value, str) else self._repr.repr(self.value)
+        return _cut(text, self.limit)
+
+    __repr__ = __str__
+
+def _cut(text: str, limit: int) -> str:
+    if limit and len(text) > limit:
+        return f"{text[:limit]}... [truncated {len(text) - limit} chars]"
+    return text
+
+class TruncatingFormatter(logging.Formatter):
+    """Formatter that caps the rendered message length."""
+
+    def __init__(self, fmt: str = DEFAULT_FORMAT, max_length: int = 2000):
+        super().__init__(fmt)
+        self.max_length = max_length
+
+    def formatMessage(self, record: logging.LogRecord) -> str:
+        record.message = _cut(record.message, self.max_length)
+        return super().formatMessage(record)
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep every Nth DEBUG/INFO record of selected loggers.
+
+    Args:
+        rates: Mapping of logger name prefix to N (1 keeps everything)
+    """
+
+    def __init__(self, rates: Dict[str, int]):
+        super().__init__()
+        self.rates = {name: max(1, int(rate)) for name, rate in rates.items()}
+        self._counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _rate_for(self, name: str) -> int:
+        while name:
+            if name in self.rates:
+                return self.rates[name]
+            name = name.rpartition('.')[0]
+        return 1
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or not self.rates:
+            return True
+        rate = self._rate_for(record.name)
+        if rate == 1:
+            return True
+        with self._lock:
+            count = self._counts.get(record.name, 0)
+            self._counts[record.name] = count + 1
+        return count % rate == 0
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that renders the capped message and leaves the rest to the
+    listener thread.
+
+    msg % args and the traceback are rendered in the calling thread, while
+    the arguments are still as they were at the call; the timestamp and line
+    format are applied by the listener.
+
+    Args:
+        queue: Queue the listener reads
+        max_length: Cap on the rendered message (0 for none)
+    """
+
+    def __init__(self, queue, max_length: int = 0):
+        super().__init__(queue)
+        self.max_length = max_length
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        message = _cut(record.getMessage(), self.max_length)
+        exc_text = record.exc_text
+        if record.exc_info and not exc_text:
+            exc_text = logging.Formatter().formatException(record.exc_info)
+        record = copy.copy(record)
+        record.msg, record.args = message, None
+        record.exc_info, record.exc_text = None, exc_text
+        return record
+
+def parse_sampling(spec: str) -> Dict[str, int]:
+    """Parse 'logger=N,other=M' into a sampling rate mapping."""
+    rates = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        name, _, rate = item.partition('=')
+        rates[name.strip()] = int(rate or 1)
+    return rates
+
+def configure_logging(profile: str = 'development', level: Optional[str] = None,
+                      max_message_length: Optional[int] = None,
+                      sampling: Optional[Dict[str, int]] = None, stream=None) -> None:
+    """
+    Install the queue-based logging pipeline on the root logger.
+
+    Calling it again replaces the previous configuration.
+
+    Args:
+        profile: Name of a profile in PROFILES
+        level: Override for the root log level
+        max_message_length: Override for the message length cap
+        sampling: Override for the per-logger sampling rates
+        stream: Output stream (defaults to stderr)
+    """
+    global _listener, _settings
+
+    _settings = dict(profile=profile, level=level, max_message_length=max_message_length,
+                     sampling=sampling, stream=stream)
+    settings = PROFILES.get(profile, PROFILES['development'])
+    level = level or settings['level']
+    max_length = max_message_length if max_message_length is not None else settings['max_message_length']
+    rates = sampling if sampling is not None else settings['sampling']
+
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+
+        output = logging.StreamHandler(stream or sys.stderr)
+        output.setFormatter(TruncatingFormatter(DEFAULT_FORMAT, max_length))
+
+        records = queue.SimpleQueue()
+        handler = BoundedQueueHandler(records, max_length)
+        handler.addFilter(SamplingFilter(rates))
+
+        root = logging.getLogger()
+        for existing in list(root.handlers):
+            root.removeHandler(existing)
+        root.addHandler(handler)
+        root.setLevel(level)
+        for other in PROFILES.values():
+            for name in other['logger_levels']:
+                logging.getLogger(name).setLevel(logging.NOTSET)
+        for name, logger_level in settings['logger_levels'].items():
+            logging.getLogger(name).setLevel(logger_level)
+
+        _listener = logging.handlers.QueueListener(records, output, respect_handler_level=True)
+        _listener.start()
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+def _restart_after_fork() -> None:
+    """Start a listener in a forked child; the parent's thread does not exist here."""
+    global _listener, _lock
+    # The lock may have been held by another thread of the parent
+    _lock = threading.Lock()
+    if _listener is not None:
+        _listener = None
+        configure_logging(**_settings)
+
+os.register_at_fork(after_in_child=_restart_after_fork)
+atexit.register(shutdown_logging)
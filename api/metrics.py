@@ -0,0 +1,300 @@
+"""
+Lightweight in-process instrumentation exported in Prometheus text format.
+
+Provides:
+
+- Counter, Gauge and Histogram metrics with labels, kept in a module-level registry
+- span(name): a context manager timing a named pipeline stage
+  (read_csv, data_quality, extract_ontology, graph_build, persistence,
+  context_build, llm_call, ...)
+- per-endpoint request latency histograms via Flask request hooks
+- SQL statement counts and durations via SQLAlchemy engine events, labelled
+  with the stage that was active when the statement ran
+- a /metrics endpoint rendering everything in the Prometheus text format
+
+Metrics are per process; with several workers each one exposes its own
+values, as with the default prometheus_client setup.
+"""
+
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+import logging
+
+from flask import Flask, Response, g, request
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds, from sub-millisecond SQL to multi-second LLM calls
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_current_stage: ContextVar[str] = ContextVar('metrics_stage', default='none')
+
+class _Metric:
+    """Base class for labelled metrics."""
+    type_name = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        REGISTRY.register(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def _format_labels(self, key: Tuple[str, ...], extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = list(zip(self.labelnames, key))
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ''
+        body = ','.join(f'{name}="{_escape(value)}"' for name, value in pairs)
+        return '{' + body + '}'
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+class Counter(_Metric):
+    """Monotonically increasing counter."""
+    type_name = 'counter'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f'{self.name}{self._format_labels(key)} {_number(value)}' for key, value in items]
+
+class Gauge(_Metric):
+    """Value that can go up and down."""
+    type_name = 'gauge'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f'{self.name}{self._format_labels(key)} {_number(value)}' for key, value in items]
+
+class Histogram(_Metric):
+    """Cumulative histogram with fixed buckets."""
+    type_name = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [per-bucket counts (+Inf last), sum, count]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def count(self, **labels) -> int:
+        state = self._values.get(self._key(labels))
+        return state[2] if state else 0
+
+    def sum(self, **labels) -> float:
+        state = self._values.get(self._key(labels))
+        return state[1] if state else 0.0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, [list(state[0]), state[1], state[2]]) for key, state in self._values.items())
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else _number(bound)
+                lines.append(f'{self.name}_bucket{self._format_labels(key, ("le", le))} {cumulative}')
+            lines.append(f'{self.name}_sum{self._format_labels(key)} {_number(total)}')
+            lines.append(f'{self.name}_count{self._format_labels(key)} {count}')
+        return lines
+
+class Registry:
+    """Collection of metrics rendered together."""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> None:
+        with self._lock:
+            self._metrics.append(metric)
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics)
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type_name}')
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+REGISTRY = Registry()
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds',
+    'HTTP request latency by endpoint',
+    ('endpoint', 'method', 'status')
+)
+STAGE_LATENCY = Histogram(
+    'stage_duration_seconds',
+    'Duration of named pipeline stages',
+    ('stage',)
+)
+STAGE_ERRORS = Counter(
+    'stage_errors_total',
+    'Pipeline stages that raised an exception',
+    ('stage',)
+)
+SQL_STATEMENTS = Counter(
+    'db_statements_total',
+    'SQL statements executed, by operation and active stage',
+    ('operation', 'stage')
+)
+SQL_LATENCY = Histogram(
+    'db_statement_duration_seconds',
+    'SQL statement execution time, by operation and active stage',
+    ('operation', 'stage')
+)
+
+_SQL_OPERATION = re.compile(r'\s*(\w+)')
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """
+    Time a named stage and attribute SQL statements run inside it.
+
+    Args:
+        stage: Stage name used as the metric label
+    """
+    token = _current_stage.set(stage)
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.inc(stage=stage)
+        raise
+    finally:
+        STAGE_LATENCY.observe(time.perf_counter() - start, stage=stage)
+        _current_stage.reset(token)
+
+def _sql_operation(statement: str) -> str:
+    """Extract the leading SQL keyword (SELECT, INSERT, ...) of a statement."""
+    match = _SQL_OPERATION.match(statement)
+    return match.group(1).upper() if match else 'UNKNOWN'
+
+def instrument_engine(engine) -> None:
+    """Attach statement count and timing listeners to a SQLAlchemy engine."""
+    if getattr(engine, '_metrics_instrumented', False):
+        return
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('metrics_start', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get('metrics_start')
+        if not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()
+        operation = _sql_operation(statement)
+        stage = _current_stage.get()
+        SQL_STATEMENTS.inc(operation=operation, stage=stage)
+        SQL_LATENCY.observe(elapsed, operation=operation, stage=stage)
+
+    @event.listens_for(engine, 'handle_error')
+    def handle_error(context):
+        starts = context.connection.info.get('metrics_start') if context.connection is not None else None
+        if starts:
+            starts.pop()
+
+    engine._metrics_instrumented = True
+
+def init_metrics(app: Flask, db) -> None:
+    """
+    Register request timing hooks, SQL instrumentation and the /metrics route.
+
+    Args:
+        app: Flask application
+        db: Flask-SQLAlchemy extension bound to the app
+    """
+    @app.before_request
+    def start_request_timer():
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def record_request_latency(response):
+        start = g.pop('metrics_start', None)
+        if start is not None:
+            REQUEST_LATENCY.observe(
+                time.perf_counter() - start,
+                endpoint=request.endpoint or 'unmatched',
+                method=request.method,
+                status=response.status_code
+            )
+        return response
+
+    @app.route('/metrics')
+    def metrics():
+        """Expose collected metrics in the Prometheus text format."""
+        return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+    with app.app_context():
+        for engine in db.engines.values():
+            instrument_engine(engine)
+    replica = app.extensions.get('replica_engine')
+    if replica is not None:
+        instrument_engine(replica)
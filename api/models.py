@@ -7,15 +7,27 @@ of our knowledge graph system:
 - Node: Represents vertices in the knowledge graph (assets, facilities, etc.)
 - Edge: Represents relationships between nodes
 - User: Handles user authentication and management
+- GraphVersion: Tracks the version of each site's graph and of the whole
+  graph for cache validation
+- GraphChange: Node/edge delta of each graph version, for the change feed
+- WorkOrderAttribute: Typed work order attributes (dates, status, cost) for
+  time-window and aggregate queries
+- ChatSession / ChatTurn: Server-side chat conversations with a rolling summary
+- QueryTemplate: Cached question-shape to graph query plans for chat
 
 Each model includes comprehensive indexing for optimized query performance
-and proper cascade behaviors for maintaining referential integrity.
+and proper cascade behaviors for maintaining referential integrity. Nodes,
+edges and work order attributes are scoped by a site key; on PostgreSQL the
+node and edge tables are list-partitioned by site (see sites.py).
 """
 
 from database import db
 from datetime import datetime
+from sqlalchemy import DDL, event
 from sqlalchemy.dialects.postgresql import JSONB
 from flask_login import UserMixin
+from config import DEFAULT_SITE
+from sites import PARTITION_KEY, partition_name
 
 class Node(db.Model):
     """
@@ -26,7 +38,8 @@ class Node(db.Model):
     JSON properties for flexible attribute storage.
 
     Attributes:
-        id (int): Primary key
+        id (int): Primary key (unique across sites)
+        site (str): Site key; partition key on PostgreSQL
         label (str): Human-readable label for the node
         type (str): Entity type (e.g., 'Asset', 'Facility')
         properties (JSONB): Flexible JSON storage for additional attributes
@@ -34,16 +47,22 @@ class Node(db.Model):
         updated_at (datetime): Timestamp of last update
     """
     id = db.Column(db.Integer, primary_key=True)
+    site = db.Column(db.String(64), nullable=False, default=DEFAULT_SITE)
     label = db.Column(db.String(255), nullable=False)
     type = db.Column(db.String(50), nullable=False)
     properties = db.Column(JSONB)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
-    # Indexes for better query performance
+    # Indexes for better query performance; on PostgreSQL they are created
+    # per partition, so site is implied by partition pruning
     __table_args__ = (
         db.Index('idx_node_label_type', 'label', 'type'),  # Composite index for label+type queries
         db.Index('idx_node_type', 'type'),                 # Index for type-based filtering
+        db.Index('idx_node_site_type', 'site', 'type'),    # Site-scoped type filters on SQLite
+        # Target of the edge foreign keys; the primary key covers it on PostgreSQL
+        db.Index('uq_node_id_site', 'id', 'site', unique=True).ddl_if(dialect='sqlite'),
+        {'postgresql_partition_by': 'LIST (site)', 'info': {PARTITION_KEY: 'site'}},
     )
 
     def to_dict(self):
@@ -55,6 +74,7 @@ class Node(db.Model):
         """
         return {
             'id': self.id,
+            'site': self.site,
             'label': self.label,
             'type': self.type,
             'properties': self.properties or {},
@@ -75,7 +95,8 @@ class Edge(db.Model):
     referential integrity when nodes are deleted.
 
     Attributes:
-        id (int): Primary key
+        id (int): Primary key (unique across sites)
+        site (str): Site key, the same as both endpoints'; partition key on PostgreSQL
         source_id (int): Foreign key to source node
         target_id (int): Foreign key to target node
         type (str): Relationship type
@@ -84,21 +105,30 @@ class Edge(db.Model):
         updated_at (datetime): Timestamp of last update
     """
     id = db.Column(db.Integer, primary_key=True)
-    source_id = db.Column(db.Integer, db.ForeignKey('node.id', ondelete='CASCADE'), nullable=False)
-    target_id = db.Column(db.Integer, db.ForeignKey('node.id', ondelete='CASCADE'), nullable=False)
+    site = db.Column(db.String(64), nullable=False, default=DEFAULT_SITE)
+    source_id = db.Column(db.Integer, nullable=False)
+    target_id = db.Column(db.Integer, nullable=False)
     type = db.Column(db.String(50), nullable=False)
     properties = db.Column(JSONB)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # Relationships with automatic backref population
-    source = db.relationship('Node', foreign_keys=[source_id], backref=db.backref('outgoing_edges', lazy='dynamic'))
-    target = db.relationship('Node', foreign_keys=[target_id], backref=db.backref('incoming_edges', lazy='dynamic'))
+    # Joined on id alone (ids are unique across sites); site is set explicitly
+    source = db.relationship('Node', primaryjoin='Edge.source_id == Node.id', foreign_keys=[source_id],
+                             backref=db.backref('outgoing_edges', lazy='dynamic'))
+    target = db.relationship('Node', primaryjoin='Edge.target_id == Node.id', foreign_keys=[target_id],
+                             backref=db.backref('incoming_edges', lazy='dynamic'))
 
     # Indexes for better query performance
     __table_args__ = (
+        db.ForeignKeyConstraint(['source_id', 'site'], ['node.id', 'node.site'], ondelete='CASCADE'),
+        db.ForeignKeyConstraint(['target_id', 'site'], ['node.id', 'node.site'], ondelete='CASCADE'),
         db.Index('idx_edge_source_target', 'source_id', 'target_id'),  # Composite index for edge traversal
+        db.Index('idx_edge_target', 'target_id'),                     # Incoming edges of a node
         db.Index('idx_edge_type', 'type'),                            # Index for type-based filtering
+        db.Index('idx_edge_site_type', 'site', 'type'),               # Site-scoped type filters on SQLite
+        {'postgresql_partition_by': 'LIST (site)', 'info': {PARTITION_KEY: 'site'}},
     )
 
     def to_dict(self):
@@ -110,6 +140,7 @@ class Edge(db.Model):
         """
         return {
             'id': self.id,
+            'site': self.site,
             'source_id': self.source_id,
             'target_id': self.target_id,
             'type': self.type,
@@ -146,4 +177,209 @@ class User(UserMixin, db.Model):
 
     def __repr__(self):
         """String representation of the User."""
-        return f'<User {self.username}>'
\ No newline at end of file
+        return f'<User {self.username}>'
+
+class GraphVersion(db.Model):
+    """
+    Monotonic version counters for the stored knowledge graph.
+
+    Each site has a row, bumped in the same transaction as every write to
+    the site's nodes and edges; the ALL_SITES row is bumped by every write.
+    Readers use the version of the graph they serve as a cheap cache
+    validator (e.g. for ETags) without scanning the graph itself, so a write
+    to one site leaves the ETags and caches of other sites valid.
+
+    Attributes:
+        site (str): Site key, or ALL_SITES ('*') for the whole graph
+        version (int): Current version, starting at 0 for an empty store
+        updated_at (datetime): Timestamp of the last bump
+    """
+    site = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        """String representation of the GraphVersion."""
+        return f'<GraphVersion {self.site} {self.version}>'
+
+class GraphChange(db.Model):
+    """
+    The node and edge delta that produced one graph version (see graph_changes.py).
+
+    Written in the same transaction as the version bump and kept for the
+    last GRAPH_CHANGES_RETENTION versions of each site, so live clients can
+    resume the change feed from the version they last applied.
+
+    Attributes:
+        version (int): Whole-graph version the change produced, primary key
+        site (str): Site whose graph changed
+        site_version (int): Version of the site's graph the change produced
+        kind (str): Write that caused it ('upload', 'validate', 'patch')
+        delta (JSONB): Added/removed id ranges and updated records, or
+            {'reset': True, ...} when the change was too large to list
+        created_at (datetime): Timestamp of the write
+    """
+    version = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    site = db.Column(db.String(64), nullable=False)
+    site_version = db.Column(db.Integer, nullable=False)
+    kind = db.Column(db.String(32), nullable=False)
+    delta = db.Column(JSONB, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('site', 'site_version', name='uq_graph_change_site_version'),  # Site feeds
+    )
+
+    def __repr__(self):
+        """String representation of the GraphChange."""
+        return f'<GraphChange {self.version} {self.kind}>'
+
+class WorkOrderAttribute(db.Model):
+    """
+    Typed attributes of a work order, captured from the uploaded CSV.
+
+    Kept beside the graph rather than in Node.properties so time-window and
+    aggregate queries use real date and numeric columns and indexes instead
+    of JSONB scans. Rows are keyed by site and the work order's node label
+    (e.g. 'WO_1001'), and a site's rows are replaced on every upload to it.
+
+    Attributes:
+        id (int): Primary key
+        site (str): Site key
+        work_order (str): Label of the WorkOrder node
+        asset (str): Asset ID the work order maintains
+        facility (str): Facility name
+        department (str): Department
+        assigned_to (str): Assigned personnel
+        status (str): Work order status
+        priority (str): Priority
+        work_type (str): Work type (e.g. 'Corrective', 'Preventive')
+        created_date (datetime): When the work order was opened
+        completed_date (datetime): When it was completed, if it was
+        labor_hours (float): Labor hours booked
+        cost (float): Total cost
+        source_digest (str): SHA-256 of the upload the row came from
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    site = db.Column(db.String(64), nullable=False, default=DEFAULT_SITE)
+    work_order = db.Column(db.String(255), nullable=False)
+    asset = db.Column(db.String(255))
+    facility = db.Column(db.String(255))
+    department = db.Column(db.String(255))
+    assigned_to = db.Column(db.String(255))
+    status = db.Column(db.String(50))
+    priority = db.Column(db.String(50))
+    work_type = db.Column(db.String(100))
+    created_date = db.Column(db.DateTime)
+    completed_date = db.Column(db.DateTime)
+    labor_hours = db.Column(db.Float)
+    cost = db.Column(db.Float)
+    source_digest = db.Column(db.String(64))
+
+    __table_args__ = (
+        db.UniqueConstraint('site', 'work_order', name='uq_woa_site_work_order'),
+        db.Index('idx_woa_asset_created', 'site', 'asset', 'created_date'),        # Per-asset time windows and intervals
+        db.Index('idx_woa_facility_created', 'site', 'facility', 'created_date'),  # Per-facility time windows
+        db.Index('idx_woa_status', 'site', 'status'),                              # Status filters
+        # Work orders arrive roughly in date order, so a BRIN index covers
+        # plain time-range scans at a fraction of a B-tree's size (a regular
+        # index on other databases)
+        db.Index('idx_woa_created_brin', 'created_date', postgresql_using='brin'),
+    )
+
+    def __repr__(self):
+        """String representation of the WorkOrderAttribute."""
+        return f'<WorkOrderAttribute {self.work_order}>'
+
+class ChatSession(db.Model):
+    """
+    A multi-turn chat conversation (see chat_sessions.py).
+
+    Recent turns are kept verbatim in ChatTurn; older ones are folded into
+    the running summary so the prompt stays bounded.
+
+    Attributes:
+        id (str): Random hex session id
+        site (str): Site the conversation is scoped to, or None for all sites
+        summary (str): Running summary of the turns folded out of the history
+        focus (list): Labels of the entities the conversation is about
+        created_at (datetime): Timestamp of session creation
+        updated_at (datetime): Timestamp of the last turn
+    """
+    id = db.Column(db.String(32), primary_key=True)
+    site = db.Column(db.String(64))
+    summary = db.Column(db.Text, nullable=False, default='')
+    focus = db.Column(JSONB)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
+    turns = db.relationship('ChatTurn', backref='session', lazy='dynamic', cascade='all, delete-orphan',
+                            order_by='ChatTurn.id')
+
+    def __repr__(self):
+        """String representation of the ChatSession."""
+        return f'<ChatSession {self.id}>'
+
+class ChatTurn(db.Model):
+    """
+    One message of a chat session.
+
+    Attributes:
+        id (int): Primary key, increasing with the conversation order
+        session_id (str): Foreign key to the chat session
+        role (str): 'user' or 'assistant'
+        content (str): Message text
+        summarized (bool): Whether the turn was folded into the session summary
+        created_at (datetime): Timestamp of the message
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    session_id = db.Column(db.String(32), db.ForeignKey('chat_session.id', ondelete='CASCADE'), nullable=False)
+    role = db.Column(db.String(16), nullable=False)
+    content = db.Column(db.Text, nullable=False)
+    summarized = db.Column(db.Boolean, nullable=False, default=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('idx_chat_turn_session', 'session_id', 'summarized', 'id'),  # Unsummarized history of a session
+    )
+
+    def __repr__(self):
+        """String representation of the ChatTurn."""
+        return f'<ChatTurn {self.session_id}:{self.role}>'
+
+class QueryTemplate(db.Model):
+    """
+    A graph query plan for one question shape (see query_planner.py).
+
+    Questions that differ only in the entities they name share a signature
+    such as 'work orders for asset {Asset}'; the plan is requested from the
+    LLM once and then run locally with the entities filled in.
+
+    Attributes:
+        digest (str): SHA-256 of the site and the signature, primary key
+        site (str): Site whose schema the plan was made for; None for all sites
+        signature (str): Normalized question with typed entity slots
+        plan (JSONB): Validated traversal plan, or {'answerable': False, ...}
+        hits (int): Number of questions answered (or declined) with the plan
+        created_at (datetime): Timestamp of planning
+        last_used_at (datetime): Timestamp of the last question of this shape
+    """
+    digest = db.Column(db.String(64), primary_key=True)
+    site = db.Column(db.String(64))
+    signature = db.Column(db.Text, nullable=False)
+    plan = db.Column(JSONB, nullable=False)
+    hits = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_used_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        """String representation of the QueryTemplate."""
+        return f'<QueryTemplate {self.signature}>'
+
+# Partitions of the default site are created with the tables; other sites'
+# partitions are added on first write (sites.ensure_site_partitions)
+for _table in (Node.__table__, Edge.__table__):
+    event.listen(_table, 'after_create', DDL(
+        f'CREATE TABLE IF NOT EXISTS "{partition_name(_table.name, DEFAULT_SITE)}" '
+        f"PARTITION OF \"{_table.name}\" FOR VALUES IN ('{DEFAULT_SITE}')"
+    ).execute_if(dialect='postgresql'))
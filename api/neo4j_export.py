@@ -0,0 +1,405 @@
+"""
+Bulk export of the stored graph for Neo4j.
+
+Two formats, both written offline without a Neo4j server:
+
+- ``csv``: files for ``neo4j-admin database import full``. One data file per
+  node type and per relationship type, each with a separate header file,
+  plus an ``import.sh`` holding the matching command line::
+
+      nodes_Asset.header.csv         id:ID(Node),label,properties
+      nodes_Asset.csv                12,A001,"{""id"": ""A001""}"
+      relationships_LOCATED_IN.header.csv   :START_ID(Node),:END_ID(Node),id:long
+      relationships_LOCATED_IN.csv          12,3,7
+
+- ``cypher``: an ``import.cypher`` script of batched ``UNWIND`` statements
+  (NEO4J_EXPORT_BATCH_SIZE rows each) for cypher-shell, creating a uniqueness
+  constraint on ``:Node(id)`` first so relationship batches can MATCH their
+  endpoints by index.
+
+Every node gets the ``Node`` label in addition to its type; ``id`` is the
+database id and ``properties`` the JSON-encoded properties column. Both
+tables are read in keyset-paginated batches and rows are written as they
+arrive, so memory stays flat however large the graph is (the Cypher writer
+buffers at most one batch per node type). A ``manifest.json`` records the
+graph version, row counts and SHA-256 of every file; verify_export checks
+an export directory against it.
+
+As in arrow_export, the version and both tables are read in one snapshot
+session, and the export is written again if the version changed by the
+time it is complete, so nodes and relationships describe the same version.
+"""
+
+import csv
+import hashlib
+import json
+import os
+import re
+import shlex
+import zipfile
+from typing import Any, Dict, IO, Iterator, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from database import get_graph_version, read_session, snapshot_session
+from graph_export import StreamBuffer, iter_node_batches
+from models import Edge
+
+ID_SPACE = 'Node'
+NODE_HEADER = [f'id:ID({ID_SPACE})', 'label', 'properties']
+RELATIONSHIP_HEADER = [f':START_ID({ID_SPACE})', f':END_ID({ID_SPACE})', 'id:long']
+MANIFEST = 'manifest.json'
+FORMATS = ('csv', 'cypher')
+
+def iter_edge_batches(batch_size: int = 1000, session: Optional[Session] = None) -> Iterator[List]:
+    """
+    Yield batches of edge rows in id order using keyset pagination.
+
+    Args:
+        batch_size: Number of rows fetched per query
+        session: Session to read from (default read_session())
+
+    Yields:
+        Lists of rows with id, source_id, target_id and type columns
+    """
+    session = session or read_session()
+    cursor = 0
+    while True:
+        rows = session.execute(
+            select(Edge.id, Edge.source_id, Edge.target_id, Edge.type)
+            .where(Edge.id > cursor)
+            .order_by(Edge.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return
+        yield rows
+        cursor = rows[-1].id
+        if len(rows) < batch_size:
+            return
+
+def cypher_name(name: str) -> str:
+    """Quote a label or relationship type as a Cypher identifier."""
+    return '`' + name.replace('`', '``') + '`'
+
+def cypher_rows(rows: List[Dict]) -> str:
+    """
+    Encode rows as a Cypher list of maps.
+
+    Values are strings, numbers or null; JSON string escapes are valid in
+    Cypher string literals.
+    """
+    return '[' + ', '.join(
+        '{' + ', '.join(f'{key}: {value if type(value) is int else json.dumps(value)}'
+                        for key, value in row.items()) + '}'
+        for row in rows
+    ) + ']'
+
+def _properties(properties: Optional[Dict]) -> str:
+    return json.dumps(properties or {}, sort_keys=True)
+
+def _file_stem(name: str, taken: Dict[str, str]) -> str:
+    """A filesystem-safe, unique file stem for a node or relationship type."""
+    stem = re.sub(r'[^A-Za-z0-9_-]+', '_', name) or '_'
+    candidate, suffix = stem, 1
+    while candidate in taken.values():
+        suffix += 1
+        candidate = f'{stem}_{suffix}'
+    taken[name] = candidate
+    return candidate
+
+class _CsvFiles:
+    """Lazily opened per-type CSV data files, each with its header file."""
+
+    def __init__(self, directory: str, prefix: str, header: List[str]):
+        self.directory = directory
+        self.prefix = prefix
+        self.header = header
+        self.stems: Dict[str, str] = {}
+        self.rows: Dict[str, int] = {}
+        self._open: Dict[str, Tuple[IO, Any]] = {}
+
+    def writer(self, name: str):
+        if name not in self._open:
+            stem = f'{self.prefix}_{_file_stem(name, self.stems)}'
+            with open(os.path.join(self.directory, f'{stem}.header.csv'), 'w', newline='', encoding='utf-8') as f:
+                csv.writer(f).writerow(self.header)
+            handle = open(os.path.join(self.directory, f'{stem}.csv'), 'w', newline='', encoding='utf-8')
+            self._open[name] = (handle, csv.writer(handle))
+            self.rows[name] = 0
+        return self._open[name][1]
+
+    def write_batch(self, rows: List[Tuple[str, List]]) -> None:
+        """Write (type, row) pairs, grouped so each file gets one writerows call."""
+        grouped: Dict[str, List[List]] = {}
+        for name, row in rows:
+            grouped.setdefault(name, []).append(row)
+        for name, group in grouped.items():
+            self.writer(name).writerows(group)
+            self.rows[name] += len(group)
+
+    def close(self) -> None:
+        for handle, _ in self._open.values():
+            handle.close()
+
+    def files(self) -> Dict[str, Tuple[str, str, int]]:
+        """Type -> (header file, data file, rows)."""
+        return {
+            name: (f'{self.prefix}_{stem}.header.csv', f'{self.prefix}_{stem}.csv', self.rows[name])
+            for name, stem in self.stems.items()
+        }
+
+def import_command(nodes: Dict[str, Tuple[str, str, int]], relationships: Dict[str, Tuple[str, str, int]],
+                   database: str = 'neo4j') -> List[str]:
+    """Build the neo4j-admin command line for an admin-import export."""
+    command = ['neo4j-admin', 'database', 'import', 'full', database, '--id-type=integer']
+    for name, (header, data, _) in nodes.items():
+        command.append(f'--nodes={ID_SPACE}:{name}={header},{data}')
+    for name, (header, data, _) in relationships.items():
+        command.append(f'--relationships={name}={header},{data}')
+    return command
+
+def _remove_files(directory: str, entries: Dict[str, Tuple[str, str, int]]) -> None:
+    for header, data, _ in entries.values():
+        for name in (header, data):
+            os.remove(os.path.join(directory, name))
+
+def export_admin_csv(directory: str, batch_size: int = 1000, attempts: int = 3) -> Dict:
+    """
+    Write neo4j-admin import CSV files for the stored graph.
+
+    Args:
+        directory: Output directory, created if missing
+        batch_size: Rows fetched per database round trip
+        attempts: Exports to try before giving up on a graph being written
+
+    Returns:
+        The manifest written to manifest.json
+
+    Raises:
+        RuntimeError: If the graph changed during every attempt
+    """
+    os.makedirs(directory, exist_ok=True)
+    for _ in range(attempts):
+        with snapshot_session() as session:
+            version = get_graph_version(session)
+
+            nodes = _CsvFiles(directory, 'nodes', NODE_HEADER)
+            try:
+                for rows in iter_node_batches([], batch_size=batch_size, session=session):
+                    nodes.write_batch([(node_type, [node_id, label, _properties(properties)])
+                                       for node_id, label, node_type, properties in rows])
+            finally:
+                nodes.close()
+
+            relationships = _CsvFiles(directory, 'relationships', RELATIONSHIP_HEADER)
+            try:
+                for rows in iter_edge_batches(batch_size, session):
+                    relationships.write_batch([(edge_type, [source_id, target_id, edge_id])
+                                               for edge_id, source_id, target_id, edge_type in rows])
+            finally:
+                relationships.close()
+
+            node_files, relationship_files = nodes.files(), relationships.files()
+            # get() would answer from the identity map
+            session.expire_all()
+            if get_graph_version(session) == version:
+                break
+        # Types may have disappeared since; the next attempt must not leave their files behind
+        _remove_files(directory, node_files)
+        _remove_files(directory, relationship_files)
+    else:
+        raise RuntimeError(f'The graph changed during each of {attempts} export attempts')
+
+    command = import_command(node_files, relationship_files)
+    with open(os.path.join(directory, 'import.sh'), 'w', encoding='utf-8') as f:
+        f.write('#!/bin/sh\n# Run from this directory with Neo4j stopped; extra arguments are passed on\n')
+        f.write(' \\\n  '.join(shlex.quote(part) for part in command) + ' "$@"\n')
+
+    files = {}
+    for kind, entries in (('nodes', node_files), ('relationships', relationship_files)):
+        for name, (header, data, count) in entries.items():
+            files[header] = {'kind': 'header', 'rows': 1}
+            files[data] = {'kind': kind, 'type': name, 'rows': count}
+    files['import.sh'] = {'kind': 'script'}
+    return _write_manifest(directory, 'csv', version, files)
+
+def iter_cypher(batch_size: int = 1000, read_batch_size: int = 1000,
+                session: Optional[Session] = None) -> Iterator[str]:
+    """
+    Stream the stored graph as a cypher-shell script of batched UNWIND statements.
+
+    Args:
+        batch_size: Rows per UNWIND statement
+        read_batch_size: Rows fetched per database round trip
+        session: Session to read from (default read_session()); pass a
+            snapshot_session() so nodes and relationships match
+
+    Yields:
+        Complete statements terminated by ';' and a newline
+    """
+    yield (f'CREATE CONSTRAINT node_id IF NOT EXISTS FOR (n:{ID_SPACE}) REQUIRE n.id IS UNIQUE;\n')
+
+    def create_nodes(node_type: str, rows: List[Dict]) -> str:
+        return (f'UNWIND {cypher_rows(rows)} AS row\n'
+                f'CREATE (n:{ID_SPACE}:{cypher_name(node_type)} '
+                '{id: row.id, label: row.label, properties: row.properties});\n')
+
+    # One pending batch per node type, flushed when full
+    pending: Dict[str, List[Dict]] = {}
+    for rows in iter_node_batches([], batch_size=read_batch_size, session=session):
+        for row in rows:
+            batch = pending.setdefault(row.type, [])
+            batch.append({'id': row.id, 'label': row.label, 'properties': _properties(row.properties)})
+            if len(batch) >= batch_size:
+                yield create_nodes(row.type, batch)
+                pending[row.type] = []
+    for node_type, batch in pending.items():
+        if batch:
+            yield create_nodes(node_type, batch)
+    pending.clear()
+
+    def create_relationships(edge_type: str, rows: List[Dict]) -> str:
+        return (f'UNWIND {cypher_rows(rows)} AS row\n'
+                f'MATCH (s:{ID_SPACE} {{id: row.source}}) MATCH (t:{ID_SPACE} {{id: row.target}})\n'
+                f'CREATE (s)-[:{cypher_name(edge_type)} {{id: row.id}}]->(t);\n')
+
+    pending = {}
+    for rows in iter_edge_batches(read_batch_size, session):
+        for row in rows:
+            batch = pending.setdefault(row.type, [])
+            batch.append({'source': row.source_id, 'target': row.target_id, 'id': row.id})
+            if len(batch) >= batch_size:
+                yield create_relationships(row.type, batch)
+                pending[row.type] = []
+    for edge_type, batch in pending.items():
+        if batch:
+            yield create_relationships(edge_type, batch)
+
+def export_cypher(directory: str, batch_size: int = 1000, read_batch_size: int = 1000,
+                  attempts: int = 3) -> Dict:
+    """
+    Write import.cypher for the stored graph.
+
+    Args:
+        directory: Output directory, created if missing
+        batch_size: Rows per UNWIND statement
+        read_batch_size: Rows fetched per database round trip
+        attempts: Exports to try before giving up on a graph being written
+
+    Returns:
+        The manifest written to manifest.json
+
+    Raises:
+        RuntimeError: If the graph changed during every attempt
+    """
+    os.makedirs(directory, exist_ok=True)
+    for _ in range(attempts):
+        with snapshot_session() as session:
+            version = get_graph_version(session)
+            statements = 0
+            with open(os.path.join(directory, 'import.cypher'), 'w', encoding='utf-8') as f:
+                for statement in iter_cypher(batch_size, read_batch_size, session):
+                    f.write(statement)
+                    statements += 1
+            # get() would answer from the identity map
+            session.expire_all()
+            if get_graph_version(session) == version:
+                break
+    else:
+        raise RuntimeError(f'The graph changed during each of {attempts} export attempts')
+    files = {'import.cypher': {'kind': 'cypher', 'statements': statements, 'batch_size': batch_size}}
+    return _write_manifest(directory, 'cypher', version, files)
+
+def _sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _write_manifest(directory: str, export_format: str, version: int, files: Dict) -> Dict:
+    for name, entry in files.items():
+        entry['sha256'] = _sha256(os.path.join(directory, name))
+    manifest = {'format': export_format, 'graph_version': version, 'files': files}
+    with open(os.path.join(directory, MANIFEST), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+def verify_export(directory: str) -> List[str]:
+    """
+    Check an export directory against its manifest without a Neo4j server.
+
+    Verifies checksums, CSV headers, per-row column counts and row counts,
+    and the number of Cypher statements.
+
+    Args:
+        directory: Directory written by export_admin_csv or export_cypher
+
+    Returns:
+        A list of problems; empty if the export is intact
+    """
+    try:
+        with open(os.path.join(directory, MANIFEST), encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        return [f'Cannot read {MANIFEST}: {e}']
+
+    problems = []
+    for name, entry in manifest.get('files', {}).items():
+        path = os.path.join(directory, name)
+        if not os.path.isfile(path):
+            problems.append(f'{name}: missing')
+            continue
+        if _sha256(path) != entry.get('sha256'):
+            problems.append(f'{name}: checksum mismatch')
+
+        kind = entry.get('kind')
+        if kind in ('nodes', 'relationships'):
+            width = len(NODE_HEADER if kind == 'nodes' else RELATIONSHIP_HEADER)
+            rows = 0
+            with open(path, newline='', encoding='utf-8') as f:
+                for line, row in enumerate(csv.reader(f), 1):
+                    if len(row) != width:
+                        problems.append(f'{name}:{line}: expected {width} columns, found {len(row)}')
+                        break
+                    rows += 1
+            if rows != entry.get('rows'):
+                problems.append(f"{name}: expected {entry.get('rows')} rows, found {rows}")
+        elif kind == 'header':
+            with open(path, newline='', encoding='utf-8') as f:
+                header = next(csv.reader(f), None)
+            if header not in (NODE_HEADER, RELATIONSHIP_HEADER):
+                problems.append(f'{name}: unexpected header {header}')
+        elif kind == 'cypher':
+            statements = 0
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    if line.rstrip('\n').endswith(';'):
+                        statements += 1
+            if statements != entry.get('statements'):
+                problems.append(f"{name}: expected {entry.get('statements')} statements, found {statements}")
+    return problems
+
+def iter_zip(directory: str, chunk_size: int = 1024 * 1024) -> Iterator[bytes]:
+    """
+    Stream the files of a directory as a deflated zip archive.
+
+    Files are copied chunk by chunk, so at most one compressed chunk is held
+    in memory at a time.
+    """
+    buffer = StreamBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name in sorted(os.listdir(directory)):
+            with open(os.path.join(directory, name), 'rb') as source, \
+                    archive.open(name, 'w', force_zip64=True) as target:
+                for chunk in iter(lambda: source.read(chunk_size), b''):
+                    target.write(chunk)
+                    data = buffer.drain()
+                    if data:
+                        yield data
+            data = buffer.drain()
+            if data:
+                yield data
+    yield buffer.drain()
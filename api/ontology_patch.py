@@ -0,0 +1,254 @@
+"""
+Incremental edits to a stored graph without regenerating it.
+
+A patch is a list of operations applied in order, in one transaction:
+
+- ``add_entity``: ``label``, ``type``
+- ``remove_entity``: ``label``, optional ``type``; also removes its edges
+- ``rename_entity``: ``label``, optional ``type``, ``new_label`` and/or ``new_type``
+- ``add_relationship``: ``source``, ``target``, ``type``, optional
+  ``source_type`` / ``target_type``
+- ``remove_relationship``: the same keys as add_relationship
+- ``rename_relationship``: the same keys plus ``new_type``
+
+Entities are identified by (label, type) within a site, as in
+graph_generator; the type may be omitted when the label is unambiguous.
+All nodes a patch refers to are loaded with one indexed label lookup and
+edges are touched through the source/target indexes, so the cost depends on
+the number of operations and touched edges, not on the size of the graph.
+Any invalid operation raises PatchError and nothing is applied. The ids the
+patch added, removed and updated are recorded for the change feed
+(graph_changes.py).
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+from database import bump_graph_version, db
+from graph_changes import id_ranges, record_change
+from models import Node, Edge
+
+OPERATIONS = {
+    'add_entity': ('label', 'type'),
+    'remove_entity': ('label',),
+    'rename_entity': ('label',),
+    'add_relationship': ('source', 'target', 'type'),
+    'remove_relationship': ('source', 'target', 'type'),
+    'rename_relationship': ('source', 'target', 'type', 'new_type'),
+}
+OPTIONAL_FIELDS = ('type', 'new_label', 'new_type', 'source_type', 'target_type')
+MAX_LABEL_LENGTH = 255
+MAX_TYPE_LENGTH = 50
+
+class PatchError(ValueError):
+    """Raised for patch operations that are malformed or do not apply to the stored graph."""
+
+    def __init__(self, index: int, message: str):
+        super().__init__(f"Operation {index}: {message}")
+        self.index = index
+
+def validate_operations(operations, max_operations: Optional[int] = None) -> List[Dict]:
+    """
+    Check the structure of a patch before touching the database.
+
+    Args:
+        operations: Parsed JSON list of operations
+        max_operations: Optional upper bound on the number of operations
+
+    Returns:
+        The operations
+
+    Raises:
+        PatchError: If an operation has an unknown op or a missing or invalid field
+    """
+    if not isinstance(operations, list) or not operations:
+        raise PatchError(0, 'operations must be a non-empty list')
+    if max_operations is not None and len(operations) > max_operations:
+        raise PatchError(max_operations, f'a patch is limited to {max_operations} operations')
+    for index, operation in enumerate(operations):
+        if not isinstance(operation, dict) or operation.get('op') not in OPERATIONS:
+            raise PatchError(index, f"op must be one of {list(OPERATIONS)}")
+        for field in OPERATIONS[operation['op']]:
+            if not operation.get(field):
+                raise PatchError(index, f"'{field}' is required for {operation['op']}")
+        for field in set(OPERATIONS[operation['op']]) | set(OPTIONAL_FIELDS):
+            value = operation.get(field)
+            if value is None:
+                continue
+            limit = MAX_TYPE_LENGTH if field.endswith('type') else MAX_LABEL_LENGTH
+            if not isinstance(value, str) or not value or len(value) > limit:
+                raise PatchError(index, f"'{field}' must be a string of 1-{limit} characters")
+        if operation['op'] == 'rename_entity' and not (operation.get('new_label') or operation.get('new_type')):
+            raise PatchError(index, "rename_entity needs 'new_label' or 'new_type'")
+    return operations
+
+def _referenced_labels(operations: List[Dict]) -> set:
+    labels = set()
+    for operation in operations:
+        for field in ('label', 'new_label', 'source', 'target'):
+            if operation.get(field):
+                labels.add(operation[field])
+    return labels
+
+class _Patch:
+    """Node lookup by (label, type) for one site, kept current as operations apply."""
+
+    def __init__(self, site: str, labels: set):
+        self.site = site
+        self.nodes: Dict[Tuple[str, str], Node] = {}
+        self.changes = dict.fromkeys(
+            ('nodes_added', 'nodes_removed', 'nodes_updated', 'edges_added', 'edges_removed', 'edges_updated'), 0)
+        # Touched rows for the change feed; added ones get their ids on flush
+        self.added_nodes: List[Node] = []
+        self.added_edges: List[Edge] = []
+        self.updated_nodes: List[Node] = []
+        self.updated_edges: List[Edge] = []
+        self.removed_node_ids: set = set()
+        self.removed_edge_ids: set = set()
+        if labels:
+            for node in Node.query.filter(Node.site == site, Node.label.in_(labels)):
+                self.nodes[(node.label, node.type)] = node
+
+    def resolve(self, index: int, label: str, entity_type: Optional[str]) -> Node:
+        """Find a node by label, and by type when given or when the label is ambiguous."""
+        if entity_type:
+            node = self.nodes.get((label, entity_type))
+            if node is None:
+                raise PatchError(index, f"entity {label!r} of type {entity_type!r} not found")
+        else:
+            candidates = [node for (node_label, _), node in self.nodes.items() if node_label == label]
+            if not candidates:
+                raise PatchError(index, f"entity {label!r} not found")
+            if len(candidates) > 1:
+                types = sorted(node.type for node in candidates)
+                raise PatchError(index, f"entity {label!r} is ambiguous; give its type (one of {types})")
+            node = candidates[0]
+        if node.id is None:
+            db.session.flush()
+        return node
+
+    def edges(self, index: int, operation: Dict):
+        """Query of the edges matching a relationship operation."""
+        source = self.resolve(index, operation['source'], operation.get('source_type'))
+        target = self.resolve(index, operation['target'], operation.get('target_type'))
+        return source, target, Edge.query.filter(
+            Edge.site == self.site,
+            Edge.source_id == source.id,
+            Edge.target_id == target.id,
+            Edge.type == operation['type']
+        )
+
+    def add_entity(self, index: int, operation: Dict) -> None:
+        key = (operation['label'], operation['type'])
+        if key in self.nodes:
+            raise PatchError(index, f"entity {key[0]!r} of type {key[1]!r} already exists")
+        node = Node(site=self.site, label=key[0], type=key[1], properties={})
+        db.session.add(node)
+        self.nodes[key] = node
+        self.added_nodes.append(node)
+        self.changes['nodes_added'] += 1
+
+    def remove_entity(self, index: int, operation: Dict) -> None:
+        node = self.resolve(index, operation['label'], operation.get('type'))
+        # Explicit rather than ON DELETE CASCADE, which SQLite does not enforce
+        # by default; one statement per direction so each uses its own index
+        for column in (Edge.source_id, Edge.target_id):
+            edges = Edge.query.filter(Edge.site == self.site, column == node.id)
+            self.removed_edge_ids.update((id_ for id_, in edges.with_entities(Edge.id)))
+            self.changes['edges_removed'] += edges.delete(synchronize_session='fetch')
+        Node.query.filter(Node.site == self.site, Node.id == node.id).delete(synchronize_session='fetch')
+        del self.nodes[(node.label, node.type)]
+        self.removed_node_ids.add(node.id)
+        self.changes['nodes_removed'] += 1
+
+    def rename_entity(self, index: int, operation: Dict) -> None:
+        node = self.resolve(index, operation['label'], operation.get('type'))
+        key = (operation.get('new_label') or node.label, operation.get('new_type') or node.type)
+        if key == (node.label, node.type):
+            return
+        if key in self.nodes:
+            raise PatchError(index, f"entity {key[0]!r} of type {key[1]!r} already exists")
+        # Edges reference the node id, so they follow the rename unchanged
+        del self.nodes[(node.label, node.type)]
+        node.label, node.type = key
+        self.nodes[key] = node
+        self.updated_nodes.append(node)
+        self.changes['nodes_updated'] += 1
+
+    def add_relationship(self, index: int, operation: Dict) -> None:
+        source, target, existing = self.edges(index, operation)
+        if existing.first() is not None:
+            raise PatchError(index, f"relationship {operation['source']!r} -{operation['type']}-> "
+                                    f"{operation['target']!r} already exists")
+        edge = Edge(site=self.site, source=source, target=target, type=operation['type'])
+        db.session.add(edge)
+        self.added_edges.append(edge)
+        self.changes['edges_added'] += 1
+
+    def remove_relationship(self, index: int, operation: Dict) -> None:
+        _, _, matching = self.edges(index, operation)
+        self.removed_edge_ids.update((id_ for id_, in matching.with_entities(Edge.id)))
+        removed = matching.delete(synchronize_session='fetch')
+        if not removed:
+            raise PatchError(index, f"relationship {operation['source']!r} -{operation['type']}-> "
+                                    f"{operation['target']!r} not found")
+        self.changes['edges_removed'] += removed
+
+    def rename_relationship(self, index: int, operation: Dict) -> None:
+        _, _, matching = self.edges(index, operation)
+        edges = matching.all()
+        if not edges:
+            raise PatchError(index, f"relationship {operation['source']!r} -{operation['type']}-> "
+                                    f"{operation['target']!r} not found")
+        for edge in edges:
+            edge.type = operation['new_type']
+        self.updated_edges.extend(edges)
+        self.changes['edges_updated'] += len(edges)
+
+    def record(self, version: int) -> None:
+        """Record the patch's delta for the change feed (call after flushing)."""
+        # Rows added and removed again by the same patch were never visible
+        new_nodes = {node.id for node in self.added_nodes}
+        new_edges = {edge.id for edge in self.added_edges}
+        unchanged_nodes = new_nodes | self.removed_node_ids
+        unchanged_edges = new_edges | self.removed_edge_ids
+        record_change(
+            version, self.site, 'patch',
+            nodes_added=id_ranges(new_nodes - self.removed_node_ids),
+            nodes_removed=id_ranges(self.removed_node_ids - new_nodes),
+            edges_added=id_ranges(new_edges - self.removed_edge_ids),
+            edges_removed=id_ranges(self.removed_edge_ids - new_edges),
+            nodes_updated=[{'id': node.id, 'label': node.label, 'type': node.type}
+                           for node in {node.id: node for node in self.updated_nodes}.values()
+                           if node.id not in unchanged_nodes],
+            edges_updated=[{'id': edge.id, 'type': edge.type}
+                           for edge in {edge.id: edge for edge in self.updated_edges}.values()
+                           if edge.id not in unchanged_edges],
+        )
+
+def apply_patch(operations: List[Dict], site: str, max_operations: Optional[int] = None) -> Dict:
+    """
+    Apply patch operations to a site's stored graph, bump the site's graph
+    version and record the change.
+
+    Runs in the current transaction; the caller commits, or rolls back on
+    PatchError so that no operation of a failed patch is applied.
+
+    Args:
+        operations: List of operation dicts (see the module docstring)
+        site: Site key of the graph to patch
+        max_operations: Optional upper bound on the number of operations
+
+    Returns:
+        Dict with the site's new graph 'version' and per-kind 'changes' counts
+
+    Raises:
+        PatchError: If an operation is malformed or does not apply
+    """
+    validate_operations(operations, max_operations)
+    patch = _Patch(site, _referenced_labels(operations))
+    for index, operation in enumerate(operations):
+        getattr(patch, operation['op'])(index, operation)
+    db.session.flush()
+    version = bump_graph_version(site)
+    patch.record(version)
+    return {'version': version, 'changes': patch.changes}
@@ -0,0 +1,411 @@
+"""
+Declarative ontology extraction rules compiled to vectorized pandas plans.
+
+A rule set maps columns to entity types and column pairs to relationship
+types, with optional row filters:
+
+    {
+      "entities": [
+        {"column": "Asset ID", "type": "Asset"},
+        {"column": "Work Order ID", "type": "WorkOrder", "prefix": "WO_"}
+      ],
+      "relationships": [
+        {"source": "Work Order ID", "target": "Asset ID", "type": "MAINTAINS",
+         "where": [{"column": "Status", "op": "ne", "value": "Cancelled"}]}
+      ]
+    }
+
+Relationship endpoints take their entity type and label prefix from the
+entity rule on the same column unless source_type/target_type and
+source_prefix/target_prefix are given. "cardinality": "one" declares that a
+source has a single target (an asset is in one facility); the default,
+"many", allows several. Only the data-quality profile uses it. Filter ops: eq, ne, in, not_in,
+contains, startswith, matches (regex search), gt, ge, lt, le (numeric),
+notnull, isnull. String comparisons use the cleaned (stripped) cell text.
+
+compile_rules() validates a rule set once and caches the resulting plan by
+the SHA-256 of its canonical JSON. Applying a plan evaluates every rule as
+column-wide masks and string operations, cleaning each column once (or
+reusing its factorize_column() codes); rows are never iterated in Python.
+Output matches the row-by-row extraction it replaces: entities sorted and
+unique, relationships in row order and, within a row, in rule order.
+Missing columns produce no entities or relationships.
+"""
+
+import hashlib
+import json
+import re
+import threading
+import warnings
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# The built-in work order mapping
+DEFAULT_RULES = {
+    'entities': [
+        {'column': 'Asset ID', 'type': 'Asset'},
+        {'column': 'Asset Name', 'type': 'Asset'},
+        {'column': 'Facility Name', 'type': 'Facility'},
+        {'column': 'Department', 'type': 'Department'},
+        {'column': 'Work Order ID', 'type': 'WorkOrder', 'prefix': 'WO_'},
+        {'column': 'Assigned To', 'type': 'Personnel'},
+    ],
+    'relationships': [
+        {'source': 'Work Order ID', 'target': 'Asset ID', 'type': 'MAINTAINS', 'cardinality': 'one'},
+        {'source': 'Asset ID', 'target': 'Asset Name', 'type': 'HAS_NAME', 'cardinality': 'one'},
+        {'source': 'Asset ID', 'target': 'Facility Name', 'type': 'LOCATED_IN', 'cardinality': 'one'},
+        {'source': 'Asset ID', 'target': 'Department', 'type': 'BELONGS_TO', 'cardinality': 'one'},
+        {'source': 'Work Order ID', 'target': 'Assigned To', 'type': 'ASSIGNED_TO'},
+    ]
+}
+
+STRING_OPS = ('eq', 'ne', 'in', 'not_in', 'contains', 'startswith', 'matches')
+NUMERIC_OPS = ('gt', 'ge', 'lt', 'le')
+NULL_OPS = ('notnull', 'isnull')
+CARDINALITIES = ('one', 'many')
+MAX_PLAN_CACHE_ENTRIES = 64
+
+class RuleError(ValueError):
+    """Raised for rule sets that do not validate."""
+
+class ColumnCodes(NamedTuple):
+    """A column factorized on its cleaned text (see factorize_column)."""
+    codes: np.ndarray   # Code of each row's cleaned text, -1 for null or blank cells
+    labels: np.ndarray  # Cleaned text of each code
+    notna: np.ndarray   # Not-null mask of the raw cells
+
+def factorize_column(series: pd.Series) -> ColumnCodes:
+    """
+    Factorize a column on its cleaned (stripped) text.
+
+    The raw column is hashed once and only its distinct values are cleaned,
+    which is cheaper than cleaning every cell; whitespace variants of a
+    value share a code.
+    """
+    notna = series.notna().to_numpy()
+    codes, uniques = pd.factorize(series)
+    # The same conversion as _Columns.get, applied to the distinct values
+    text = pd.Series(uniques).astype(str)
+    cleaned = text.str.strip()
+    if (cleaned == text).all():
+        # Already clean (the usual case): the distinct values stay distinct
+        labels = cleaned.to_numpy(dtype=object)
+        remap = np.append(np.arange(len(labels)), -1)
+    else:
+        cleaned_codes, labels = pd.factorize(cleaned)
+        labels = np.asarray(labels, dtype=object)
+        remap = np.append(cleaned_codes, -1)
+    blank = np.flatnonzero(labels == '')
+    if len(blank):
+        remap[remap == blank[0]] = -1
+    return ColumnCodes(remap[codes], labels, notna)
+
+class _Columns:
+    """Per-DataFrame cache of the not-null mask and cleaned text of each column."""
+
+    def __init__(self, df: pd.DataFrame, codes: Optional[Dict[str, ColumnCodes]] = None):
+        self.df = df
+        # Columns already factorized (e.g. by data_quality) are not cleaned again
+        self.codes = codes or {}
+        self._cache: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+
+    def get(self, column: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """Return (notna mask, cleaned strings) for a column, or None if missing."""
+        if column not in self.df.columns:
+            return None
+        if column not in self._cache:
+            if column in self.codes:
+                factorized = self.codes[column]
+                # Code -1 picks the appended ''
+                cleaned = np.append(factorized.labels, '')[factorized.codes]
+                self._cache[column] = (factorized.notna, cleaned)
+                return self._cache[column]
+            series = self.df[column]
+            notna = series.notna().to_numpy()
+            cleaned = np.full(len(series), '', dtype=object)
+            if notna.any():
+                cleaned[notna] = series[notna].astype(str).str.strip().to_numpy(dtype=object)
+            self._cache[column] = (notna, cleaned)
+        return self._cache[column]
+
+    def numeric(self, column: str) -> Optional[np.ndarray]:
+        if column not in self.df.columns:
+            return None
+        return pd.to_numeric(self.df[column], errors='coerce').to_numpy(dtype=float)
+
+Filter = Callable[[_Columns], np.ndarray]
+
+class EntityStep(NamedTuple):
+    column: str
+    type: str
+    prefix: str
+    filters: Tuple[Filter, ...]
+
+class RelationshipStep(NamedTuple):
+    source: str
+    target: str
+    type: str
+    source_type: str
+    target_type: str
+    source_prefix: str
+    target_prefix: str
+    filters: Tuple[Filter, ...]
+    single: bool = False  # "cardinality": "one"
+
+def _require_str(rule: Dict, key: str, where: str) -> str:
+    value = rule.get(key)
+    if not isinstance(value, str) or not value:
+        raise RuleError(f"{where}: '{key}' must be a non-empty string")
+    return value
+
+def _compile_filter(spec: Any, where: str) -> Filter:
+    """Compile one filter into a function returning a row mask."""
+    if not isinstance(spec, dict):
+        raise RuleError(f"{where}: filters must be objects")
+    column = _require_str(spec, 'column', where)
+    op = spec.get('op', 'eq')
+    value = spec.get('value')
+
+    if op in NULL_OPS:
+        def null_filter(columns: _Columns) -> np.ndarray:
+            data = columns.get(column)
+            if data is None:
+                return np.full(len(columns.df), op == 'isnull')
+            return data[0] if op == 'notnull' else ~data[0]
+        return null_filter
+
+    if op in NUMERIC_OPS:
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise RuleError(f"{where}: '{op}' needs a numeric value")
+        compare = {'gt': np.greater, 'ge': np.greater_equal, 'lt': np.less, 'le': np.less_equal}[op]
+
+        def numeric_filter(columns: _Columns) -> np.ndarray:
+            numbers = columns.numeric(column)
+            if numbers is None:
+                return np.zeros(len(columns.df), dtype=bool)
+            with np.errstate(invalid='ignore'):
+                return compare(numbers, value)  # NaN compares False
+        return numeric_filter
+
+    if op not in STRING_OPS:
+        raise RuleError(f"{where}: unknown filter op '{op}'")
+    if op in ('in', 'not_in'):
+        if not isinstance(value, list):
+            raise RuleError(f"{where}: '{op}' needs a list value")
+        values = [str(v) for v in value]
+    elif value is None:
+        raise RuleError(f"{where}: '{op}' needs a value")
+    else:
+        values = str(value)
+    if op == 'matches':
+        try:
+            pattern = re.compile(values)
+        except re.error as e:
+            raise RuleError(f"{where}: invalid regular expression: {e}") from None
+
+    def string_filter(columns: _Columns) -> np.ndarray:
+        data = columns.get(column)
+        if data is None:
+            return np.full(len(columns.df), op in ('ne', 'not_in'))
+        notna, cleaned = data
+        text = pd.Series(cleaned, copy=False)
+        if op == 'eq':
+            mask = cleaned == values
+        elif op == 'ne':
+            mask = cleaned != values
+        elif op == 'in':
+            mask = text.isin(values).to_numpy()
+        elif op == 'not_in':
+            mask = ~text.isin(values).to_numpy()
+        elif op == 'contains':
+            mask = text.str.contains(values, regex=False).to_numpy(dtype=bool)
+        elif op == 'startswith':
+            mask = text.str.startswith(values).to_numpy(dtype=bool)
+        else:
+            with warnings.catch_warnings():
+                # pandas warns about capture groups, which are irrelevant for a mask
+                warnings.filterwarnings('ignore', 'This pattern is interpreted', UserWarning)
+                mask = text.str.contains(pattern).to_numpy(dtype=bool)
+        # Null cells only satisfy negative comparisons
+        return mask & notna if op not in ('ne', 'not_in') else mask | ~notna
+    return string_filter
+
+def _compile_filters(rule: Dict, where: str) -> Tuple[Filter, ...]:
+    filters = rule.get('where', [])
+    if not isinstance(filters, list):
+        raise RuleError(f"{where}: 'where' must be a list")
+    return tuple(_compile_filter(spec, f"{where}, filter {i + 1}") for i, spec in enumerate(filters))
+
+def _apply_filters(filters: Tuple[Filter, ...], columns: _Columns, mask: np.ndarray) -> np.ndarray:
+    for row_filter in filters:
+        mask = mask & row_filter(columns)
+    return mask
+
+def _labels(columns: _Columns, column: str, prefix: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """Return (mask of usable rows, labels) for a column, or None if it is missing."""
+    data = columns.get(column)
+    if data is None:
+        return None
+    notna, cleaned = data
+    labels = prefix + cleaned if prefix else cleaned
+    return notna & (labels != ''), labels
+
+class CompiledRules:
+    """A validated rule set, ready to apply to DataFrames."""
+
+    def __init__(self, rules: Dict, fingerprint: str):
+        if not isinstance(rules, dict):
+            raise RuleError("Rules must be an object with 'entities' and 'relationships'")
+        self.fingerprint = fingerprint
+        entity_specs = rules.get('entities', [])
+        relationship_specs = rules.get('relationships', [])
+        if not isinstance(entity_specs, list) or not isinstance(relationship_specs, list):
+            raise RuleError("'entities' and 'relationships' must be lists")
+
+        self.entities: List[EntityStep] = []
+        by_column: Dict[str, EntityStep] = {}
+        for i, rule in enumerate(entity_specs):
+            where = f"entity rule {i + 1}"
+            if not isinstance(rule, dict):
+                raise RuleError(f"{where}: rules must be objects")
+            prefix = rule.get('prefix', '')
+            if not isinstance(prefix, str):
+                raise RuleError(f"{where}: 'prefix' must be a string")
+            step = EntityStep(_require_str(rule, 'column', where), _require_str(rule, 'type', where),
+                              prefix, _compile_filters(rule, where))
+            self.entities.append(step)
+            by_column.setdefault(step.column, step)
+
+        self.relationships: List[RelationshipStep] = []
+        for i, rule in enumerate(relationship_specs):
+            where = f"relationship rule {i + 1}"
+            if not isinstance(rule, dict):
+                raise RuleError(f"{where}: rules must be objects")
+            source = _require_str(rule, 'source', where)
+            target = _require_str(rule, 'target', where)
+            endpoints = {}
+            for side, column in (('source', source), ('target', target)):
+                entity = by_column.get(column)
+                entity_type = rule.get(f'{side}_type') or (entity.type if entity else None)
+                if not entity_type:
+                    raise RuleError(f"{where}: no entity rule for column '{column}'; set '{side}_type'")
+                prefix = rule.get(f'{side}_prefix', entity.prefix if entity else '')
+                if not isinstance(prefix, str):
+                    raise RuleError(f"{where}: '{side}_prefix' must be a string")
+                endpoints[side] = (entity_type, prefix)
+            cardinality = rule.get('cardinality', 'many')
+            if cardinality not in CARDINALITIES:
+                raise RuleError(f"{where}: 'cardinality' must be one of {list(CARDINALITIES)}")
+            self.relationships.append(RelationshipStep(
+                source, target, _require_str(rule, 'type', where),
+                endpoints['source'][0], endpoints['target'][0],
+                endpoints['source'][1], endpoints['target'][1],
+                _compile_filters(rule, where), cardinality == 'one'
+            ))
+
+    def extract_entities(self, df: pd.DataFrame, columns: Optional[_Columns] = None) -> List[Tuple[str, str]]:
+        """Return the sorted unique (label, type) pairs matched by the entity rules."""
+        columns = columns or _Columns(df)
+        entities = set()
+        for step in self.entities:
+            data = _labels(columns, step.column, step.prefix)
+            if data is None:
+                continue
+            mask, labels = data
+            mask = _apply_filters(step.filters, columns, mask)
+            entities.update((label, step.type) for label in pd.unique(labels[mask]))
+        return sorted(entities)
+
+    def extract_relationships(self, df: pd.DataFrame, columns: Optional[_Columns] = None) -> List[Dict]:
+        """Return relationship dicts in row order, then rule order."""
+        columns = columns or _Columns(df)
+        rows, rule_ids, sources, targets = [], [], [], []
+        for rule_id, step in enumerate(self.relationships):
+            source = _labels(columns, step.source, step.source_prefix)
+            target = _labels(columns, step.target, step.target_prefix)
+            if source is None or target is None:
+                continue
+            mask = _apply_filters(step.filters, columns, source[0] & target[0])
+            matched = np.flatnonzero(mask)
+            rows.append(matched)
+            rule_ids.append(np.full(len(matched), rule_id))
+            sources.append(source[1][matched])
+            targets.append(target[1][matched])
+        if not rows:
+            return []
+
+        rule_ids = np.concatenate(rule_ids)
+        order = np.lexsort((rule_ids, np.concatenate(rows)))
+        steps = self.relationships
+        return [
+            {
+                'source': source,
+                'target': target,
+                'type': steps[rule_id].type,
+                'source_type': steps[rule_id].source_type,
+                'target_type': steps[rule_id].target_type
+            }
+            for source, target, rule_id in zip(np.concatenate(sources)[order], np.concatenate(targets)[order],
+                                               rule_ids[order].tolist())
+        ]
+
+    def apply(self, df: pd.DataFrame, codes: Optional[Dict[str, ColumnCodes]] = None) -> Dict:
+        """
+        Extract an ontology ({entities, relationships, attributes}) from a DataFrame.
+
+        codes optionally maps column names to their factorize_column() result,
+        which is used instead of cleaning those columns again.
+        """
+        columns = _Columns(df, codes)
+        return {
+            'entities': self.extract_entities(df, columns),
+            'relationships': self.extract_relationships(df, columns),
+            'attributes': list(df.columns)
+        }
+
+def rule_set_hash(rules: Dict) -> str:
+    """SHA-256 of the canonical JSON form of a rule set."""
+    try:
+        canonical = json.dumps(rules, sort_keys=True, separators=(',', ':'))
+    except (TypeError, ValueError) as e:
+        raise RuleError(f"Rules must be JSON-serializable: {e}") from None
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+_plans: 'OrderedDict[str, CompiledRules]' = OrderedDict()
+_plans_lock = threading.Lock()
+
+def compile_rules(rules: Optional[Dict] = None) -> CompiledRules:
+    """
+    Validate and compile a rule set, reusing the cached plan for known rule sets.
+
+    Args:
+        rules: Rule set; None means DEFAULT_RULES
+
+    Returns:
+        The compiled plan
+
+    Raises:
+        RuleError: If the rule set is invalid
+    """
+    rules = DEFAULT_RULES if rules is None else rules
+    fingerprint = rule_set_hash(rules)
+    with _plans_lock:
+        plan = _plans.get(fingerprint)
+        if plan is not None:
+            _plans.move_to_end(fingerprint)
+            return plan
+
+    plan = CompiledRules(rules, fingerprint)
+    logger.debug("Compiled rule set %s: %d entity and %d relationship rules",
+                 fingerprint[:12], len(plan.entities), len(plan.relationships))
+    with _plans_lock:
+        _plans[fingerprint] = plan
+        while len(_plans) > MAX_PLAN_CACHE_ENTRIES:
+            _plans.popitem(last=False)
+    return plan
@@ -0,0 +1,352 @@
+"""
+Cached natural-language-to-query templates for chat.
+
+Many chat questions have the same shape with different entities ("work
+orders for asset A001", "work orders for asset A002"). A question is reduced
+to a signature by replacing the node labels it names with typed slots:
+
+    "Which work orders maintain A001?" -> "which work orders maintain {Asset}"
+
+The first question of a shape asks the LLM once to translate the signature
+into a plan: a traversal of up to QUERY_TEMPLATE_MAX_STEPS edges from one
+slot, with an answer sentence to fill in. The plan is checked against a
+whitelist (edge and node types of the stored graph, known directions and
+answer fields) and stored in the query_template table. Every later question
+of the same shape and site runs the plan locally as one parameterized join
+over node/edge and skips the LLM entirely. Shapes the LLM cannot express as a
+traversal, or whose plan fails the whitelist, are stored as unanswerable,
+so their later questions go straight to the regular chat without another
+planning call. A reply that is not JSON (e.g. cut off at max_tokens) says
+nothing about the shape and is not stored; the next question plans again.
+
+Templates only see the question, so chat sessions use them for a session's
+first question only; follow-ups need the session's summary and focus.
+
+Entities are found by exact label lookup of the question's word n-grams in
+one indexed query; questions naming no entity, or a label shared by several
+node types, are not planned.
+"""
+
+import hashlib
+import json
+import logging
+import string
+from datetime import datetime
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from sqlalchemy import and_, distinct, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import aliased
+
+from database import db, get_graph_version, read_session
+from graph_cache import VersionedCache
+from models import Edge, Node, QueryTemplate
+
+# Longest label, in words, looked up in a question
+MAX_LABEL_WORDS = 6
+# Longer questions are left to the regular chat
+MAX_QUESTION_WORDS = 64
+# Schema triples shown to the planner
+MAX_SCHEMA_TRIPLES = 100
+MAX_ANSWER_LENGTH = 500
+DIRECTIONS = ('out', 'in')
+RESULTS = ('list', 'count')
+_PUNCTUATION = '.,;:!?"\'()[]{}'
+
+logger = logging.getLogger(__name__)
+
+_schema_cache = VersionedCache('query_schema', max_entries=16)
+
+PLANNER_PROMPT = """You translate questions about an industrial knowledge graph into graph traversals.
+Entities named in the question are replaced by slots such as {Asset}; they are numbered slot0, slot1, ... in order.
+Reply with one JSON object:
+{"answerable": true,
+ "start": <index of the slot the traversal starts from>,
+ "steps": [{"edge": "<edge type>", "direction": "out" | "in", "node_type": "<optional node type>",
+            "slot": <optional index of a slot the reached node must be>}],
+ "result": "list" | "count",
+ "answer": "<answer sentence using only the fields {count}, {results}, {slot0}, {slot1}, ...>"}
+"out" follows an edge from its source to its target, "in" from its target to its source.
+Use only the edge and node types of the schema. The answer describes the nodes reached by the last step.
+If the question cannot be answered by such a traversal, reply {"answerable": false, "reason": "<why>"}."""
+
+class PlanError(ValueError):
+    """Raised for planner output that is not an allowed plan."""
+
+class Slot(NamedTuple):
+    label: str
+    type: str
+
+class QuestionShape(NamedTuple):
+    """A question reduced to its signature and the entities filling its slots."""
+    signature: str
+    slots: List[Slot]
+    # Plans use the edge and node types of the site they were planned for
+    site: Optional[str] = None
+
+    @property
+    def digest(self) -> str:
+        return hashlib.sha256(f"{self.site or ''}\n{self.signature}".encode('utf-8')).hexdigest()
+
+def _words(question: str) -> List[str]:
+    words = (word.strip(_PUNCTUATION) for word in question.split())
+    return [word for word in words if word]
+
+def parse_question(question: str, site: Optional[str] = None, session=None) -> Optional[QuestionShape]:
+    """
+    Find the entities a question names and reduce it to a signature.
+
+    Args:
+        question: Chat question
+        site: Optional site key the labels are looked up in
+        session: Session to query (default: read_session())
+
+    Returns:
+        The question shape, or None if it names no entity, names an
+        ambiguous label or is too long to plan
+    """
+    words = _words(question)
+    if not words or len(words) > MAX_QUESTION_WORDS:
+        return None
+    candidates = {' '.join(words[start:start + size])
+                  for start in range(len(words))
+                  for size in range(1, min(MAX_LABEL_WORDS, len(words) - start) + 1)}
+
+    session = session or read_session()
+    query = select(Node.label, Node.type).where(Node.label.in_(candidates)).distinct()
+    if site:
+        query = query.where(Node.site == site)
+    types: Dict[str, set] = {}
+    for label, node_type in session.execute(query):
+        types.setdefault(label, set()).add(node_type)
+    if not types:
+        return None
+
+    parts, slots, start = [], [], 0
+    while start < len(words):
+        # Prefer the longest label starting at each word ('Plant A' over 'Plant')
+        for size in range(min(MAX_LABEL_WORDS, len(words) - start), 0, -1):
+            label = ' '.join(words[start:start + size])
+            if label in types:
+                if len(types[label]) > 1:
+                    return None
+                slot = Slot(label, next(iter(types[label])))
+                slots.append(slot)
+                parts.append('{' + slot.type + '}')
+                start += size
+                break
+        else:
+            parts.append(words[start].lower())
+            start += 1
+    return QuestionShape(' '.join(parts), slots, site or None)
+
+def graph_schema(site: Optional[str] = None) -> Dict:
+    """
+    The node types and (source type, edge type, target type) triples of the stored graph.
+
+    Computed with one grouped scan per graph version and site, then cached.
+    """
+    session = read_session()
+
+    def compute():
+        source, target = aliased(Node), aliased(Node)
+        query = select(source.type, Edge.type, target.type, func.count()).select_from(Edge).join(
+            source, and_(Edge.source_id == source.id, source.site == Edge.site)
+        ).join(
+            target, and_(Edge.target_id == target.id, target.site == Edge.site)
+        ).group_by(source.type, Edge.type, target.type).order_by(func.count().desc())
+        node_types = select(Node.type).distinct()
+        if site:
+            query = query.where(Edge.site == site)
+            node_types = node_types.where(Node.site == site)
+        triples = [tuple(row) for row in session.execute(query.limit(MAX_SCHEMA_TRIPLES))]
+        return {
+            'node_types': sorted(session.execute(node_types).scalars()),
+            'edge_types': sorted({edge_type for _, edge_type, _, _ in triples}),
+            'triples': triples
+        }
+
+    return _schema_cache.get_or_compute(get_graph_version(session, site), 'schema', compute, site=site)
+
+def planning_messages(shape: QuestionShape, schema: Dict) -> List[Dict]:
+    """Chat messages asking the LLM for the plan of a question shape."""
+    slots = '\n'.join(f"slot{index}: {slot.type}" for index, slot in enumerate(shape.slots))
+    triples = '\n'.join(f"{source} -{edge_type}-> {target} ({count} edges)"
+                        for source, edge_type, target, count in schema['triples'])
+    return [
+        {'role': 'system', 'content': PLANNER_PROMPT},
+        {'role': 'user', 'content': f"Node types: {', '.join(schema['node_types'])}\n"
+                                    f"Relationships:\n{triples}\n\n"
+                                    f"Slots:\n{slots}\n\nQuestion: {shape.signature}"}
+    ]
+
+def _slot_index(value, slots: List[Slot], field: str) -> int:
+    if isinstance(value, bool) or not isinstance(value, int) or not 0 <= value < len(slots):
+        raise PlanError(f"'{field}' must be a slot index below {len(slots)}")
+    return value
+
+def validate_plan(plan, shape: QuestionShape, schema: Dict, max_steps: int) -> Dict:
+    """
+    Check a plan returned by the LLM against the whitelist.
+
+    Args:
+        plan: Parsed JSON reply of the planner
+        shape: Question shape the plan is for
+        schema: Graph schema from graph_schema()
+        max_steps: Upper bound on the traversal length
+
+    Returns:
+        The plan reduced to its known keys
+
+    Raises:
+        PlanError: If the plan uses unknown keys, types, directions, slots or answer fields
+    """
+    if not isinstance(plan, dict):
+        raise PlanError('the plan must be a JSON object')
+    if plan.get('answerable') is not True:
+        return {'answerable': False, 'reason': str(plan.get('reason') or 'declined by the planner')[:MAX_ANSWER_LENGTH]}
+
+    start = _slot_index(plan.get('start'), shape.slots, 'start')
+    steps = plan.get('steps')
+    if not isinstance(steps, list) or not 1 <= len(steps) <= max_steps:
+        raise PlanError(f"'steps' must be a list of 1-{max_steps} steps")
+    checked = []
+    for step in steps:
+        if not isinstance(step, dict) or step.get('edge') not in schema['edge_types']:
+            raise PlanError(f"step edge must be one of {schema['edge_types']}")
+        if step.get('direction') not in DIRECTIONS:
+            raise PlanError(f"step direction must be one of {list(DIRECTIONS)}")
+        entry = {'edge': step['edge'], 'direction': step['direction']}
+        if step.get('node_type') is not None:
+            if step['node_type'] not in schema['node_types']:
+                raise PlanError(f"step node_type must be one of {schema['node_types']}")
+            entry['node_type'] = step['node_type']
+        if step.get('slot') is not None:
+            entry['slot'] = _slot_index(step['slot'], shape.slots, 'slot')
+        checked.append(entry)
+
+    if plan.get('result') not in RESULTS:
+        raise PlanError(f"'result' must be one of {list(RESULTS)}")
+    answer = plan.get('answer')
+    if not isinstance(answer, str) or not answer or len(answer) > MAX_ANSWER_LENGTH:
+        raise PlanError(f"'answer' must be a string of 1-{MAX_ANSWER_LENGTH} characters")
+    fields = {'count', 'results'} | {f'slot{index}' for index in range(len(shape.slots))}
+    for _, field, spec, conversion in string.Formatter().parse(answer):
+        # Plain names only: no attribute access, indexing, conversions or format specs
+        if field is not None and (field not in fields or spec or conversion):
+            raise PlanError(f"answer field {{{field}}} is not one of {sorted(fields)}")
+    return {'answerable': True, 'start': start, 'steps': checked, 'result': plan['result'], 'answer': answer}
+
+def run_plan(plan: Dict, shape: QuestionShape, site: Optional[str] = None,
+             max_results: int = 50, session=None) -> Dict:
+    """
+    Run a plan as one parameterized join over node/edge.
+
+    Returns:
+        Dict with the filled-in 'answer', the total 'count' and up to
+        max_results result labels
+    """
+    session = session or read_session()
+    nodes = [aliased(Node) for _ in range(len(plan['steps']) + 1)]
+    first, start = nodes[0], shape.slots[plan['start']]
+    conditions = [first.label == start.label, first.type == start.type]
+    if site:
+        conditions.append(first.site == site)
+
+    joins = []
+    for step, near, far in zip(plan['steps'], nodes, nodes[1:]):
+        edge = aliased(Edge)
+        near_id, far_id = ((edge.source_id, edge.target_id) if step['direction'] == 'out'
+                           else (edge.target_id, edge.source_id))
+        # Traversals stay within the start node's site, as labels are only unique per site
+        joins.append((edge, and_(near_id == near.id, edge.site == near.site, edge.type == step['edge'])))
+        joins.append((far, and_(far_id == far.id, far.site == near.site)))
+        if 'node_type' in step:
+            conditions.append(far.type == step['node_type'])
+        if 'slot' in step:
+            slot = shape.slots[step['slot']]
+            conditions.extend((far.label == slot.label, far.type == slot.type))
+
+    def query(*columns):
+        statement = select(*columns).select_from(first)
+        for target, condition in joins:
+            statement = statement.join(target, condition)
+        return statement.where(*conditions)
+
+    last = nodes[-1]
+    count = session.execute(query(func.count(distinct(last.id)))).scalar() or 0
+    labels = list(session.execute(
+        query(last.label).distinct().order_by(last.label).limit(max_results)
+    ).scalars()) if count else []
+
+    results = ', '.join(labels) if labels else 'none'
+    if count > len(labels):
+        results += f' and {count - len(labels)} more'
+    values = {f'slot{index}': slot.label for index, slot in enumerate(shape.slots)}
+    return {'answer': plan['answer'].format(count=count, results=results, **values),
+            'count': count, 'results': labels}
+
+def _store_template(shape: QuestionShape, plan: Dict) -> QueryTemplate:
+    """
+    Insert the template of a shape unless it exists, and return the stored row.
+
+    Two requests may plan a new shape at the same time; ON CONFLICT DO
+    NOTHING lets the later insert keep the first plan instead of failing
+    the request with a duplicate key at commit.
+    """
+    insert = postgresql.insert if db.session.get_bind().dialect.name == 'postgresql' else sqlite.insert
+    db.session.execute(insert(QueryTemplate).values(
+        digest=shape.digest, site=shape.site, signature=shape.signature, plan=plan, hits=0,
+        created_at=datetime.utcnow(), last_used_at=datetime.utcnow()
+    ).on_conflict_do_nothing(index_elements=['digest']))
+    return db.session.get(QueryTemplate, shape.digest)
+
+def answer_question(question: str, site: Optional[str], complete: Callable[[List[Dict]], str],
+                    max_steps: int = 3, max_results: int = 50) -> Optional[Dict]:
+    """
+    Answer a question from the cached template of its shape, planning it first if needed.
+
+    Runs in the current transaction (a new template is added and its hit
+    count updated); the caller commits.
+
+    Args:
+        question: Chat question
+        site: Optional site key the question is about
+        complete: Sends chat messages to the LLM and returns the reply text
+        max_steps: Upper bound on the traversal length of new plans
+        max_results: Result labels included in the answer
+
+    Returns:
+        A chat response dict, or None if the question is left to the regular chat
+    """
+    shape = parse_question(question, site)
+    if shape is None:
+        return None
+
+    template = db.session.get(QueryTemplate, shape.digest)
+    if template is None:
+        schema = graph_schema(site)
+        try:
+            reply = json.loads(complete(planning_messages(shape, schema)) or '')
+        except ValueError as e:
+            # Truncated or malformed: not stored, so the shape is planned again
+            logger.warning(f"Planner reply for '{shape.signature}' is not JSON: {str(e)}")
+            return None
+        try:
+            plan = validate_plan(reply, shape, schema, max_steps)
+        except PlanError as e:
+            # Also cached, so a shape the planner gets wrong costs one call
+            plan = {'answerable': False, 'reason': str(e)[:MAX_ANSWER_LENGTH]}
+        template = _store_template(shape, plan)
+    template.hits += 1
+    template.last_used_at = datetime.utcnow()
+    if not template.plan.get('answerable'):
+        return None
+
+    result = run_plan(template.plan, shape, site, max_results)
+    return {
+        'response': result['answer'],
+        'context': {'type': 'query_template', 'data': [{'label': label} for label in result['results']],
+                    'system_note': f"{result['count']} results for: {shape.signature}"},
+        'template': shape.signature
+    }
@@ -1,10 +1,68 @@
-from flask import request, jsonify
-import pandas as pd
-from ontology_processor import extract_ontology
-from graph_generator import generate_knowledge_graph
-from config import logger
+import hashlib
+import json
+import logging
+from flask import request, jsonify, Response, stream_with_context
+from entity_resolution import resolve_entities
+from metrics import span
+from logging_setup import truncated
+from upload_cache import upload_digest
+from admission import admission_controlled
+from config import logger, GRAPH_EXPORT_BATCH_SIZE, GRAPH_EXPORT_MAX_LIMIT, GRAPH_LAYOUT_MAX_NODES
 from models import Node, Edge
-from database import db
+from database import db, get_graph_version, bump_graph_version, read_session, primary_reads
+from sites import ensure_site_partitions, validate_site
+
+def version_etag(version, *params):
+    """Build an ETag from the graph version and the request parameters."""
+    query_key = hashlib.sha1(repr(params).encode('utf-8')).hexdigest()[:16]
+    return f"g{version}-{query_key}"
+
+def cursor_arg(name='after'):
+    """
+    Parse a node id cursor from the query string; 0 when absent.
+
+    Raises:
+        ValueError: If the cursor is not a non-negative integer, rather than
+            silently restarting from the first page
+    """
+    value = request.args.get(name)
+    if value is None:
+        return 0
+    try:
+        cursor = int(value)
+    except ValueError:
+        cursor = -1
+    if cursor < 0:
+        raise ValueError(f"'{name}' must be a non-negative integer")
+    return cursor
+
+def read_upload(file):
+    """Parse an uploaded CSV into a DataFrame."""
+    # pandas is imported on first upload, not at startup
+    import pandas as pd
+    with span('read_csv'):
+        df = pd.read_csv(file)
+    logger.info(f"Successfully read CSV file with {len(df)} rows and columns: {df.columns.tolist()}")
+    return df
+
+def process_upload(df, rules=None):
+    """
+    Profile an uploaded CSV and extract its entity-resolved ontology.
+
+    Returns:
+        Tuple of (ontology, data quality report)
+    """
+    from ontology_processor import extract_ontology
+    from data_quality import factorize_rule_columns, profile_frame
+    # The rule columns are factorized once, for the profile and the extraction
+    with span('data_quality'):
+        codes = factorize_rule_columns(df, rules)
+        quality = profile_frame(df, rules, codes)
+    # Extract initial ontology and merge near-duplicate entities
+    with span('extract_ontology'):
+        ontology = extract_ontology(df, rules, codes)
+    with span('entity_resolution'):
+        return resolve_entities(ontology), quality
 
 def register_routes(app):
     @app.route('/api/upload', methods=['POST', 'OPTIONS'])
@@ -30,46 +88,129 @@ def register_routes(app):
                 logger.error("Invalid file type")
                 return jsonify({'error': 'Only CSV files are supported'}), 400
 
-            # Clear existing data
+            # Uploads replace the data of one site only
             try:
-                Node.query.delete()
-                Edge.query.delete()
+                site = validate_site(request.form.get('site'))
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+
+            # Optional custom extraction rules, sent as a JSON form field
+            rules = None
+            if request.form.get('rules'):
+                from ontology_rules import compile_rules
+                try:
+                    rules = json.loads(request.form['rules'])
+                    rule_set = compile_rules(rules).fingerprint
+                except ValueError as e:  # malformed JSON or RuleError
+                    logger.error(f"Invalid extraction rules: {str(e)}")
+                    return jsonify({'error': f"Invalid rules: {str(e)}"}), 400
+
+            # Clear the site's existing data (a single partition on PostgreSQL)
+            try:
+                from graph_changes import record_change, stored_id_ranges
+                max_ranges = app.config['GRAPH_CHANGES_MAX_RANGES']
+                removed = {'nodes_removed': stored_id_ranges(Node, site, max_ranges),
+                           'edges_removed': stored_id_ranges(Edge, site, max_ranges)}
+                Edge.query.filter_by(site=site).delete()
+                Node.query.filter_by(site=site).delete()
+                record_change(bump_graph_version(site), site, 'upload', **removed)
                 db.session.commit()
-                logger.info("Cleared existing graph data")
+                logger.info(f"Cleared existing graph data of site {site}")
             except Exception as e:
                 logger.error(f"Error clearing data: {str(e)}")
                 db.session.rollback()
 
-            # Process the file
-            df = pd.read_csv(file)
-            logger.info(f"Successfully read CSV file with {len(df)} rows and columns: {df.columns.tolist()}")
-
-            # Extract initial ontology
-            ontology = extract_ontology(df)
+            # Identical re-uploads are served from the content-hash cache
+            # without parsing the file (see upload_cache.py)
+            cache = app.extensions.get('upload_cache')
+            content_digest = upload_digest(file) if cache is not None else None
+            digest = content_digest
+            if digest is not None and rules is not None:
+                digest = f"{digest}-{rule_set[:16]}"
+            ontology = cache.get(digest) if cache is not None else None
+            df = None
+            if ontology is not None:
+                logger.info(f"Upload {digest[:12]} served from the upload cache")
+                # Entries carry the data quality report beside the ontology
+                quality = ontology.pop('quality', None)
+            else:
+                df = read_upload(file)
+                ontology, quality = process_upload(df, rules)
+                if cache is not None:
+                    try:
+                        cache.put(digest, dict(ontology, quality=quality))
+                    except OSError as e:
+                        logger.warning(f"Could not cache upload {digest[:12]}: {str(e)}")
             logger.info(f"Extracted ontology: {len(ontology.get('entities', []))} entities, {len(ontology.get('relationships', []))} relationships")
 
-            # Debug ontology contents
-            for entity in ontology.get('entities', []):
-                if entity[1] == 'WorkOrder':
-                    logger.debug(f"Found WorkOrder entity: {entity}")
+            # Typed work order attributes (dates, status, cost, ...) for the
+            # work order queries and chat; a cache hit only re-reads the file
+            # when the stored attributes came from a different upload
+            from work_orders import attributes_loaded, extract_work_order_attributes, store_work_order_attributes
+            if content_digest is None or not attributes_loaded(content_digest, site):
+                if df is None:
+                    file.stream.seek(0)
+                    df = read_upload(file)
+                with span('work_order_attributes'):
+                    store_work_order_attributes(extract_work_order_attributes(df), content_digest, site)
+                    db.session.commit()
 
-            for rel in ontology.get('relationships', []):
-                if 'WorkOrder' in [rel.get('source_type'), rel.get('target_type')]:
-                    logger.debug(f"Found WorkOrder relationship: {rel}")
+            # Debug ontology contents; skip the scan entirely unless DEBUG is on
+            if logger.isEnabledFor(logging.DEBUG):
+                for entity in ontology.get('entities', []):
+                    if entity[1] == 'WorkOrder':
+                        logger.debug("Found WorkOrder entity: %s", entity)
+
+                for rel in ontology.get('relationships', []):
+                    if 'WorkOrder' in [rel.get('source_type'), rel.get('target_type')]:
+                        logger.debug("Found WorkOrder relationship: %s", rel)
 
             return jsonify({
                 'message': 'File processed successfully',
-                'ontology': ontology
+                'site': site,
+                'ontology': ontology,
+                'quality': quality
             })
         except Exception as e:
             logger.error(f"Error processing file: {str(e)}", exc_info=True)
             return jsonify({'error': str(e)}), 500
 
+    @app.route('/api/rules/default', methods=['GET'])
+    def default_rules():
+        """Return the built-in extraction rules as a starting point for custom ones."""
+        from ontology_rules import DEFAULT_RULES, rule_set_hash
+        return jsonify({'rule_set': rule_set_hash(DEFAULT_RULES), 'rules': DEFAULT_RULES})
+
+    @app.route('/api/rules/compile', methods=['POST', 'OPTIONS'])
+    def compile_extraction_rules():
+        """Validate a rule set and return its id (the hash its compiled plan is cached under)."""
+        if request.method == 'OPTIONS':
+            return '', 204
+
+        try:
+            data = request.get_json(silent=True)
+            if not data or 'rules' not in data:
+                return jsonify({'error': 'No rules provided'}), 400
+
+            from ontology_rules import RuleError, compile_rules
+            try:
+                plan = compile_rules(data['rules'])
+            except RuleError as e:
+                return jsonify({'error': str(e)}), 400
+            return jsonify({
+                'rule_set': plan.fingerprint,
+                'entity_rules': len(plan.entities),
+                'relationship_rules': len(plan.relationships)
+            })
+        except Exception as e:
+            logger.error(f"Error compiling rules: {str(e)}", exc_info=True)
+            return jsonify({'error': str(e)}), 500
+
     @app.route('/api/validate-ontology', methods=['POST', 'OPTIONS'])
     def validate_ontology():
         """Validate ontology and generate graph."""
         logger.info(f"Validate ontology endpoint hit with method: {request.method}")
-        logger.debug(f"Request headers: {request.headers}")
+        logger.debug("Request headers: %s", truncated(dict(request.headers)))
 
         # Handle OPTIONS request for CORS preflight
         if request.method == 'OPTIONS':
@@ -78,58 +219,100 @@ def register_routes(app):
 
         try:
             data = request.json
-            logger.debug(f"Received data: {data}")
+            logger.debug("Received data: %s", truncated(data))
 
             if not data or 'ontology' not in data:
                 logger.error("Invalid request data")
                 return jsonify({'error': 'Invalid request data'}), 400
 
+            try:
+                site = validate_site(data.get('site'))
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+
             validated_ontology = data.get('ontology')
+            if not validated_ontology:
+                # Nothing to store; the stored graph and its version stay as they are
+                return jsonify({'message': 'Empty ontology, nothing stored', 'site': site,
+                                'graph': {'nodes': [], 'edges': []}})
             logger.info(f"Processing ontology with {len(validated_ontology.get('entities', []))} entities")
 
             # Generate graph structure
-            graph_data = generate_knowledge_graph(validated_ontology)
+            from graph_generator import generate_knowledge_graph
+            with span('graph_build'):
+                graph_data = generate_knowledge_graph(validated_ontology)
             logger.info(f"Generated graph with {len(graph_data.get('nodes', []))} nodes")
 
             try:
-                # Store data in PostgreSQL
-                node_mapping = {}
-                for node_data in graph_data.get('nodes', []):
-                    node = Node(
-                        label=node_data.get('label'),
-                        type=node_data.get('type'),
-                        properties={'id': node_data.get('id')}
-                    )
-                    db.session.add(node)
-                    node_mapping[node_data.get('id')] = node
-
-                db.session.flush()
-                logger.info(f"Created {len(node_mapping)} nodes")
-
-                # Create edges
-                edge_count = 0
-                for edge_data in graph_data.get('edges', []):
-                    source_id = edge_data.get('source')
-                    target_id = edge_data.get('target')
-                    if source_id in node_mapping and target_id in node_mapping:
-                        edge = Edge(
-                            source=node_mapping[source_id],
-                            target=node_mapping[target_id],
-                            type=edge_data.get('type', 'relates_to')
+                with span('persistence'):
+                    # Store data in PostgreSQL, in the site's partition
+                    ensure_site_partitions(site)
+                    node_mapping = {}
+                    for node_data in graph_data.get('nodes', []):
+                        node = Node(
+                            site=site,
+                            label=node_data.get('label'),
+                            type=node_data.get('type'),
+                            properties={'id': node_data.get('id')}
                         )
-                        db.session.add(edge)
-                        edge_count += 1
+                        db.session.add(node)
+                        node_mapping[node_data.get('id')] = node
 
-                db.session.commit()
+                    with span('orm_flush'):
+                        db.session.flush()
+                    logger.info(f"Created {len(node_mapping)} nodes")
+
+                    # Create edges
+                    edges = []
+                    for edge_data in graph_data.get('edges', []):
+                        source_id = edge_data.get('source')
+                        target_id = edge_data.get('target')
+                        if source_id in node_mapping and target_id in node_mapping:
+                            edge = Edge(
+                                site=site,
+                                source=node_mapping[source_id],
+                                target=node_mapping[target_id],
+                                type=edge_data.get('type', 'relates_to')
+                            )
+                            db.session.add(edge)
+                            edges.append(edge)
+                    edge_count = len(edges)
+
+                    # Flushed first so the change feed can list the new ids
+                    from graph_changes import id_ranges, record_change
+                    db.session.flush()
+                    version = bump_graph_version(site)
+                    record_change(version, site, 'validate',
+                                  nodes_added=id_ranges(node.id for node in node_mapping.values()),
+                                  edges_added=id_ranges(edge.id for edge in edges))
+                    with span('commit'):
+                        db.session.commit()
                 logger.info(f"Created {edge_count} edges")
 
+                # Precompute the site's layout for this version and attach
+                # coordinates; read from the primary so a lagging replica is
+                # not cached under the new version
+                try:
+                    from graph_layout import get_layout
+                    with span('layout'), primary_reads():
+                        layout = get_layout(version, max_nodes=GRAPH_LAYOUT_MAX_NODES, site=site)
+                    if layout is not None:
+                        positions = layout.positions_for(node.id for node in node_mapping.values())
+                        for node_data in graph_data.get('nodes', []):
+                            position = positions.get(node_mapping[node_data.get('id')].id)
+                            if position is not None:
+                                node_data['x'], node_data['y'] = position
+                except Exception as e:
+                    logger.warning(f"Layout computation failed: {str(e)}", exc_info=True)
+
                 # Verify data was stored
-                stored_nodes = Node.query.count()
-                stored_edges = Edge.query.count()
+                stored_nodes = Node.query.filter_by(site=site).count()
+                stored_edges = Edge.query.filter_by(site=site).count()
                 logger.info(f"Database verification - Nodes: {stored_nodes}, Edges: {stored_edges}")
 
                 return jsonify({
                     'message': 'Ontology validated and stored successfully',
+                    'site': site,
                     'graph': graph_data
                 })
 
@@ -142,7 +325,486 @@ def register_routes(app):
             logger.error(f"Error validating ontology: {str(e)}", exc_info=True)
             return jsonify({'error': str(e)}), 500
 
+    @app.route('/api/ontology', methods=['PATCH', 'OPTIONS'])
+    def patch_ontology():
+        """
+        Apply add/remove/rename operations to the stored graph.
+
+        Request JSON:
+            operations: List of operations (see ontology_patch.py)
+            site: Optional site key of the graph to patch
+
+        Returns:
+            200: The new graph version and counts of changed nodes and edges
+            400: If an operation is invalid; no operation is applied
+        """
+        if request.method == 'OPTIONS':
+            return '', 204
+
+        from ontology_patch import PatchError, apply_patch
+        try:
+            data = request.get_json(silent=True) or {}
+            try:
+                site = validate_site(data.get('site'))
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+
+            try:
+                with span('ontology_patch'):
+                    ensure_site_partitions(site)
+                    result = apply_patch(data.get('operations'), site,
+                                         max_operations=app.config['ONTOLOGY_PATCH_MAX_OPERATIONS'])
+                    db.session.commit()
+            except PatchError as e:
+                db.session.rollback()
+                return jsonify({'error': str(e), 'operation': e.index}), 400
+            except Exception:
+                db.session.rollback()
+                raise
+
+            logger.info(f"Patched graph of site {site} to version {result['version']}: {result['changes']}")
+            return jsonify({'message': 'Patch applied', 'site': site, **result})
+        except Exception as e:
+            logger.error(f"Error patching ontology: {str(e)}", exc_info=True)
+            return jsonify({'error': str(e)}), 500
+
+    @app.route('/api/graph', methods=['GET'])
+    def export_graph():
+        """Stream the stored graph as NDJSON with keyset pagination.
+
+        Query parameters:
+            type: Node type to include (repeatable)
+            facility: Facility label restricting the export to its subgraph
+            site: Site key restricting the export to one site's graph
+            after: Node id cursor; only nodes with a greater id are returned
+            limit: Maximum number of nodes in this page
+            layout: Set to 0 to omit precomputed x/y coordinates
+
+        Returns:
+            200: NDJSON stream of meta, node, edge and end records
+            304: If the client's ETag matches the current graph version (of
+                the site, if given)
+            400: If the pagination parameters or the site key are invalid
+        """
+        logger.info("Graph export endpoint hit")
+
+        try:
+            types = request.args.getlist('type')
+            facility = request.args.get('facility')
+            site = request.args.get('site') or None
+            try:
+                after = cursor_arg()
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            limit = request.args.get('limit', type=int)
+            with_layout = request.args.get('layout', '1') != '0'
+            if limit is not None and not 0 < limit <= GRAPH_EXPORT_MAX_LIMIT:
+                return jsonify({'error': 'Invalid pagination parameters'}), 400
+            if site is not None:
+                try:
+                    validate_site(site)
+                except ValueError as e:
+                    return jsonify({'error': str(e)}), 400
+
+            version = get_graph_version(read_session(), site)
+            etag = version_etag(version, sorted(types), facility, site, after, limit, with_layout)
+
+            if request.if_none_match.contains_weak(etag):
+                response = Response(status=304)
+            else:
+                from graph_export import iter_graph_ndjson
+                from graph_layout import get_layout
+                layout = get_layout(version, max_nodes=GRAPH_LAYOUT_MAX_NODES, site=site) if with_layout else None
+                response = Response(
+                    stream_with_context(iter_graph_ndjson(
+                        version,
+                        types=types,
+                        facility=facility,
+                        site=site,
+                        after=after,
+                        limit=limit,
+                        batch_size=GRAPH_EXPORT_BATCH_SIZE,
+                        layout=layout
+                    )),
+                    mimetype='application/x-ndjson'
+                )
+
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'no-cache'
+            response.headers['X-Graph-Version'] = str(version)
+            return response
+        except Exception as e:
+            logger.error(f"Error exporting graph: {str(e)}", exc_info=True)
+            return jsonify({'error': str(e)}), 500
+
+    @app.route('/api/graph/changes', methods=['GET'])
+    @admission_controlled('graph_changes', streaming=True)
+    def graph_changes():
+        """Stream graph change events (server-sent events).
+
+        Query parameters:
+            site: Only send changes of this site, numbered by its versions
+            since: Graph version the client last applied; the Last-Event-ID
+                header takes precedence. Defaults to the current version.
+
+        Returns:
+            200: text/event-stream of change and reset events (see graph_changes.py)
+            400: If the version or the site key is invalid
+            503: If too many streams are open
+        """
+        try:
+            site = request.args.get('site') or None
+            if site is not None:
+                try:
+                    validate_site(site)
+                except ValueError as e:
+                    return jsonify({'error': str(e)}), 400
+            since = request.headers.get('Last-Event-ID') or request.args.get('since')
+            if since is None:
+                since = get_graph_version(site=site)
+            elif not since.isdigit():
+                return jsonify({'error': 'since must be a graph version'}), 400
+
+            from graph_changes import iter_change_events
+            response = Response(
+                stream_with_context(iter_change_events(
+                    int(since),
+                    site=site,
+                    poll_interval=app.config['GRAPH_CHANGES_POLL_INTERVAL'],
+                    keepalive=app.config['GRAPH_CHANGES_KEEPALIVE'],
+                    max_seconds=app.config['GRAPH_CHANGES_MAX_SECONDS']
+                )),
+                mimetype='text/event-stream'
+            )
+            response.headers['Cache-Control'] = 'no-cache'
+            # Stop nginx from buffering the events
+            response.headers['X-Accel-Buffering'] = 'no'
+            return response
+        except Exception as e:
+            logger.error(f"Error streaming graph changes: {str(e)}", exc_info=True)
+            return jsonify({'error': str(e)}), 500
+
+    @app.route('/api/export/neo4j', methods=['GET'])
+    def export_neo4j():
+        """Stream the stored graph in a Neo4j bulk import format.
+
+        Query parameters:
+            format: 'cypher' for a batched UNWIND script (default) or 'csv' for a
+                zip of neo4j-admin import files
+            batch_size: Rows per UNWIND statement (cypher only)
+
+        Returns:
+            200: The Cypher script or zip archive as an attachment
+            400: If the format or batch size is invalid
+        """
+        logger.info("Neo4j export endpoint hit")
+
+        try:
+            from neo4j_export import FORMATS, export_admin_csv, export_cypher, iter_zip
+            export_format = request.args.get('format', 'cypher')
+            batch_size = request.args.get('batch_size', app.config['NEO4J_EXPORT_BATCH_SIZE'], type=int)
+            if export_format not in FORMATS:
+                return jsonify({'error': f"format must be one of {list(FORMATS)}"}), 400
+            if not 0 < batch_size <= GRAPH_EXPORT_MAX_LIMIT:
+                return jsonify({'error': 'Invalid batch size'}), 400
+
+            # The export is written to a scratch directory before the response
+            # starts: each node/relationship type gets its own file, and an
+            # export that raced a write is redone rather than sent half old
+            import os
+            import shutil
+            import tempfile
+            directory = tempfile.mkdtemp(prefix='neo4j-export-')
+            try:
+                if export_format == 'cypher':
+                    manifest = export_cypher(directory, batch_size, read_batch_size=GRAPH_EXPORT_BATCH_SIZE)
+                else:
+                    manifest = export_admin_csv(directory, batch_size=GRAPH_EXPORT_BATCH_SIZE)
+            except Exception:
+                shutil.rmtree(directory, ignore_errors=True)
+                raise
+            version = manifest['graph_version']
+
+            def stream():
+                try:
+                    if export_format == 'cypher':
+                        with open(os.path.join(directory, 'import.cypher'), 'rb') as f:
+                            yield from iter(lambda: f.read(1024 * 1024), b'')
+                    else:
+                        yield from iter_zip(directory)
+                finally:
+                    shutil.rmtree(directory, ignore_errors=True)
+
+            if export_format == 'cypher':
+                mimetype, filename = 'text/plain', f'graph-v{version}.cypher'
+            else:
+                mimetype, filename = 'application/zip', f'graph-v{version}-neo4j-import.zip'
+
+            response = Response(stream_with_context(stream()), mimetype=mimetype)
+            response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+            response.headers['X-Graph-Version'] = str(version)
+            return response
+        except Exception as e:
+            logger.error(f"Error exporting graph for Neo4j: {str(e)}", exc_info=True)
+            return jsonify({'error': str(e)}), 500
+
+    @app.route('/api/export/<any(parquet, arrow):export_format>', methods=['GET'])
+    def export_snapshot(export_format):
+        """Stream the node or edge table as Parquet or an Arrow IPC stream.
+
+        Query parameters:
+            table: 'nodes' (default) or 'edges'
+
+        Returns:
+            200: The table as an attachment, tagged with X-Graph-Version
+            400: If the table is unknown
+            501: If pyarrow is not installed
+        """
+        logger.info(f"Snapshot export endpoint hit for {export_format}")
+
+        try:
+            from arrow_export import MIMETYPES, TABLES, arrow_available, iter_export
+            table = request.args.get('table', 'nodes')
+            if table not in TABLES:
+                return jsonify({'error': f"table must be one of {list(TABLES)}"}), 400
+            if not arrow_available():
+                return jsonify({'error': 'Snapshot export requires pyarrow'}), 501
+
+            version = get_graph_version(read_session())
+            response = Response(
+                stream_with_context(iter_export(
+                    table, version, export_format,
+                    batch_size=app.config['ARROW_EXPORT_BATCH_SIZE'],
+                    row_group_size=app.config['PARQUET_ROW_GROUP_SIZE'],
+                    compression=app.config['PARQUET_COMPRESSION']
+                )),
+                mimetype=MIMETYPES[export_format]
+            )
+            response.headers['Content-Disposition'] = f'attachment; filename=graph-v{version}-{table}.{export_format}'
+            response.headers['X-Graph-Version'] = str(version)
+            return response
+        except Exception as e:
+            logger.error(f"Error exporting graph snapshot: {str(e)}", exc_info=True)
+            return jsonify({'error': str(e)}), 500
+
+    @app.route('/api/graph/summary', methods=['GET'])
+    def graph_summary():
+        """Return the graph collapsed into supernodes and counted superedges.
+
+        Query parameters:
+            group_by: Grouping level, one of 'type', 'facility' or 'department'
+            site: Site key restricting the summary to one site's graph
+
+        Returns:
+            200: JSON summary with supernodes and superedges
+            304: If the client's ETag matches the current graph version (of
+                the site, if given)
+            400: If the grouping level or the site key is unknown
+        """
+        logger.info("Graph summary endpoint hit")
+
+        try:
+            from graph_summary import GROUPINGS, get_summary
+            group_by = request.args.get('group_by', 'type')
+            site = request.args.get('site') or None
+            if group_by not in GROUPINGS:
+                return jsonify({'error': f"group_by must be one of {sorted(GROUPINGS)}"}), 400
+            if site is not None:
+                try:
+                    validate_site(site)
+                except ValueError as e:
+                    return jsonify({'error': str(e)}), 400
+
+            version = get_graph_version(read_session(), site)
+            etag = version_etag(version, 'summary', group_by, site)
+            if request.if_none_match.contains_weak(etag):
+                response = Response(status=304)
+            else:
+                summary = get_summary(version, group_by, site)
+                response = jsonify({
+                    'version': version,
+                    'site': site,
+                    'group_by': group_by,
+                    'supernodes': summary.supernodes,
+                    'superedges': summary.superedges
+                })
+
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        except Exception as e:
+            logger.error(f"Error summarizing graph: {str(e)}", exc_info=True)
+            return jsonify({'error': str(e)}), 500
+
+    @app.route('/api/graph/supernodes/<path:supernode_id>', methods=['GET'])
+    def expand_graph_supernode(supernode_id):
+        """Return the member nodes of one supernode, paginated by node id.
+
+        Query parameters:
+            after: Node id cursor; only members with a greater id are returned
+            limit: Maximum number of members in this page
+            site: Site key of the summary the supernode belongs to
+
+        Returns:
+            200: JSON with the member nodes, edges among them and next cursor
+            400: If the cursor, limit or site key is invalid
+            404: If the supernode does not exist in the current graph version
+        """
+        logger.info(f"Supernode expansion endpoint hit for {supernode_id}")
+
+        try:
+            from graph_summary import GROUPINGS, get_summary, expand_supernode
+            group_by = supernode_id.split(':', 1)[0]
+            try:
+                after = cursor_arg()
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            limit = request.args.get('limit', GRAPH_EXPORT_BATCH_SIZE, type=int)
+            site = request.args.get('site') or None
+            if not 0 < limit <= GRAPH_EXPORT_MAX_LIMIT:
+                return jsonify({'error': 'Invalid pagination parameters'}), 400
+            if site is not None:
+                try:
+                    validate_site(site)
+                except ValueError as e:
+                    return jsonify({'error': str(e)}), 400
+            if group_by not in GROUPINGS:
+                return jsonify({'error': 'Supernode not found'}), 404
+
+            version = get_graph_version(read_session(), site)
+            expansion = expand_supernode(get_summary(version, group_by, site), supernode_id,
+                                         after=after, limit=limit)
+            if expansion is None:
+                return jsonify({'error': 'Supernode not found'}), 404
+
+            expansion['version'] = version
+            return jsonify(expansion)
+        except Exception as e:
+            logger.error(f"Error expanding supernode: {str(e)}", exc_info=True)
+            return jsonify({'error': str(e)}), 500
+
+    @app.route('/api/graph/analytics', methods=['GET'])
+    def graph_analytics():
+        """Return degree statistics, connected components and hotspot rankings.
+
+        Query parameters:
+            k: Number of entries per ranking (default 10, at most 100)
+            site: Site key restricting the analytics to one site's graph
+
+        Returns:
+            200: JSON analytics for the current graph version
+            304: If the client's ETag matches the current graph version (of
+                the site, if given)
+            400: If k is out of range or the site key is invalid
+        """
+        logger.info("Graph analytics endpoint hit")
+
+        try:
+            k = request.args.get('k', 10, type=int)
+            site = request.args.get('site') or None
+            if not 0 < k <= 100:
+                return jsonify({'error': 'k must be between 1 and 100'}), 400
+            if site is not None:
+                try:
+                    validate_site(site)
+                except ValueError as e:
+                    return jsonify({'error': str(e)}), 400
+
+            version = get_graph_version(read_session(), site)
+            etag = version_etag(version, 'analytics', k, site)
+            if request.if_none_match.contains_weak(etag):
+                response = Response(status=304)
+            else:
+                from graph_analytics import get_analytics
+                response = jsonify({'version': version, 'site': site, **get_analytics(version, k, site)})
+
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        except Exception as e:
+            logger.error(f"Error computing graph analytics: {str(e)}", exc_info=True)
+            return jsonify({'error': str(e)}), 500
+
+    def work_order_query_args():
+        """Parse the time window and equality filters shared by the work order queries."""
+        from datetime import datetime
+        from work_orders import GROUPS
+        window = {}
+        for name in ('start', 'end'):
+            value = request.args.get(name)
+            try:
+                window[name] = datetime.fromisoformat(value) if value else None
+            except ValueError:
+                raise ValueError(f"{name} must be an ISO 8601 date or datetime")
+        window['filters'] = {name: request.args[name] for name in GROUPS if request.args.get(name)}
+        if 'site' in window['filters']:
+            validate_site(window['filters']['site'])
+        return window
+
+    @app.route('/api/work-orders/aggregate', methods=['GET'])
+    def aggregate_work_orders():
+        """Aggregate work orders per group and/or calendar period.
+
+        Query parameters:
+            group_by: Attribute to group by, e.g. 'asset' or 'facility'
+            period: Calendar bucket of the created date: day, week, month, quarter or year
+            start, end: Created date window [start, end) as ISO 8601
+            asset, facility, status, ...: Equality filters
+
+        Returns:
+            200: JSON rows with count, total_cost, total_labor_hours and mean_resolution_hours
+            400: If a parameter is invalid
+        """
+        logger.info("Work order aggregate endpoint hit")
+
+        try:
+            from work_orders import aggregate_work_orders as aggregate
+            try:
+                args = work_order_query_args()
+                rows = aggregate(group_by=request.args.get('group_by') or None,
+                                 period=request.args.get('period') or None, **args)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            return jsonify({'rows': rows})
+        except Exception as e:
+            logger.error(f"Error aggregating work orders: {str(e)}", exc_info=True)
+            return jsonify({'error': str(e)}), 500
+
+    @app.route('/api/work-orders/intervals', methods=['GET'])
+    def work_order_intervals():
+        """Return MTBF-style intervals between consecutive work orders per asset.
+
+        Query parameters:
+            group_by: Attribute to compute intervals for (default 'asset')
+            min_work_orders: Leave out groups with fewer work orders (default 2)
+            limit: Maximum number of groups, shortest mean interval first (default 100)
+            start, end, asset, facility, work_type, ...: As for /api/work-orders/aggregate
+
+        Returns:
+            200: JSON rows with work_orders, mean/median_interval_hours and mean_repair_hours
+            400: If a parameter is invalid
+        """
+        logger.info("Work order intervals endpoint hit")
+
+        try:
+            from work_orders import failure_intervals
+            min_work_orders = request.args.get('min_work_orders', 2, type=int)
+            limit = request.args.get('limit', 100, type=int)
+            if not 0 < limit <= GRAPH_EXPORT_MAX_LIMIT:
+                return jsonify({'error': f"limit must be between 1 and {GRAPH_EXPORT_MAX_LIMIT}"}), 400
+            try:
+                args = work_order_query_args()
+                rows = failure_intervals(group_by=request.args.get('group_by', 'asset'),
+                                         min_work_orders=min_work_orders, limit=limit, **args)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            return jsonify({'rows': rows})
+        except Exception as e:
+            logger.error(f"Error computing work order intervals: {str(e)}", exc_info=True)
+            return jsonify({'error': str(e)}), 500
+
     @app.route('/api/chat', methods=['POST', 'OPTIONS'])
+    @admission_controlled('chat')
     def chat():
         """Handle chat requests."""
         logger.info("Chat endpoint hit")
@@ -156,12 +818,86 @@ def register_routes(app):
             if not data or 'query' not in data:
                 return jsonify({'error': 'No query provided'}), 400
 
+            try:
+                site = validate_site(data['site']) if data.get('site') else None
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+
+            # Follow-ups in a session carry its summary, recent turns and focus
+            session = None
+            if data.get('session_id'):
+                from chat_sessions import get_session
+                session = get_session(str(data['session_id']))
+                if session is None:
+                    return jsonify({'error': 'Chat session not found'}), 404
+                if site is not None and site != session.site:
+                    return jsonify({'error': f"Chat session belongs to site {session.site!r}"}), 400
+                site = session.site
+
             from chat_handler import ChatHandler
-            handler = ChatHandler(db)
-            response = handler.get_response(data['query'])
+            handler = ChatHandler(db, site=site)
+            response = handler.get_response(data['query'], session=session)
+            # Session turns and new query templates
+            if 'error' in response:
+                db.session.rollback()
+            else:
+                db.session.commit()
             return jsonify(response)
         except Exception as e:
             logger.error(f"Error in chat endpoint: {str(e)}", exc_info=True)
+            db.session.rollback()
+            return jsonify({'error': str(e)}), 500
+
+    @app.route('/api/chat/sessions', methods=['POST'])
+    def create_chat_session():
+        """
+        Start a multi-turn chat session.
+
+        Request JSON:
+            site: Optional site key the conversation is scoped to
+
+        Returns:
+            201: The new session_id
+            400: If the site key is invalid
+        """
+        from chat_sessions import create_session
+        try:
+            data = request.get_json(silent=True) or {}
+            try:
+                site = validate_site(data['site']) if data.get('site') else None
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            session = create_session(site)
+            db.session.commit()
+            return jsonify({'session_id': session.id, 'site': site}), 201
+        except Exception as e:
+            logger.error(f"Error creating chat session: {str(e)}", exc_info=True)
+            db.session.rollback()
+            return jsonify({'error': str(e)}), 500
+
+    @app.route('/api/chat/sessions/<session_id>', methods=['GET', 'DELETE'])
+    def chat_session(session_id):
+        """
+        Return a chat session's conversation and summary, or delete the session.
+
+        Returns:
+            200: The session (GET)
+            204: If the session was deleted (DELETE)
+            404: If there is no such session
+        """
+        from chat_sessions import get_session, session_to_dict
+        try:
+            session = get_session(session_id)
+            if session is None:
+                return jsonify({'error': 'Chat session not found'}), 404
+            if request.method == 'DELETE':
+                db.session.delete(session)
+                db.session.commit()
+                return '', 204
+            return jsonify(session_to_dict(session))
+        except Exception as e:
+            logger.error(f"Error in chat session endpoint: {str(e)}", exc_info=True)
+            db.session.rollback()
             return jsonify({'error': str(e)}), 500
 
     logger.info("Routes registered successfully")
\ No newline at end of file
@@ -0,0 +1,87 @@
+"""
+Site (plant/tenant) scoping of the stored graph.
+
+Every node, edge and work order attribute row carries a ``site`` key. An
+upload replaces one site's data only, and chat, traversal and the graph
+export can be restricted to a site.
+
+On PostgreSQL the node and edge tables are declaratively partitioned
+``BY LIST (site)``: each site gets its own partition, created on first write
+by ensure_site_partitions, so queries with a site predicate are pruned to a
+single partition and a per-site reload only deletes from that partition.
+PostgreSQL requires the partition key in every unique constraint, so their
+primary keys are compiled as (id, site); ids still come from one sequence,
+are unique across sites and remain the ORM identity. Edges reference
+(node.id, node.site), so an edge cannot cross sites.
+
+SQLite has no partitioning: the tables are plain tables filtered on ``site``.
+"""
+
+import hashlib
+import re
+import threading
+from typing import Optional
+
+from flask import current_app
+from sqlalchemy import PrimaryKeyConstraint, text
+from sqlalchemy.ext.compiler import compiles
+
+from database import db
+
+# Table.info key naming the partition column of a site-partitioned table
+PARTITION_KEY = 'partition_key'
+PARTITIONED_TABLES = ('node', 'edge')
+SITE_PATTERN = re.compile(r'^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$')
+
+_created_partitions = set()
+_partition_lock = threading.Lock()
+
+@compiles(PrimaryKeyConstraint, 'postgresql')
+def _partitioned_primary_key(constraint, compiler, **kw):
+    """Add the partition key to the primary key of partitioned tables."""
+    partition_key = constraint.table.info.get(PARTITION_KEY)
+    if partition_key is None or partition_key in constraint.columns:
+        return compiler.visit_primary_key_constraint(constraint, **kw)
+    names = [column.name for column in constraint.columns] + [partition_key]
+    return 'PRIMARY KEY (%s)' % ', '.join(compiler.preparer.quote(name) for name in names)
+
+def validate_site(site: Optional[str]) -> str:
+    """
+    Return the site key for a request, defaulting to DEFAULT_SITE.
+
+    Raises:
+        ValueError: If the key is not 1-64 letters, digits, '_', '.' or '-'
+    """
+    if site is None or site == '':
+        return current_app.config['DEFAULT_SITE']
+    if not SITE_PATTERN.match(site):
+        raise ValueError("site must be 1-64 letters, digits, '_', '.' or '-' and start with a letter or digit")
+    return site
+
+def partition_name(table: str, site: str) -> str:
+    """Name of a site's partition; a hash suffix keeps sanitized names unique."""
+    readable = re.sub(r'[^a-z0-9_]', '_', site.lower())[:32]
+    return f"{table}_site_{readable}_{hashlib.sha1(site.encode('utf-8')).hexdigest()[:8]}"
+
+def ensure_site_partitions(site: str) -> None:
+    """
+    Create the site's node and edge partitions on PostgreSQL if missing.
+
+    Runs in its own short transaction so the parent-table lock taken by
+    CREATE TABLE ... PARTITION OF is not held while the caller writes. No-op
+    on other databases.
+    """
+    engine = db.engine
+    if engine.dialect.name != 'postgresql' or (engine.url, site) in _created_partitions:
+        return
+    # The site key is validated by SITE_PATTERN, so it is safe as a literal
+    if not SITE_PATTERN.match(site):
+        raise ValueError(f"Invalid site key: {site!r}")
+    with _partition_lock:
+        with engine.begin() as connection:
+            for table in PARTITIONED_TABLES:
+                connection.execute(text(
+                    f'CREATE TABLE IF NOT EXISTS "{partition_name(table, site)}" '
+                    f"PARTITION OF \"{table}\" FOR VALUES IN ('{site}')"
+                ))
+        _created_partitions.add((engine.url, site))
@@ -0,0 +1,267 @@
+"""
+In-memory index for serving the frontend build.
+
+The dist directory is scanned once at startup. The catch-all route then looks
+requests up in a dict instead of touching the filesystem, and:
+
+- serves a brotli or gzip variant when the client accepts it, using .br/.gz
+  files written next to the originals by the build (see the
+  precompress-static command), gzip-compressing in memory otherwise
+- marks content-hashed Vite assets (assets/name-<hash>.js) as immutable for a
+  year, while index.html and unhashed files are revalidated on every load
+- answers If-None-Match with 304 from precomputed ETags
+- falls back to index.html for client-side routes
+
+Files up to STATIC_MEMORY_MAX_FILE_SIZE are held in memory; larger ones are
+streamed from disk with the same headers. brotli is optional: without the
+package only prebuilt .br files are served.
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+import time
+from email.utils import formatdate
+from typing import Dict, NamedTuple, Optional
+import re
+import logging
+
+from flask import Flask, Response, jsonify, request, send_file
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+
+# Vite names bundled assets "<name>-<hash>.<ext>" with an 8+ character hash
+_HASHED_ASSET = re.compile(r'(^|/)assets/.+-[A-Za-z0-9_-]{8,}\.[A-Za-z0-9]+$')
+_COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'application/x-ndjson', 'image/svg+xml',
+                       'application/xml', 'application/manifest+json', 'application/wasm')
+# Preferred first when the client accepts several
+ENCODINGS = ('br', 'gzip')
+_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+class Variant(NamedTuple):
+    """One encoding of a static file."""
+    etag: str
+    size: int
+    data: Optional[bytes]
+    path: Optional[str]
+
+class StaticFile(NamedTuple):
+    """Indexed static file with its encoded variants (None = identity)."""
+    mimetype: str
+    last_modified: str
+    immutable: bool
+    variants: Dict[Optional[str], Variant]
+
+def is_compressible(mimetype: str) -> bool:
+    return mimetype.startswith(_COMPRESSIBLE_TYPES)
+
+def _content_etag(data: bytes) -> str:
+    return hashlib.sha1(data).hexdigest()[:20]
+
+def _guess_mimetype(path: str) -> str:
+    mimetype, _ = mimetypes.guess_type(path)
+    if path.endswith(('.js', '.mjs')):
+        return 'application/javascript'
+    return mimetype or 'application/octet-stream'
+
+class StaticIndex:
+    """
+    Snapshot of a static directory for lookups without filesystem access.
+
+    Args:
+        root: Directory to index
+        max_memory_file_size: Files larger than this are streamed from disk
+        compress_min_size: Smaller files are not compressed
+    """
+
+    def __init__(self, root: str, max_memory_file_size: int = 5 * 1024 * 1024,
+                 compress_min_size: int = 1024):
+        self.root = os.path.abspath(root)
+        self.max_memory_file_size = max_memory_file_size
+        self.compress_min_size = compress_min_size
+        self.files: Dict[str, StaticFile] = {}
+        self._lock = threading.Lock()
+        self._last_scan = 0.0
+
+    def build(self) -> 'StaticIndex':
+        """(Re)scan the directory."""
+        files = {}
+        if os.path.isdir(self.root):
+            for directory, _, names in os.walk(self.root):
+                for name in names:
+                    if name.endswith(tuple(_SUFFIXES.values())):
+                        continue
+                    path = os.path.join(directory, name)
+                    relative = os.path.relpath(path, self.root).replace(os.sep, '/')
+                    try:
+                        files[relative] = self._index_file(path, relative)
+                    except OSError as e:
+                        logger.warning(f"Skipping static file {relative}: {str(e)}")
+        with self._lock:
+            self.files = files
+            self._last_scan = time.monotonic()
+        logger.info(f"Indexed {len(files)} static files from {self.root}")
+        return self
+
+    def refresh_if_missing(self, min_interval: float = 1.0) -> None:
+        """Rescan if the build was absent at startup (e.g. still being built)."""
+        if 'index.html' in self.files or time.monotonic() - self._last_scan < min_interval:
+            return
+        self.build()
+
+    def _index_file(self, path: str, relative: str) -> StaticFile:
+        stat = os.stat(path)
+        mimetype = _guess_mimetype(path)
+        in_memory = stat.st_size <= self.max_memory_file_size
+        with open(path, 'rb') as f:
+            data = f.read() if in_memory else None
+        if data is not None:
+            etag = _content_etag(data)
+        else:
+            etag = hashlib.sha1(f"{relative}:{stat.st_size}:{stat.st_mtime_ns}".encode()).hexdigest()[:20]
+
+        variants = {None: Variant(etag, stat.st_size, data, None if in_memory else path)}
+        for encoding in ENCODINGS:
+            variant_path = path + _SUFFIXES[encoding]
+            if os.path.isfile(variant_path):
+                size = os.path.getsize(variant_path)
+                with open(variant_path, 'rb') as f:
+                    variant_data = f.read() if size <= self.max_memory_file_size else None
+                variants[encoding] = Variant(f"{etag}-{encoding}", size, variant_data,
+                                             None if variant_data is not None else variant_path)
+
+        # Compress small text files in memory if the build did not
+        if data is not None and is_compressible(mimetype) and len(data) >= self.compress_min_size:
+            if 'gzip' not in variants:
+                compressed = gzip.compress(data, compresslevel=9, mtime=0)
+                if len(compressed) < len(data):
+                    variants['gzip'] = Variant(f"{etag}-gzip", len(compressed), compressed, None)
+            if 'br' not in variants and brotli is not None:
+                compressed = brotli.compress(data)
+                if len(compressed) < len(data):
+                    variants['br'] = Variant(f"{etag}-br", len(compressed), compressed, None)
+
+        return StaticFile(
+            mimetype=mimetype,
+            last_modified=formatdate(stat.st_mtime, usegmt=True),
+            immutable=bool(_HASHED_ASSET.search(relative)),
+            variants=variants
+        )
+
+    def lookup(self, path: str) -> Optional[StaticFile]:
+        return self.files.get(path.lstrip('/'))
+
+def choose_encoding(entry: StaticFile, accept_encodings) -> Optional[str]:
+    """Pick the best variant the client accepts; None means identity."""
+    for encoding in ENCODINGS:
+        if encoding in entry.variants and accept_encodings[encoding] > 0:
+            return encoding
+    return None
+
+def static_response(entry: StaticFile) -> Response:
+    """Build the response for an indexed file for the current request."""
+    encoding = choose_encoding(entry, request.accept_encodings)
+    variant = entry.variants[encoding]
+
+    if request.if_none_match.contains_weak(variant.etag):
+        response = Response(status=304)
+    elif variant.data is not None:
+        response = Response(variant.data, mimetype=entry.mimetype)
+    else:
+        response = send_file(variant.path, mimetype=entry.mimetype, conditional=False, etag=False)
+        response.content_length = variant.size
+
+    if encoding is not None:
+        response.headers['Content-Encoding'] = encoding
+    if len(entry.variants) > 1:
+        response.vary.add('Accept-Encoding')
+    response.set_etag(variant.etag)
+    response.headers['Last-Modified'] = entry.last_modified
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL if entry.immutable else REVALIDATE_CACHE_CONTROL
+    return response
+
+def precompress_directory(root: str, min_size: int = 1024) -> int:
+    """
+    Write .gz (and .br, if brotli is installed) files next to compressible files.
+
+    Args:
+        root: Directory to process, e.g. frontend/dist
+        min_size: Skip files smaller than this
+
+    Returns:
+        Number of variant files written
+    """
+    written = 0
+    for directory, _, names in os.walk(root):
+        for name in names:
+            if name.endswith(tuple(_SUFFIXES.values())):
+                continue
+            path = os.path.join(directory, name)
+            if not is_compressible(_guess_mimetype(path)) or os.path.getsize(path) < min_size:
+                continue
+            with open(path, 'rb') as f:
+                data = f.read()
+            outputs = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                outputs['.br'] = brotli.compress(data)
+            for suffix, compressed in outputs.items():
+                if len(compressed) < len(data):
+                    with open(path + suffix, 'wb') as f:
+                        f.write(compressed)
+                    written += 1
+    return written
+
+def init_static(app: Flask, root: str) -> StaticIndex:
+    """
+    Index the frontend build and register the catch-all route serving it.
+
+    Args:
+        app: Flask application
+        root: Frontend build directory
+
+    Returns:
+        The StaticIndex used by the route
+    """
+    index = StaticIndex(
+        root,
+        max_memory_file_size=app.config.get('STATIC_MEMORY_MAX_FILE_SIZE', 5 * 1024 * 1024),
+        compress_min_size=app.config.get('STATIC_COMPRESS_MIN_SIZE', 1024)
+    ).build()
+    app.extensions['static_index'] = index
+
+    @app.route('/', defaults={'path': ''})
+    @app.route('/<path:path>')
+    def serve_frontend(path):
+        """Serve the frontend application and handle client-side routing.
+
+        Args:
+            path: The requested path from the client
+
+        Returns:
+            The matching static file, or index.html for client-side routing
+        """
+        try:
+            index.refresh_if_missing()
+            entry = index.lookup(path) if path else None
+            if entry is None:
+                entry = index.lookup('index.html')
+                if entry is None:
+                    logger.error(f"Frontend build not found at {index.root}")
+                    return jsonify({'error': 'Frontend build not found'}), 404
+                logger.debug("Serving index.html for path: %s", path)
+            return static_response(entry)
+        except Exception as e:
+            logger.error(f"Error serving frontend: {str(e)}")
+            return jsonify({'error': str(e)}), 500
+
+    return index
@@ -0,0 +1,207 @@
+"""
+Seeded generator for realistic synthetic work-order CSVs.
+
+Produces data with the columns the ontology extraction understands (Work
+Order ID, Asset ID, Asset Name, Facility Name, Department, Assigned To) plus
+the usual CMMS attributes (Status, Priority, Work Type, Created Date,
+Completed Date, Labor Hours, Cost). Every asset belongs to one facility and
+department, and work orders are spread over assets and technicians with a
+Zipf-like skew so a few "bad actor" assets collect most of the maintenance.
+
+The same seed and parameters always produce the same rows. Large datasets are
+generated and written in chunks, so 10M rows never have to fit in memory.
+
+Usage:
+    python synthetic_data.py --rows 1000000 --output work_orders.csv
+"""
+
+import argparse
+from typing import Iterator, NamedTuple, Optional
+import logging
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+ASSET_KINDS = ['Pump', 'Compressor', 'Conveyor', 'Boiler', 'Chiller', 'Motor', 'Press',
+               'Valve', 'Mixer', 'Generator', 'Fan', 'Heat Exchanger']
+DEPARTMENTS = ['Maintenance', 'Production', 'Utilities', 'Facilities', 'Quality', 'Packaging',
+               'Logistics', 'Engineering']
+FIRST_NAMES = ['Alex', 'Sam', 'Jordan', 'Taylor', 'Morgan', 'Casey', 'Riley', 'Jamie', 'Avery',
+               'Quinn', 'Drew', 'Robin', 'Kai', 'Noor', 'Mika', 'Sasha']
+LAST_NAMES = ['Smith', 'Garcia', 'Chen', 'Patel', 'Kowalski', 'Nguyen', 'Okafor', 'Silva',
+              'Muller', 'Tanaka', 'Haddad', 'Larsen', 'Novak', 'Reyes', 'Ivanova', 'Byrne']
+STATUSES = ['Open', 'In Progress', 'On Hold', 'Completed', 'Cancelled']
+STATUS_WEIGHTS = [0.15, 0.1, 0.05, 0.65, 0.05]
+PRIORITIES = ['Low', 'Medium', 'High', 'Critical']
+PRIORITY_WEIGHTS = [0.3, 0.45, 0.2, 0.05]
+WORK_TYPES = ['Preventive', 'Corrective', 'Inspection', 'Emergency', 'Calibration']
+WORK_TYPE_WEIGHTS = [0.45, 0.3, 0.15, 0.05, 0.05]
+
+class DatasetSpec(NamedTuple):
+    """Shape of a synthetic dataset."""
+    rows: int = 1000
+    assets: Optional[int] = None
+    facilities: int = 5
+    personnel: Optional[int] = None
+    skew: float = 1.0
+    seed: int = 42
+    start_date: str = '2022-01-01'
+    days: int = 730
+
+    def resolved(self) -> 'DatasetSpec':
+        """Fill in entity counts that scale with the row count."""
+        assets = self.assets or max(10, self.rows // 20)
+        personnel = self.personnel or max(5, min(5000, self.rows // 200))
+        return self._replace(assets=assets, personnel=personnel)
+
+def zipf_weights(count: int, skew: float) -> np.ndarray:
+    """
+    Normalized Zipf-like weights: rank r gets weight 1 / r**skew.
+
+    A skew of 0 gives a uniform distribution.
+    """
+    weights = 1.0 / np.arange(1, count + 1, dtype=np.float64) ** skew
+    return weights / weights.sum()
+
+class _Catalog(NamedTuple):
+    asset_ids: np.ndarray
+    asset_names: np.ndarray
+    asset_facility: np.ndarray
+    asset_department: np.ndarray
+    asset_weights: np.ndarray
+    facility_names: np.ndarray
+    personnel_names: np.ndarray
+    personnel_weights: np.ndarray
+
+def _build_catalog(spec: DatasetSpec, rng: np.random.Generator) -> _Catalog:
+    """Draw the fixed asset, facility and personnel master data."""
+    width = len(str(spec.assets))
+    kinds = rng.integers(0, len(ASSET_KINDS), spec.assets)
+    asset_ids = np.array([f"A{i:0{width}d}" for i in range(1, spec.assets + 1)], dtype=object)
+    asset_names = np.array(
+        [f"{ASSET_KINDS[kind]} {i}" for i, kind in enumerate(kinds, start=1)], dtype=object
+    )
+    facility_names = np.array(
+        [f"Plant {chr(ord('A') + i % 26)}{'' if i < 26 else i // 26}" for i in range(spec.facilities)],
+        dtype=object
+    )
+    # Facilities differ in size too, so skew the asset placement as well
+    asset_facility = rng.choice(spec.facilities, spec.assets, p=zipf_weights(spec.facilities, spec.skew / 2))
+    asset_department = rng.integers(0, len(DEPARTMENTS), spec.assets)
+
+    personnel_names = np.array(
+        [f"{FIRST_NAMES[i % len(FIRST_NAMES)]} {LAST_NAMES[(i // len(FIRST_NAMES)) % len(LAST_NAMES)]}"
+         f"{'' if i < len(FIRST_NAMES) * len(LAST_NAMES) else f' {i}'}"
+         for i in range(spec.personnel)],
+        dtype=object
+    )
+
+    # Shuffle which asset/technician gets which popularity rank
+    asset_weights = zipf_weights(spec.assets, spec.skew)[rng.permutation(spec.assets)]
+    personnel_weights = zipf_weights(spec.personnel, spec.skew / 2)[rng.permutation(spec.personnel)]
+    return _Catalog(asset_ids, asset_names, asset_facility, asset_department, asset_weights,
+                    facility_names, personnel_names, personnel_weights)
+
+def _chunk(spec: DatasetSpec, catalog: _Catalog, rng: np.random.Generator, start: int, size: int) -> pd.DataFrame:
+    """Generate rows [start, start + size) of the dataset."""
+    assets = rng.choice(len(catalog.asset_ids), size, p=catalog.asset_weights)
+    personnel = rng.choice(len(catalog.personnel_names), size, p=catalog.personnel_weights)
+    status = rng.choice(len(STATUSES), size, p=STATUS_WEIGHTS)
+
+    created = (np.datetime64(spec.start_date, 's')
+               + rng.integers(0, spec.days * 86400, size).astype('timedelta64[s]'))
+    duration_hours = rng.gamma(2.0, 12.0, size)
+    completed = created + (duration_hours * 3600).astype('timedelta64[s]')
+    labor_hours = np.round(rng.gamma(1.5, 2.5, size), 1)
+    cost = np.round(labor_hours * rng.uniform(45, 120, size) + rng.exponential(150, size), 2)
+
+    done = STATUSES.index('Completed')
+    width = len(str(spec.rows))
+    return pd.DataFrame({
+        'Work Order ID': [f"{i:0{width}d}" for i in range(start + 1, start + size + 1)],
+        'Asset ID': catalog.asset_ids[assets],
+        'Asset Name': catalog.asset_names[assets],
+        'Facility Name': catalog.facility_names[catalog.asset_facility[assets]],
+        'Department': np.array(DEPARTMENTS, dtype=object)[catalog.asset_department[assets]],
+        'Assigned To': catalog.personnel_names[personnel],
+        'Status': np.array(STATUSES, dtype=object)[status],
+        'Priority': np.array(PRIORITIES, dtype=object)[rng.choice(len(PRIORITIES), size, p=PRIORITY_WEIGHTS)],
+        'Work Type': np.array(WORK_TYPES, dtype=object)[rng.choice(len(WORK_TYPES), size, p=WORK_TYPE_WEIGHTS)],
+        'Created Date': pd.to_datetime(created),
+        'Completed Date': pd.Series(pd.to_datetime(completed)).where(status == done),
+        'Labor Hours': labor_hours,
+        'Cost': cost,
+    })
+
+def iter_work_orders(spec: DatasetSpec, chunk_size: int = 100000) -> Iterator[pd.DataFrame]:
+    """
+    Generate a synthetic work-order dataset chunk by chunk.
+
+    Args:
+        spec: Dataset shape and seed
+        chunk_size: Rows per yielded DataFrame
+
+    Yields:
+        DataFrames with consecutive work orders
+    """
+    spec = spec.resolved()
+    rng = np.random.default_rng(spec.seed)
+    catalog = _build_catalog(spec, rng)
+    for start in range(0, spec.rows, chunk_size):
+        yield _chunk(spec, catalog, rng, start, min(chunk_size, spec.rows - start))
+
+def generate_work_orders(rows: int = 1000, **kwargs) -> pd.DataFrame:
+    """
+    Generate a synthetic work-order dataset in memory.
+
+    Args:
+        rows: Number of work orders
+        **kwargs: Further DatasetSpec fields (assets, facilities, personnel, skew, seed, ...)
+
+    Returns:
+        DataFrame with one row per work order
+    """
+    chunks = list(iter_work_orders(DatasetSpec(rows=rows, **kwargs)))
+    return pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
+
+def write_work_orders_csv(path: str, spec: DatasetSpec, chunk_size: int = 100000) -> int:
+    """
+    Stream a synthetic dataset to a CSV file.
+
+    Args:
+        path: Output file path
+        spec: Dataset shape and seed
+        chunk_size: Rows generated and written at a time
+
+    Returns:
+        Number of rows written
+    """
+    written = 0
+    for index, chunk in enumerate(iter_work_orders(spec, chunk_size)):
+        chunk.to_csv(path, mode='w' if index == 0 else 'a', header=index == 0, index=False,
+                     date_format='%Y-%m-%d %H:%M:%S')
+        written += len(chunk)
+        logger.info(f"Wrote {written}/{spec.rows} rows to {path}")
+    return written
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description='Generate a synthetic work-order CSV')
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--assets', type=int, default=None, help='Defaults to rows / 20')
+    parser.add_argument('--facilities', type=int, default=5)
+    parser.add_argument('--personnel', type=int, default=None, help='Defaults to rows / 200 (max 5000)')
+    parser.add_argument('--skew', type=float, default=1.0, help='Zipf exponent; 0 is uniform')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--chunk-size', type=int, default=100000)
+    parser.add_argument('--output', required=True)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    spec = DatasetSpec(rows=args.rows, assets=args.assets, facilities=args.facilities,
+                       personnel=args.personnel, skew=args.skew, seed=args.seed)
+    write_work_orders_csv(args.output, spec, args.chunk_size)
+
+if __name__ == '__main__':
+    main()
@@ -1,18 +1,26 @@
 import os
+import tempfile
 import pytest
-from app import app as flask_app
+
+# config.py reads DATABASE_URL on import; default it for modules that use the env directly
+os.environ.setdefault('DATABASE_URL', 'sqlite:///:memory:')
+
+from app import create_app
 from database import db
+from graph_cache import clear_all_caches
+
+# Use an in-memory SQLite database for testing
+flask_app = create_app({
+    'TESTING': True,
+    'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+    'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+    'WTF_CSRF_ENABLED': False,
+    'UPLOAD_CACHE_DIR': tempfile.mkdtemp(prefix='upload-cache-')
+})
 
 @pytest.fixture
 def app():
-    """Create and configure a new app instance for each test."""
-    # Use an in-memory SQLite database for testing
-    flask_app.config.update({
-        'TESTING': True,
-        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
-        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
-        'WTF_CSRF_ENABLED': False
-    })
+    """Provide the test app with freshly created tables."""
 
     # Create the database and the database tables
     with flask_app.app_context():
@@ -24,6 +32,8 @@ def app():
     with flask_app.app_context():
         db.session.remove()
         db.drop_all()
+    clear_all_caches()
+    flask_app.extensions['upload_cache'].clear()
 
 @pytest.fixture
 def client(app):
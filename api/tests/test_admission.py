@@ -0,0 +1,69 @@
+import threading
+
+import pytest
+
+from admission import ADMISSION_QUEUE_DEPTH, ADMISSION_REJECTIONS, ConcurrencyLimiter, Rejected, TokenBucketLimiter
+from app import create_app
+
+def test_token_bucket_allows_burst_then_refills():
+    bucket = TokenBucketLimiter(rate=1.0, burst=2)
+    assert bucket.acquire('a', now=0.0) == 0
+    assert bucket.acquire('a', now=0.0) == 0
+    assert bucket.acquire('a', now=0.0) == pytest.approx(1.0)
+    assert bucket.acquire('b', now=0.0) == 0
+    assert bucket.acquire('a', now=1.0) == 0
+
+def test_concurrency_limiter_rejects_when_queue_full_or_deadline_passes():
+    limiter = ConcurrencyLimiter('unit', max_concurrent=1, max_queue=1, timeout=0.05)
+    release = threading.Event()
+    entered = threading.Event()
+
+    def hold():
+        with limiter.slot():
+            entered.set()
+            release.wait(5)
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    entered.wait(5)
+
+    # One request may wait; it times out since the slot is never released
+    with pytest.raises(Rejected) as timeout:
+        with limiter.slot():
+            pass
+    assert (timeout.value.status, timeout.value.reason) == (503, 'queue_timeout')
+    assert timeout.value.retry_after >= 1
+    assert ADMISSION_QUEUE_DEPTH.value(endpoint='unit') == 0
+
+    limiter.waiting = 1  # simulate a full queue
+    with pytest.raises(Rejected) as full:
+        with limiter.slot():
+            pass
+    assert full.value.reason == 'queue_full'
+    limiter.waiting = 0
+
+    release.set()
+    holder.join(5)
+    with limiter.slot():
+        assert limiter.active == 1
+    assert limiter.active == 0
+    assert ADMISSION_QUEUE_DEPTH.value(endpoint='unit') == 0
+
+def test_chat_endpoint_returns_429_with_retry_after():
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+        'CHAT_RATE_PER_MINUTE': 1,
+        'CHAT_RATE_BURST': 1,
+    })
+    client = app.test_client()
+    before = ADMISSION_REJECTIONS.value(endpoint='chat', reason='rate_limited')
+
+    assert client.post('/api/chat', json={}).status_code == 400
+    assert client.options('/api/chat').status_code == 204
+
+    response = client.post('/api/chat', json={})
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) == 60
+    assert response.get_json()['reason'] == 'rate_limited'
+    assert ADMISSION_REJECTIONS.value(endpoint='chat', reason='rate_limited') == before + 1
@@ -0,0 +1,36 @@
+import os
+import subprocess
+import sys
+
+from sqlalchemy import inspect
+
+from app import create_app
+from database import db
+
+API_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_wsgi_import_defers_heavy_libraries_and_schema_creation(tmp_path):
+    database = tmp_path / 'startup.db'
+    script = (
+        "import sys, wsgi\n"
+        "heavy = [m for m in ('pandas', 'networkx', 'scipy', 'openai') if m in sys.modules]\n"
+        "print(','.join(heavy) or 'none')\n"
+    )
+    env = {**os.environ, 'DATABASE_URL': f'sqlite:///{database}'}
+    result = subprocess.run([sys.executable, '-c', script], cwd=API_DIR, env=env,
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == 'none'
+    assert not database.exists()
+
+def test_init_db_command_creates_schema(tmp_path):
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'cli.db'}"})
+    result = app.test_cli_runner().invoke(args=['init-db'])
+    assert result.exit_code == 0, result.output
+    with app.app_context():
+        assert {'node', 'edge', 'graph_version'} <= set(inspect(db.engine).get_table_names())
+        db.engine.dispose()
+
+def test_health_check(client):
+    response = client.get('/health')
+    assert response.status_code == 200
+    assert response.get_json() == {'status': 'healthy'}
@@ -0,0 +1,117 @@
+import io
+import json
+
+import pytest
+
+from arrow_export import export_snapshot, pa, write_parquet
+from database import bump_graph_version, db
+
+pytestmark = pytest.mark.skipif(pa is None, reason='pyarrow not installed')
+
+ONTOLOGY = {
+    'entities': [
+        ['A001', 'Asset'],
+        ['A002', 'Asset'],
+        ['Plant A', 'Facility'],
+        ['WO_1', 'WorkOrder'],
+    ],
+    'relationships': [
+        {'source': 'A001', 'target': 'Plant A', 'type': 'LOCATED_IN'},
+        {'source': 'A002', 'target': 'Plant A', 'type': 'LOCATED_IN'},
+        {'source': 'WO_1', 'target': 'A001', 'type': 'MAINTAINS'},
+    ]
+}
+
+@pytest.fixture
+def loaded_client(client):
+    assert client.post('/api/validate-ontology', json={'ontology': ONTOLOGY}).status_code == 200
+    return client
+
+def test_parquet_snapshot_row_groups(app, loaded_client, tmp_path):
+    import pyarrow.parquet as pq
+    with app.app_context():
+        manifest = export_snapshot(str(tmp_path), 'parquet', batch_size=1, row_group_size=2)
+    assert manifest == {'graph_version': 1, 'files': {'nodes.parquet': 4, 'edges.parquet': 3}}
+
+    nodes = pq.ParquetFile(tmp_path / 'nodes.parquet')
+    assert nodes.metadata.num_row_groups == 2
+    assert nodes.schema_arrow.metadata[b'graph_version'] == b'1'
+    table = nodes.read().to_pydict()
+    assert table['label'] == ['A001', 'A002', 'Plant A', 'WO_1']
+    assert table['type'] == ['Asset', 'Asset', 'Facility', 'WorkOrder']
+    assert all(isinstance(json.loads(properties), dict) for properties in table['properties'])
+
+    edges = pq.read_table(tmp_path / 'edges.parquet').to_pydict()
+    node_ids = set(table['id'])
+    assert edges['type'] == ['LOCATED_IN', 'LOCATED_IN', 'MAINTAINS']
+    assert set(edges['source_id']) | set(edges['target_id']) <= node_ids
+
+def test_arrow_snapshot_is_memory_mappable(app, loaded_client, tmp_path):
+    with app.app_context():
+        export_snapshot(str(tmp_path), 'arrow', batch_size=2)
+    with pa.memory_map(str(tmp_path / 'edges.arrow')) as source:
+        reader = pa.ipc.open_file(source)
+        assert reader.num_record_batches == 2
+        assert reader.read_all().num_rows == 3
+
+def test_snapshot_is_written_again_after_a_concurrent_write(app, loaded_client, tmp_path, monkeypatch):
+    import arrow_export
+    import pyarrow.parquet as pq
+    write_parquet = arrow_export.write_parquet
+    tables = []
+
+    def write_during_export(sink, table, *args):
+        tables.append(table)
+        if len(tables) == 2:
+            # A write committed between reading the nodes and the edges
+            operations = [{'op': 'add_relationship', 'source': 'A002', 'target': 'WO_1', 'type': 'FEEDS'}]
+            assert loaded_client.patch('/api/ontology', json={'operations': operations}).status_code == 200
+        return write_parquet(sink, table, *args)
+
+    monkeypatch.setattr(arrow_export, 'write_parquet', write_during_export)
+    with app.app_context():
+        manifest = export_snapshot(str(tmp_path))
+    assert tables == ['nodes', 'edges', 'nodes', 'edges']
+    assert manifest == {'graph_version': 2, 'files': {'nodes.parquet': 4, 'edges.parquet': 4}}
+    assert pq.read_schema(tmp_path / 'nodes.parquet').metadata[b'graph_version'] == b'2'
+
+    def write_always(sink, table, *args):
+        with app.app_context():
+            bump_graph_version('default')
+            db.session.commit()
+        return write_parquet(sink, table, *args)
+
+    monkeypatch.setattr(arrow_export, 'write_parquet', write_always)
+    with app.app_context(), pytest.raises(RuntimeError, match='changed during each of 2'):
+        export_snapshot(str(tmp_path), attempts=2)
+
+def test_empty_graph_writes_schema_only_file(app, client):
+    import pyarrow.parquet as pq
+    sink = io.BytesIO()
+    with app.app_context():
+        assert write_parquet(sink, 'edges', 0) == 0
+    table = pq.read_table(io.BytesIO(sink.getvalue()))
+    assert table.num_rows == 0
+    assert table.column_names == ['id', 'source_id', 'target_id', 'type']
+
+def test_export_endpoints_stream_tables(loaded_client):
+    import pyarrow.parquet as pq
+    response = loaded_client.get('/api/export/arrow?table=edges')
+    assert response.status_code == 200
+    assert response.mimetype == 'application/vnd.apache.arrow.stream'
+    assert response.headers['X-Graph-Version'] == '1'
+    assert pa.ipc.open_stream(response.get_data()).read_all().num_rows == 3
+
+    response = loaded_client.get('/api/export/parquet')
+    assert response.status_code == 200
+    assert response.headers['Content-Disposition'] == 'attachment; filename=graph-v1-nodes.parquet'
+    assert pq.read_table(io.BytesIO(response.get_data())).num_rows == 4
+
+    assert loaded_client.get('/api/export/parquet?table=layout').status_code == 400
+    assert loaded_client.get('/api/export/csv').status_code == 404
+
+def test_export_snapshot_cli(loaded_client, runner, tmp_path):
+    result = runner.invoke(args=['export-snapshot', str(tmp_path)])
+    assert result.exit_code == 0, result.output
+    assert 'nodes.parquet: 4 rows' in result.output
+    assert (tmp_path / 'edges.parquet').exists()
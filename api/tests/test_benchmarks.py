@@ -0,0 +1,30 @@
+from benchmarks.run import compare, run_suite
+from database import db
+
+def test_compare_flags_only_regressions_beyond_threshold():
+    baseline = {
+        'thresholds': {'default': 0.25, 'noisy': 1.0},
+        'min_delta_s': 0.005,
+        'results': {'1000': {
+            'fast': {'median_s': 0.1},
+            'slow': {'median_s': 0.1},
+            'noisy': {'median_s': 0.1},
+            'tiny': {'median_s': 0.001},
+        }}
+    }
+    results = {'1000': {
+        'fast': {'median_s': 0.11},
+        'slow': {'median_s': 0.2},
+        'noisy': {'median_s': 0.19},
+        'tiny': {'median_s': 0.004},
+        'new': {'median_s': 1.0},
+    }}
+    regressed = {entry['benchmark'] for entry in compare(results, baseline) if entry['regressed']}
+    assert regressed == {'slow'}
+
+def test_run_suite_reports_each_benchmark(app):
+    results = run_suite(app, db, [100], repeat=1)
+    benchmarks = results['100']
+    for name in ('extract_ontology', 'generate_knowledge_graph', 'validate_ontology',
+                 'validate_ontology.persistence'):
+        assert benchmarks[name]['median_s'] > 0
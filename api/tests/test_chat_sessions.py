@@ -0,0 +1,158 @@
+import itertools
+
+import pytest
+
+from chat_sessions import IndexedContext, estimate_tokens, select_context, trim_summary
+from database import db
+from loadtest.stub_llm import StubLLMServer, StubSettings
+from models import ChatSession, ChatTurn
+
+ONTOLOGY = {
+    'entities': [
+        ['A001', 'Asset'],
+        ['A002', 'Asset'],
+        ['Plant A', 'Facility'],
+        ['Plant B', 'Facility'],
+        ['WO_1', 'WorkOrder'],
+        ['WO_2', 'WorkOrder'],
+    ],
+    'relationships': [
+        {'source': 'A001', 'target': 'Plant A', 'type': 'LOCATED_IN'},
+        {'source': 'A002', 'target': 'Plant B', 'type': 'LOCATED_IN'},
+        {'source': 'WO_1', 'target': 'A001', 'type': 'MAINTAINS'},
+        {'source': 'WO_2', 'target': 'A002', 'type': 'MAINTAINS'},
+    ]
+}
+
+# A fresh client address per request keeps the chat rate limit out of the way
+_addresses = (f'10.47.0.{n}' for n in itertools.count(1))
+
+CONTEXT = {'type': 'asset_context', 'system_note': '2 work orders across 2 assets.', 'data': [
+    {'asset': 'A001', 'facility': 'Plant A', 'status': None,
+     'workOrders': [{'id': 'WO_1', 'status': 'Open', 'type': 'MAINTAINS'}]},
+    {'asset': 'A002', 'facility': 'Plant B', 'status': None,
+     'workOrders': [{'id': 'WO_2', 'status': 'Closed', 'type': 'MAINTAINS'}]},
+]}
+
+@pytest.fixture
+def llm(monkeypatch):
+    server = StubLLMServer(settings=StubSettings(latency=0, tokens_per_second=0, completion_tokens=30,
+                                                 jitter=0)).start()
+    monkeypatch.setenv('OPENAI_API_KEY', 'test')
+    monkeypatch.setenv('OPENAI_BASE_URL', server.base_url)
+    # The asset context query is PostgreSQL SQL (DISTINCT ON); count builds instead
+    from chat_handler import ChatHandler
+    server.context_builds = 0
+
+    def asset_context(handler, raise_errors=False):
+        server.context_builds += 1
+        return CONTEXT
+    monkeypatch.setattr(ChatHandler, '_get_asset_context', asset_context)
+    yield server
+    server.stop()
+
+@pytest.fixture
+def session_id(client):
+    assert client.post('/api/validate-ontology', json={'ontology': ONTOLOGY}).status_code == 200
+    response = client.post('/api/chat/sessions', json={})
+    assert response.status_code == 201
+    return response.get_json()['session_id']
+
+def ask(client, session_id, query):
+    response = client.post('/api/chat', json={'query': query, 'session_id': session_id},
+                           environ_base={'REMOTE_ADDR': next(_addresses)})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert 'error' not in body, body
+    return body
+
+def test_follow_up_reuses_focus_and_cached_context(client, llm, session_id):
+    first = ask(client, session_id, 'What is the status of A001?')
+    assert first['focus'] == ['A001'] and not first['context_reused']
+    assert [asset['asset'] for asset in first['context']['data']] == ['A001']
+
+    follow_up = ask(client, session_id, 'And when was it last maintained?')
+    assert follow_up['context_reused'] and follow_up['focus'] == ['A001']
+    assert follow_up['context'] == first['context']
+    # Built once for the graph version
+    assert llm.context_builds == 1
+
+    # The previous exchange is sent verbatim before the new question
+    messages = llm.last_request['messages']
+    assert [m['role'] for m in messages] == ['system', 'user', 'assistant', 'user']
+    assert messages[1]['content'] == 'What is the status of A001?'
+
+    moved = ask(client, session_id, 'Compare it with the assets in Plant B')
+    assert moved['focus'] == ['Plant B'] and not moved['context_reused']
+    assert [asset['asset'] for asset in moved['context']['data']] == ['A002']
+
+    # A graph change rebuilds the shared context
+    client.patch('/api/ontology', json={'operations': [{'op': 'remove_entity', 'label': 'WO_2'}]})
+    ask(client, session_id, 'Anything else?')
+    assert llm.context_builds == 2
+
+def test_long_conversation_keeps_prompt_bounded(app, client, llm, session_id):
+    app.config.update(CHAT_HISTORY_MESSAGES=4, CHAT_SUMMARY_MAX_TOKENS=250)
+    try:
+        sizes = []
+        for turn in range(12):
+            ask(client, session_id, f'Question {turn}: anything overdue at A002? ' + 'detail ' * 20)
+            sizes.append(sum(estimate_tokens(m['content']) for m in llm.last_request['messages']))
+    finally:
+        app.config.update(CHAT_HISTORY_MESSAGES=6, CHAT_SUMMARY_MAX_TOKENS=400)
+
+    # Growth stops once the history window is full and the summary at its budget
+    assert max(sizes[6:]) - min(sizes[6:]) <= 250
+    messages = llm.last_request['messages']
+    assert len(messages) == 1 + 4 + 1
+    assert 'Summary of the earlier conversation:' in messages[0]['content']
+
+    with app.app_context():
+        session = db.session.get(ChatSession, session_id)
+        assert estimate_tokens(session.summary) <= 250
+        assert 'Question 9' in session.summary and 'Question 0' not in session.summary
+        assert ChatTurn.query.filter_by(session_id=session_id).count() == 24
+        assert ChatTurn.query.filter_by(session_id=session_id, summarized=False).count() == 4
+
+def test_session_endpoints(client, llm, session_id):
+    ask(client, session_id, 'How many work orders does WO_2 belong to?')
+    body = client.get(f'/api/chat/sessions/{session_id}').get_json()
+    assert [turn['role'] for turn in body['turns']] == ['user', 'assistant']
+    assert body['focus'] == ['WO_2']
+
+    response = client.post('/api/chat', json={'query': 'hi', 'session_id': 'missing'},
+                           environ_base={'REMOTE_ADDR': next(_addresses)})
+    assert response.status_code == 404
+    response = client.post('/api/chat', json={'query': 'hi', 'session_id': session_id, 'site': 'north'},
+                           environ_base={'REMOTE_ADDR': next(_addresses)})
+    assert response.status_code == 400
+
+    assert client.delete(f'/api/chat/sessions/{session_id}').status_code == 204
+    assert client.get(f'/api/chat/sessions/{session_id}').status_code == 404
+
+def test_prune_chat_sessions_cli(app, client, runner, session_id):
+    result = runner.invoke(args=['prune-chat-sessions', '--days', '0'])
+    assert result.exit_code == 0 and 'Deleted 1 chat sessions' in result.output
+    with app.app_context():
+        assert ChatSession.query.count() == 0
+
+def test_entity_matching_and_selection():
+    context = IndexedContext({'type': 'asset_context', 'system_note': None, 'data': [
+        {'asset': 'A001', 'facility': 'Plant A', 'status': None, 'workOrders': [{'id': 'WO_1', 'status': None,
+                                                                                 'type': 'MAINTAINS'}]},
+        {'asset': 'A002', 'facility': 'Plant A North', 'status': None, 'workOrders': []},
+    ]})
+    assert context.mentioned('Is plant a north busier than Plant A? See wo_1.') == ['Plant A North', 'Plant A',
+                                                                                     'WO_1']
+    assert context.mentioned('A0012 is not an asset') == []
+
+    selected = select_context(context.context, ['WO_1'], max_tokens=1000)
+    assert [asset['asset'] for asset in selected['data']] == ['A001']
+    truncated = select_context(context.context, [], max_tokens=50)
+    assert len(truncated['data']) == 1 and '1 further matching assets' in truncated['system_note']
+
+def test_trim_summary_drops_oldest_lines():
+    summary = '\n'.join(f'- Asked: q{n} Answered: a{n}' for n in range(10))
+    trimmed = trim_summary(summary, max_tokens=20)
+    assert trimmed.splitlines()[-1] == '- Asked: q9 Answered: a9'
+    assert estimate_tokens(trimmed) <= 20 and 'q0' not in trimmed
@@ -0,0 +1,64 @@
+import datetime
+import decimal
+import gzip
+import json
+import zlib
+
+import pytest
+
+from compression import zstandard
+from json_provider import OrjsonProvider
+
+ONTOLOGY = {
+    'entities': [[f'A{i:03d}', 'Asset'] for i in range(60)] + [['Plant A', 'Facility']],
+    'relationships': [{'source': f'A{i:03d}', 'target': 'Plant A', 'type': 'LOCATED_IN'} for i in range(60)]
+}
+
+def validate(client, **headers):
+    return client.post('/api/validate-ontology', json={'ontology': ONTOLOGY}, headers=headers)
+
+def test_orjson_provider_matches_flask_defaults(app):
+    assert isinstance(app.json, OrjsonProvider)
+    data = {'b': 1, 'a': [decimal.Decimal('1.5'), datetime.date(2024, 1, 2)], 'big': 2 ** 70}
+    encoded = app.json.dumps(data)
+    assert encoded == json.dumps({'a': ['1.5', 'Tue, 02 Jan 2024 00:00:00 GMT'], 'b': 1, 'big': 2 ** 70},
+                                 separators=(', ', ': '))
+    assert app.json.loads(encoded)['big'] == 2 ** 70
+
+def test_large_response_is_gzip_compressed(client):
+    response = validate(client, **{'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.vary
+    body = json.loads(gzip.decompress(response.get_data()))
+    assert len(body['graph']['nodes']) == 61
+
+    identity = validate(client)
+    assert 'Content-Encoding' not in identity.headers
+    assert identity.get_json()['graph']['edges'] == body['graph']['edges']
+
+def test_small_responses_are_not_compressed(client):
+    response = client.post('/api/validate-ontology', json={}, headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 400
+    assert 'Content-Encoding' not in response.headers
+
+@pytest.mark.skipif(zstandard is None, reason='zstandard not installed')
+def test_zstd_preferred_when_accepted(client):
+    response = validate(client, **{'Accept-Encoding': 'gzip, zstd'})
+    assert response.headers['Content-Encoding'] == 'zstd'
+    body = zstandard.ZstdDecompressor().decompress(response.get_data())
+    assert len(json.loads(body)['graph']['edges']) == 60
+
+def test_streamed_export_is_compressed_and_revalidates(client):
+    validate(client)
+    response = client.get('/api/graph', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Length' not in response.headers
+    lines = zlib.decompress(response.get_data(), 31).decode().splitlines()
+    assert json.loads(lines[0]) == {'kind': 'meta', 'version': 1}
+    assert len([line for line in lines if '"kind": "node"' in line]) == 61
+
+    etag = response.headers['ETag']
+    assert etag.startswith('W/')
+    cached = client.get('/api/graph', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+    assert cached.status_code == 304
@@ -0,0 +1,99 @@
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+from data_quality import factorize_rule_columns, profile_frame
+from ontology_processor import extract_ontology
+from ontology_rules import factorize_column
+
+def messy_orders():
+    return pd.DataFrame({
+        'Work Order ID': ['WO001', 'WO002', 'WO002', 'WO003', '  ', 'WO005'],
+        'Asset ID': ['A001', ' A001 ', 'A002', None, 'A003', 'A001'],
+        'Asset Name': ['Pump 1', 'Pump 1', 'Fan 2', 'Valve 9', 'Belt 3', 'Pump 1'],
+        'Facility Name': ['Plant A', 'Plant A', 'Plant B', 'Plant B', 'Plant C', 'Plant B'],
+        'Department': ['Ops', 'Ops', 'Ops', 'Ops', 'Ops', 'Ops'],
+        'Assigned To': ['Ann', 'Bo', 'Bo', 'Cy', 'Di', 'Ann'],
+        'Cost': [10.0, np.nan, 5.0, 5.0, 7.5, 1.0],
+    })
+
+def issue(report, check, **match):
+    found = [entry for entry in report['issues']
+             if entry['check'] == check and all(entry.get(key) == value for key, value in match.items())]
+    assert len(found) == 1, report['issues']
+    return found[0]
+
+def test_profile_reports_conflicts_duplicates_blanks_and_orphans():
+    report = profile_frame(messy_orders())
+    assert report['rows'] == 6 and report['missing_columns'] == []
+    assert report['columns']['Asset ID'] == {'null_rate': 0.1667, 'distinct': 3}
+    assert report['columns']['Cost'] == {'null_rate': 0.1667, 'distinct': 4}
+
+    duplicates = issue(report, 'duplicate_ids')
+    assert duplicates['examples'] == ['WO002'] and duplicates['rows'] == 2
+    assert issue(report, 'blank_values', column='Asset ID')['rows'] == [3]
+    assert issue(report, 'blank_values', column='Work Order ID')['rows'] == [4]
+
+    # ' A001 ' is A001; it sits in Plant A and Plant B
+    located = issue(report, 'conflicts', relationship='LOCATED_IN')
+    assert located['examples'] == [{'value': 'A001', 'targets': ['Plant A', 'Plant B']}]
+    maintains = issue(report, 'conflicts', relationship='MAINTAINS')
+    assert maintains['examples'] == [{'value': 'WO002', 'targets': ['A001', 'A002']}]
+    # A work order may be assigned to several people
+    assert not [entry for entry in report['issues'] if entry.get('relationship') == 'ASSIGNED_TO']
+
+    # Valve 9's row has no Asset ID, so the name is linked to nothing
+    assert issue(report, 'orphans', column='Asset Name')['examples'] == ['Valve 9']
+    assert issue(report, 'orphans', column='Assigned To')['examples'] == ['Di']
+
+def test_profile_with_custom_rules_lists_missing_columns():
+    rules = {'entities': [{'column': 'Asset ID', 'type': 'Asset'}, {'column': 'Line', 'type': 'Line'}],
+             'relationships': [{'source': 'Asset ID', 'target': 'Line', 'type': 'ON_LINE'}]}
+    report = profile_frame(messy_orders(), rules)
+    assert report['missing_columns'] == ['Line']
+    # Without its target column the relationship links nothing
+    assert issue(report, 'orphans', column='Asset ID')['count'] == 3
+    assert not [entry for entry in report['issues'] if entry['check'] == 'conflicts']
+
+def test_only_single_valued_relationships_report_conflicts():
+    df = messy_orders()
+    df.loc[2, 'Assigned To'] = 'Cy'
+    rules = {'entities': [{'column': 'Work Order ID', 'type': 'WorkOrder'},
+                          {'column': 'Assigned To', 'type': 'Personnel'},
+                          {'column': 'Asset ID', 'type': 'Asset'}],
+             'relationships': [{'source': 'Work Order ID', 'target': 'Assigned To', 'type': 'ASSIGNED_TO'},
+                               {'source': 'Work Order ID', 'target': 'Asset ID', 'type': 'MAINTAINS',
+                                'cardinality': 'one'}]}
+    report = profile_frame(df, rules)
+    # WO002 has two assignees and two assets; only the single-valued rule counts
+    assert [entry['relationship'] for entry in report['issues'] if entry['check'] == 'conflicts'] == ['MAINTAINS']
+    assert not [entry for entry in profile_frame(df)['issues'] if entry.get('relationship') == 'ASSIGNED_TO']
+
+def test_extraction_with_shared_codes_matches_plain_extraction():
+    df = messy_orders()
+    # Mixed-type object columns are cleaned the same way
+    df['Asset ID'] = df['Asset ID'].astype(object)
+    df.loc[5, 'Asset ID'] = 42
+    codes = factorize_rule_columns(df)
+    assert extract_ontology(df, codes=codes) == extract_ontology(df)
+
+    factorized = factorize_column(pd.Series([' x', 'x', None, '   ', 'y']))
+    assert [factorized.labels[code] if code >= 0 else None for code in factorized.codes] == \
+        ['x', 'x', None, None, 'y']
+    assert factorized.notna.tolist() == [True, True, False, True, True]
+
+def test_upload_returns_the_report_also_from_the_cache(client):
+    csv = messy_orders().to_csv(index=False).encode('utf-8')
+
+    def upload():
+        response = client.post('/api/upload', data={'file': (BytesIO(csv), 'orders.csv')},
+                               content_type='multipart/form-data')
+        assert response.status_code == 200
+        return response.get_json()
+
+    first = upload()
+    assert issue(first['quality'], 'duplicate_ids')['examples'] == ['WO002']
+    assert 'quality' not in first['ontology']
+    second = upload()
+    assert second['quality'] == first['quality'] and second['ontology'] == first['ontology']
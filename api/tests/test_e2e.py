@@ -1,22 +1,25 @@
-import os
-import pytest
 import json
 from io import BytesIO
+
 import pandas as pd
-from app import app
-from models import Node, Edge, db
+import pytest
+
+from loadtest.stub_llm import StubLLMServer, StubSettings
+from models import Node, Edge
 
 @pytest.fixture
-def test_client():
-    app.config['TESTING'] = True
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
-    
-    with app.test_client() as client:
-        with app.app_context():
-            db.create_all()
-            yield client
-            db.session.remove()
-            db.drop_all()
+def llm(monkeypatch):
+    server = StubLLMServer(settings=StubSettings(latency=0, tokens_per_second=0, completion_tokens=20,
+                                                 jitter=0)).start()
+    monkeypatch.setenv('OPENAI_API_KEY', 'test')
+    monkeypatch.setenv('OPENAI_BASE_URL', server.base_url)
+    # The asset context query is PostgreSQL SQL (DISTINCT ON)
+    from chat_handler import ChatHandler
+    monkeypatch.setattr(ChatHandler, '_get_asset_context',
+                        lambda handler, raise_errors=False: {'type': 'asset_context', 'data': [],
+                                                             'system_note': None})
+    yield server
+    server.stop()
 
 def create_test_csv():
     """Create a test CSV file with sample work order data"""
@@ -32,12 +35,12 @@ def create_test_csv():
     csv_data = df.to_csv(index=False).encode('utf-8')
     return BytesIO(csv_data)
 
-def test_complete_workflow(test_client):
+def test_complete_workflow(app, client, llm):
     """Test the complete workflow from file upload to chat interaction"""
     # Step 1: Upload CSV file
     csv_file = create_test_csv()
-    response = test_client.post(
-        '/upload',
+    response = client.post(
+        '/api/upload',
         data={'file': (csv_file, 'test.csv')},
         content_type='multipart/form-data'
     )
@@ -45,43 +48,41 @@ def test_complete_workflow(test_client):
     data = json.loads(response.data)
     assert 'ontology' in data
     ontology = data['ontology']
-    
-    # Step 2: Validate ontology
-    response = test_client.post(
-        '/validate-ontology',
+
+    # Step 2: Validate ontology, which stores the graph
+    response = client.post(
+        '/api/validate-ontology',
         json={'ontology': ontology}
     )
     assert response.status_code == 200
     data = json.loads(response.data)
     assert 'graph' in data
-    graph_data = data['graph']
-    
-    # Step 3: Export to database
-    response = test_client.post(
-        '/export-neo4j',
-        json={'graph': graph_data}
-    )
-    assert response.status_code == 200
-    
+
     # Verify database state
     with app.app_context():
         assert Node.query.count() > 0
         assert Edge.query.count() > 0
-        
+
         # Verify specific nodes exist
         nodes = Node.query.all()
         node_labels = [node.label for node in nodes]
         assert 'Pump 1' in node_labels
         assert 'Plant A' in node_labels
-        
+
         # Verify relationships
         edges = Edge.query.all()
         assert any(edge.type == 'LOCATED_IN' for edge in edges)
         assert any(edge.type == 'ASSIGNED_TO' for edge in edges)
 
+    # Step 3: Export the stored graph for Neo4j
+    response = client.get('/api/export/neo4j?format=cypher')
+    assert response.status_code == 200
+    script = response.get_data(as_text=True)
+    assert 'UNWIND' in script and 'Pump 1' in script and 'LOCATED_IN' in script
+
     # Step 4: Test chat interface
-    response = test_client.post(
-        '/chat',
+    response = client.post(
+        '/api/chat',
         json={'query': 'What assets are in Plant A?'}
     )
     assert response.status_code == 200
@@ -89,33 +90,37 @@ def test_complete_workflow(test_client):
     assert 'response' in data
     assert not data.get('error')
 
-def test_error_handling(test_client):
+def test_error_handling(client):
     """Test error handling in the workflow"""
     # Test file upload with invalid file
-    response = test_client.post(
-        '/upload',
+    response = client.post(
+        '/api/upload',
         data={'file': (BytesIO(b'invalid data'), 'test.txt')},
         content_type='multipart/form-data'
     )
     assert response.status_code == 400
-    
+
     # Test ontology validation with invalid data
-    response = test_client.post(
-        '/validate-ontology',
+    response = client.post(
+        '/api/validate-ontology',
         json={'ontology': None}
     )
     assert response.status_code == 200  # Returns empty graph on invalid data
-    
+
     # Test chat with empty query
-    response = test_client.post(
-        '/chat',
+    response = client.post(
+        '/api/chat',
         json={}
     )
     assert response.status_code == 400
 
-def test_health_check(test_client):
+    # Test Neo4j export with an unknown format
+    response = client.get('/api/export/neo4j?format=graphml')
+    assert response.status_code == 400
+
+def test_health_check(client):
     """Test health check endpoint"""
-    response = test_client.get('/health')
+    response = client.get('/health')
     assert response.status_code == 200
     data = json.loads(response.data)
     assert data['status'] == 'healthy'
@@ -0,0 +1,50 @@
+from entity_resolution import normalize_label, resolve_entities
+from graph_generator import generate_knowledge_graph
+
+def test_normalize_label():
+    assert normalize_label('Pump 1') == 'pump 1'
+    assert normalize_label('PUMP-1') == 'pump 1'
+    assert normalize_label(' pump1 ') == 'pump 1'
+
+def test_merges_variants_within_type_only():
+    ontology = {
+        'entities': [
+            ['Pump 1', 'Asset'], ['PUMP-1', 'Asset'], ['pump 1 ', 'Asset'],
+            ['Pump 2', 'Asset'], ['A001', 'Asset'], ['A002', 'Asset'],
+            ['Compressor Station', 'Facility'], ['Compresor Station', 'Facility'],
+            ['Maintenance', 'Asset'], ['Maintenance', 'Department'],
+        ],
+        'relationships': [
+            {'source': 'PUMP-1', 'target': 'Compresor Station', 'type': 'LOCATED_IN'},
+            {'source': 'Pump 1', 'target': 'Compressor Station', 'type': 'LOCATED_IN'},
+            {'source': 'Pump 2', 'target': 'Maintenance', 'type': 'BELONGS_TO',
+             'source_type': 'Asset', 'target_type': 'Department'},
+        ]
+    }
+    resolved = resolve_entities(ontology)
+
+    entities = set(resolved['entities'])
+    assert len([e for e in entities if normalize_label(e[0]) == 'pump 1']) == 1
+    assert ('Pump 2', 'Asset') in entities
+    assert {('A001', 'Asset'), ('A002', 'Asset')} <= entities
+    assert len([e for e in entities if e[1] == 'Facility']) == 1
+    assert {('Maintenance', 'Asset'), ('Maintenance', 'Department')} <= entities
+    assert resolved['resolution']['merged'] == 3
+
+    # Both LOCATED_IN relationships collapse onto the canonical labels
+    located = [r for r in resolved['relationships'] if r['type'] == 'LOCATED_IN']
+    assert len(located) == 1
+    assert (located[0]['source'], 'Asset') in entities
+    assert (located[0]['target'], 'Facility') in entities
+
+def test_graph_keeps_same_label_types_apart():
+    graph = generate_knowledge_graph({
+        'entities': [['Maintenance', 'Asset'], ['Maintenance', 'Department'], ['A001', 'Asset']],
+        'relationships': [
+            {'source': 'A001', 'target': 'Maintenance', 'type': 'BELONGS_TO',
+             'source_type': 'Asset', 'target_type': 'Department'},
+        ]
+    })
+    assert len(graph['nodes']) == 3
+    types = {node['id']: node['type'] for node in graph['nodes']}
+    assert [types[edge['target']] for edge in graph['edges']] == ['Department']
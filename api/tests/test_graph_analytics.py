@@ -0,0 +1,59 @@
+import pytest
+
+ONTOLOGY = {
+    'entities': [
+        ['A001', 'Asset'],
+        ['A002', 'Asset'],
+        ['Plant A', 'Facility'],
+        ['WO_1', 'WorkOrder'],
+        ['WO_2', 'WorkOrder'],
+        ['WO_3', 'WorkOrder'],
+        ['John Doe', 'Personnel'],
+        ['Jane Smith', 'Personnel'],
+        ['Spare Parts', 'Department'],
+    ],
+    'relationships': [
+        {'source': 'A001', 'target': 'Plant A', 'type': 'LOCATED_IN'},
+        {'source': 'A002', 'target': 'Plant A', 'type': 'LOCATED_IN'},
+        {'source': 'WO_1', 'target': 'A001', 'type': 'MAINTAINS'},
+        {'source': 'WO_2', 'target': 'A001', 'type': 'MAINTAINS'},
+        {'source': 'WO_3', 'target': 'A002', 'type': 'MAINTAINS'},
+        {'source': 'WO_1', 'target': 'John Doe', 'type': 'ASSIGNED_TO'},
+        {'source': 'WO_2', 'target': 'John Doe', 'type': 'ASSIGNED_TO'},
+        {'source': 'WO_3', 'target': 'Jane Smith', 'type': 'ASSIGNED_TO'},
+    ]
+}
+
+@pytest.fixture
+def analytics(client):
+    client.post('/api/validate-ontology', json={'ontology': ONTOLOGY})
+    response = client.get('/api/graph/analytics?k=5')
+    assert response.status_code == 200
+    return response.get_json()
+
+def test_degree_by_relationship_type(analytics):
+    assert analytics['node_count'] == 9
+    assert analytics['edge_count'] == 8
+    maintains = analytics['degree']['MAINTAINS']
+    assert maintains['edges'] == 3
+    assert maintains['in'] == {'nodes': 2, 'max': 2, 'mean': 1.5}
+    assert maintains['out'] == {'nodes': 3, 'max': 1, 'mean': 1.0}
+
+def test_components_and_islands(analytics):
+    components = analytics['components']
+    assert components['count'] == 2
+    assert components['largest'] == 8
+    assert components['isolated_nodes'] == 1
+    assert components['islands'] == [
+        {'size': 1, 'sample': {'id': components['islands'][0]['sample']['id'],
+                               'label': 'Spare Parts', 'type': 'Department'}}
+    ]
+
+def test_hotspot_rankings(analytics):
+    rankings = analytics['rankings']
+    assert [(r['label'], r['score']) for r in rankings['most_maintained_assets']] == [('A001', 2), ('A002', 1)]
+    assert [(r['label'], r['score']) for r in rankings['most_loaded_personnel']] == [('John Doe', 2), ('Jane Smith', 1)]
+    assert rankings['highest_degree'][0]['label'] == 'A001'
+
+def test_analytics_rejects_invalid_k(client):
+    assert client.get('/api/graph/analytics?k=0').status_code == 400
@@ -0,0 +1,157 @@
+import json
+from io import BytesIO
+
+import pytest
+
+from database import bump_graph_version, db
+from graph_changes import id_ranges, iter_change_events
+from models import Edge, GraphChange, Node
+
+ONTOLOGY = {
+    'entities': [['A001', 'Asset'], ['A002', 'Asset'], ['Plant A', 'Facility'], ['WO_1', 'WorkOrder']],
+    'relationships': [
+        {'source': 'A001', 'target': 'Plant A', 'type': 'LOCATED_IN'},
+        {'source': 'A002', 'target': 'Plant A', 'type': 'LOCATED_IN'},
+        {'source': 'WO_1', 'target': 'A001', 'type': 'MAINTAINS'},
+    ]
+}
+
+@pytest.fixture
+def feed(app):
+    # One poll per request: the stream ends after sending what is pending
+    app.config.update(GRAPH_CHANGES_MAX_SECONDS=0)
+    yield
+    app.config.update(GRAPH_CHANGES_MAX_SECONDS=300, GRAPH_CHANGES_RETENTION=1000,
+                      GRAPH_CHANGES_MAX_RANGES=10000, GRAPH_CHANGES_POLL_INTERVAL=1.0)
+
+def events(client, **kwargs):
+    """Parse the events of one stream into (event, id, data) tuples."""
+    response = client.get('/api/graph/changes', buffered=True, **kwargs)
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    parsed = []
+    for block in response.get_data(as_text=True).split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.splitlines() if not line.startswith(':'))
+        if 'event' in fields:
+            parsed.append((fields['event'], int(fields['id']), json.loads(fields['data'])))
+    return parsed
+
+def node_ids(app, **filters):
+    with app.app_context():
+        return {node.label: node.id for node in Node.query.filter_by(**filters)}
+
+def test_validate_and_patch_events_list_changed_ids(app, client, feed):
+    assert client.post('/api/validate-ontology', json={'ontology': ONTOLOGY}).status_code == 200
+    (event, version, change), = events(client, query_string={'since': 0})
+    assert (event, version, change['kind'], change['site']) == ('change', 1, 'validate', 'default')
+    ids = node_ids(app)
+    assert change['nodes']['added'] == id_ranges(ids.values()) == [[min(ids.values()), max(ids.values())]]
+    assert len(change['edges']['added']) == 1 and change['nodes']['removed'] == []
+
+    operations = [
+        {'op': 'add_entity', 'label': 'A003', 'type': 'Asset'},
+        {'op': 'add_relationship', 'source': 'A003', 'target': 'Plant A', 'type': 'LOCATED_IN'},
+        {'op': 'remove_entity', 'label': 'A002'},
+        {'op': 'rename_entity', 'label': 'WO_1', 'new_label': 'WO_9'},
+        {'op': 'rename_relationship', 'source': 'WO_9', 'target': 'A001', 'type': 'MAINTAINS',
+         'new_type': 'SERVICES'},
+        # Added and removed again: not part of the delta
+        {'op': 'add_entity', 'label': 'tmp', 'type': 'Asset'},
+        {'op': 'remove_entity', 'label': 'tmp'},
+    ]
+    assert client.patch('/api/ontology', json={'operations': operations}).status_code == 200
+    (event, version, change), = events(client, headers={'Last-Event-ID': '1'})
+    assert (event, version, change['kind']) == ('change', 2, 'patch')
+    with app.app_context():
+        a003 = Node.query.filter_by(label='A003').one()
+        new_edge = Edge.query.filter_by(source_id=a003.id).one()
+        services = Edge.query.filter_by(type='SERVICES').one()
+    assert change['nodes'] == {'added': [[a003.id, a003.id]], 'removed': [[ids['A002'], ids['A002']]],
+                               'updated': [{'id': ids['WO_1'], 'label': 'WO_9', 'type': 'WorkOrder'}]}
+    assert change['edges']['added'] == [[new_edge.id, new_edge.id]]
+    assert len(change['edges']['removed']) == 1
+    assert change['edges']['updated'] == [{'id': services.id, 'type': 'SERVICES'}]
+
+    # Up to date: nothing to send
+    assert events(client, query_string={'since': 2}) == []
+    assert events(client) == []
+
+def test_upload_clear_and_site_filter(app, client, feed):
+    for site in ('north', 'south'):
+        assert client.post('/api/validate-ontology', json={'ontology': ONTOLOGY, 'site': site}).status_code == 200
+    north = node_ids(app, site='north')
+
+    csv = b'Work Order ID,Asset ID,Facility Name\nWO_5,A005,Plant C\n'
+    response = client.post('/api/upload', data={'file': (BytesIO(csv), 'orders.csv'), 'site': 'north'},
+                           content_type='multipart/form-data')
+    assert response.status_code == 200
+
+    # Site feeds are numbered by the site's own versions
+    received = events(client, query_string={'since': 0, 'site': 'north'})
+    assert [(event, version, change['kind']) for event, version, change in received] == \
+        [('change', 1, 'validate'), ('change', 2, 'upload')]
+    assert received[1][2]['nodes']['removed'] == id_ranges(north.values())
+    assert len(received[1][2]['edges']['removed']) == 1
+    assert [version for _, version, _ in events(client, query_string={'since': 0, 'site': 'south'})] == [1]
+    assert events(client, query_string={'since': 1, 'site': 'south'}) == []
+    assert [(version, change['site']) for _, version, change in events(client, query_string={'since': 0})] == \
+        [(1, 'north'), (2, 'south'), (3, 'north')]
+
+def test_other_sites_keep_a_site_history(app, client, feed):
+    app.config.update(GRAPH_CHANGES_RETENTION=2)
+    assert client.post('/api/validate-ontology', json={'ontology': ONTOLOGY, 'site': 'south'}).status_code == 200
+    for n in range(3):
+        assert client.patch('/api/ontology', json={'site': 'north', 'operations': [
+            {'op': 'add_entity', 'label': f'A{n}', 'type': 'Asset'}]}).status_code == 200
+    assert [version for _, version, _ in events(client, query_string={'since': 0, 'site': 'south'})] == [1]
+    assert events(client, query_string={'since': 0, 'site': 'north'}) == [('reset', 3, {'version': 3})]
+    assert [version for _, version, _ in events(client, query_string={'since': 1, 'site': 'north'})] == [2, 3]
+
+def test_reset_when_history_is_unavailable(app, client, feed):
+    app.config.update(GRAPH_CHANGES_RETENTION=2)
+    for n in range(3):
+        assert client.patch('/api/ontology', json={'operations': [
+            {'op': 'add_entity', 'label': f'A{n}', 'type': 'Asset'}]}).status_code == 200
+    with app.app_context():
+        assert [change.version for change in GraphChange.query] == [2, 3]
+
+    assert events(client, query_string={'since': 0}) == [('reset', 3, {'version': 3})]
+    assert [version for _, version, _ in events(client, query_string={'since': 1})] == [2, 3]
+    # A client ahead of the database reloads as well
+    assert events(client, query_string={'since': 7}) == [('reset', 3, {'version': 3})]
+
+    # A version bumped without a recorded delta
+    with app.app_context():
+        bump_graph_version('default')
+        db.session.commit()
+    assert events(client, query_string={'since': 3}) == [('reset', 4, {'version': 4})]
+
+    # Changes too large to list are sent as a reset
+    app.config.update(GRAPH_CHANGES_MAX_RANGES=1)
+    assert client.post('/api/validate-ontology', json={'ontology': ONTOLOGY}).status_code == 200
+    assert events(client, query_string={'since': 4}) == [('reset', 5, {'version': 5})]
+
+def test_stream_limit_and_invalid_parameters(app, client, feed):
+    app.config.update(GRAPH_CHANGES_MAX_SECONDS=300, GRAPH_CHANGES_POLL_INTERVAL=0.01)
+    open_streams = [client.get('/api/graph/changes', buffered=False) for _ in range(3)]
+    try:
+        assert all(response.status_code == 200 for response in open_streams)
+        assert next(open_streams[0].response) == b'retry: 2000\n\n'
+        rejected = client.get('/api/graph/changes')
+        assert rejected.status_code == 503 and rejected.headers['Retry-After']
+    finally:
+        # Streams in one thread share the context stack; close the newest first
+        for response in reversed(open_streams):
+            response.close()
+    # Closing a stream frees its slot
+    app.config.update(GRAPH_CHANGES_MAX_SECONDS=0)
+    assert client.get('/api/graph/changes', buffered=True).status_code == 200
+
+    assert client.get('/api/graph/changes', query_string={'since': 'latest'}).status_code == 400
+    assert client.get('/api/graph/changes', query_string={'site': '../etc'}).status_code == 400
+
+def test_keepalive_comments(app):
+    with app.test_request_context():
+        stream = iter_change_events(0, poll_interval=0.01, keepalive=0, max_seconds=0.05)
+        chunks = list(stream)
+    assert chunks[0] == 'retry: 2000\n\n' and ': keepalive\n\n' in chunks[1:]
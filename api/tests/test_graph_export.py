@@ -0,0 +1,110 @@
+import json
+import pytest
+
+ONTOLOGY = {
+    'entities': [
+        ['A001', 'Asset'],
+        ['A002', 'Asset'],
+        ['Plant A', 'Facility'],
+        ['Plant B', 'Facility'],
+        ['WO_1', 'WorkOrder'],
+        ['WO_2', 'WorkOrder'],
+    ],
+    'relationships': [
+        {'source': 'A001', 'target': 'Plant A', 'type': 'LOCATED_IN'},
+        {'source': 'A002', 'target': 'Plant B', 'type': 'LOCATED_IN'},
+        {'source': 'WO_1', 'target': 'A001', 'type': 'MAINTAINS'},
+        {'source': 'WO_2', 'target': 'A002', 'type': 'MAINTAINS'},
+    ]
+}
+
+@pytest.fixture
+def loaded_client(client):
+    response = client.post('/api/validate-ontology', json={'ontology': ONTOLOGY})
+    assert response.status_code == 200
+    return client
+
+def read_ndjson(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+def test_export_streams_all_nodes_and_edges(loaded_client):
+    response = loaded_client.get('/api/graph')
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+
+    records = read_ndjson(response)
+    assert records[0] == {'kind': 'meta', 'version': 1}
+    assert records[-1] == {'kind': 'end', 'next_after': None}
+    assert len([r for r in records if r['kind'] == 'node']) == 6
+    assert len([r for r in records if r['kind'] == 'edge']) == 4
+
+def test_export_keyset_pagination(loaded_client):
+    first = read_ndjson(loaded_client.get('/api/graph?limit=4'))
+    cursor = first[-1]['next_after']
+    assert cursor is not None
+
+    second = read_ndjson(loaded_client.get(f'/api/graph?after={cursor}&limit=4'))
+    assert second[-1]['next_after'] is None
+
+    ids = [r['id'] for r in first + second if r['kind'] == 'node']
+    assert len(ids) == len(set(ids)) == 6
+    edges = [r for r in first + second if r['kind'] == 'edge']
+    assert len(edges) == 4
+
+def test_export_filters(loaded_client):
+    records = read_ndjson(loaded_client.get('/api/graph?type=Asset'))
+    assert {r['label'] for r in records if r['kind'] == 'node'} == {'A001', 'A002'}
+    assert not [r for r in records if r['kind'] == 'edge']
+
+    records = read_ndjson(loaded_client.get('/api/graph?facility=Plant A'))
+    assert {r['label'] for r in records if r['kind'] == 'node'} == {'Plant A', 'A001', 'WO_1'}
+    assert len([r for r in records if r['kind'] == 'edge']) == 2
+
+def test_export_etag_changes_with_graph_version(loaded_client):
+    response = loaded_client.get('/api/graph')
+    response.get_data()
+    etag = response.headers['ETag']
+
+    cached = loaded_client.get('/api/graph', headers={'If-None-Match': etag})
+    assert cached.status_code == 304
+
+    loaded_client.post('/api/validate-ontology', json={'ontology': ONTOLOGY})
+    refreshed = loaded_client.get('/api/graph', headers={'If-None-Match': etag})
+    refreshed.get_data()
+    assert refreshed.status_code == 200
+    assert refreshed.headers['ETag'] != etag
+
+def test_export_rejects_invalid_pagination(loaded_client):
+    assert loaded_client.get('/api/graph?limit=0').status_code == 400
+    # A malformed cursor is an error, not a restart from the first page
+    for after in ('abc', '-1', '1.5'):
+        response = loaded_client.get(f'/api/graph?after={after}')
+        assert response.status_code == 400
+        assert response.get_json() == {'error': "'after' must be a non-negative integer"}
+
+def test_export_includes_precomputed_layout(loaded_client):
+    nodes = [r for r in read_ndjson(loaded_client.get('/api/graph')) if r['kind'] == 'node']
+    assert all(0 <= r['x'] <= 1000 and 0 <= r['y'] <= 1000 for r in nodes)
+    assert len({(r['x'], r['y']) for r in nodes}) == len(nodes)
+
+    nodes = [r for r in read_ndjson(loaded_client.get('/api/graph?layout=0')) if r['kind'] == 'node']
+    assert not any('x' in r for r in nodes)
+
+def test_validate_response_includes_layout(client):
+    response = client.post('/api/validate-ontology', json={'ontology': ONTOLOGY})
+    nodes = response.get_json()['graph']['nodes']
+    assert all('x' in node and 'y' in node for node in nodes)
+
+def test_large_layout_keeps_dense_clusters_apart():
+    import numpy as np
+    from graph_layout import LAYOUT_SIZE, force_layout
+
+    # Above the exact-repulsion limit: 1500 nodes attached to 3 hubs
+    n = 1500
+    src = np.arange(3, n)
+    tgt = np.arange(3, n) % 3
+    pos = force_layout(n, src, tgt)
+    dist2 = ((pos[:, None, :] - pos[None, :, :]) ** 2).sum(axis=2)
+    np.fill_diagonal(dist2, np.inf)
+    # Nodes sharing a grid cell still repel each other
+    assert np.sqrt(dist2.min()) > 0.02 * LAYOUT_SIZE / np.sqrt(n)
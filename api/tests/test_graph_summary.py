@@ -0,0 +1,97 @@
+import itertools
+
+import pytest
+
+ONTOLOGY = {
+    'entities': [
+        ['A001', 'Asset'],
+        ['A002', 'Asset'],
+        ['A003', 'Asset'],
+        ['Plant A', 'Facility'],
+        ['Plant B', 'Facility'],
+        ['WO_1', 'WorkOrder'],
+        ['WO_2', 'WorkOrder'],
+        ['WO_3', 'WorkOrder'],
+    ],
+    'relationships': [
+        {'source': 'A001', 'target': 'Plant A', 'type': 'LOCATED_IN'},
+        {'source': 'A002', 'target': 'Plant A', 'type': 'LOCATED_IN'},
+        {'source': 'A003', 'target': 'Plant B', 'type': 'LOCATED_IN'},
+        {'source': 'WO_1', 'target': 'A001', 'type': 'MAINTAINS'},
+        {'source': 'WO_2', 'target': 'A002', 'type': 'MAINTAINS'},
+        {'source': 'WO_3', 'target': 'A003', 'type': 'MAINTAINS'},
+    ]
+}
+
+@pytest.fixture
+def loaded_client(client):
+    response = client.post('/api/validate-ontology', json={'ontology': ONTOLOGY})
+    assert response.status_code == 200
+    return client
+
+def test_summary_by_type(loaded_client):
+    data = loaded_client.get('/api/graph/summary?group_by=type').get_json()
+    counts = {s['id']: s['count'] for s in data['supernodes']}
+    assert counts == {'type:Asset': 3, 'type:Facility': 2, 'type:WorkOrder': 3}
+
+    edges = {(e['source'], e['target'], e['type']): e['count'] for e in data['superedges']}
+    assert edges == {
+        ('type:Asset', 'type:Facility', 'LOCATED_IN'): 3,
+        ('type:WorkOrder', 'type:Asset', 'MAINTAINS'): 3,
+    }
+
+def test_summary_by_facility_and_expand(loaded_client):
+    data = loaded_client.get('/api/graph/summary?group_by=facility').get_json()
+    by_label = {s['label']: s for s in data['supernodes']}
+    assert by_label['Plant A / Asset']['count'] == 2
+    assert by_label['Plant A / WorkOrder']['count'] == 2
+    assert by_label['Plant B / Asset']['count'] == 1
+
+    supernode_id = by_label['Plant A / Asset']['id']
+    first = loaded_client.get(f'/api/graph/supernodes/{supernode_id}?limit=1').get_json()
+    assert first['total'] == 2
+    assert len(first['nodes']) == 1
+    second = loaded_client.get(
+        f"/api/graph/supernodes/{supernode_id}?after={first['next_after']}"
+    ).get_json()
+    assert second['next_after'] is None
+    assert {n['label'] for n in first['nodes'] + second['nodes']} == {'A001', 'A002'}
+
+def test_summary_errors(loaded_client):
+    assert loaded_client.get('/api/graph/summary?group_by=bogus').status_code == 400
+    assert loaded_client.get('/api/graph/supernodes/type:Missing').status_code == 404
+    assert loaded_client.get('/api/graph/supernodes/type:Asset?after=abc').status_code == 400
+    assert loaded_client.get('/api/graph/supernodes/type:Asset?after=-1').status_code == 400
+
+def test_summary_etag(loaded_client):
+    etag = loaded_client.get('/api/graph/summary').headers['ETag']
+    response = loaded_client.get('/api/graph/summary', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+
+def test_summary_is_reloaded_when_the_graph_changes(app, loaded_client, monkeypatch):
+    import graph_summary
+    from database import bump_graph_version, db
+    get_graph_version = graph_summary.get_graph_version
+    calls = []
+
+    def write_during_load(session, site=None):
+        calls.append(site)
+        if len(calls) == 2:
+            # A write committed between reading the version and re-checking it
+            bump_graph_version('default')
+            db.session.commit()
+        return get_graph_version(session, site)
+
+    monkeypatch.setattr(graph_summary, 'get_graph_version', write_during_load)
+    with app.app_context():
+        summary = graph_summary.get_summary(1, 'type')
+        assert len(calls) == 4 and summary.version == 2
+        # Not cached under the version it does not describe
+        assert graph_summary.get_summary(1, 'type') is not summary
+        assert graph_summary.get_summary(2, 'type') is graph_summary.get_summary(2, 'type')
+
+    # Every read sees a newer version
+    versions = itertools.count(3)
+    monkeypatch.setattr(graph_summary, 'get_graph_version', lambda session, site=None: next(versions))
+    with app.app_context(), pytest.raises(RuntimeError, match='changed during each of 3'):
+        graph_summary.build_summary('type')
@@ -0,0 +1,50 @@
+import time
+
+import pytest
+from openai import OpenAI
+
+from loadtest.run import Sample, parse_mix, percentile, summarize
+from loadtest.stub_llm import StubLLMServer, StubSettings
+
+@pytest.fixture
+def stub():
+    server = StubLLMServer(settings=StubSettings(latency=0.05, tokens_per_second=1000, completion_tokens=20,
+                                                 jitter=0)).start()
+    yield server
+    server.stop()
+
+def test_stub_serves_openai_chat_completions(stub):
+    client = OpenAI(api_key='test', base_url=stub.base_url)
+    start = time.perf_counter()
+    response = client.chat.completions.create(
+        model='gpt-4-turbo-preview',
+        messages=[{'role': 'user', 'content': 'How many work orders?'}],
+        max_tokens=10
+    )
+    assert time.perf_counter() - start >= 0.05
+    assert response.choices[0].message.content
+    assert response.usage.completion_tokens == 10
+
+    chunks = list(client.chat.completions.create(
+        model='gpt-4-turbo-preview', messages=[{'role': 'user', 'content': 'hi'}], stream=True
+    ))
+    assert sum(1 for chunk in chunks if chunk.choices[0].delta.content) == 20
+    assert stub.requests == 2
+
+def test_summary_percentiles_and_errors():
+    samples = [Sample('chat', 200, (i + 1) / 1000, 0.0) for i in range(100)]
+    samples += [Sample('upload', 500, 0.5, 0.0), Sample('upload', 0, 1.0, 0.0), Sample('upload', 503, 0.01, 0.0)]
+    report = summarize(samples, elapsed=2.0)
+
+    chat = report['endpoints']['chat']
+    assert (chat['p50_ms'], chat['p95_ms'], chat['p99_ms']) == (50.0, 95.0, 99.0)
+    assert chat['throughput_rps'] == 50.0
+    assert report['endpoints']['upload']['errors'] == 3
+    assert report['endpoints']['upload']['shed'] == 1
+    assert report['endpoints']['all']['requests'] == 103
+    assert percentile([], 0.5) == 0.0
+
+def test_parse_mix():
+    assert parse_mix('chat=8, upload=1,validate') == {'chat': 8.0, 'upload': 1.0, 'validate': 1.0}
+    with pytest.raises(ValueError):
+        parse_mix('search=1')
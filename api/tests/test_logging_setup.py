@@ -0,0 +1,71 @@
+import io
+import logging
+import os
+
+import pytest
+
+from logging_setup import SamplingFilter, configure_logging, parse_sampling, shutdown_logging, truncated
+
+def make_record(name, level=logging.DEBUG, msg='message %s', args=('x',)):
+    return logging.LogRecord(name, level, __file__, 1, msg, args, None)
+
+def test_sampling_keeps_every_nth_record_and_all_warnings():
+    sampler = SamplingFilter({'graph_generator': 10})
+    kept = sum(sampler.filter(make_record('graph_generator')) for _ in range(100))
+    assert kept == 10
+    assert all(sampler.filter(make_record('graph_generator', logging.WARNING)) for _ in range(5))
+    assert all(sampler.filter(make_record('routes')) for _ in range(5))
+
+def test_truncated_bounds_large_payloads():
+    text = str(truncated({'rows': list(range(100000))}, limit=100))
+    assert len(text) <= 130
+    assert str(truncated('a' * 50, limit=10)).startswith('a' * 10 + '... [truncated 40 chars]')
+
+def test_parse_sampling():
+    assert parse_sampling('graph_generator=100, routes=5,') == {'graph_generator': 100, 'routes': 5}
+
+def test_queue_pipeline_renders_messages_at_the_call():
+    stream = io.StringIO()
+    configure_logging('production', max_message_length=40, stream=stream)
+    try:
+        test_logger = logging.getLogger('logging_setup_test')
+        test_logger.debug("dropped below INFO %s", 'x')
+        test_logger.info("kept %s", 'y' * 100)
+        # Arguments changed after the call do not change the record
+        rows = ['before']
+        test_logger.info("rows %s", rows)
+        rows[0] = 'after'
+        try:
+            raise ValueError('boom')
+        except ValueError:
+            test_logger.error("failed", exc_info=True)
+    finally:
+        shutdown_logging()
+        configure_logging()
+    output = stream.getvalue()
+    assert 'dropped' not in output
+    assert 'kept ' + 'y' * 35 + '... [truncated' in output
+    assert 'ValueError: boom' in output
+    assert "rows ['before']" in output and 'after' not in output
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs os.fork')
+def test_forked_child_emits_its_records():
+    read_fd, write_fd = os.pipe()
+    stream = os.fdopen(write_fd, 'w')
+    configure_logging(stream=stream)
+    try:
+        pid = os.fork()
+        if pid == 0:
+            # Child: log, flush the listener and leave without pytest teardown
+            try:
+                logging.getLogger('logging_setup_test').warning("from child %s", os.getpid())
+                shutdown_logging()
+            finally:
+                os._exit(0)
+        os.waitpid(pid, 0)
+    finally:
+        shutdown_logging()
+        stream.close()
+        configure_logging()
+    with os.fdopen(read_fd) as output:
+        assert f'from child {pid}' in output.read()
@@ -0,0 +1,50 @@
+from io import BytesIO
+
+import pandas as pd
+
+from metrics import Histogram, span, STAGE_LATENCY
+
+def upload_csv(client):
+    df = pd.DataFrame({
+        'Work Order ID': ['WO001', 'WO002'],
+        'Asset ID': ['A001', 'A002'],
+        'Facility Name': ['Plant A', 'Plant B'],
+    })
+    data = BytesIO(df.to_csv(index=False).encode('utf-8'))
+    return client.post('/api/upload', data={'file': (data, 'test.csv')},
+                       content_type='multipart/form-data')
+
+def test_metrics_endpoint_reports_stages_requests_and_sql(client):
+    ontology = upload_csv(client).get_json()['ontology']
+    assert client.post('/api/validate-ontology', json={'ontology': ontology}).status_code == 200
+
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    body = response.get_data(as_text=True)
+
+    for stage in ('read_csv', 'extract_ontology', 'graph_build', 'persistence', 'orm_flush', 'commit'):
+        assert f'stage_duration_seconds_count{{stage="{stage}"}}' in body
+    assert 'http_request_duration_seconds_count{endpoint="upload_file",method="POST",status="200"}' in body
+    assert 'db_statements_total{operation="INSERT",stage="orm_flush"}' in body
+    assert '# TYPE db_statement_duration_seconds histogram' in body
+
+def test_span_records_duration_and_errors():
+    before = STAGE_LATENCY.count(stage='unit_test_stage')
+    try:
+        with span('unit_test_stage'):
+            raise RuntimeError('boom')
+    except RuntimeError:
+        pass
+    assert STAGE_LATENCY.count(stage='unit_test_stage') == before + 1
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram('unit_latency_seconds', 'Test histogram', ('op',), buckets=(0.1, 1.0))
+    histogram.observe(0.05, op='a')
+    histogram.observe(0.5, op='a')
+
+    lines = histogram.render()
+    assert 'unit_latency_seconds_bucket{op="a",le="0.1"} 1' in lines
+    assert 'unit_latency_seconds_bucket{op="a",le="1"} 2' in lines
+    assert 'unit_latency_seconds_bucket{op="a",le="+Inf"} 2' in lines
+    assert 'unit_latency_seconds_count{op="a"} 2' in lines
@@ -0,0 +1,158 @@
+import csv
+import io
+import json
+import os
+import zipfile
+
+import pytest
+
+from neo4j_export import cypher_name, export_admin_csv, export_cypher, verify_export
+
+ONTOLOGY = {
+    'entities': [
+        ['A001', 'Asset'],
+        ['A002', 'Asset'],
+        ['Plant "A", North', 'Facility'],
+        ['WO_1', 'WorkOrder'],
+        ['WO_2', 'WorkOrder'],
+    ],
+    'relationships': [
+        {'source': 'A001', 'target': 'Plant "A", North', 'type': 'LOCATED_IN'},
+        {'source': 'A002', 'target': 'Plant "A", North', 'type': 'LOCATED_IN'},
+        {'source': 'WO_1', 'target': 'A001', 'type': 'MAINTAINS'},
+        {'source': 'WO_2', 'target': 'A002', 'type': 'MAINTAINS'},
+    ]
+}
+
+def load(client):
+    assert client.post('/api/validate-ontology', json={'ontology': ONTOLOGY}).status_code == 200
+
+def read_csv(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        return list(csv.reader(f))
+
+def test_admin_import_files_split_by_type(app, client, tmp_path):
+    load(client)
+    with app.app_context():
+        manifest = export_admin_csv(str(tmp_path), batch_size=2)
+
+    assert read_csv(tmp_path / 'nodes_Asset.header.csv') == [['id:ID(Node)', 'label', 'properties']]
+    assert sorted(row[1] for row in read_csv(tmp_path / 'nodes_Asset.csv')) == ['A001', 'A002']
+    assert [row[1] for row in read_csv(tmp_path / 'nodes_Facility.csv')] == ['Plant "A", North']
+    assert read_csv(tmp_path / 'relationships_MAINTAINS.header.csv') == [[':START_ID(Node)', ':END_ID(Node)', 'id:long']]
+
+    # Every relationship endpoint is an exported node id
+    node_ids = {row[0] for name in os.listdir(tmp_path) if name.startswith('nodes_') and not name.endswith('header.csv')
+                for row in read_csv(tmp_path / name)}
+    relationships = read_csv(tmp_path / 'relationships_LOCATED_IN.csv') + read_csv(tmp_path / 'relationships_MAINTAINS.csv')
+    assert len(relationships) == 4
+    assert all(row[0] in node_ids and row[1] in node_ids for row in relationships)
+
+    script = (tmp_path / 'import.sh').read_text()
+    assert '--nodes=Node:Asset=nodes_Asset.header.csv,nodes_Asset.csv' in script
+    assert '--relationships=LOCATED_IN=relationships_LOCATED_IN.header.csv,relationships_LOCATED_IN.csv' in script
+    assert manifest['files']['nodes_WorkOrder.csv']['rows'] == 2
+    assert verify_export(str(tmp_path)) == []
+
+def test_export_is_redone_when_the_graph_changes(app, client, tmp_path, monkeypatch):
+    import neo4j_export
+    from database import bump_graph_version, db
+    load(client)
+    iter_edge_batches = neo4j_export.iter_edge_batches
+    calls = []
+
+    def write_during_export(*args):
+        calls.append(args)
+        if len(calls) == 1:
+            # A write committed between reading the nodes and the relationships
+            operations = [{'op': 'add_relationship', 'source': 'A002', 'target': 'WO_1', 'type': 'FEEDS'}]
+            assert client.patch('/api/ontology', json={'operations': operations}).status_code == 200
+        return iter_edge_batches(*args)
+
+    monkeypatch.setattr(neo4j_export, 'iter_edge_batches', write_during_export)
+    with app.app_context():
+        manifest = export_admin_csv(str(tmp_path))
+    assert len(calls) == 2
+    assert manifest['graph_version'] == 2
+    assert manifest['files']['relationships_FEEDS.csv']['rows'] == 1
+    assert verify_export(str(tmp_path)) == []
+
+    def write_always(*args):
+        bump_graph_version('default')
+        db.session.commit()
+        return iter_edge_batches(*args)
+
+    monkeypatch.setattr(neo4j_export, 'iter_edge_batches', write_always)
+    with app.app_context():
+        with pytest.raises(RuntimeError, match='changed during each of 2'):
+            export_admin_csv(str(tmp_path / 'csv'), attempts=2)
+        with pytest.raises(RuntimeError, match='changed during each of 2'):
+            export_cypher(str(tmp_path / 'cypher'), attempts=2)
+    # Files of abandoned attempts are not left behind
+    assert os.listdir(tmp_path / 'csv') == []
+
+def test_verify_detects_tampering(app, client, tmp_path):
+    load(client)
+    with app.app_context():
+        export_admin_csv(str(tmp_path))
+    with open(tmp_path / 'nodes_Asset.csv', 'a', encoding='utf-8') as f:
+        f.write('99,extra\n')
+    os.remove(tmp_path / 'relationships_MAINTAINS.csv')
+
+    problems = verify_export(str(tmp_path))
+    assert 'nodes_Asset.csv: checksum mismatch' in problems
+    assert 'nodes_Asset.csv:3: expected 3 columns, found 2' in problems
+    assert 'relationships_MAINTAINS.csv: missing' in problems
+
+def test_cypher_export_batches_unwind_statements(app, client, tmp_path):
+    load(client)
+    with app.app_context():
+        manifest = export_cypher(str(tmp_path), batch_size=1)
+
+    script = (tmp_path / 'import.cypher').read_text()
+    statements = [s.strip() for s in script.split(';\n') if s.strip()]
+    assert statements[0].startswith('CREATE CONSTRAINT node_id IF NOT EXISTS FOR (n:Node)')
+    # 5 nodes and 4 relationships, one row per statement
+    assert len(statements) == 1 + 5 + 4 == manifest['files']['import.cypher']['statements']
+    assert 'CREATE (n:Node:`Facility` {id: row.id' in script
+    assert 'label: "Plant \\"A\\", North"' in script
+    assert 'CREATE (s)-[:`MAINTAINS` {id: row.id}]->(t)' in script
+    assert verify_export(str(tmp_path)) == []
+
+    with app.app_context():
+        export_cypher(str(tmp_path / 'batched'), batch_size=1000)
+    batched = (tmp_path / 'batched' / 'import.cypher').read_text()
+    # One statement per node type and per relationship type
+    assert batched.count('UNWIND') == 3 + 2
+
+def test_cypher_name_escapes_backticks():
+    assert cypher_name('Work`Order') == '`Work``Order`'
+
+def test_export_endpoint_streams_cypher_and_zip(client):
+    load(client)
+    response = client.get('/api/export/neo4j?batch_size=2')
+    assert response.status_code == 200
+    assert response.headers['Content-Disposition'] == 'attachment; filename=graph-v1.cypher'
+    assert response.get_data(as_text=True).count('UNWIND') == 5
+
+    response = client.get('/api/export/neo4j?format=csv')
+    assert response.status_code == 200
+    assert response.mimetype == 'application/zip'
+    with zipfile.ZipFile(io.BytesIO(response.get_data())) as archive:
+        assert 'import.sh' in archive.namelist()
+        manifest = json.loads(archive.read('manifest.json'))
+        assert manifest['files']['relationships_LOCATED_IN.csv']['rows'] == 2
+
+    assert client.get('/api/export/neo4j?format=graphml').status_code == 400
+    assert client.get('/api/export/neo4j?batch_size=0').status_code == 400
+
+def test_export_cli_and_verify(app, client, runner, tmp_path):
+    load(client)
+    result = runner.invoke(args=['export-neo4j', str(tmp_path), '--format', 'cypher', '--batch-size', '2'])
+    assert result.exit_code == 0, result.output
+    assert 'for graph version 1' in result.output
+
+    result = runner.invoke(args=['verify-neo4j-export', str(tmp_path)])
+    assert result.exit_code == 0 and 'intact' in result.output
+    (tmp_path / 'import.cypher').write_text('')
+    assert runner.invoke(args=['verify-neo4j-export', str(tmp_path)]).exit_code != 0
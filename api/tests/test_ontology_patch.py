@@ -0,0 +1,111 @@
+import pytest
+
+from database import get_graph_version
+from models import Node, Edge
+from ontology_patch import PatchError, validate_operations
+
+ONTOLOGY = {
+    'entities': [
+        ['A001', 'Asset'],
+        ['A002', 'Asset'],
+        ['Plant A', 'Facility'],
+        ['WO_1', 'WorkOrder'],
+        ['WO_2', 'WorkOrder'],
+    ],
+    'relationships': [
+        {'source': 'A001', 'target': 'Plant A', 'type': 'LOCATED_IN'},
+        {'source': 'A002', 'target': 'Plant A', 'type': 'LOCATED_IN'},
+        {'source': 'WO_1', 'target': 'A001', 'type': 'MAINTAINS'},
+        {'source': 'WO_2', 'target': 'A002', 'type': 'MAINTAINS'},
+    ]
+}
+
+@pytest.fixture
+def loaded_client(client):
+    assert client.post('/api/validate-ontology', json={'ontology': ONTOLOGY}).status_code == 200
+    return client
+
+def patch(client, operations, status=200, **extra):
+    response = client.patch('/api/ontology', json={'operations': operations, **extra})
+    assert response.status_code == status, response.get_json()
+    return response.get_json()
+
+def graph(app):
+    with app.app_context():
+        nodes = {node.id: (node.label, node.type) for node in Node.query.all()}
+        edges = {(nodes[edge.source_id][0], edge.type, nodes[edge.target_id][0]) for edge in Edge.query.all()}
+    return set(nodes.values()), edges
+
+def test_remove_entity_cascades_to_its_edges(app, loaded_client):
+    result = patch(loaded_client, [{'op': 'remove_entity', 'label': 'A001'}])
+    assert result['version'] == 2
+    assert result['changes']['nodes_removed'] == 1 and result['changes']['edges_removed'] == 2
+
+    nodes, edges = graph(app)
+    assert ('A001', 'Asset') not in nodes and len(nodes) == 4
+    assert edges == {('A002', 'LOCATED_IN', 'Plant A'), ('WO_2', 'MAINTAINS', 'A002')}
+    with app.app_context():
+        assert get_graph_version() == 2
+
+def test_add_and_rename_in_one_patch(app, loaded_client):
+    result = patch(loaded_client, [
+        {'op': 'add_entity', 'label': 'Plant B', 'type': 'Facility'},
+        {'op': 'remove_relationship', 'source': 'A002', 'target': 'Plant A', 'type': 'LOCATED_IN'},
+        {'op': 'add_relationship', 'source': 'A002', 'target': 'Plant B', 'type': 'LOCATED_IN'},
+        {'op': 'rename_entity', 'label': 'WO_2', 'new_label': 'WO_20'},
+        {'op': 'rename_relationship', 'source': 'WO_1', 'target': 'A001', 'type': 'MAINTAINS',
+         'new_type': 'INSPECTS'},
+    ])
+    assert result['changes'] == {'nodes_added': 1, 'nodes_removed': 0, 'nodes_updated': 1,
+                                 'edges_added': 1, 'edges_removed': 1, 'edges_updated': 1}
+
+    nodes, edges = graph(app)
+    assert ('Plant B', 'Facility') in nodes and ('WO_20', 'WorkOrder') in nodes
+    assert edges == {('A001', 'LOCATED_IN', 'Plant A'), ('A002', 'LOCATED_IN', 'Plant B'),
+                     ('WO_1', 'INSPECTS', 'A001'), ('WO_20', 'MAINTAINS', 'A002')}
+
+def test_failed_patch_applies_nothing(app, loaded_client):
+    before = graph(app)
+    result = patch(loaded_client, [
+        {'op': 'remove_entity', 'label': 'A001'},
+        {'op': 'rename_entity', 'label': 'A002', 'new_label': 'Plant A', 'new_type': 'Facility'},
+    ], status=400)
+    assert result['operation'] == 1 and 'already exists' in result['error']
+    assert graph(app) == before
+    with app.app_context():
+        assert get_graph_version() == 1
+
+def test_patch_errors(loaded_client):
+    loaded_client.patch('/api/ontology', json={'operations': [{'op': 'add_entity', 'label': 'A001', 'type': 'Tag'}]})
+    # 'A001' now names an Asset and a Tag
+    result = patch(loaded_client, [{'op': 'remove_entity', 'label': 'A001'}], status=400)
+    assert 'ambiguous' in result['error']
+    result = patch(loaded_client, [{'op': 'remove_relationship', 'source': 'WO_1', 'source_type': 'WorkOrder',
+                                    'target': 'Plant A', 'type': 'MAINTAINS'}], status=400)
+    assert 'not found' in result['error']
+    result = patch(loaded_client, [{'op': 'add_relationship', 'source': 'A002', 'target': 'Plant A',
+                                    'type': 'LOCATED_IN'}], status=400)
+    assert 'already exists' in result['error']
+    assert patch(loaded_client, [{'op': 'remove_entity', 'label': 'WO_1'}], status=400, site='bad site')
+    assert loaded_client.patch('/api/ontology', json={}).status_code == 400
+
+def test_validate_operations():
+    with pytest.raises(PatchError, match="op must be one of"):
+        validate_operations([{'op': 'drop_table'}])
+    with pytest.raises(PatchError, match="'type' is required"):
+        validate_operations([{'op': 'add_entity', 'label': 'A'}])
+    with pytest.raises(PatchError, match="needs 'new_label' or 'new_type'"):
+        validate_operations([{'op': 'rename_entity', 'label': 'A'}])
+    with pytest.raises(PatchError, match="1-50 characters"):
+        validate_operations([{'op': 'add_entity', 'label': 'A', 'type': 'T' * 51}])
+    with pytest.raises(PatchError, match="limited to 1 operations"):
+        validate_operations([{'op': 'remove_entity', 'label': 'A'}] * 2, max_operations=1)
+
+def test_patch_is_site_scoped(app, client):
+    client.post('/api/validate-ontology', json={'ontology': ONTOLOGY, 'site': 'north'})
+    client.post('/api/validate-ontology', json={'ontology': ONTOLOGY, 'site': 'south'})
+    patch(client, [{'op': 'remove_entity', 'label': 'Plant A'}], site='north')
+    with app.app_context():
+        assert Node.query.filter_by(site='north', label='Plant A').count() == 0
+        assert Node.query.filter_by(site='south', label='Plant A').count() == 1
+        assert Edge.query.filter_by(site='south').count() == 4
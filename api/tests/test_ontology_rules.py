@@ -0,0 +1,103 @@
+import json
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ontology_processor import extract_ontology
+from ontology_rules import DEFAULT_RULES, RuleError, compile_rules
+
+def work_orders():
+    return pd.DataFrame({
+        'Work Order ID': ['1', '2', '3', None],
+        'Asset ID': [' A001 ', 'A002', '   ', 'A004'],
+        'Asset Name': ['Pump', np.nan, 'Fan', 'Valve'],
+        'Facility Name': ['Plant A', 'Plant B', 'Plant A', None],
+        'Status': ['Open', 'Cancelled', 'Open', 'Closed'],
+        'Cost': [100.0, 2500.0, np.nan, 40.0],
+    })
+
+def test_default_rules_match_builtin_extraction():
+    ontology = extract_ontology(work_orders())
+    assert ontology['entities'] == sorted({
+        ('A001', 'Asset'), ('A002', 'Asset'), ('A004', 'Asset'),
+        ('Pump', 'Asset'), ('Fan', 'Asset'), ('Valve', 'Asset'),
+        ('Plant A', 'Facility'), ('Plant B', 'Facility'),
+        ('WO_1', 'WorkOrder'), ('WO_2', 'WorkOrder'), ('WO_3', 'WorkOrder'),
+    })
+    # Row order first, then rule order within a row
+    assert [(r['source'], r['type'], r['target']) for r in ontology['relationships']] == [
+        ('WO_1', 'MAINTAINS', 'A001'),
+        ('A001', 'HAS_NAME', 'Pump'),
+        ('A001', 'LOCATED_IN', 'Plant A'),
+        ('WO_2', 'MAINTAINS', 'A002'),
+        ('A002', 'LOCATED_IN', 'Plant B'),
+        ('A004', 'HAS_NAME', 'Valve'),
+    ]
+    assert ontology['relationships'][0]['source_type'] == 'WorkOrder'
+    assert ontology['attributes'] == list(work_orders().columns)
+
+def test_custom_rules_with_filters():
+    rules = {
+        'entities': [
+            {'column': 'Asset ID', 'type': 'Equipment', 'where': [{'column': 'Cost', 'op': 'ge', 'value': 50}]},
+            {'column': 'Status', 'type': 'Status'},
+        ],
+        'relationships': [
+            {'source': 'Asset ID', 'target': 'Status', 'type': 'HAS_STATUS',
+             'where': [{'column': 'Status', 'op': 'not_in', 'value': ['Cancelled']}]},
+            {'source': 'Asset Name', 'target': 'Facility Name', 'type': 'NAMED_AT',
+             'source_type': 'Label', 'target_type': 'Site', 'where': [{'column': 'Asset Name', 'op': 'matches',
+                                                                       'value': '^(P|F)'}]},
+        ]
+    }
+    ontology = extract_ontology(work_orders(), rules)
+    assert [e for e in ontology['entities'] if e[1] == 'Equipment'] == [('A001', 'Equipment'), ('A002', 'Equipment')]
+    assert [(r['source'], r['target'], r['type']) for r in ontology['relationships']] == [
+        ('A001', 'Open', 'HAS_STATUS'),
+        ('Pump', 'Plant A', 'NAMED_AT'),
+        ('Fan', 'Plant A', 'NAMED_AT'),
+        ('A004', 'Closed', 'HAS_STATUS'),
+    ]
+    assert ontology['relationships'][1]['source_type'] == 'Label'
+
+@pytest.mark.parametrize('rules, message', [
+    ({'entities': [{'column': 'Asset ID'}]}, "'type' must be a non-empty string"),
+    ({'relationships': [{'source': 'A', 'target': 'B', 'type': 'X'}]}, "no entity rule for column 'A'"),
+    ({'entities': [{'column': 'A', 'type': 'T', 'where': [{'column': 'A', 'op': 'like', 'value': 1}]}]},
+     "unknown filter op 'like'"),
+    ({'entities': [{'column': 'A', 'type': 'T', 'where': [{'column': 'A', 'op': 'gt', 'value': 'x'}]}]},
+     "needs a numeric value"),
+    ({'entities': [{'column': 'A', 'type': 'T'}],
+      'relationships': [{'source': 'A', 'target': 'A', 'type': 'X', 'cardinality': 'single'}]},
+     "'cardinality' must be one of"),
+])
+def test_invalid_rules_are_rejected(rules, message):
+    with pytest.raises(RuleError, match=message):
+        compile_rules(rules)
+
+def test_compiled_plans_are_cached_by_rule_set_hash():
+    plan = compile_rules(json.loads(json.dumps(DEFAULT_RULES)))
+    assert plan is compile_rules()
+    assert plan.fingerprint == compile_rules(DEFAULT_RULES).fingerprint
+
+def test_rules_api_and_upload_with_rules(client):
+    default = client.get('/api/rules/default').get_json()
+    assert default['rules'] == DEFAULT_RULES
+
+    rules = {'entities': [{'column': 'Facility Name', 'type': 'Site'}], 'relationships': []}
+    compiled = client.post('/api/rules/compile', json={'rules': rules}).get_json()
+    assert compiled['entity_rules'] == 1 and compiled['rule_set'] != default['rule_set']
+    assert client.post('/api/rules/compile', json={'rules': {'entities': 'x'}}).status_code == 400
+
+    csv = work_orders().to_csv(index=False).encode('utf-8')
+    response = client.post('/api/upload', data={'file': (BytesIO(csv), 'orders.csv'), 'rules': json.dumps(rules)},
+                           content_type='multipart/form-data')
+    assert response.status_code == 200
+    assert {tuple(e) for e in response.get_json()['ontology']['entities']} == {('Plant A', 'Site'), ('Plant B', 'Site')}
+
+    # The same file without rules is not served from the rules' cache entry
+    response = client.post('/api/upload', data={'file': (BytesIO(csv), 'orders.csv')},
+                           content_type='multipart/form-data')
+    assert 'WorkOrder' in {e[1] for e in response.get_json()['ontology']['entities']}
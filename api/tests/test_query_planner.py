@@ -0,0 +1,218 @@
+import itertools
+import json
+
+import pytest
+
+from database import db
+from loadtest.stub_llm import StubLLMServer, StubSettings
+from models import Node, QueryTemplate
+from query_planner import PlanError, QuestionShape, Slot, answer_question, parse_question, validate_plan
+
+ONTOLOGY = {
+    'entities': [
+        ['A001', 'Asset'],
+        ['A002', 'Asset'],
+        ['Plant A', 'Facility'],
+        ['Plant B', 'Facility'],
+        ['WO_1', 'WorkOrder'],
+        ['WO_2', 'WorkOrder'],
+        ['WO_3', 'WorkOrder'],
+    ],
+    'relationships': [
+        {'source': 'Plant A', 'target': 'A001', 'type': 'LOCATED_IN'},
+        {'source': 'Plant B', 'target': 'A002', 'type': 'LOCATED_IN'},
+        {'source': 'WO_1', 'target': 'A001', 'type': 'MAINTAINS'},
+        {'source': 'WO_2', 'target': 'A002', 'type': 'MAINTAINS'},
+        {'source': 'WO_3', 'target': 'A002', 'type': 'MAINTAINS'},
+    ]
+}
+
+WORK_ORDERS_PLAN = {
+    'answerable': True, 'start': 0, 'result': 'list',
+    'steps': [{'edge': 'MAINTAINS', 'direction': 'in', 'node_type': 'WorkOrder'}],
+    'answer': '{slot0} has {count} work orders: {results}.'
+}
+
+SCHEMA = {'node_types': ['Asset', 'Facility', 'WorkOrder'], 'edge_types': ['LOCATED_IN', 'MAINTAINS'],
+          'triples': [('WorkOrder', 'MAINTAINS', 'Asset', 3), ('Facility', 'LOCATED_IN', 'Asset', 2)]}
+
+# A fresh client address per request keeps the chat rate limit out of the way
+_addresses = (f'10.48.0.{n}' for n in itertools.count(1))
+
+@pytest.fixture(autouse=True)
+def templates(app):
+    app.config.update(CHAT_QUERY_TEMPLATES=True)
+    yield
+    app.config.update(CHAT_QUERY_TEMPLATES=False)
+
+@pytest.fixture
+def llm(monkeypatch):
+    server = StubLLMServer(settings=StubSettings(latency=0, tokens_per_second=0, completion_tokens=20,
+                                                 jitter=0)).start()
+    server.plan = WORK_ORDERS_PLAN
+    server.planning_requests = 0
+
+    def respond(request):
+        # Planning calls ask for a JSON object; answers are filler words
+        if 'response_format' not in request:
+            return 'The regular chat answer.'
+        server.planning_requests += 1
+        return json.dumps(server.plan)
+    server.responder = respond
+    monkeypatch.setenv('OPENAI_API_KEY', 'test')
+    monkeypatch.setenv('OPENAI_BASE_URL', server.base_url)
+    # The asset context query is PostgreSQL SQL (DISTINCT ON)
+    from chat_handler import ChatHandler
+    monkeypatch.setattr(ChatHandler, '_get_asset_context',
+                        lambda handler, raise_errors=False: {'type': 'asset_context', 'data': [],
+                                                             'system_note': None})
+    yield server
+    server.stop()
+
+@pytest.fixture
+def graph(client):
+    assert client.post('/api/validate-ontology', json={'ontology': ONTOLOGY}).status_code == 200
+
+def ask(client, query, **extra):
+    response = client.post('/api/chat', json={'query': query, **extra},
+                           environ_base={'REMOTE_ADDR': next(_addresses)})
+    assert response.status_code == 200
+    body = response.get_json()
+    assert 'error' not in body, body
+    return body
+
+def test_repeated_shape_runs_cached_template_without_llm(app, client, runner, llm, graph):
+    first = ask(client, 'Which work orders maintain A001?')
+    assert first['response'] == 'A001 has 1 work orders: WO_1.'
+    assert first['template'] == 'which work orders maintain {Asset}'
+    assert llm.planning_requests == 1 and llm.requests == 1
+
+    second = ask(client, 'which work orders maintain A002')
+    assert second['response'] == 'A002 has 2 work orders: WO_2, WO_3.'
+    assert [item['label'] for item in second['context']['data']] == ['WO_2', 'WO_3']
+    # Same shape: no LLM call at all
+    assert llm.requests == 1
+
+    result = runner.invoke(args=['query-templates'])
+    assert '2  planned   which work orders maintain {Asset}' in result.output
+    result = runner.invoke(args=['query-templates', '--clear'])
+    assert 'Deleted 1 query templates' in result.output
+
+def test_declined_and_invalid_plans_fall_back_to_chat(app, client, llm, graph):
+    llm.plan = {'answerable': False, 'reason': 'needs maintenance history'}
+    assert ask(client, 'Why does A001 keep failing?')['response'] == 'The regular chat answer.'
+    assert ask(client, 'Why does A002 keep failing?')['response'] == 'The regular chat answer.'
+    # Planned once; both questions answered by the regular chat
+    assert llm.planning_requests == 1 and llm.requests == 3
+
+    # A plan using an edge type the graph does not have is stored as declined
+    llm.plan = dict(WORK_ORDERS_PLAN, steps=[{'edge': 'OWNS', 'direction': 'in'}])
+    assert ask(client, 'Who owns A001?')['response'] == 'The regular chat answer.'
+    with app.app_context():
+        template = QueryTemplate.query.filter_by(signature='who owns {Asset}').one()
+        assert not template.plan['answerable'] and 'edge' in template.plan['reason']
+
+def test_unparseable_plan_is_not_stored(app, client, llm, graph):
+    respond = llm.responder
+
+    def truncated(request):
+        # Cut off at max_tokens
+        reply = respond(request)
+        return reply[:40] if 'response_format' in request else reply
+    llm.responder = truncated
+    assert ask(client, 'Which work orders maintain A001?')['response'] == 'The regular chat answer.'
+    with app.app_context():
+        assert QueryTemplate.query.count() == 0
+
+    # The next question of the shape is planned again
+    llm.responder = respond
+    assert ask(client, 'Which work orders maintain A002?')['response'] == 'A002 has 2 work orders: WO_2, WO_3.'
+    assert llm.planning_requests == 2
+
+def test_shape_planned_concurrently_keeps_the_first_template(app, graph):
+    declined = {'answerable': False, 'reason': 'planned by another request'}
+
+    def complete(messages):
+        # Another request stores the same shape while this one is planning
+        shape = parse_question('Which work orders maintain A002?')
+        db.session.add(QueryTemplate(digest=shape.digest, signature=shape.signature, plan=declined, hits=3))
+        db.session.commit()
+        return json.dumps(WORK_ORDERS_PLAN)
+
+    with app.app_context():
+        assert answer_question('Which work orders maintain A001?', None, complete) is None
+        db.session.commit()
+        template, = QueryTemplate.query.all()
+        assert (template.plan, template.hits) == (declined, 4)
+
+def test_session_follow_ups_skip_templates(client, llm, graph):
+    session_id = client.post('/api/chat/sessions', json={}).get_json()['session_id']
+    first = ask(client, 'Which work orders maintain A001?', session_id=session_id)
+    assert first['template'] == 'which work orders maintain {Asset}'
+    # Answered with the session's history instead of the template
+    follow_up = ask(client, 'Which work orders maintain A002?', session_id=session_id)
+    assert follow_up['response'] == 'The regular chat answer.' and 'template' not in follow_up
+    assert [m['role'] for m in llm.last_request['messages']] == ['system', 'user', 'assistant', 'user']
+    assert llm.planning_requests == 1
+
+def test_plan_slots_and_sites(app, client, llm, graph):
+    llm.plan = {'answerable': True, 'start': 1, 'result': 'count',
+                'steps': [{'edge': 'LOCATED_IN', 'direction': 'out', 'slot': 0}],
+                'answer': '{slot0} in {slot1}: {count}'}
+    assert ask(client, 'Is A001 located in Plant A?')['response'] == 'A001 in Plant A: 1'
+    assert ask(client, 'Is A002 located in Plant A?')['response'] == 'A002 in Plant A: 0'
+    assert llm.requests == 1
+
+    # Labels of another site are not entities of this one
+    assert client.post('/api/validate-ontology', json={'ontology': ONTOLOGY, 'site': 'north'}).status_code == 200
+    llm.plan = WORK_ORDERS_PLAN
+    assert ask(client, 'Which work orders maintain A002?', site='north')['response'] == \
+        'A002 has 2 work orders: WO_2, WO_3.'
+    assert ask(client, 'Which work orders maintain A002?', site='south')['response'] == 'The regular chat answer.'
+
+def test_templates_are_planned_per_site(app, client, llm):
+    # The same shape on a site whose graph has no MAINTAINS edges
+    other = {'entities': [['A001', 'Asset'], ['Plant A', 'Facility']],
+             'relationships': [{'source': 'Plant A', 'target': 'A001', 'type': 'LOCATED_IN'}]}
+    for site, ontology in (('north', ONTOLOGY), ('south', other)):
+        assert client.post('/api/validate-ontology', json={'ontology': ontology, 'site': site}).status_code == 200
+    assert ask(client, 'Which work orders maintain A001?', site='north')['response'] == \
+        'A001 has 1 work orders: WO_1.'
+    # The north plan uses an edge type south does not have: planned again and declined there
+    assert ask(client, 'Which work orders maintain A001?', site='south')['response'] == 'The regular chat answer.'
+    assert llm.planning_requests == 2
+    with app.app_context():
+        assert sorted((t.site, t.plan['answerable']) for t in QueryTemplate.query) == \
+            [('north', True), ('south', False)]
+
+def test_parse_question(app, graph):
+    with app.app_context():
+        shape = parse_question('Compare Plant A with "Plant B", please.')
+        assert shape.signature == 'compare {Facility} with {Facility} please'
+        assert shape.slots == [Slot('Plant A', 'Facility'), Slot('Plant B', 'Facility')]
+        assert parse_question('How many facilities are there?') is None
+
+        db.session.add(Node(label='A001', type='Facility', properties={}))
+        db.session.commit()
+        assert parse_question('Work orders of A001') is None
+
+def test_validate_plan_rejects_plans_outside_the_whitelist():
+    shape = QuestionShape('which work orders maintain {Asset}', [Slot('A001', 'Asset')])
+    assert validate_plan(WORK_ORDERS_PLAN, shape, SCHEMA, max_steps=3) == WORK_ORDERS_PLAN
+    invalid = [
+        dict(WORK_ORDERS_PLAN, start=1),
+        dict(WORK_ORDERS_PLAN, start=True),
+        dict(WORK_ORDERS_PLAN, steps=[]),
+        dict(WORK_ORDERS_PLAN, steps=WORK_ORDERS_PLAN['steps'] * 4),
+        dict(WORK_ORDERS_PLAN, steps=[{'edge': 'MAINTAINS', 'direction': 'sideways'}]),
+        dict(WORK_ORDERS_PLAN, steps=[{'edge': 'MAINTAINS', 'direction': 'in', 'node_type': 'Pump'}]),
+        dict(WORK_ORDERS_PLAN, result='sum'),
+        dict(WORK_ORDERS_PLAN, answer='{slot0.__class__}'),
+        dict(WORK_ORDERS_PLAN, answer='{count!r}'),
+        dict(WORK_ORDERS_PLAN, answer='{slot1}'),
+        ['not', 'a', 'plan'],
+    ]
+    for plan in invalid:
+        with pytest.raises(PlanError):
+            validate_plan(plan, shape, SCHEMA, max_steps=3)
+    assert validate_plan({'answerable': 'yes'}, shape, SCHEMA, max_steps=3)['answerable'] is False
@@ -0,0 +1,83 @@
+import json
+import shutil
+
+import pytest
+from sqlalchemy import text
+
+from app import create_app
+from database import db, engine_options, read_session
+
+ONTOLOGY = {
+    'entities': [['A001', 'Asset'], ['Plant A', 'Facility'], ['WO_1', 'WorkOrder']],
+    'relationships': [
+        {'source': 'A001', 'target': 'Plant A', 'type': 'LOCATED_IN'},
+        {'source': 'WO_1', 'target': 'A001', 'type': 'MAINTAINS'},
+    ]
+}
+
+@pytest.fixture
+def routed_app(tmp_path):
+    primary, replica = tmp_path / 'primary.db', tmp_path / 'replica.db'
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{primary}',
+        'DATABASE_REPLICA_URL': f'sqlite:///{replica}',
+    })
+    app.test_cli_runner().invoke(args=['init-db'])
+
+    def replicate():
+        """Copy the primary file over the replica, standing in for streaming replication."""
+        app.extensions['replica_engine'].dispose()
+        shutil.copyfile(primary, replica)
+
+    replicate()
+    yield app, replicate
+    app.extensions['replica_engine'].dispose()
+    with app.app_context():
+        db.engine.dispose()
+
+def node_count(response):
+    records = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    return len([r for r in records if r['kind'] == 'node'])
+
+def test_writes_go_to_primary_and_reads_to_replica(routed_app):
+    app, replicate = routed_app
+    client = app.test_client()
+
+    assert client.post('/api/validate-ontology', json={'ontology': ONTOLOGY}).status_code == 200
+    with app.app_context():
+        assert db.session.execute(text('SELECT COUNT(*) FROM node')).scalar() == 3
+
+    # The replica has not caught up yet
+    assert node_count(client.get('/api/graph')) == 0
+
+    replicate()
+    assert node_count(client.get('/api/graph')) == 3
+
+def test_replica_rejects_writes(routed_app):
+    app, _ = routed_app
+    with app.app_context():
+        session = read_session()
+        assert session is not db.session
+        with pytest.raises(Exception, match='readonly'):
+            session.execute(text("INSERT INTO graph_version (site, version) VALUES ('*', 1)"))
+
+def test_reads_use_primary_without_replica(app):
+    with app.app_context():
+        assert read_session() is db.session
+
+def test_engine_options_from_config():
+    config = {
+        'DB_POOL_SIZE': 7, 'DB_MAX_OVERFLOW': 3, 'DB_POOL_TIMEOUT': 9,
+        'DB_POOL_RECYCLE': 120, 'DB_STATEMENT_TIMEOUT_MS': 5000,
+    }
+    options = engine_options('postgresql://db/app', config, read_only=True)
+    assert options['pool_size'] == 7
+    assert options['max_overflow'] == 3
+    assert options['pool_timeout'] == 9
+    assert options['pool_recycle'] == 120
+    assert options['connect_args']['options'] == '-c statement_timeout=5000 -c default_transaction_read_only=on'
+
+    sqlite_options = engine_options('sqlite:///:memory:', config)
+    assert 'pool_size' not in sqlite_options
+    assert 'connect_args' not in sqlite_options
@@ -0,0 +1,129 @@
+import json
+from io import BytesIO
+
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.schema import CreateTable
+
+from models import Node, Edge, WorkOrderAttribute
+from sites import partition_name
+from work_orders import aggregate_work_orders
+
+ONTOLOGY = {
+    'entities': [
+        ['A001', 'Asset'],
+        ['Plant A', 'Facility'],
+        ['WO_1', 'WorkOrder'],
+    ],
+    'relationships': [
+        {'source': 'A001', 'target': 'Plant A', 'type': 'LOCATED_IN'},
+        {'source': 'WO_1', 'target': 'A001', 'type': 'MAINTAINS'},
+    ]
+}
+
+CSV = (
+    'Work Order ID,Asset ID,Facility Name,Status,Created Date,Cost\n'
+    '1001,A001,Plant A,Open,2024-01-05 08:00,100\n'
+    '1002,A001,Plant A,Closed,2024-01-15 08:00,50\n'
+).encode('utf-8')
+
+def load(client, site):
+    response = client.post('/api/validate-ontology', json={'ontology': ONTOLOGY, 'site': site})
+    assert response.status_code == 200
+    assert response.get_json()['site'] == site
+
+def upload(client, site):
+    response = client.post('/api/upload', data={'file': (BytesIO(CSV), 'orders.csv'), 'site': site},
+                           content_type='multipart/form-data')
+    assert response.status_code == 200
+    return response
+
+def read_nodes(response):
+    records = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    return [r for r in records if r['kind'] == 'node'], [r for r in records if r['kind'] == 'edge']
+
+def test_sites_hold_separate_graphs(app, client):
+    load(client, 'north')
+    load(client, 'south')
+    with app.app_context():
+        assert Node.query.filter_by(site='north').count() == Node.query.filter_by(site='south').count() == 3
+        # Labels repeat across sites; edges never cross them
+        for edge in Edge.query.all():
+            assert edge.source.site == edge.target.site == edge.site
+
+    nodes, edges = read_nodes(client.get('/api/graph?site=north'))
+    assert len(nodes) == 3 and len(edges) == 2
+
+    nodes, _ = read_nodes(client.get('/api/graph?site=north&facility=Plant A'))
+    assert {node['label'] for node in nodes} == {'Plant A', 'A001', 'WO_1'}
+    assert len(read_nodes(client.get('/api/graph'))[0]) == 6
+
+def test_site_upload_leaves_other_sites_untouched(app, client):
+    upload(client, 'north')
+    upload(client, 'south')
+    load(client, 'north')
+    load(client, 'south')
+
+    # Reloading one site clears only its graph and attributes
+    assert upload(client, 'north').get_json()['site'] == 'north'
+    with app.app_context():
+        assert Node.query.filter_by(site='north').count() == 0
+        assert Node.query.filter_by(site='south').count() == 3
+        assert Edge.query.filter_by(site='south').count() == 2
+        assert WorkOrderAttribute.query.filter_by(site='north').count() == 2
+        assert WorkOrderAttribute.query.filter_by(site='south').count() == 2
+
+        rows = aggregate_work_orders(group_by='site', filters={'status': 'Open'})
+    assert [(row['site'], row['count']) for row in rows] == [('north', 1), ('south', 1)]
+
+def test_writes_to_one_site_keep_other_sites_cached(client):
+    load(client, 'north')
+    load(client, 'south')
+    urls = ['/api/graph?site=north', '/api/graph/summary?site=north', '/api/graph/analytics?site=north']
+    etags = {url: client.get(url).headers['ETag'] for url in urls}
+    assert client.get('/api/graph?site=north').headers['X-Graph-Version'] == '1'
+    whole = client.get('/api/graph/summary').headers['ETag']
+
+    operations = [{'op': 'add_entity', 'label': 'A002', 'type': 'Asset'}]
+    assert client.patch('/api/ontology', json={'site': 'south', 'operations': operations}).status_code == 200
+    for url in urls:
+        assert client.get(url, headers={'If-None-Match': etags[url]}).status_code == 304
+    assert client.get('/api/graph/summary', headers={'If-None-Match': whole}).status_code == 200
+    assert client.get('/api/graph').headers['X-Graph-Version'] == '3'
+    assert client.get('/api/graph?site=south').headers['X-Graph-Version'] == '2'
+
+    summary = client.get('/api/graph/summary?site=south').get_json()
+    assert (summary['version'], sum(supernode['count'] for supernode in summary['supernodes'])) == (2, 4)
+    assert client.get('/api/graph/analytics?site=south').get_json()['node_count'] == 4
+    assert client.get('/api/graph/analytics').get_json()['node_count'] == 7
+
+def test_default_and_invalid_sites(app, client):
+    response = client.post('/api/validate-ontology', json={'ontology': ONTOLOGY})
+    assert response.get_json()['site'] == app.config['DEFAULT_SITE']
+
+    bad = "north'; DROP TABLE node; --"
+    assert client.post('/api/validate-ontology', json={'ontology': ONTOLOGY, 'site': bad}).status_code == 400
+    assert client.get('/api/graph', query_string={'site': bad}).status_code == 400
+    assert client.get('/api/graph/summary', query_string={'site': bad}).status_code == 400
+    assert client.get('/api/graph/analytics', query_string={'site': bad}).status_code == 400
+    response = client.post('/api/upload', data={'file': (BytesIO(CSV), 'orders.csv'), 'site': bad},
+                           content_type='multipart/form-data')
+    assert response.status_code == 400
+    assert client.post('/api/chat', json={'query': 'status?', 'site': bad}).status_code == 400
+
+def test_postgresql_tables_are_list_partitioned_by_site():
+    for table in (Node.__table__, Edge.__table__):
+        ddl = str(CreateTable(table).compile(dialect=postgresql.dialect()))
+        assert 'PRIMARY KEY (id, site)' in ddl
+        assert ddl.rstrip().endswith('PARTITION BY LIST (site)')
+    edge_ddl = str(CreateTable(Edge.__table__).compile(dialect=postgresql.dialect()))
+    assert 'FOREIGN KEY(source_id, site) REFERENCES node (id, site) ON DELETE CASCADE' in edge_ddl
+
+    # SQLite keeps a plain table with an autoincrementing id
+    ddl = str(CreateTable(Node.__table__).compile(dialect=sqlite.dialect()))
+    assert 'PRIMARY KEY (id)' in ddl and 'PARTITION' not in ddl
+
+def test_partition_names_are_unique_identifiers():
+    names = {partition_name('node', site) for site in ('Plant-A', 'plant_a', 'Plant.A', 'plant-a')}
+    assert len(names) == 4
+    name = partition_name('edge', 'x' * 64)
+    assert name.startswith('edge_site_') and len(name) <= 63
@@ -0,0 +1,60 @@
+import gzip
+
+import pytest
+
+from app import create_app
+from static_files import IMMUTABLE_CACHE_CONTROL, precompress_directory
+
+BUNDLE = b'console.log("knowledge graph");\n' * 200
+
+@pytest.fixture
+def dist(tmp_path):
+    (tmp_path / 'assets').mkdir()
+    (tmp_path / 'index.html').write_text('<!doctype html><div id="root"></div>')
+    (tmp_path / 'assets' / 'index-B7xQ2k9a.js').write_bytes(BUNDLE)
+    (tmp_path / 'favicon.svg').write_text('<svg/>')
+    return tmp_path
+
+@pytest.fixture
+def static_client(dist):
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:', 'FRONTEND_DIST_DIR': str(dist)})
+    return app.test_client()
+
+def test_hashed_assets_are_immutable_and_gzip_encoded(static_client):
+    response = static_client.get('/assets/index-B7xQ2k9a.js', headers={'Accept-Encoding': 'gzip, deflate'})
+    assert response.status_code == 200
+    assert response.headers['Cache-Control'] == IMMUTABLE_CACHE_CONTROL
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert gzip.decompress(response.get_data()) == BUNDLE
+
+    plain = static_client.get('/assets/index-B7xQ2k9a.js', headers={'Accept-Encoding': 'identity'})
+    assert 'Content-Encoding' not in plain.headers
+    assert plain.get_data() == BUNDLE
+    assert plain.headers['ETag'] != response.headers['ETag']
+
+def test_conditional_requests_and_spa_fallback(static_client):
+    first = static_client.get('/')
+    assert first.headers['Cache-Control'] == 'no-cache'
+    etag = first.headers['ETag']
+
+    cached = static_client.get('/', headers={'If-None-Match': etag})
+    assert cached.status_code == 304
+    assert cached.get_data() == b''
+
+    route = static_client.get('/graphs/42', headers={'If-None-Match': etag})
+    assert route.status_code == 304
+    assert static_client.get('/graphs/42').get_data() == first.get_data()
+
+def test_prebuilt_variants_are_served(dist):
+    assert precompress_directory(str(dist)) == 1
+    (dist / 'assets' / 'index-B7xQ2k9a.js.br').write_bytes(b'brotli-bytes')
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:', 'FRONTEND_DIST_DIR': str(dist)})
+    response = app.test_client().get('/assets/index-B7xQ2k9a.js', headers={'Accept-Encoding': 'gzip, br'})
+    assert response.headers['Content-Encoding'] == 'br'
+    assert response.get_data() == b'brotli-bytes'
+
+def test_missing_build_returns_404(tmp_path):
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:', 'FRONTEND_DIST_DIR': str(tmp_path / 'none')})
+    response = app.test_client().get('/')
+    assert response.status_code == 404
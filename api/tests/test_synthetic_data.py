@@ -0,0 +1,33 @@
+import pandas as pd
+
+from synthetic_data import DatasetSpec, generate_work_orders, iter_work_orders, write_work_orders_csv
+from ontology_processor import extract_ontology
+
+def test_generator_is_deterministic_and_chunk_independent_of_memory():
+    first = generate_work_orders(500, seed=7)
+    second = generate_work_orders(500, seed=7)
+    pd.testing.assert_frame_equal(first, second)
+    assert not first.equals(generate_work_orders(500, seed=8))
+
+    chunks = list(iter_work_orders(DatasetSpec(rows=500, seed=7), chunk_size=200))
+    assert [len(chunk) for chunk in chunks] == [200, 200, 100]
+    assert pd.concat(chunks)['Work Order ID'].is_unique
+
+def test_assets_keep_one_facility_and_skew_concentrates_work():
+    df = generate_work_orders(5000, assets=200, facilities=4, skew=1.2)
+    assert (df.groupby('Asset ID')['Facility Name'].nunique() == 1).all()
+    assert df['Facility Name'].nunique() <= 4
+    counts = df['Asset ID'].value_counts()
+    assert counts.iloc[0] > 10 * counts.median()
+
+    uniform = generate_work_orders(5000, assets=200, skew=0).value_counts('Asset ID')
+    assert uniform.iloc[0] < 3 * uniform.median()
+
+def test_csv_output_feeds_ontology_extraction(tmp_path):
+    path = tmp_path / 'work_orders.csv'
+    assert write_work_orders_csv(str(path), DatasetSpec(rows=50, assets=10), chunk_size=20) == 50
+    df = pd.read_csv(path)
+    assert len(df) == 50
+    ontology = extract_ontology(df)
+    types = {entity_type for _, entity_type in ontology['entities']}
+    assert types == {'Asset', 'Facility', 'Department', 'WorkOrder', 'Personnel'}
@@ -0,0 +1,64 @@
+import hashlib
+import os
+from io import BytesIO
+
+from metrics import STAGE_LATENCY
+from upload_cache import UPLOAD_CACHE_REQUESTS, UploadCache
+
+CSV = (
+    'Work Order ID,Asset ID,Facility Name\n'
+    'WO001,A001,Plant A\n'
+    'WO002,A002,Plant B\n'
+).encode('utf-8')
+
+def upload(client, data=CSV):
+    return client.post('/api/upload', data={'file': (BytesIO(data), 'orders.csv')},
+                       content_type='multipart/form-data')
+
+def test_identical_reupload_skips_processing(client):
+    first = upload(client)
+    assert first.status_code == 200
+
+    extractions = STAGE_LATENCY.count(stage='extract_ontology')
+    hits = UPLOAD_CACHE_REQUESTS.value(result='hit')
+    second = upload(client)
+    assert second.status_code == 200
+    assert second.get_json() == first.get_json()
+    assert STAGE_LATENCY.count(stage='extract_ontology') == extractions
+    assert UPLOAD_CACHE_REQUESTS.value(result='hit') == hits + 1
+
+    changed = upload(client, CSV + b'WO003,A003,Plant C\n')
+    assert STAGE_LATENCY.count(stage='extract_ontology') == extractions + 1
+    assert ['A003', 'Asset'] in changed.get_json()['ontology']['entities']
+
+def test_cache_entries_are_keyed_by_content_hash(app, client):
+    upload(client)
+    cache = app.extensions['upload_cache']
+    digest = hashlib.sha256(CSV).hexdigest()
+    assert cache.get(digest)['entities']
+    assert [name for name in os.listdir(cache.directory) if name.startswith(digest)]
+
+def test_lru_eviction_keeps_recently_used_entries(tmp_path):
+    ontology = {'entities': [[f'asset-{i}', 'Asset'] for i in range(200)], 'relationships': []}
+    cache = UploadCache(str(tmp_path), max_bytes=10 ** 6)
+    cache.put('a', ontology)
+    entry_size = sum(entry.stat().st_size for entry in os.scandir(tmp_path))
+    cache.max_bytes = entry_size * 2
+
+    cache.put('b', ontology)
+    os.utime(cache._path('a'), (1, 1))
+    os.utime(cache._path('b'), (2, 2))
+    assert cache.get('a') == ontology  # refreshes 'a'
+
+    cache.put('c', ontology)
+    assert cache.get('b') is None
+    assert cache.get('a') == ontology
+    assert cache.get('c') == ontology
+
+def test_corrupt_entries_are_discarded(tmp_path):
+    cache = UploadCache(str(tmp_path))
+    cache.put('a', {'entities': [], 'relationships': []})
+    with open(cache._path('a'), 'wb') as f:
+        f.write(b'garbage')
+    assert cache.get('a') is None
+    assert not os.path.exists(cache._path('a'))
@@ -0,0 +1,106 @@
+from io import BytesIO
+
+import pytest
+
+from database import db
+from metrics import STAGE_LATENCY
+from models import WorkOrderAttribute
+from work_orders import aggregate_work_orders, failure_intervals
+
+CSV = (
+    'Work Order ID,Asset ID,Facility Name,Status,Priority,Work Type,Created Date,Completed Date,Labor Hours,Cost\n'
+    '1001,A001,Plant A,Open,High,Corrective,2024-01-05 08:00,2024-01-05 12:00,4,100.5\n'
+    '1002,A001,Plant A,Closed,Low,Preventive,2024-01-15 08:00,2024-01-16 08:00,2,50\n'
+    '1003,A001,Plant A,Closed,High,Corrective,2024-02-04 08:00,,1.5,n/a\n'
+    '1004,A002,Plant B,Open,Medium,Corrective,2024-02-10 08:00,2024-02-10 10:00,,200\n'
+    '1005,A002,Plant B,Open,Medium,Corrective,not a date,,3,10\n'
+).encode('utf-8')
+
+def upload(client, data=CSV):
+    response = client.post('/api/upload', data={'file': (BytesIO(data), 'orders.csv')},
+                           content_type='multipart/form-data')
+    assert response.status_code == 200
+    return response
+
+def test_upload_stores_typed_attributes(app, client):
+    upload(client)
+    with app.app_context():
+        rows = {row.work_order: row for row in WorkOrderAttribute.query.all()}
+    assert sorted(rows) == ['WO_1001', 'WO_1002', 'WO_1003', 'WO_1004', 'WO_1005']
+    first = rows['WO_1001']
+    assert (first.asset, first.facility, first.status, first.priority) == ('A001', 'Plant A', 'Open', 'High')
+    assert first.created_date.isoformat() == '2024-01-05T08:00:00'
+    assert (first.labor_hours, first.cost) == (4.0, 100.5)
+    # Unparseable values become NULL instead of failing the upload
+    assert rows['WO_1003'].cost is None and rows['WO_1003'].completed_date is None
+    assert rows['WO_1005'].created_date is None
+
+def test_cached_reupload_keeps_attributes(app, client):
+    upload(client)
+    extractions = STAGE_LATENCY.count(stage='work_order_attributes')
+    upload(client)
+    assert STAGE_LATENCY.count(stage='work_order_attributes') == extractions
+    with app.app_context():
+        assert WorkOrderAttribute.query.count() == 5
+
+        # Attributes replaced by another upload are re-read on a cache hit
+        db.session.query(WorkOrderAttribute).delete()
+        db.session.commit()
+    upload(client)
+    assert STAGE_LATENCY.count(stage='work_order_attributes') == extractions + 1
+    with app.app_context():
+        assert WorkOrderAttribute.query.count() == 5
+
+def test_aggregate_per_asset_per_month(app, client):
+    upload(client)
+    with app.app_context():
+        rows = aggregate_work_orders(group_by='asset', period='month')
+    assert rows == [
+        {'site': 'default', 'asset': 'A001', 'period': '2024-01-01', 'count': 2, 'total_cost': 150.5,
+         'total_labor_hours': 6.0, 'mean_resolution_hours': 14.0},
+        {'site': 'default', 'asset': 'A001', 'period': '2024-02-01', 'count': 1, 'total_cost': 0.0,
+         'total_labor_hours': 1.5, 'mean_resolution_hours': None},
+        {'site': 'default', 'asset': 'A002', 'period': '2024-02-01', 'count': 1, 'total_cost': 200.0,
+         'total_labor_hours': 0.0, 'mean_resolution_hours': 2.0},
+    ]
+
+def test_aggregate_time_window_and_filters(app, client):
+    upload(client)
+    response = client.get('/api/work-orders/aggregate?group_by=status&start=2024-01-10&end=2024-02-10&work_type=Corrective')
+    assert response.status_code == 200
+    assert [(row['status'], row['count']) for row in response.get_json()['rows']] == [('Closed', 1)]
+
+    overall = client.get('/api/work-orders/aggregate').get_json()['rows']
+    assert len(overall) == 1 and overall[0]['count'] == 5
+
+    for query in ('group_by=color', 'period=decade', 'start=yesterday'):
+        assert client.get(f'/api/work-orders/aggregate?{query}').status_code == 400
+
+def test_failure_intervals_per_asset(app, client):
+    upload(client)
+    with app.app_context():
+        rows = failure_intervals(filters={'work_type': 'Corrective'}, min_work_orders=1)
+    # A002 has a single dated corrective work order, so no interval
+    assert rows == [{
+        'site': 'default', 'asset': 'A001', 'work_orders': 2, 'mean_interval_hours': 720.0,
+        'median_interval_hours': 720.0, 'mean_repair_hours': 4.0,
+    }]
+
+    response = client.get('/api/work-orders/intervals?limit=1')
+    assert response.status_code == 200
+    assert response.get_json()['rows'][0]['mean_interval_hours'] == pytest.approx((240 + 480) / 2)
+    assert client.get('/api/work-orders/intervals?group_by=cost').status_code == 400
+    assert client.get('/api/work-orders/intervals?site=../north').status_code == 400
+
+def test_same_asset_label_at_two_sites_stays_apart(app, client):
+    # A001 at a second plant, with the same work orders a year earlier
+    other = CSV.replace(b'2024-', b'2023-')
+    for site, data in (('north', CSV), ('south', other)):
+        response = client.post('/api/upload', data={'file': (BytesIO(data), 'orders.csv'), 'site': site},
+                               content_type='multipart/form-data')
+        assert response.status_code == 200
+    with app.app_context():
+        rows = failure_intervals(filters={'work_type': 'Corrective', 'asset': 'A001'}, min_work_orders=1)
+        totals = aggregate_work_orders(group_by='asset', filters={'asset': 'A001'})
+    assert [(row['site'], row['mean_interval_hours']) for row in rows] == [('north', 720.0), ('south', 720.0)]
+    assert [(row['site'], row['count']) for row in totals] == [('north', 3), ('south', 3)]
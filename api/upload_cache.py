@@ -0,0 +1,207 @@
+"""
+Content-addressed cache of extracted ontologies for uploaded files.
+
+Re-uploading the same export used to re-parse the CSV and rerun
+extract_ontology and entity resolution. Instead:
+
+- HashingRequest hashes uploaded files (SHA-256) while the multipart parser
+  writes them to their spool file, so no second pass over the data is needed
+- the upload endpoint looks the digest up in UploadCache before importing
+  pandas; a hit returns the stored ontology (and its data quality report)
+  directly
+- entries are stored on local disk as zlib-compressed JSON (a few percent of
+  the ontology's JSON size), keyed by the digest and EXTRACTOR_VERSION
+- the cache is bounded by UPLOAD_CACHE_MAX_BYTES and evicts the least
+  recently used entries; hits refresh an entry's mtime, which is what the
+  eviction order is based on, so the order survives restarts and is shared
+  by all workers using the directory
+
+Bump EXTRACTOR_VERSION whenever extract_ontology, resolve_entities or the
+data quality profile change their output, so stale entries are never served.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import zlib
+from typing import Dict, Optional
+import logging
+
+from flask import Flask, Request
+from werkzeug.datastructures import FileStorage
+
+from metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+EXTRACTOR_VERSION = 2
+
+_MAGIC = b'ONTC1\n'
+_SUFFIX = '.ontc'
+
+UPLOAD_CACHE_REQUESTS = Counter(
+    'upload_cache_requests_total',
+    'Upload ontology cache lookups, by result',
+    ('result',)
+)
+
+class HashingStream:
+    """Spool file wrapper that hashes everything written to it."""
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._hash = hashlib.sha256()
+
+    def write(self, data) -> int:
+        self._hash.update(data)
+        return self._stream.write(data)
+
+    def hexdigest(self) -> str:
+        return self._hash.hexdigest()
+
+    def __iter__(self):
+        return iter(self._stream)
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+class HashingRequest(Request):
+    """Request class whose uploaded files are hashed as they are received."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return HashingStream(super()._get_file_stream(total_content_length, content_type, filename, content_length))
+
+def upload_digest(file: FileStorage, chunk_size: int = 1024 * 1024) -> str:
+    """
+    Return the SHA-256 of an uploaded file.
+
+    Uses the digest computed while receiving it when available, and reads
+    the file otherwise (rewinding it afterwards).
+    """
+    if isinstance(file.stream, HashingStream):
+        return file.stream.hexdigest()
+    digest = hashlib.sha256()
+    position = file.stream.tell()
+    for chunk in iter(lambda: file.stream.read(chunk_size), b''):
+        digest.update(chunk)
+    file.stream.seek(position)
+    return digest.hexdigest()
+
+class UploadCache:
+    """
+    Size-bounded on-disk LRU cache mapping upload digests to ontologies.
+
+    Args:
+        directory: Cache directory, created if missing
+        max_bytes: Total size of the entries to keep
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 256 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.directory, f'{digest}-v{EXTRACTOR_VERSION}{_SUFFIX}')
+
+    def get(self, digest: str) -> Optional[Dict]:
+        """Return the cached ontology for a digest, or None."""
+        path = self._path(digest)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            if not data.startswith(_MAGIC):
+                raise ValueError('unknown cache entry format')
+            ontology = json.loads(zlib.decompress(data[len(_MAGIC):]))
+        except FileNotFoundError:
+            UPLOAD_CACHE_REQUESTS.inc(result='miss')
+            return None
+        except (OSError, ValueError, zlib.error) as e:
+            logger.warning(f"Discarding unreadable upload cache entry {path}: {str(e)}")
+            self._remove(path)
+            UPLOAD_CACHE_REQUESTS.inc(result='miss')
+            return None
+
+        try:
+            os.utime(path)  # mark as recently used
+        except OSError:
+            pass
+        UPLOAD_CACHE_REQUESTS.inc(result='hit')
+        return ontology
+
+    def put(self, digest: str, ontology: Dict) -> None:
+        """Store an ontology and evict old entries beyond max_bytes."""
+        data = _MAGIC + zlib.compress(json.dumps(ontology, separators=(',', ':')).encode(), 6)
+        if len(data) > self.max_bytes:
+            logger.info(f"Not caching ontology for {digest}: {len(data)} bytes exceeds the cache size")
+            return
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(digest))
+        except OSError:
+            self._remove(tmp_path)
+            raise
+        self.evict()
+
+    def evict(self) -> int:
+        """
+        Remove least recently used entries until the cache fits max_bytes.
+
+        Returns:
+            Number of entries removed
+        """
+        with self._lock:
+            entries = []
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(_SUFFIX):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in entries)
+            removed = 0
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                self._remove(path)
+                total -= size
+                removed += 1
+        if removed:
+            logger.info(f"Evicted {removed} upload cache entries")
+        return removed
+
+    def clear(self) -> None:
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(_SUFFIX):
+                self._remove(entry.path)
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+def init_upload_cache(app: Flask) -> Optional[UploadCache]:
+    """
+    Hash uploads while they are received and set up the ontology cache.
+
+    The cache is disabled when UPLOAD_CACHE_MAX_BYTES is 0.
+
+    Args:
+        app: Flask application
+
+    Returns:
+        The UploadCache, also stored in app.extensions['upload_cache']
+    """
+    app.request_class = HashingRequest
+    max_bytes = app.config.get('UPLOAD_CACHE_MAX_BYTES', 0)
+    cache = UploadCache(app.config['UPLOAD_CACHE_DIR'], max_bytes) if max_bytes else None
+    app.extensions['upload_cache'] = cache
+    return cache
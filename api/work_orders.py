@@ -0,0 +1,252 @@
+"""
+Typed work order attribute store and its time-window / aggregate queries.
+
+The upload endpoint extracts dates, status, priority, cost and the other CMMS
+columns into the work_order_attribute table (see models.WorkOrderAttribute)
+with vectorized pandas conversions. Queries select only the columns they
+need with an indexed created_date range (BRIN on PostgreSQL, B-tree
+elsewhere) and equality filters, then aggregate in pandas:
+
+- aggregate_work_orders: counts, cost, labor hours and mean resolution time
+  per group (asset, facility, ...) and/or calendar period (day ... year)
+- failure_intervals: MTBF-style mean/median time between consecutive work
+  orders per asset (or other group), with mean time to repair
+
+Asset, facility and other labels are only unique within a site, so groups
+are always (site, label) pairs: "Pump 1" at two plants stays two groups.
+"""
+
+from datetime import datetime
+from typing import Dict, List, Optional
+import logging
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import delete, select
+
+from config import DEFAULT_SITE
+from database import db, read_session
+from models import WorkOrderAttribute
+from ontology_rules import DEFAULT_RULES
+
+logger = logging.getLogger(__name__)
+
+# CSV column -> (attribute, kind)
+ATTRIBUTE_COLUMNS = {
+    'Asset ID': ('asset', 'text'),
+    'Facility Name': ('facility', 'text'),
+    'Department': ('department', 'text'),
+    'Assigned To': ('assigned_to', 'text'),
+    'Status': ('status', 'text'),
+    'Priority': ('priority', 'text'),
+    'Work Type': ('work_type', 'text'),
+    'Created Date': ('created_date', 'datetime'),
+    'Completed Date': ('completed_date', 'datetime'),
+    'Labor Hours': ('labor_hours', 'number'),
+    'Cost': ('cost', 'number'),
+}
+WORK_ORDER_COLUMN = 'Work Order ID'
+# Attribute rows use the WorkOrder node label, e.g. 'WO_1001'
+WORK_ORDER_PREFIX = next(rule.get('prefix', '') for rule in DEFAULT_RULES['entities']
+                         if rule['column'] == WORK_ORDER_COLUMN)
+
+GROUPS = ('site', 'asset', 'facility', 'department', 'assigned_to', 'status', 'priority', 'work_type')
+PERIODS = {'day': 'D', 'week': 'W', 'month': 'M', 'quarter': 'Q', 'year': 'Y'}
+_STRING_LIMITS = {column.name: column.type.length for column in WorkOrderAttribute.__table__.columns
+                  if getattr(column.type, 'length', None)}
+
+def _clean_text(series: pd.Series) -> pd.Series:
+    text = series.astype(str).str.strip()
+    return text.where(series.notna() & (text != ''))
+
+def extract_work_order_attributes(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convert the uploaded work orders into typed attribute columns.
+
+    Missing columns become nulls, unparseable dates and numbers become
+    NaT/NaN. Rows without a work order ID are dropped; for duplicate IDs the
+    last row wins.
+
+    Args:
+        df: Uploaded CSV as read by pandas
+
+    Returns:
+        DataFrame with one column per WorkOrderAttribute attribute
+    """
+    if WORK_ORDER_COLUMN not in df.columns:
+        return pd.DataFrame(columns=['work_order'] + [name for name, _ in ATTRIBUTE_COLUMNS.values()])
+
+    frame = pd.DataFrame({'work_order': WORK_ORDER_PREFIX + _clean_text(df[WORK_ORDER_COLUMN])})
+    for column, (name, kind) in ATTRIBUTE_COLUMNS.items():
+        if column not in df.columns:
+            frame[name] = pd.Series(np.nan if kind == 'number' else None, index=df.index,
+                                    dtype='datetime64[ns]' if kind == 'datetime' else None)
+        elif kind == 'datetime':
+            frame[name] = pd.to_datetime(df[column], errors='coerce')
+        elif kind == 'number':
+            frame[name] = pd.to_numeric(df[column], errors='coerce')
+        else:
+            frame[name] = _clean_text(df[column]).str.slice(0, _STRING_LIMITS.get(name))
+    frame = frame[frame['work_order'].notna()]
+    return frame.drop_duplicates('work_order', keep='last').reset_index(drop=True)
+
+def _insert_records(frame: pd.DataFrame) -> List[Dict]:
+    """Rows as dicts of plain Python values with None for NaN/NaT, built column-wise."""
+    columns = []
+    for name in frame.columns:
+        series = frame[name]
+        if series.dtype.kind == 'M':
+            values = series.dt.to_pydatetime().astype(object)
+        else:
+            values = series.to_numpy(dtype=object)
+        values[series.isna().to_numpy()] = None
+        columns.append(values.tolist())
+    names = list(frame.columns)
+    return [dict(zip(names, row)) for row in zip(*columns)]
+
+def store_work_order_attributes(frame: pd.DataFrame, digest: Optional[str] = None,
+                                site: str = DEFAULT_SITE, batch_size: int = 5000) -> int:
+    """
+    Replace a site's stored attributes with those of its latest upload.
+
+    Other sites' rows are left untouched. Runs in the current transaction;
+    the caller commits.
+
+    Args:
+        frame: Output of extract_work_order_attributes
+        digest: SHA-256 of the upload, recorded with the rows
+        site: Site key the upload belongs to
+        batch_size: Rows per executemany batch
+
+    Returns:
+        Number of rows stored
+    """
+    db.session.execute(delete(WorkOrderAttribute).where(WorkOrderAttribute.site == site))
+    if frame.empty:
+        return 0
+    records = _insert_records(frame.assign(site=site, source_digest=digest))
+    # Core executemany; the ORM bulk path is several times slower here
+    table = WorkOrderAttribute.__table__
+    for start in range(0, len(records), batch_size):
+        db.session.execute(table.insert(), records[start:start + batch_size])
+    logger.info(f"Stored attributes for {len(records)} work orders at site {site}")
+    return len(records)
+
+def attributes_loaded(digest: str, site: str = DEFAULT_SITE) -> bool:
+    """Whether a site's stored attributes came from the upload with this digest."""
+    stored = db.session.execute(
+        select(WorkOrderAttribute.source_digest).where(WorkOrderAttribute.site == site).limit(1)
+    ).scalar()
+    return stored is not None and stored == digest
+
+def _load(columns: List[str], start: Optional[datetime], end: Optional[datetime],
+          filters: Optional[Dict[str, str]]) -> pd.DataFrame:
+    """Select columns of work orders created in [start, end) matching equality filters."""
+    statement = select(*(getattr(WorkOrderAttribute, name) for name in columns))
+    if start is not None:
+        statement = statement.where(WorkOrderAttribute.created_date >= start)
+    if end is not None:
+        statement = statement.where(WorkOrderAttribute.created_date < end)
+    for name, value in (filters or {}).items():
+        if name not in GROUPS:
+            raise ValueError(f"Cannot filter on '{name}'; use one of {list(GROUPS)}")
+        statement = statement.where(getattr(WorkOrderAttribute, name) == value)
+    rows = read_session().execute(statement).all()
+    frame = pd.DataFrame.from_records(rows, columns=columns)
+    for name in ('created_date', 'completed_date'):
+        if name in frame:
+            frame[name] = pd.to_datetime(frame[name])
+    for name in ('cost', 'labor_hours'):
+        if name in frame:
+            frame[name] = pd.to_numeric(frame[name])
+    return frame
+
+def _group_keys(group_by: str) -> List[str]:
+    """Grouping columns of a GROUPS attribute, qualified by site."""
+    return [group_by] if group_by == 'site' else ['site', group_by]
+
+def _records(frame: pd.DataFrame) -> List[Dict]:
+    """DataFrame rows as JSON-friendly dicts (NaN -> None, floats rounded)."""
+    frame = frame.round(3).astype(object)
+    return frame.where(frame.notna(), None).to_dict('records')
+
+def aggregate_work_orders(group_by: Optional[str] = None, period: Optional[str] = None,
+                          start: Optional[datetime] = None, end: Optional[datetime] = None,
+                          filters: Optional[Dict[str, str]] = None) -> List[Dict]:
+    """
+    Count work orders and sum their cost and labor per group and/or period.
+
+    Args:
+        group_by: One of GROUPS, or None for no grouping
+        period: One of PERIODS (calendar buckets of created_date), or None
+        start: Inclusive lower bound on created_date
+        end: Exclusive upper bound on created_date
+        filters: Equality filters on GROUPS columns
+
+    Returns:
+        One dict per group/period with count, total_cost, total_labor_hours
+        and mean_resolution_hours, ordered by site, group, then period
+    """
+    if group_by is not None and group_by not in GROUPS:
+        raise ValueError(f"group_by must be one of {list(GROUPS)}")
+    if period is not None and period not in PERIODS:
+        raise ValueError(f"period must be one of {list(PERIODS)}")
+
+    keys = _group_keys(group_by) if group_by else []
+    frame = _load(keys + ['created_date', 'completed_date', 'cost', 'labor_hours'], start, end, filters)
+    frame['resolution_hours'] = (frame['completed_date'] - frame['created_date']).dt.total_seconds() / 3600
+    if period:
+        frame = frame[frame['created_date'].notna()]
+        frame['period'] = frame['created_date'].dt.to_period(PERIODS[period]).dt.start_time.dt.strftime('%Y-%m-%d')
+        keys.append('period')
+
+    if not keys:
+        frame = frame.assign(_all=0)
+        keys = ['_all']
+    result = frame.groupby(keys, sort=True, dropna=False).agg(
+        count=('created_date', 'size'),
+        total_cost=('cost', 'sum'),
+        total_labor_hours=('labor_hours', 'sum'),
+        mean_resolution_hours=('resolution_hours', 'mean'),
+    ).reset_index()
+    return _records(result.drop(columns=['_all'], errors='ignore'))
+
+def failure_intervals(group_by: str = 'asset', start: Optional[datetime] = None, end: Optional[datetime] = None,
+                      filters: Optional[Dict[str, str]] = None, min_work_orders: int = 2,
+                      limit: Optional[int] = None) -> List[Dict]:
+    """
+    MTBF-style intervals between consecutive work orders of each group.
+
+    Args:
+        group_by: One of GROUPS, usually 'asset'
+        start: Inclusive lower bound on created_date
+        end: Exclusive upper bound on created_date
+        filters: Equality filters, e.g. {'work_type': 'Corrective'} for failures only
+        min_work_orders: Groups with fewer dated work orders are left out
+        limit: Return at most this many groups
+
+    Returns:
+        Dicts with site, the group, work_orders, mean_interval_hours,
+        median_interval_hours and mean_repair_hours, shortest mean interval first
+    """
+    if group_by not in GROUPS:
+        raise ValueError(f"group_by must be one of {list(GROUPS)}")
+
+    keys = _group_keys(group_by)
+    frame = _load(keys + ['created_date', 'completed_date'], start, end, filters)
+    frame = frame[frame[group_by].notna() & frame['created_date'].notna()]
+    frame = frame.sort_values(keys + ['created_date'], kind='stable')
+    frame['interval_hours'] = frame.groupby(keys)['created_date'].diff().dt.total_seconds() / 3600
+    frame['repair_hours'] = (frame['completed_date'] - frame['created_date']).dt.total_seconds() / 3600
+
+    result = frame.groupby(keys, sort=False).agg(
+        work_orders=('created_date', 'size'),
+        mean_interval_hours=('interval_hours', 'mean'),
+        median_interval_hours=('interval_hours', 'median'),
+        mean_repair_hours=('repair_hours', 'mean'),
+    ).reset_index()
+    result = result[result['work_orders'] >= max(min_work_orders, 2)]
+    result = result.sort_values(['mean_interval_hours'] + keys, kind='stable')
+    if limit is not None:
+        result = result.head(limit)
+    return _records(result)
@@ -0,0 +1,13 @@
+"""
+Production WSGI entry point.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+The app is built once in the gunicorn master (preload_app) and shared with
+the forked workers; see gunicorn.conf.py. Create the schema beforehand with
+`flask --app app init-db` or `flask --app app db upgrade`.
+"""
+
+from app import create_app
+
+app = create_app()
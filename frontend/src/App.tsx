@@ -6,6 +6,7 @@ import OntologyValidator from './components/OntologyValidator';
 import GraphViewer from './components/GraphViewer';
 import RuleEditor from './components/RuleEditor';
 import ChatInterface from './components/ChatInterface';
+import { ExtractionRules, fetchGraph, subscribeGraphChanges } from './services/api';
 
 const darkTheme = createTheme({
   palette: {
@@ -17,17 +18,32 @@ const App: React.FC = () => {
   const [ontology, setOntology] = React.useState<any>(null);
   const [graph, setGraph] = React.useState<any>(null);
   const [currentStep, setCurrentStep] = React.useState<number>(0);
+  const [rules, setRules] = React.useState<ExtractionRules | null>(null);
+  const [site, setSite] = React.useState<string | undefined>(undefined);
 
   const handleFileProcessed = (result: any) => {
     setOntology(result.ontology);
     setCurrentStep(1);
   };
 
-  const handleOntologyValidated = (graph: any) => {
+  const handleOntologyValidated = (graph: any, site: string) => {
     setGraph(graph);
+    setSite(site);
     setCurrentStep(2);
   };
 
+  const reloadGraph = React.useCallback(() => {
+    fetchGraph(site)
+      .then(setGraph)
+      .catch(error => console.error('Error loading graph:', error));
+  }, [site]);
+
+  // Keep the preview current with writes from other users and tabs
+  React.useEffect(() => {
+    if (currentStep !== 2) return;
+    return subscribeGraphChanges(reloadGraph, reloadGraph, { site });
+  }, [currentStep, site, reloadGraph]);
+
   return (
     <ThemeProvider theme={darkTheme}>
       <CssBaseline />
@@ -41,7 +57,10 @@ const App: React.FC = () => {
           </Typography>
 
           {currentStep === 0 && (
-            <FileUpload onProcessed={handleFileProcessed} />
+            <>
+              <FileUpload onProcessed={handleFileProcessed} rules={rules} />
+              <RuleEditor onRulesChange={setRules} />
+            </>
           )}
           {currentStep === 1 && (
             <OntologyValidator
@@ -51,9 +70,8 @@ const App: React.FC = () => {
           )}
           {currentStep === 2 && (
             <>
-              <GraphViewer graph={graph} />
+              <GraphViewer graph={graph} site={site} onPatched={reloadGraph} />
               <ChatInterface />
-              <RuleEditor />
             </>
           )}
         </Box>
@@ -15,7 +15,7 @@ import {
   ExpandMore as ExpandMoreIcon,
   ExpandLess as ExpandLessIcon,
 } from '@mui/icons-material';
-import { chat } from '../services/api';
+import { chat, createChatSession } from '../services/api';
 
 interface Message {
   text: string;
@@ -36,6 +36,7 @@ interface ChatApiResponse {
     data: any[];
     system_note?: string;
   };
+  session_id?: string;
   error?: string;
 }
 
@@ -44,6 +45,8 @@ const ChatInterface: React.FC = () => {
   const [input, setInput] = useState('');
   const [loading, setLoading] = useState(false);
   const [expandedContext, setExpandedContext] = useState<number | null>(null);
+  // Server-side session, so follow-up questions keep the conversation
+  const [sessionId, setSessionId] = useState<string | null>(null);
 
   const handleSend = async () => {
     if (!input.trim()) return;
@@ -64,7 +67,12 @@ const ChatInterface: React.FC = () => {
 
     try {
       console.log('Sending chat request:', userMessage);
-      const response: ChatApiResponse = await chat(userMessage);
+      let currentSession = sessionId;
+      if (!currentSession) {
+        currentSession = (await createChatSession()).session_id;
+        setSessionId(currentSession);
+      }
+      const response: ChatApiResponse = await chat(userMessage, currentSession);
       console.log('Received chat response:', response);
 
       if (response.error) {
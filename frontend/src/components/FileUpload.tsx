@@ -1,15 +1,31 @@
 import React from 'react';
-import { Button, Typography, Paper } from '@mui/material';
+import { Box, Button, Typography, Paper } from '@mui/material';
 import { Upload as UploadIcon } from '@mui/icons-material';
-import { uploadFile } from '../services/api';
+import { uploadFile, DataQualityIssue, DataQualityReport, ExtractionRules } from '../services/api';
 
 interface FileUploadProps {
   onProcessed: (result: any) => void;
+  // Custom extraction rules; the built-in ones when null
+  rules?: ExtractionRules | null;
 }
 
-const FileUpload: React.FC<FileUploadProps> = ({ onProcessed }) => {
+const describeIssue = (issue: DataQualityIssue): string => {
+  switch (issue.check) {
+    case 'duplicate_ids':
+      return `${issue.count} duplicate ${issue.column} values`;
+    case 'blank_values':
+      return `${issue.count} rows with a blank ${issue.column}`;
+    case 'conflicts':
+      return `${issue.count} ${issue.source} values with more than one ${issue.target} (${issue.relationship})`;
+    default:
+      return `${issue.count} ${issue.column} values without relationships`;
+  }
+};
+
+const FileUpload: React.FC<FileUploadProps> = ({ onProcessed, rules }) => {
   const [isDragging, setIsDragging] = React.useState(false);
   const [error, setError] = React.useState<string | null>(null);
+  const [quality, setQuality] = React.useState<DataQualityReport | null>(null);
 
   const handleDrop = async (e: React.DragEvent) => {
     e.preventDefault();
@@ -22,7 +38,8 @@ const FileUpload: React.FC<FileUploadProps> = ({ onProcessed }) => {
     }
 
     try {
-      const result = await uploadFile(file);
+      const result = await uploadFile(file, rules ?? undefined);
+      setQuality(result.quality ?? null);
       onProcessed(result);
     } catch (err) {
       setError(err instanceof Error ? err.message : 'Error processing file');
@@ -34,7 +51,8 @@ const FileUpload: React.FC<FileUploadProps> = ({ onProcessed }) => {
     if (!file) return;
 
     try {
-      const result = await uploadFile(file);
+      const result = await uploadFile(file, rules ?? undefined);
+      setQuality(result.quality ?? null);
       onProcessed(result);
     } catch (err) {
       setError(err instanceof Error ? err.message : 'Error processing file');
@@ -81,6 +99,19 @@ const FileUpload: React.FC<FileUploadProps> = ({ onProcessed }) => {
           {error}
         </Typography>
       )}
+      {quality && (quality.issues.length > 0 || quality.missing_columns.length > 0) && (
+        <Box sx={{ mt: 2, textAlign: 'left' }}>
+          <Typography variant="subtitle2" color="warning.main">
+            Data quality ({quality.rows} rows)
+          </Typography>
+          {quality.missing_columns.length > 0 && (
+            <Typography variant="body2">Missing columns: {quality.missing_columns.join(', ')}</Typography>
+          )}
+          {quality.issues.map((issue, index) => (
+            <Typography key={index} variant="body2">{describeIssue(issue)}</Typography>
+          ))}
+        </Box>
+      )}
     </Paper>
   );
 };
@@ -1,6 +1,7 @@
-import React, { useEffect, useRef } from 'react';
-import { Box, Paper, Typography } from '@mui/material';
+import React, { useEffect, useRef, useState } from 'react';
+import { Box, Button, Paper, Typography } from '@mui/material';
 import * as d3 from 'd3';
+import { patchOntology } from '../services/api';
 
 interface GraphNode extends d3.SimulationNodeDatum {
   id: string;
@@ -17,13 +18,32 @@ interface GraphViewerProps {
     nodes: GraphNode[];
     edges: GraphLink[];
   };
+  // Site of the stored graph the edits apply to
+  site?: string;
+  // Called after an edit was stored
+  onPatched?: () => void;
 }
 
-const GraphViewer: React.FC<GraphViewerProps> = ({ graph }) => {
+const GraphViewer: React.FC<GraphViewerProps> = ({ graph, site, onPatched }) => {
   const svgRef = useRef<SVGSVGElement>(null);
+  const [selected, setSelected] = useState<GraphNode | null>(null);
+  const [error, setError] = useState<string | null>(null);
+
+  const handleRemove = async () => {
+    if (!selected) return;
+    try {
+      await patchOntology([{ op: 'remove_entity', label: selected.label, type: selected.type }], site);
+      setSelected(null);
+      setError(null);
+      onPatched?.();
+    } catch (err: any) {
+      setError(err?.response?.data?.error ?? 'Error removing entity');
+    }
+  };
 
   useEffect(() => {
     if (!graph || !svgRef.current) return;
+    setSelected(null);
 
     // Clear existing content
     d3.select(svgRef.current).selectAll("*").remove();
@@ -49,14 +69,35 @@ const GraphViewer: React.FC<GraphViewerProps> = ({ graph }) => {
       .attr("d", "M 0,-5 L 10,0 L 0,5")
       .attr("fill", "#999");
 
+    // Use server-computed coordinates when every node has them
+    const hasLayout = graph.nodes.length > 0 &&
+      graph.nodes.every(d => d.x !== undefined && d.y !== undefined);
+
+    if (hasLayout) {
+      const xScale = d3.scaleLinear()
+        .domain(d3.extent(graph.nodes, d => d.x!) as [number, number])
+        .range([50, width - 50]);
+      const yScale = d3.scaleLinear()
+        .domain(d3.extent(graph.nodes, d => d.y!) as [number, number])
+        .range([50, height - 50]);
+      graph.nodes.forEach(d => {
+        d.fx = xScale(d.x!);
+        d.fy = yScale(d.y!);
+      });
+    }
+
     // Create the simulation
     const simulation = d3.forceSimulation<GraphNode>(graph.nodes)
       .force("link", d3.forceLink<GraphNode, GraphLink>(graph.edges)
         .id(d => d.id)
-        .distance(150))
-      .force("charge", d3.forceManyBody().strength(-500))
-      .force("center", d3.forceCenter(width / 2, height / 2))
-      .force("collision", d3.forceCollide().radius(50));
+        .distance(150));
+
+    if (!hasLayout) {
+      simulation
+        .force("charge", d3.forceManyBody().strength(-500))
+        .force("center", d3.forceCenter(width / 2, height / 2))
+        .force("collision", d3.forceCollide().radius(50));
+    }
 
     // Create container for the graph
     const g = svg.append("g");
@@ -95,6 +136,7 @@ const GraphViewer: React.FC<GraphViewerProps> = ({ graph }) => {
       .data(graph.nodes)
       .enter()
       .append("g")
+      .on("click", (_, d) => setSelected(d))
       .call(d3.drag<SVGGElement, GraphNode>()
         .on("start", dragstarted)
         .on("drag", dragged)
@@ -135,7 +177,7 @@ const GraphViewer: React.FC<GraphViewerProps> = ({ graph }) => {
     }
 
     function dragstarted(event: d3.D3DragEvent<SVGGElement, GraphNode, GraphNode>) {
-      if (!event.active) simulation.alphaTarget(0.3).restart();
+      if (!event.active && !hasLayout) simulation.alphaTarget(0.3).restart();
       event.subject.fx = event.subject.x;
       event.subject.fy = event.subject.y;
     }
@@ -143,16 +185,22 @@ const GraphViewer: React.FC<GraphViewerProps> = ({ graph }) => {
     function dragged(event: d3.D3DragEvent<SVGGElement, GraphNode, GraphNode>) {
       event.subject.fx = event.x;
       event.subject.fy = event.y;
+      if (hasLayout) {
+        event.subject.x = event.x;
+        event.subject.y = event.y;
+        ticked();
+      }
     }
 
     function dragended(event: d3.D3DragEvent<SVGGElement, GraphNode, GraphNode>) {
+      if (hasLayout) return;
       if (!event.active) simulation.alphaTarget(0);
       event.subject.fx = null;
       event.subject.fy = null;
     }
 
     // Update positions on simulation tick
-    simulation.on("tick", () => {
+    function ticked() {
       links.select("line")
         .attr("x1", d => (d.source as GraphNode).x!)
         .attr("y1", d => (d.source as GraphNode).y!)
@@ -164,7 +212,19 @@ const GraphViewer: React.FC<GraphViewerProps> = ({ graph }) => {
         .attr("y", d => ((d.source as GraphNode).y! + (d.target as GraphNode).y!) / 2);
 
       nodes.attr("transform", d => `translate(${d.x},${d.y})`);
-    });
+    }
+
+    if (hasLayout) {
+      // Positions are fixed: resolve them once instead of simulating
+      simulation.stop();
+      graph.nodes.forEach(d => {
+        d.x = d.fx!;
+        d.y = d.fy!;
+      });
+      ticked();
+    } else {
+      simulation.on("tick", ticked);
+    }
 
   }, [graph]);
 
@@ -177,6 +237,21 @@ const GraphViewer: React.FC<GraphViewerProps> = ({ graph }) => {
         <Box sx={{ width: '100%', height: '600px', position: 'relative' }}>
           <svg ref={svgRef} style={{ width: '100%', height: '100%' }}></svg>
         </Box>
+        {selected && (
+          <Box sx={{ mt: 1, display: 'flex', alignItems: 'center', gap: 2 }}>
+            <Typography>
+              {selected.label} ({selected.type})
+            </Typography>
+            <Button variant="outlined" color="error" onClick={handleRemove}>
+              Remove from Graph
+            </Button>
+          </Box>
+        )}
+        {error && (
+          <Typography color="error" sx={{ mt: 1 }}>
+            {error}
+          </Typography>
+        )}
       </Paper>
     </Box>
   );
@@ -22,7 +22,7 @@ interface OntologyValidatorProps {
       type: string;
     }[];
   };
-  onValidated: (graph: any) => void;
+  onValidated: (graph: any, site: string) => void;
 }
 
 // Define a type for the validated ontology structure
@@ -51,7 +51,7 @@ const OntologyValidator: React.FC<OntologyValidatorProps> = ({
   const handleValidate = async () => {
     try {
       const result = await validateOntology(validatedOntology);
-      onValidated(result.graph);
+      onValidated(result.graph, result.site);
     } catch (error) {
       console.error('Error validating ontology:', error);
     }
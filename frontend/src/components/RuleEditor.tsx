@@ -5,43 +5,55 @@ import {
   Typography,
   TextField,
   Button,
-  List,
-  ListItem,
-  ListItemText,
-  ListItemSecondaryAction,
-  IconButton,
 } from '@mui/material';
-import { Delete, Add } from '@mui/icons-material';
+import { compileRules, getDefaultRules, ExtractionRules } from '../services/api';
 
-interface Rule {
-  id: number;
-  condition: string;
-  action: string;
+interface RuleEditorProps {
+  // Called with a rule set the server accepted, or null for the built-in rules
+  onRulesChange?: (rules: ExtractionRules | null) => void;
 }
 
-const RuleEditor: React.FC = () => {
-  const [rules, setRules] = React.useState<Rule[]>([]);
-  const [newRule, setNewRule] = React.useState({
-    condition: '',
-    action: '',
-  });
+const errorMessage = (err: any): string =>
+  err?.response?.data?.error ?? (err instanceof Error ? err.message : 'Error checking rules');
 
-  const handleAddRule = () => {
-    if (newRule.condition && newRule.action) {
-      setRules([
-        ...rules,
-        {
-          id: Date.now(),
-          condition: newRule.condition,
-          action: newRule.action,
-        },
-      ]);
-      setNewRule({ condition: '', action: '' });
+const RuleEditor: React.FC<RuleEditorProps> = ({ onRulesChange }) => {
+  const [text, setText] = React.useState('');
+  const [status, setStatus] = React.useState<string | null>(null);
+  const [error, setError] = React.useState<string | null>(null);
+
+  const loadDefaults = React.useCallback(async () => {
+    try {
+      const { rules } = await getDefaultRules();
+      setText(JSON.stringify(rules, null, 2));
+      setStatus('Using the built-in rules');
+      setError(null);
+      onRulesChange?.(null);
+    } catch (err) {
+      setError(errorMessage(err));
     }
-  };
+  }, [onRulesChange]);
 
-  const handleDeleteRule = (id: number) => {
-    setRules(rules.filter(rule => rule.id !== id));
+  React.useEffect(() => {
+    loadDefaults();
+  }, [loadDefaults]);
+
+  const handleApply = async () => {
+    let rules: ExtractionRules;
+    try {
+      rules = JSON.parse(text);
+    } catch {
+      setError('Rules are not valid JSON');
+      return;
+    }
+    try {
+      const compiled = await compileRules(rules);
+      setStatus(`Rule set ${compiled.rule_set.slice(0, 12)}: ${compiled.entity_rules} entity rules, `
+        + `${compiled.relationship_rules} relationship rules`);
+      setError(null);
+      onRulesChange?.(rules);
+    } catch (err) {
+      setError(errorMessage(err));
+    }
   };
 
   return (
@@ -50,45 +62,34 @@ const RuleEditor: React.FC = () => {
         Custom Ontology Rules
       </Typography>
 
-      <Box sx={{ mb: 2 }}>
-        <TextField
-          fullWidth
-          label="Condition"
-          value={newRule.condition}
-          onChange={(e) => setNewRule({ ...newRule, condition: e.target.value })}
-          sx={{ mb: 1 }}
-        />
-        <TextField
-          fullWidth
-          label="Action"
-          value={newRule.action}
-          onChange={(e) => setNewRule({ ...newRule, action: e.target.value })}
-          sx={{ mb: 1 }}
-        />
-        <Button
-          variant="contained"
-          startIcon={<Add />}
-          onClick={handleAddRule}
-        >
-          Add Rule
+      <TextField
+        fullWidth
+        multiline
+        minRows={8}
+        label="Extraction rules (JSON)"
+        value={text}
+        onChange={(e) => setText(e.target.value)}
+        inputProps={{ spellCheck: false, style: { fontFamily: 'monospace' } }}
+        sx={{ mb: 1 }}
+      />
+      <Box sx={{ display: 'flex', gap: 1 }}>
+        <Button variant="contained" onClick={handleApply}>
+          Apply Rules
+        </Button>
+        <Button onClick={loadDefaults}>
+          Reset to Default
         </Button>
       </Box>
-
-      <List>
-        {rules.map((rule) => (
-          <ListItem key={rule.id}>
-            <ListItemText
-              primary={rule.condition}
-              secondary={rule.action}
-            />
-            <ListItemSecondaryAction>
-              <IconButton onClick={() => handleDeleteRule(rule.id)}>
-                <Delete />
-              </IconButton>
-            </ListItemSecondaryAction>
-          </ListItem>
-        ))}
-      </List>
+      {error && (
+        <Typography color="error" sx={{ mt: 1 }}>
+          {error}
+        </Typography>
+      )}
+      {!error && status && (
+        <Typography variant="body2" color="textSecondary" sx={{ mt: 1 }}>
+          {status}
+        </Typography>
+      )}
     </Paper>
   );
 };
@@ -1,50 +1,63 @@
-import { describe, it, expect, beforeEach } from 'vitest';
-import { render, screen, fireEvent } from '@testing-library/react';
-import userEvent from '@testing-library/user-event';
+import { describe, it, expect, beforeEach, vi } from 'vitest';
+import { render, screen, fireEvent, waitFor } from '@testing-library/react';
 import RuleEditor from '../RuleEditor';
+import { compileRules, getDefaultRules } from '../../services/api';
+
+vi.mock('../../services/api', () => ({
+  getDefaultRules: vi.fn(),
+  compileRules: vi.fn(),
+}));
+
+const DEFAULT_RULES = {
+  entities: [{ column: 'Asset ID', type: 'Asset' }],
+  relationships: [],
+};
 
 describe('RuleEditor Component', () => {
+  const onRulesChange = vi.fn();
+
   beforeEach(() => {
-    render(<RuleEditor />);
+    vi.mocked(getDefaultRules).mockReset().mockResolvedValue({ rule_set: 'abc', rules: DEFAULT_RULES });
+    vi.mocked(compileRules).mockReset();
+    onRulesChange.mockReset();
+    render(<RuleEditor onRulesChange={onRulesChange} />);
   });
 
-  it('renders without crashing', () => {
+  it('loads the built-in rules', async () => {
     expect(screen.getByText('Custom Ontology Rules')).toBeInTheDocument();
+    await waitFor(() =>
+      expect(screen.getByLabelText('Extraction rules (JSON)')).toHaveValue(JSON.stringify(DEFAULT_RULES, null, 2))
+    );
+    expect(screen.getByText('Using the built-in rules')).toBeInTheDocument();
+    expect(onRulesChange).toHaveBeenLastCalledWith(null);
   });
 
-  it('shows empty form inputs initially', () => {
-    expect(screen.getByLabelText('Condition')).toHaveValue('');
-    expect(screen.getByLabelText('Action')).toHaveValue('');
-  });
-
-  it('allows adding a new rule', async () => {
-    const conditionInput = screen.getByLabelText('Condition');
-    const actionInput = screen.getByLabelText('Action');
-    const addButton = screen.getByText('Add Rule');
-
-    await userEvent.type(conditionInput, 'test condition');
-    await userEvent.type(actionInput, 'test action');
-    fireEvent.click(addButton);
-
-    expect(screen.getByText('test condition')).toBeInTheDocument();
-    expect(screen.getByText('test action')).toBeInTheDocument();
+  it('applies rules the server accepts', async () => {
+    vi.mocked(compileRules).mockResolvedValue({ rule_set: '0123456789abcdef', entity_rules: 2, relationship_rules: 1 });
+    const rules = {
+      entities: [{ column: 'Asset ID', type: 'Asset' }, { column: 'Line', type: 'Line' }],
+      relationships: [{ source: 'Asset ID', target: 'Line', type: 'ON_LINE' }],
+    };
+    await waitFor(() => expect(getDefaultRules).toHaveBeenCalled());
+    fireEvent.change(screen.getByLabelText('Extraction rules (JSON)'), { target: { value: JSON.stringify(rules) } });
+    fireEvent.click(screen.getByText('Apply Rules'));
+
+    expect(await screen.findByText('Rule set 0123456789ab: 2 entity rules, 1 relationship rules')).toBeInTheDocument();
+    expect(compileRules).toHaveBeenCalledWith(rules);
+    expect(onRulesChange).toHaveBeenLastCalledWith(rules);
   });
 
-  it('allows deleting a rule', async () => {
-    // Add a rule first
-    const conditionInput = screen.getByLabelText('Condition');
-    const actionInput = screen.getByLabelText('Action');
-    const addButton = screen.getByText('Add Rule');
-
-    await userEvent.type(conditionInput, 'test condition');
-    await userEvent.type(actionInput, 'test action');
-    fireEvent.click(addButton);
-
-    // Now delete it
-    const deleteButton = screen.getByRole('button', { name: /delete/i });
-    fireEvent.click(deleteButton);
-
-    expect(screen.queryByText('test condition')).not.toBeInTheDocument();
-    expect(screen.queryByText('test action')).not.toBeInTheDocument();
+  it('shows why rules are rejected', async () => {
+    vi.mocked(compileRules).mockRejectedValue({ response: { data: { error: "entity rule 1: 'type' must be a non-empty string" } } });
+    await waitFor(() => expect(getDefaultRules).toHaveBeenCalled());
+    fireEvent.change(screen.getByLabelText('Extraction rules (JSON)'), { target: { value: '{"entities": [' } });
+    fireEvent.click(screen.getByText('Apply Rules'));
+    expect(await screen.findByText('Rules are not valid JSON')).toBeInTheDocument();
+    expect(compileRules).not.toHaveBeenCalled();
+
+    fireEvent.change(screen.getByLabelText('Extraction rules (JSON)'), { target: { value: '{"entities": [{}]}' } });
+    fireEvent.click(screen.getByText('Apply Rules'));
+    expect(await screen.findByText("entity rule 1: 'type' must be a non-empty string")).toBeInTheDocument();
+    expect(onRulesChange).not.toHaveBeenCalledWith(expect.objectContaining({ entities: [{}] }));
   });
 });
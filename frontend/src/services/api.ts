@@ -25,9 +25,54 @@ api.interceptors.response.use(
     }
 );
 
-export const uploadFile = async (file: File) => {
+// Data quality report returned with every upload (see api/data_quality.py)
+export interface DataQualityIssue {
+    check: 'duplicate_ids' | 'blank_values' | 'conflicts' | 'orphans';
+    count: number;
+    column?: string;
+    relationship?: string;
+    source?: string;
+    target?: string;
+    rows?: number | number[];
+    examples?: (string | { value: string; targets: string[] })[];
+}
+
+export interface DataQualityReport {
+    rows: number;
+    columns: Record<string, { null_rate: number; distinct: number }>;
+    issues: DataQualityIssue[];
+    missing_columns: string[];
+}
+
+// Extraction rule set (see api/ontology_rules.py)
+export interface ExtractionRules {
+    entities: Record<string, unknown>[];
+    relationships: Record<string, unknown>[];
+}
+
+export interface CompiledRules {
+    rule_set: string;
+    entity_rules: number;
+    relationship_rules: number;
+}
+
+export const getDefaultRules = async () => {
+    const response = await api.get('/rules/default');
+    return response.data as { rule_set: string; rules: ExtractionRules };
+};
+
+// Rejects with the server's message for rule sets that do not validate
+export const compileRules = async (rules: ExtractionRules) => {
+    const response = await api.post('/rules/compile', { rules });
+    return response.data as CompiledRules;
+};
+
+export const uploadFile = async (file: File, rules?: ExtractionRules) => {
     const formData = new FormData();
     formData.append('file', file);
+    if (rules) {
+        formData.append('rules', JSON.stringify(rules));
+    }
 
     try {
         const response = await axios.post('/api/upload', formData, {
@@ -48,7 +93,106 @@ export const validateOntology = async (ontology: any) => {
     return response.data;
 };
 
-export const chat = async (query: string) => {
-    const response = await api.post('/chat', { query });
+export type OntologyPatchOperation =
+    | { op: 'add_entity'; label: string; type: string }
+    | { op: 'remove_entity'; label: string; type?: string }
+    | { op: 'rename_entity'; label: string; type?: string; new_label?: string; new_type?: string }
+    | { op: 'add_relationship' | 'remove_relationship'; source: string; target: string; type: string;
+        source_type?: string; target_type?: string }
+    | { op: 'rename_relationship'; source: string; target: string; type: string; new_type: string;
+        source_type?: string; target_type?: string };
+
+// Applies edits to the stored graph without regenerating it
+export const patchOntology = async (operations: OntologyPatchOperation[], site?: string) => {
+    const response = await api.patch('/ontology', { operations, site });
+    return response.data;
+};
+
+// Stored graph of a site, read from the NDJSON export (see api/graph_export.py)
+export const fetchGraph = async (site?: string) => {
+    const response = await api.get('/graph', {
+        params: site ? { site } : {},
+        responseType: 'text',
+        transformResponse: data => data,
+    });
+    const graph = {
+        version: 0,
+        nodes: [] as { id: string; label: string; type: string; x?: number; y?: number }[],
+        edges: [] as { source: string; target: string; type: string }[],
+    };
+    for (const line of (response.data as string).split('\n')) {
+        if (!line) continue;
+        const record = JSON.parse(line);
+        if (record.kind === 'meta') {
+            graph.version = record.version;
+        } else if (record.kind === 'node') {
+            graph.nodes.push({ id: String(record.id), label: record.label, type: record.type, x: record.x, y: record.y });
+        } else if (record.kind === 'edge') {
+            graph.edges.push({ source: String(record.source), target: String(record.target), type: record.type });
+        }
+    }
+    return graph;
+};
+
+export const createChatSession = async (site?: string) => {
+    const response = await api.post('/chat/sessions', { site });
+    return response.data as { session_id: string; site: string | null };
+};
+
+export const chat = async (query: string, sessionId?: string) => {
+    const response = await api.post('/chat', sessionId ? { query, session_id: sessionId } : { query });
     return response.data;
-};
\ No newline at end of file
+};
+
+// Graph change feed (see api/graph_changes.py); ids are [first, last] ranges
+export type IdRange = [number, number];
+
+export interface GraphChange {
+    version: number;
+    site: string | null;
+    kind: 'upload' | 'validate' | 'patch';
+    nodes: { added: IdRange[]; removed: IdRange[]; updated: { id: number; label: string; type: string }[] };
+    edges: { added: IdRange[]; removed: IdRange[]; updated: { id: number; type: string }[] };
+}
+
+// Calls onChange for each change after `since` (default: from now) and
+// onReset(version) when the graph has to be reloaded. EventSource resumes
+// from the last event on reconnect; rejected streams (503) are retried here.
+// Returns a function that closes the feed.
+export const subscribeGraphChanges = (
+    onChange: (change: GraphChange) => void,
+    onReset: (version: number) => void,
+    options: { site?: string; since?: number; retryMs?: number } = {}
+) => {
+    let source: EventSource | null = null;
+    let retry: ReturnType<typeof setTimeout> | undefined;
+    let since = options.since;
+
+    const connect = () => {
+        const params = new URLSearchParams();
+        if (options.site) params.set('site', options.site);
+        if (since !== undefined) params.set('since', String(since));
+        source = new EventSource(`/api/graph/changes?${params}`);
+        source.addEventListener('change', event => {
+            const change = JSON.parse((event as MessageEvent).data) as GraphChange;
+            since = change.version;
+            onChange(change);
+        });
+        source.addEventListener('reset', event => {
+            since = JSON.parse((event as MessageEvent).data).version;
+            onReset(since as number);
+        });
+        source.onerror = () => {
+            // A closed source was rejected rather than disconnected
+            if (source?.readyState === EventSource.CLOSED) {
+                retry = setTimeout(connect, options.retryMs ?? 10000);
+            }
+        };
+    };
+    connect();
+
+    return () => {
+        clearTimeout(retry);
+        source?.close();
+    };
+};
@@ -21,6 +21,8 @@ export interface GraphNode {
   id: string;
   label: string;
   type: string;
+  x?: number;
+  y?: number;
 }
 
 export interface GraphEdge {